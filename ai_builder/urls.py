@@ -2,6 +2,6 @@ from django.contrib import admin
 from django.urls import path,include
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('main.urls')),
-    path('', include('main.urls')), 
+    # One mount: main.urls spells out its api/ routes itself
+    path('', include('main.urls')),
 ]
@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Website
+from .models import Website, GenerationJob, BulkGeneration
 
-admin.site.register(Website)
\ No newline at end of file
+admin.site.register(Website)
+admin.site.register(GenerationJob)
+admin.site.register(BulkGeneration)
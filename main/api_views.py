@@ -1,16 +1,52 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Website
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from .models import BulkGeneration
 import jwt
+import logging
 import os
 from datetime import datetime
-from pymongo import MongoClient
-import pymongo
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from .jobs import submit_job, get_job, job_status
+from .llm_client import get_client_manager
+from .generation_cache import generation_cache
+from .circuit_breaker import breaker_stats
+from .config import setting
+from .bulk import bulk_status, detect_format
+from .content_builder import build_site_content
+from .mongo_client import command_stats, pool_stats
+from .renderers import NDJSON_MEDIA_TYPE, NDJSONRenderer, ndjson_lines
+from .pagination import paged_response, parse_page_params
+from .replication import replication_status, save_website
+from .repositories import get_repository
+from .revisions import revisions
+from .autosave import autosave
+from .website_patch import (
+    EDITABLE_FIELDS,
+    Operation,
+    PatchError,
+    VersionConflict,
+    check_operations,
+    load_editable,
+    parse_dotted,
+    parse_json_patch,
+    write_operations,
+)
+from .website_cache import website_cache
+from .conditional import (
+    check_preconditions,
+    has_if_match,
+    list_etag,
+    precondition_failed,
+    set_list_etag,
+    wants_not_modified,
+    website_etag,
+)
 
-# Connect to MongoDB
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["ai_builder_db"]
+logger = logging.getLogger(__name__)
 
 class WebsiteCreateAPIView(APIView):
     def post(self, request):
@@ -31,66 +67,7 @@ class WebsiteCreateAPIView(APIView):
             if not all([business_name, location, description, business_type, email]):
                 return Response({"error": "All fields are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Create a basic JSON structure for the website content
-            content = {
-                "name": business_name,
-                "theme": {
-                    "primary_color": "#6366f1",
-                    "secondary_color": "#4f46e5",
-                    "text_color": "#333333",
-                    "background_color": "#ffffff"
-                },
-                "pages": [
-                    {
-                        "name": "Home",
-                        "sections": [
-                            {
-                                "type": "hero",
-                                "title": business_name,
-                                "subtitle": f"Your premier {business_type.lower()} in {location}",
-                                "cta": {
-                                    "text": "Contact Us",
-                                    "link": "#contact"
-                                }
-                            },
-                            {
-                                "type": "about",
-                                "id": "about",
-                                "title": "About Us",
-                                "content": description
-                            },
-                            {
-                                "type": "services",
-                                "title": "Our Services",
-                                "items": [
-                                    {
-                                        "title": f"{business_type} Service 1",
-                                        "description": "Our primary service offering"
-                                    },
-                                    {
-                                        "title": f"{business_type} Service 2",
-                                        "description": "Our secondary service offering"
-                                    },
-                                    {
-                                        "title": f"{business_type} Service 3",
-                                        "description": "Our tertiary service offering"
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "contact",
-                                "title": "Contact Us",
-                                "address": f"{business_name}, {location}",
-                                "phone": "+1 (555) 123-4567",
-                                "email": "contact@example.com"
-                            }
-                        ]
-                    }
-                ],
-                "footer": {
-                    "copyright": f" {datetime.now().year} {business_name}. All rights reserved."
-                }
-            }
+            content = build_site_content(business_type, industry, business_name, location, description)
 
             # Prepare website data
             website_data = {
@@ -105,32 +82,14 @@ class WebsiteCreateAPIView(APIView):
                 'updated_at': datetime.now()
             }
             
-            # Save to MongoDB
-            mongo_id = db.websites_collection.insert_one(website_data).inserted_id
-            
-            if not mongo_id:
-                return Response({"error": "Failed to save website data to MongoDB."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Also save in Django ORM
-            try:
-                website = Website.objects.create(
-                    user_email=email,
-                    business_name=business_name,
-                    location=location,
-                    description=description,
-                    business_type=business_type,
-                    industry=industry,
-                    content=str(content)  # Convert content to string for Django ORM
-                )
-                django_id = website.id
-            except Exception as e:
-                django_id = None
+            # Save to MongoDB; the ORM copy is written by the replicator
+            mongo_id, django_id = save_website(website_data)
             
             # Return success response with IDs
             return Response({
                 "success": True,
                 "message": "Website data saved successfully.",
-                "mongo_id": str(mongo_id),
+                "mongo_id": mongo_id,
                 "django_id": django_id
             }, status=status.HTTP_201_CREATED)
             
@@ -138,22 +97,304 @@ class WebsiteCreateAPIView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
 class WebsiteListAPIView(APIView):
+    """
+    List the user's websites a page at a time, or stream all of them as
+    NDJSON (``Accept: application/x-ndjson`` or ``?format=ndjson``).
+    """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+    
     def get(self, request):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            token = request.headers.get('Authorization').split()[1]
-            decoded_token = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=['HS256'])
-            email = decoded_token['email']
+            page_params = parse_page_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # The list version comes first, so a change while the list is read only costs a 200
+            etag = list_etag(request, email, get_repository().list_version(email), request.accepted_renderer.format)
+            if etag and wants_not_modified(request):
+                response = check_preconditions(request, etag)
+                if response is not None:
+                    return set_list_etag(response, etag)
             
-            # Get websites from MongoDB
-            websites = list(db.websites_collection.find({"user_email": email}))
+            if request.accepted_renderer.format == NDJSONRenderer.format:
+                return set_list_etag(self.stream(email, page_params), etag)
             
-            # Convert ObjectId to string
-            for website in websites:
-                website['_id'] = str(website['_id'])
+            # Get one page of websites from the repository
+            page = get_repository().list(user_id=email, **page_params)
+            if page is None:
+                return Response({"error": "Failed to read websites."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            return Response(websites)
+            return set_list_etag(paged_response(request, page), etag)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def stream(self, email, page_params):
+        """Every website after the cursor, one JSON document per line; ``limit`` does not apply."""
+        websites = get_repository().iter(
+            user_id=email,
+            cursor=page_params['cursor'],
+            fields=page_params['fields'],
+            batch_size=setting('WEBSITE_EXPORT_BATCH_SIZE', 100)
+        )
+        if websites is None:
+            return Response({"error": "Failed to read websites."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        def on_error(e):
+            logger.error(f"Website export for {email} stopped: {e}")
+        
+        return StreamingHttpResponse(ndjson_lines(websites, on_error), content_type=NDJSON_MEDIA_TYPE)
+
+def _request_email(request):
+    """Email of the JWT bearer token, or None if it is missing or invalid."""
+    try:
+        token = request.headers.get('Authorization', '').split()[1]
+        return jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=['HS256'])['email']
+    except (IndexError, KeyError, jwt.PyJWTError):
+        return None
+
+class WebsiteRevisionListAPIView(APIView):
+    """List the saved versions of a website's content, newest first."""
+    def get(self, request, website_id):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        if load_editable(website_id, email) is None:
+            return Response({"error": "Website not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"website_id": website_id, "versions": revisions.history(website_id)})
+
+class WebsiteRevisionAPIView(APIView):
+    """Return one version of a website's content, or restore it (undo) with POST."""
+    def get(self, request, website_id, version):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        content = revisions.get(website_id, version) if load_editable(website_id, email) else None
+        if content is None:
+            return Response({"error": "Version not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"website_id": website_id, "version": version, "content": content})
+
+    def post(self, request, website_id, version):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        autosave.flush(website_id)
+        website = load_editable(website_id, email)
+        content = revisions.get(website_id, version) if website else None
+        if content is None:
+            return Response({"error": "Version not found."}, status=status.HTTP_404_NOT_FOUND)
+        # Restoring adds a version, so the restore itself can be undone
+        if write_operations(website, [Operation('set', 'content', content)]) is None:
+            return Response({"error": "Failed to restore the website."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"website_id": website_id, "version": revisions.latest_version(website_id), "restored_from": version})
+
+class JSONPatchParser(JSONParser):
+    media_type = 'application/json-patch+json'
+
+class WebsitePatchAPIView(APIView):
+    """
+    Change fields of a website with JSON Patch or dotted paths (see
+    ``website_patch``). Send the ``version`` of a previous response as
+    ``expected_version`` (query parameter, or body field of a dotted patch)
+    to get 409 instead of overwriting someone else's change, or its ETag as
+    If-Match to get 412.
+    """
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + [JSONPatchParser]
+
+    def patch(self, request, website_id):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        expected = request.query_params.get('expected_version')
+        if expected is None and isinstance(request.data, dict):
+            expected = request.data.get('expected_version')
+        try:
+            # Buffered autosave edits come first
+            autosave.flush(website_id)
+            website = load_editable(website_id, email)
+            if website is None:
+                return Response({"error": "Website not found."}, status=status.HTTP_404_NOT_FOUND)
+            response = check_preconditions(request, website_etag(website_id, website.version))
+            if response is not None:
+                return response
+            if expected is None and has_if_match(request):
+                # The write itself checks that nobody changed the website since
+                expected = website.version
+            if isinstance(request.data, list):
+                operations = check_operations(parse_json_patch(request.data, website.document))
+            else:
+                operations = check_operations(parse_dotted(request.data))
+            version = write_operations(website, operations, expected)
+        except PatchError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except VersionConflict as e:
+            if has_if_match(request):
+                return precondition_failed(website_etag(website_id, e.current_version) if e.current_version else None)
+            return Response({"error": str(e), "version": e.current_version}, status=status.HTTP_409_CONFLICT)
+        if version is None:
+            return Response({"error": "Failed to update the website."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        fields = sorted({operation.path.split('.')[0] for operation in operations})
+        return Response(
+            {"website_id": website_id, "version": version, "updated": fields},
+            headers={'ETag': website_etag(website_id, version)}
+        )
+
+class WebsiteAutosaveAPIView(APIView):
+    """
+    Buffer editor changes (dotted-path patches) and write them together
+    (see ``autosave``); GET returns the website with the user's pending
+    changes applied.
+    """
+    def post(self, request, website_id):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            pending = autosave.submit(website_id, email, parse_dotted(request.data))
+        except PatchError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if pending is None:
+            return Response({"error": "Website not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"website_id": website_id, "pending": pending}, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request, website_id):
+        email = _request_email(request)
+        if email is None:
+            return Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        website, pending = autosave.view(website_id, email)
+        if website is None:
+            return Response({"error": "Website not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "website_id": website_id,
+            "version": website.version,
+            "pending": pending,
+            "website": {field: website.document.get(field) for field in EDITABLE_FIELDS},
+        })
+
+class GenerationJobCreateAPIView(APIView):
+    """Queue a website generation job and return its id without waiting for it."""
+    def post(self, request):
+        try:
+            payload = {
+                'business_name': request.data.get('business_name', ''),
+                'business_type': request.data.get('business_type', ''),
+                'industry': request.data.get('industry', ''),
+                'location': request.data.get('location', ''),
+                'description': request.data.get('description', ''),
+            }
+            
+            # Check for required fields
+            if not all(payload.values()):
+                return Response({
+                    "success": False,
+                    "message": "All fields are required."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            user_email = request.session.get('user_email', 'guest@example.com')
+            job = submit_job(payload, user_email=user_email)
+            
+            return Response({
+                "success": True,
+                "job_id": str(job.job_id),
+                "status": job.status,
+                "status_url": reverse('generation_job_status', args=[job.job_id])
+            }, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": f"An error occurred: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class GenerationJobStatusAPIView(APIView):
+    """Report whether a generation job is queued, running, done or failed."""
+    def get(self, request, job_id):
+        job = get_job(job_id)
+        if job is None:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job_status(job))
+
+class GenerationStatusAPIView(APIView):
+    """
+    Report LLM utilization, circuit breakers, cache, website cache, MongoDB
+    pool and command latency and autosave counters for this process, and the
+    MongoDB to ORM replication lag.
+    """
+    def get(self, request):
+        return Response({
+            "llm": get_client_manager().utilization(),
+            "breakers": breaker_stats(),
+            "cache": generation_cache.stats(),
+            "website_cache": website_cache.stats(),
+            "mongo_pool": pool_stats(),
+            "mongo_commands": command_stats(),
+            "replication": replication_status(),
+            "autosave": autosave.stats(),
+        })
+
+class BulkGenerationCreateAPIView(APIView):
+    """
+    Queue a bulk import of businesses from CSV or JSON Lines.
+
+    Send the file as a multipart ``file`` field or as the raw request body;
+    the format comes from ``?format=``, the file name or the content type.
+    """
+    def post(self, request):
+        try:
+            if request.content_type.startswith('multipart/'):
+                upload = request.FILES.get('file')
+                if upload is None:
+                    return Response({"success": False, "message": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+                name, content_type, raw = upload.name, upload.content_type, upload.read()
+            else:
+                name, content_type, raw = '', request.content_type, request.body
+
+            max_bytes = setting('BULK_MAX_INPUT_BYTES', 5 * 1024 * 1024)
+            if not raw:
+                return Response({"success": False, "message": "The input is empty."}, status=status.HTTP_400_BAD_REQUEST)
+            if len(raw) > max_bytes:
+                return Response({
+                    "success": False,
+                    "message": f"The input is larger than {max_bytes} bytes; use the bulk_generate command instead."
+                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+            input_format = request.query_params.get('format') or detect_format(name, content_type)
+            if input_format not in ('csv', 'jsonl'):
+                return Response({"success": False, "message": "Format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+            user_email = request.session.get('user_email', 'guest@example.com')
+            bulk = BulkGeneration.objects.create(
+                user_email=user_email,
+                source=name or 'request body',
+                format=input_format,
+                input_data=raw.decode('utf-8-sig')
+            )
+            job = submit_job({'bulk_id': str(bulk.bulk_id)}, user_email=user_email, kind='bulk', max_attempts=5)
+
+            return Response({
+                "success": True,
+                "bulk_id": str(bulk.bulk_id),
+                "job_id": str(job.job_id),
+                "status": bulk.status,
+                "status_url": reverse('bulk_generation_status', args=[bulk.bulk_id])
+            }, status=status.HTTP_202_ACCEPTED)
+        except UnicodeDecodeError:
+            return Response({"success": False, "message": "The input must be UTF-8 text."}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": f"An error occurred: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class BulkGenerationStatusAPIView(APIView):
+    """Report the progress of a bulk import."""
+    def get(self, request, bulk_id):
+        try:
+            bulk = BulkGeneration.objects.get(bulk_id=bulk_id)
+        except BulkGeneration.DoesNotExist:
+            return Response({"error": "Bulk generation not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(bulk_status(bulk))
 
 class WebsiteFormAPIView(APIView):
     def post(self, request):
@@ -181,104 +422,7 @@ class WebsiteFormAPIView(APIView):
             # Get user email from session if available, otherwise use guest
             user_email = request.session.get('user_email', 'guest@example.com')
             
-            # Generate a color theme based on business type/industry
-            primary_color, secondary_color = self.get_theme_colors(business_type, industry)
-            
-            # Create a basic JSON structure for the website content
-            content = {
-                "name": business_name,
-                "theme": {
-                    "primary_color": primary_color,
-                    "secondary_color": secondary_color,
-                    "text_color": "#f8fafc",
-                    "background_color": "#0f172a",
-                    "accent_color": "#a5b4fc"
-                },
-                "header": {
-                    "logo_text": business_name,
-                    "navigation": [
-                        {"text": "Home", "link": "#"},
-                        {"text": "About", "link": "#about"},
-                        {"text": "Services", "link": "#services"},
-                        {"text": "Testimonials", "link": "#testimonials"},
-                        {"text": "Contact", "link": "#contact"}
-                    ]
-                },
-                "pages": [
-                    {
-                        "name": "Home",
-                        "sections": [
-                            {
-                                "type": "hero",
-                                "id": "home",
-                                "title": business_name,
-                                "subtitle": f"Your premier {business_type.lower()} in {location}",
-                                "background_image": self.get_background_image(business_type, industry),
-                                "cta": {
-                                    "text": "Get Started",
-                                    "link": "#contact"
-                                }
-                            },
-                            {
-                                "type": "about",
-                                "id": "about",
-                                "title": "About Us",
-                                "content": description,
-                                "image": self.get_about_image(business_type, industry)
-                            },
-                            {
-                                "type": "services",
-                                "id": "services",
-                                "title": "Our Services",
-                                "items": self.generate_services(business_type, industry)
-                            },
-                            {
-                                "type": "testimonials",
-                                "id": "testimonials",
-                                "title": "What Our Clients Say",
-                                "items": self.generate_testimonials(business_type, location)
-                            },
-                            {
-                                "type": "contact",
-                                "id": "contact",
-                                "title": "Contact Us",
-                                "address": f"{business_name}, {location}",
-                                "email": "contact@example.com",
-                                "phone": "+1 (555) 123-4567",
-                                "map_embed": f"https://maps.google.com/maps?q={location.replace(' ', '+')}&output=embed"
-                            }
-                        ]
-                    }
-                ],
-                "footer": {
-                    "copyright": f" {datetime.now().year} {business_name}. All rights reserved.",
-                    "social_links": [
-                        {"platform": "Facebook", "icon": "fab fa-facebook", "link": "#"},
-                        {"platform": "Twitter", "icon": "fab fa-twitter", "link": "#"},
-                        {"platform": "Instagram", "icon": "fab fa-instagram", "link": "#"},
-                        {"platform": "LinkedIn", "icon": "fab fa-linkedin", "link": "#"}
-                    ],
-                    "columns": [
-                        {
-                            "title": "Quick Links",
-                            "links": [
-                                {"text": "Home", "link": "#"},
-                                {"text": "About", "link": "#about"},
-                                {"text": "Services", "link": "#services"},
-                                {"text": "Contact", "link": "#contact"}
-                            ]
-                        },
-                        {
-                            "title": "Services",
-                            "links": self.generate_service_links(business_type, industry)
-                        },
-                        {
-                            "title": "Contact Info",
-                            "content": f"<p>{business_name}</p><p>{location}</p><p>Phone: +1 (555) 123-4567</p><p>Email: contact@example.com</p>"
-                        }
-                    ]
-                }
-            }
+            content = build_site_content(business_type, industry, business_name, location, description, layout='rich')
             
             # Create the website data dictionary
             website_data = {
@@ -293,34 +437,30 @@ class WebsiteFormAPIView(APIView):
                 "updated_at": datetime.now()
             }
             
-            # Print debug information before saving to MongoDB
-            print(f"Attempting to save to MongoDB: {website_data.keys()}")
+            # Print debug information before saving to the repository
+            print(f"Attempting to save to the website repository: {website_data.keys()}")
             
-            # Connect to MongoDB
-            MONGO_URI = os.getenv('MONGO_URI')
-            if not MONGO_URI:
-                print("MongoDB URI not found in environment variables")
+            repository = get_repository()
+            if not repository.configured():
+                print("Website repository is not configured")
                 return Response({
                     "success": False,
                     "message": "Database configuration error."
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
             try:
-                # Connect to MongoDB with a timeout
-                mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-                # Test the connection
-                mongo_client.server_info()
-                db = mongo_client["ai_builder_db"]
-                print(f"MongoDB connection successful, inserting into websites_collection")
-                
-                # Insert the data into MongoDB
-                mongo_result = db.websites_collection.insert_one(website_data)
-                mongo_id = str(mongo_result.inserted_id)
+                # Save the website; the replicator copies it to the ORM
+                mongo_id = repository.save(website_data)
+                if mongo_id is None:
+                    return Response({
+                        "success": False,
+                        "message": "Database connection error."
+                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
-                print(f"Data saved to MongoDB with ID: {mongo_id}")
+                print(f"Data saved with ID: {mongo_id}")
                 
                 # Verify the data was saved
-                saved_data = db.websites_collection.find_one({"_id": mongo_result.inserted_id})
+                saved_data = repository.get(mongo_id)
                 if saved_data:
                     print(f"Verified data saved with keys: {list(saved_data.keys())}")
                 else:
@@ -334,14 +474,8 @@ class WebsiteFormAPIView(APIView):
                     "mongo_id": mongo_id  # Add this for backward compatibility
                 }, status=status.HTTP_201_CREATED)
                 
-            except pymongo.errors.ConnectionFailure as e:
-                print(f"MongoDB connection failure: {str(e)}")
-                return Response({
-                    "success": False,
-                    "message": f"Database connection error: {str(e)}"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             except Exception as e:
-                print(f"MongoDB error: {str(e)}")
+                print(f"Website repository error: {str(e)}")
                 return Response({
                     "success": False,
                     "message": f"Database error: {str(e)}"
@@ -353,246 +487,3 @@ class WebsiteFormAPIView(APIView):
                 "success": False,
                 "message": f"An error occurred: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    def get_theme_colors(self, business_type, industry):
-        """Generate a color theme based on business type and industry"""
-        # Default colors
-        primary = "#6366f1"
-        secondary = "#4f46e5"
-        
-        # Map business types to color schemes
-        business_colors = {
-            "Restaurant": ("#e11d48", "#be123c"),  # Red
-            "Cafe": ("#d97706", "#b45309"),  # Amber
-            "Bakery": ("#f59e0b", "#d97706"),  # Amber
-            "Technology": ("#3b82f6", "#2563eb"),  # Blue
-            "Healthcare": ("#06b6d4", "#0891b2"),  # Cyan
-            "Education": ("#8b5cf6", "#7c3aed"),  # Violet
-            "Fitness": ("#10b981", "#059669"),  # Emerald
-            "Legal": ("#1e40af", "#1e3a8a"),  # Dark Blue
-            "Real Estate": ("#0f766e", "#115e59"),  # Teal
-            "Construction": ("#f97316", "#ea580c"),  # Orange
-            "Retail": ("#ec4899", "#db2777"),  # Pink
-            "Consulting": ("#6366f1", "#4f46e5"),  # Indigo
-            "Marketing": ("#84cc16", "#65a30d"),  # Lime
-            "Financial": ("#064e3b", "#065f46"),  # Green
-            "Automotive": ("#dc2626", "#b91c1c"),  # Red
-            "Salon": ("#d946ef", "#c026d3"),  # Fuchsia
-            "Spa": ("#8b5cf6", "#7c3aed"),  # Violet
-            "Travel": ("#0ea5e9", "#0284c7"),  # Sky
-        }
-        
-        # Check if business type has a predefined color scheme
-        for key in business_colors:
-            if key.lower() in business_type.lower() or key.lower() in industry.lower():
-                return business_colors[key]
-        
-        # If no match, return default colors
-        return primary, secondary
-    
-    def get_background_image(self, business_type, industry):
-        """Get a relevant background image based on business type"""
-        # Default image
-        default_image = "https://images.unsplash.com/photo-1497366754035-f200968a6e72?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80"
-        
-        # Map business types to background images
-        image_map = {
-            "Restaurant": "https://images.unsplash.com/photo-1517248135467-4c7edcad34c4?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Cafe": "https://images.unsplash.com/photo-1554118811-1e0d58224f24?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Bakery": "https://images.unsplash.com/photo-1517433670267-08bbd4be890f?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Technology": "https://images.unsplash.com/photo-1518770660439-4636190af475?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Healthcare": "https://images.unsplash.com/photo-1505751172876-fa1923c5c528?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Education": "https://images.unsplash.com/photo-1523050854058-8e7e53415bb0?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Fitness": "https://images.unsplash.com/photo-1517836357463-d25dfeac3438?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Legal": "https://images.unsplash.com/photo-1589829545856-d10d557cf95f?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Real Estate": "https://images.unsplash.com/photo-1560518883-ce09059eeffa?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Construction": "https://images.unsplash.com/photo-1503387762-592deb58ef4e?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Retail": "https://images.unsplash.com/photo-1567401893414-76b7b1e5a7a5?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Consulting": "https://images.unsplash.com/photo-1454165804606-c3d57bc86b40?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Marketing": "https://images.unsplash.com/photo-1552664730-d307ca884978?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Financial": "https://images.unsplash.com/photo-1460925895917-d51941baf7fb?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Automotive": "https://images.unsplash.com/photo-1492144534655-d51941baf7fb?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Salon": "https://images.unsplash.com/photo-1560066984-138dadb4c035?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Spa": "https://images.unsplash.com/photo-1540555700478-4be289fbecef?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-            "Travel": "https://images.unsplash.com/photo-1503220317375-aaad61436b1b?ixlib=rb-4.0.3&auto=format&fit=crop&w=1200&q=80",
-        }
-        
-        # Check if business type has a predefined image
-        for key in image_map:
-            if key.lower() in business_type.lower() or key.lower() in industry.lower():
-                return image_map[key]
-        
-        # If no match, return default image
-        return default_image
-    
-    def get_about_image(self, business_type, industry):
-        """Get a relevant about section image based on business type"""
-        # Default image
-        default_image = "https://images.unsplash.com/photo-1600880292203-757bb62b4baf?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80"
-        
-        # Map business types to about images
-        image_map = {
-            "Restaurant": "https://images.unsplash.com/photo-1414235077428-338989a2e8c0?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Cafe": "https://images.unsplash.com/photo-1445116572660-236099ec97a0?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Bakery": "https://images.unsplash.com/photo-1591688515527-f7b20bd05902?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Technology": "https://images.unsplash.com/photo-1581091226825-a6a2a5aee158?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Healthcare": "https://images.unsplash.com/photo-1579684385127-1ef15d508118?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Education": "https://images.unsplash.com/photo-1427504494785-3a9ca7044f45?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Fitness": "https://images.unsplash.com/photo-1571902943202-507ec2618e8f?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Legal": "https://images.unsplash.com/photo-1589391886645-d51941baf7fb?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Real Estate": "https://images.unsplash.com/photo-1592595896616-c37162298647?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Construction": "https://images.unsplash.com/photo-1504307651254-35680f356dfd?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Retail": "https://images.unsplash.com/photo-1573855619003-97b4799dcd8b?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Consulting": "https://images.unsplash.com/photo-1542744173-8e7e53415bb0?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Marketing": "https://images.unsplash.com/photo-1533750349088-cd871a92f312?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Financial": "https://images.unsplash.com/photo-1563986768494-d10d557cf95f?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Automotive": "https://images.unsplash.com/photo-1503376780353-7e6692767b70?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Salon": "https://images.unsplash.com/photo-1521590832167-7bcbfaa6381f?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Spa": "https://images.unsplash.com/photo-1544161515-4ab6ce6db874?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-            "Travel": "https://images.unsplash.com/photo-1526772662000-3f88f10405ff?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80",
-        }
-        
-        # Check if business type has a predefined image
-        for key in image_map:
-            if key.lower() in business_type.lower() or key.lower() in industry.lower():
-                return image_map[key]
-        
-        # If no match, return default image
-        return default_image
-    
-    def generate_services(self, business_type, industry):
-        """Generate relevant services based on business type and industry"""
-        # Default services
-        default_services = [
-            {
-                "title": "Service 1",
-                "description": "Our primary service offering tailored to your needs."
-            },
-            {
-                "title": "Service 2",
-                "description": "Our secondary service offering with premium features."
-            },
-            {
-                "title": "Service 3",
-                "description": "Our tertiary service offering for specialized needs."
-            }
-        ]
-        
-        # Map business types to specific services
-        service_map = {
-            "Restaurant": [
-                {"title": "Fine Dining", "description": "Experience our exquisite menu in an elegant atmosphere."},
-                {"title": "Catering", "description": "Let us bring our culinary expertise to your special events."},
-                {"title": "Private Events", "description": "Host your celebrations in our dedicated private dining spaces."}
-            ],
-            "Cafe": [
-                {"title": "Specialty Coffee", "description": "Enjoy our selection of premium, locally-roasted coffee beans."},
-                {"title": "Breakfast & Brunch", "description": "Start your day with our fresh, homemade breakfast options."},
-                {"title": "Pastries & Desserts", "description": "Indulge in our freshly baked goods made daily."}
-            ],
-            "Technology": [
-                {"title": "Software Development", "description": "Custom software solutions tailored to your business needs."},
-                {"title": "IT Consulting", "description": "Expert advice on optimizing your technology infrastructure."},
-                {"title": "Cloud Services", "description": "Secure, scalable cloud solutions for your business."}
-            ],
-            "Healthcare": [
-                {"title": "Primary Care", "description": "Comprehensive healthcare services for patients of all ages."},
-                {"title": "Specialized Treatment", "description": "Expert care for specific health conditions and needs."},
-                {"title": "Preventive Medicine", "description": "Proactive healthcare to maintain your wellbeing."}
-            ],
-            "Fitness": [
-                {"title": "Personal Training", "description": "One-on-one sessions tailored to your fitness goals."},
-                {"title": "Group Classes", "description": "Energetic, motivating classes for all fitness levels."},
-                {"title": "Nutrition Coaching", "description": "Expert guidance on nutrition to complement your fitness journey."}
-            ]
-        }
-        
-        # Check if business type has predefined services
-        for key in service_map:
-            if key.lower() in business_type.lower() or key.lower() in industry.lower():
-                return service_map[key]
-        
-        # If no match, generate generic services based on business type
-        if business_type:
-            return [
-                {"title": f"Premium {business_type} Service", "description": f"Our flagship {business_type.lower()} service designed to exceed expectations."},
-                {"title": "Consultation", "description": f"Expert {business_type.lower()} consultation tailored to your specific needs."},
-                {"title": "Ongoing Support", "description": f"Continuous assistance and support for all your {business_type.lower()} requirements."}
-            ]
-        
-        # If all else fails, return default services
-        return default_services
-    
-    def generate_testimonials(self, business_type, location):
-        """Generate relevant testimonials based on business type and location"""
-        return [
-            {
-                "quote": f"The best {business_type.lower()} service I've experienced in {location}. Highly recommended!",
-                "author": "John Smith",
-                "position": "Satisfied Customer"
-            },
-            {
-                "quote": f"Exceptional quality and service. Their {business_type.lower()} expertise is unmatched.",
-                "author": "Jane Doe",
-                "position": "Loyal Client"
-            },
-            {
-                "quote": "Professional, reliable, and truly outstanding results every time.",
-                "author": "Robert Johnson",
-                "position": "Business Owner"
-            }
-        ]
-    
-    def generate_service_links(self, business_type, industry):
-        """Generate service links for the footer based on business type"""
-        # Default service links
-        default_links = [
-            {"text": "Service 1", "link": "#services"},
-            {"text": "Service 2", "link": "#services"},
-            {"text": "Service 3", "link": "#services"}
-        ]
-        
-        # Map business types to specific service links
-        service_links_map = {
-            "Restaurant": [
-                {"text": "Fine Dining", "link": "#services"},
-                {"text": "Catering", "link": "#services"},
-                {"text": "Private Events", "link": "#services"}
-            ],
-            "Cafe": [
-                {"text": "Specialty Coffee", "link": "#services"},
-                {"text": "Breakfast & Brunch", "link": "#services"},
-                {"text": "Pastries & Desserts", "link": "#services"}
-            ],
-            "Technology": [
-                {"text": "Software Development", "link": "#services"},
-                {"text": "IT Consulting", "link": "#services"},
-                {"text": "Cloud Services", "link": "#services"}
-            ],
-            "Healthcare": [
-                {"text": "Primary Care", "link": "#services"},
-                {"text": "Specialized Treatment", "link": "#services"},
-                {"text": "Preventive Medicine", "link": "#services"}
-            ],
-            "Fitness": [
-                {"text": "Personal Training", "link": "#services"},
-                {"text": "Group Classes", "link": "#services"},
-                {"text": "Nutrition Coaching", "link": "#services"}
-            ]
-        }
-        
-        # Check if business type has predefined service links
-        for key in service_links_map:
-            if key.lower() in business_type.lower() or key.lower() in industry.lower():
-                return service_links_map[key]
-        
-        # If no match, generate generic service links based on business type
-        if business_type:
-            return [
-                {"text": f"{business_type} Service", "link": "#services"},
-                {"text": "Consultation", "link": "#services"},
-                {"text": "Support", "link": "#services"}
-            ]
-        
-        # If all else fails, return default links
-        return default_links
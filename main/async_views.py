@@ -0,0 +1,201 @@
+"""
+Async versions of the read-heavy views.
+
+Served instead of their sync counterparts when ASYNC_READ_VIEWS is on, which
+``ai_builder/asgi.py`` does: under uvicorn a worker awaits MongoDB through
+Motor (``mongodb_async``) instead of blocking on pymongo, so one worker
+serves many concurrent viewers. Reads go through the async methods of the
+active website repository (``repositories.get_repository()``). Responses match the sync views. Session
+access and template rendering still run synchronously, through
+``sync_to_async``, reusing the sync views' rendering helpers.
+
+The two list endpoints are plain Django views here (DRF views cannot be
+async): they answer with the same JSON body and pagination headers, and
+``list_websites_api`` streams NDJSON for ``?format=ndjson`` or
+``Accept: application/x-ndjson`` like WebsiteListAPIView.
+"""
+import logging
+import os
+
+import jwt
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import views
+from .models import Website
+from .pagination import page_headers, parse_page_params
+from .renderers import NDJSON_MEDIA_TYPE, andjson_lines
+from .autosave import autosave
+from .repositories import get_repository
+from .website_cache import acached_website, aload_version, website_cache, website_version
+from .config import setting
+from .conditional import check_preconditions, list_etag, set_list_etag, wants_not_modified, website_etag
+
+logger = logging.getLogger(__name__)
+
+
+def _json_response(data, status=200, headers=None):
+    # Same encoding as DRF's JSONRenderer
+    return JsonResponse(
+        data, encoder=JSONEncoder, safe=False, status=status, headers=headers,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+
+
+def _wants_ndjson(request):
+    return request.GET.get('format') == 'ndjson' or NDJSON_MEDIA_TYPE in request.headers.get('Accept', '')
+
+
+async def view_website(request, website_id):
+    logger.info(f"Viewing website with ID: {website_id}")
+
+    version = None
+    if wants_not_modified(request) and not autosave.has_pending(website_id):
+        try:
+            version = await aload_version(website_id)
+        except Exception as e:
+            logger.error(f"Error reading website version: {str(e)}")
+        response = await sync_to_async(views.website_not_modified)(request, website_id, version)
+        if response is not None:
+            return response
+
+    try:
+        cached = await acached_website(website_id)
+        if cached is not None and version is not None and website_version(cached) != version:
+            website_cache.invalidate(website_id)
+            cached = await acached_website(website_id)
+    except Exception as e:
+        logger.error(f"Error retrieving website from MongoDB: {str(e)}")
+        messages.warning(request, f"⚠️ Error retrieving from MongoDB: {str(e)}")
+        # Nothing is cached while MongoDB cannot be asked
+        fields = await Website.objects.filter(id=website_id).values().afirst()
+        cached = {'source': 'orm', 'document': fields} if fields else None
+
+    cached = views.with_autosaved_changes(website_id, cached)
+    return await sync_to_async(views.render_cached_website)(request, website_id, cached)
+
+
+async def view_generated_website(request, website_id=None):
+    """Async ``views.view_generated_website``."""
+    user_email = await sync_to_async(request.session.get)('user_email', None)
+
+    repository = get_repository()
+    if not repository.configured():
+        messages.error(request, "Website repository is not configured")
+        return redirect('details')
+
+    try:
+        if website_id:
+            if wants_not_modified(request) and not autosave.has_pending(website_id):
+                version = await repository.aversion(website_id)
+                if version is not None:
+                    response = check_preconditions(request, website_etag(website_id, version))
+                    if response is not None:
+                        return response
+            website_data = await repository.aget(website_id, raise_errors=True)
+            if not website_data:
+                messages.error(request, "Website not found.")
+                return redirect('home')
+        else:
+            page = await repository.alist(user_id=user_email or None, limit=1)
+            website_data = page['websites'][0] if page and page['websites'] else None
+            if not website_data:
+                messages.error(request, "No websites found. Please generate a website first.")
+                return redirect('home')
+
+        fields, pending_edits = autosave.pending_fields(website_data['_id'])
+        if fields is not None:
+            website_data.update(fields)
+        return await sync_to_async(views.render_generated_website)(request, website_data, user_email, pending_edits)
+    except Exception as e:
+        logger.error(f"Error in view_generated_website: {str(e)}")
+        messages.error(request, f"Error loading the website: {str(e)}")
+        return redirect('home')
+
+
+@require_GET
+async def get_websites(request):
+    """Async ``views.get_websites``."""
+    try:
+        secret_key = str(os.getenv("SECRET_KEY", "django-insecure-dummy-key-for-development"))
+
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header or ' ' not in auth_header:
+            return _json_response({"error": "Invalid Authorization header"}, status=401)
+
+        try:
+            email = jwt.decode(auth_header.split()[1], secret_key, algorithms=['HS256'])['email']
+        except jwt.PyJWTError as e:
+            return _json_response({"error": f"Invalid token: {str(e)}"}, status=401)
+
+        try:
+            page_params = parse_page_params(request.GET)
+        except ValueError as e:
+            return _json_response({"error": str(e)}, status=400)
+
+        repository = get_repository()
+        etag = list_etag(request, email, await repository.alist_version(email))
+        if etag and wants_not_modified(request):
+            response = check_preconditions(request, etag)
+            if response is not None:
+                return set_list_etag(response, etag)
+
+        page = await repository.alist(user_id=email, **page_params)
+        if page is not None and (page['websites'] or page_params['cursor']):
+            return set_list_etag(_json_response(page['websites'], headers=page_headers(request, page)), etag)
+
+        # The repository is not available or has nothing: fall back to the Django ORM
+        websites = [views.website_to_dict(website) async for website in Website.objects.filter(user_email=email)]
+        return _json_response(websites)
+    except Exception as e:
+        logger.error(f"Error in get_websites: {str(e)}")
+        return _json_response({"error": str(e)}, status=401)
+
+
+@require_GET
+async def list_websites_api(request):
+    """Async ``api_views.WebsiteListAPIView``."""
+    try:
+        token = request.headers.get('Authorization', '').split()[1]
+        email = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=['HS256'])['email']
+    except (IndexError, KeyError, jwt.PyJWTError):
+        return _json_response({"error": "Invalid token."}, status=401)
+    try:
+        page_params = parse_page_params(request.GET)
+    except ValueError as e:
+        return _json_response({"error": str(e)}, status=400)
+    try:
+        representation = 'ndjson' if _wants_ndjson(request) else 'json'
+        etag = list_etag(request, email, await get_repository().alist_version(email), representation)
+        if etag and wants_not_modified(request):
+            response = check_preconditions(request, etag)
+            if response is not None:
+                return set_list_etag(response, etag)
+
+        if representation == 'ndjson':
+            websites = get_repository().aiter(
+                user_id=email,
+                cursor=page_params['cursor'],
+                fields=page_params['fields'],
+                batch_size=setting('WEBSITE_EXPORT_BATCH_SIZE', 100)
+            )
+            if websites is None:
+                return _json_response({"error": "Failed to read websites."}, status=500)
+
+            def on_error(e):
+                logger.error(f"Website export for {email} stopped: {e}")
+
+            return set_list_etag(
+                StreamingHttpResponse(andjson_lines(websites, on_error), content_type=NDJSON_MEDIA_TYPE), etag
+            )
+
+        page = await get_repository().alist(user_id=email, **page_params)
+        if page is None:
+            return _json_response({"error": "Failed to read websites."}, status=500)
+        return set_list_etag(_json_response(page['websites'], headers=page_headers(request, page)), etag)
+    except Exception as e:
+        return _json_response({"error": str(e)}, status=500)
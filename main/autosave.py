@@ -0,0 +1,316 @@
+"""
+Debounced autosave for the website editor.
+
+Editors send every change to ``POST /api/websites/<id>/autosave/`` as a
+small dotted-path patch (see ``website_patch``). Instead of one write per
+change, ``AutosaveBuffer`` keeps the pending changes of each website in
+memory and writes them with one ``write_operations`` call once the oldest
+has waited AUTOSAVE_INTERVAL seconds. Changes are merged as they arrive:
+a later change to a path replaces earlier ones at or below it, appends to
+one list are batched, and changes that overlap in any other way are folded
+into one ``set`` of the path they share, taken from the working copy.
+
+The working copy is the website as loaded for the first pending change
+with every pending change applied, so ``GET .../autosave/`` shows the
+editing user their own edits before they are written, and a change that
+does not fit the website is refused when it is sent, not when it is
+written. The website pages show the working copy too, without writing it;
+other writes of the website (PATCH, PUT, restoring a revision) flush its
+pending changes first.
+
+Pending changes are flushed at interpreter exit, so a gracefully stopped
+worker loses nothing. They live in the worker process: route an editor's
+autosaves to one worker, or the same field edited through two workers may
+be written out of order.
+"""
+import atexit
+import copy
+import logging
+import os
+import threading
+import time
+
+from .config import setting
+from .website_patch import (
+    EDITABLE_FIELDS,
+    Operation,
+    PatchError,
+    VersionConflict,
+    apply_operations,
+    check_operations,
+    get_path,
+    load_editable,
+    write_operations,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _overlaps(first, second):
+    return first == second or first.startswith(second + '.') or second.startswith(first + '.')
+
+
+class PendingEdits:
+    """The merged, not yet written changes of one website."""
+
+    def __init__(self, website, email, now):
+        self.website = website
+        self.email = email
+        self.document = copy.deepcopy(website.document)
+        self.operations = {}  # path -> Operation, no two paths overlapping
+        self.edits = 0
+        self.first_at = now
+
+    def add(self, operations):
+        """
+        Apply checked operations to the working copy and merge them.
+
+        Raises:
+            PatchError: If they do not fit the website; nothing is changed
+        """
+        self.document = apply_operations(copy.deepcopy(self.document), operations)
+        for operation in operations:
+            self._merge(operation)
+        self.edits += 1
+
+    def _merge(self, operation):
+        pending = self.operations.get(operation.path)
+        if (operation.kind == 'push' and operation.position is None and pending is not None
+                and pending.kind == 'push' and pending.position is None):
+            pending.value.extend(operation.value)
+            return
+        overlapping = [path for path in self.operations if _overlaps(path, operation.path)]
+        if not overlapping:
+            self.operations[operation.path] = operation
+            return
+        if operation.kind != 'push' and all(
+            path == operation.path or path.startswith(operation.path + '.') for path in overlapping
+        ):
+            # Replaces everything pending at or below its path
+            for path in overlapping:
+                del self.operations[path]
+            self.operations[operation.path] = operation
+            return
+        # Fold into one change of the outermost path, from the working copy
+        outer = min(overlapping + [operation.path], key=len)
+        for path in overlapping:
+            del self.operations[path]
+        found, value = get_path(self.document, outer)
+        self.operations[outer] = Operation('set', outer, copy.deepcopy(value)) if found else Operation('unset', outer)
+
+
+class AutosaveBuffer:
+    """
+    Per-website buffers of editor changes, written by a background thread.
+
+    Args:
+        interval (float): Seconds the oldest pending change of a website
+            waits before its changes are written
+        clock (callable): Monotonic time source
+    """
+
+    STRIPES = 64
+
+    def __init__(self, interval=2.0, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Changes and writes of one website are serialized on its stripe
+        self._stripes = [threading.Lock() for _ in range(self.STRIPES)]
+        self._pid = None
+
+        self.edits = 0
+        self.writes = 0
+        self.conflicts = 0
+        self.failures = 0
+
+    def _stripe(self, website_id):
+        return self._stripes[hash(website_id) % self.STRIPES]
+
+    def ensure_started(self):
+        """Start the flush thread in this process if it is not running yet."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='autosave', daemon=True).start()
+
+    def _after_fork(self):
+        # The parent writes its own pending changes; the thread does not survive a fork
+        self._pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(self.STRIPES)]
+
+    def _run(self):
+        while True:
+            time.sleep(max(0.05, self.interval / 4))
+            try:
+                self.flush_due()
+            except Exception as e:
+                logger.error(f"Autosave flush failed: {e}")
+
+    def submit(self, website_id, email, operations):
+        """
+        Buffer a change of the user's website.
+
+        Args:
+            operations (list): ``website_patch.Operation``s of one change
+
+        Returns:
+            int: Changes pending for the website, or None if ``email`` has
+                no such website
+
+        Raises:
+            PatchError: If the change is malformed or does not fit the website
+        """
+        operations = check_operations(operations)
+        website_id = str(website_id)
+        self.ensure_started()
+        with self._stripe(website_id):
+            pending = self._pending.get(website_id)
+            if pending is not None and pending.email != email:
+                return None
+            if pending is None:
+                website = load_editable(website_id, email)
+                if website is None:
+                    return None
+                pending = PendingEdits(website, email, self.clock())
+            pending.add(operations)
+            with self._lock:
+                self._pending[website_id] = pending
+                self.edits += 1
+            return pending.edits
+
+    def view(self, website_id, email):
+        """
+        The user's website with their pending changes applied.
+
+        Returns:
+            tuple: (EditableWebsite or None, number of pending changes)
+        """
+        website_id = str(website_id)
+        with self._stripe(website_id):
+            pending = self._pending.get(website_id)
+            if pending is not None and pending.email == email:
+                website = pending.website._replace(document=copy.deepcopy(pending.document))
+                return website, pending.edits
+        return load_editable(website_id, email), 0
+
+    def pending_fields(self, website_id):
+        """
+        The editable fields of the website with its pending changes applied,
+        for page views, which show the changes without writing them.
+
+        Returns:
+            tuple: (dict of fields, number of pending changes), or (None, 0)
+                if nothing is pending
+        """
+        website_id = str(website_id)
+        if website_id not in self._pending:
+            return None, 0
+        with self._stripe(website_id):
+            pending = self._pending.get(website_id)
+            if pending is None:
+                return None, 0
+            fields = {field: copy.deepcopy(pending.document[field]) for field in EDITABLE_FIELDS if field in pending.document}
+            return fields, pending.edits
+
+    def has_pending(self, website_id):
+        return str(website_id) in self._pending
+
+    def discard(self, website_id):
+        """Drop the pending changes of a deleted website."""
+        with self._lock:
+            self._pending.pop(str(website_id), None)
+
+    def flush(self, website_id):
+        """
+        Write the website's pending changes now.
+
+        Returns:
+            bool: False if they could not be written and stay pending
+        """
+        website_id = str(website_id)
+        if website_id not in self._pending:
+            return True
+        with self._stripe(website_id):
+            with self._lock:
+                pending = self._pending.pop(website_id, None)
+            if pending is None:
+                return True
+            written = self._write(pending)
+            if not written:
+                with self._lock:
+                    # Retried with the next flush
+                    self._pending.setdefault(website_id, pending)
+            return written
+
+    def flush_due(self):
+        """Write every website whose oldest pending change waited ``interval``."""
+        now = self.clock()
+        due = [website_id for website_id, pending in list(self._pending.items()) if now - pending.first_at >= self.interval]
+        for website_id in due:
+            self.flush(website_id)
+        return len(due)
+
+    def flush_all(self):
+        """Write everything pending (at shutdown)."""
+        for website_id in list(self._pending):
+            self.flush(website_id)
+
+    def _write(self, pending):
+        """
+        Returns:
+            bool: False if the store failed and the changes should be retried
+        """
+        operations = list(pending.operations.values())
+        website = pending.website
+        try:
+            try:
+                version = write_operations(website, operations)
+            except VersionConflict:
+                # Changed by another writer since it was loaded; the changes
+                # are path-level, so apply them to the current version
+                with self._lock:
+                    self.conflicts += 1
+                website = load_editable(website.website_id, pending.email)
+                if website is None:
+                    raise PatchError("the website was deleted")
+                version = write_operations(website, operations)
+        except (PatchError, VersionConflict) as e:
+            logger.error(f"Dropping autosaved changes of website {website.website_id}: {e}")
+            with self._lock:
+                self.failures += 1
+            return True
+        except Exception as e:
+            logger.error(f"Autosave of website {website.website_id} failed: {e}")
+            version = None
+        with self._lock:
+            if version is None:
+                self.failures += 1
+                return False
+            self.writes += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'pending_websites': len(self._pending),
+                'pending_edits': sum(pending.edits for pending in self._pending.values()),
+                'edits': self.edits,
+                'writes': self.writes,
+                'conflicts': self.conflicts,
+                'failures': self.failures,
+            }
+
+
+autosave = AutosaveBuffer(interval=setting('AUTOSAVE_INTERVAL', 2.0))
+atexit.register(autosave.flush_all)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=autosave._after_fork)
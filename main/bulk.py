@@ -0,0 +1,228 @@
+"""
+Bulk website generation from CSV or JSON Lines input.
+
+Input is parsed one record at a time and processed in batches: the records
+of a batch are generated concurrently on a bounded thread pool, then stored
+with one ``insert_many``; the replicator copies them to the Django ORM. After
+every batch the import's checkpoint (records persisted so far) is saved, so
+an import that stops part way resumes with the first unsaved record. MongoDB
+documents carry a ``bulk_key``; when a batch is retried, records that are
+already stored are neither generated nor inserted again.
+"""
+import csv
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .config import setting
+from .models import BulkGeneration
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('business_name', 'business_type', 'industry', 'location', 'description')
+
+# Per-record errors kept on the import; the count in ``failed`` is always exact
+MAX_STORED_ERRORS = 100
+
+
+def detect_format(name, content_type=None):
+    """Guess the input format from a file name or content type; CSV by default."""
+    name = (name or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'jsonl'
+    return 'csv'
+
+
+def _normalize_header(header):
+    return (header or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def iter_records(stream, format):
+    """
+    Parse input one record at a time.
+
+    Args:
+        stream: Text file object
+        format (str): ``csv`` (with a header row) or ``jsonl``
+
+    Yields:
+        tuple: (record index, dict or None, error message or None)
+    """
+    if format == 'jsonl':
+        index = 0
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Each line must be a JSON object")
+                yield index, record, None
+            except ValueError as e:
+                yield index, None, f"Invalid JSON: {e}"
+            index += 1
+    elif format == 'csv':
+        reader = csv.reader(stream)
+        headers = None
+        index = 0
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if headers is None:
+                headers = [_normalize_header(cell) for cell in row]
+                continue
+            yield index, dict(zip(headers, row)), None
+            index += 1
+    else:
+        raise ValueError(f"Unknown input format: {format}")
+
+
+def _clean_record(record):
+    """Return the generation inputs of a record, or raise ValueError."""
+    fields = {field: str(record.get(field) or '').strip() for field in REQUIRED_FIELDS}
+    missing = [field for field, value in fields.items() if not value]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    return fields
+
+
+def _generate(fields):
+    # Imported lazily so parsing does not pull in the generation stack
+    from .utils import generate_content
+
+    return generate_content(
+        fields['business_type'], fields['industry'], fields['business_name'],
+        fields['location'], fields['description']
+    )
+
+
+def bulk_status(bulk):
+    """Serialize an import for the status API and progress output."""
+    return {
+        'bulk_id': str(bulk.bulk_id),
+        'status': bulk.status,
+        'source': bulk.source,
+        'format': bulk.format,
+        'processed': bulk.checkpoint,
+        'created': bulk.created,
+        'failed': bulk.failed,
+        'errors': json.loads(bulk.errors),
+        'error': bulk.error,
+        'created_at': bulk.created_at,
+        'updated_at': bulk.updated_at,
+        'finished_at': bulk.finished_at,
+    }
+
+
+def open_input(bulk):
+    """Open the import's input as a text stream."""
+    if bulk.input_data:
+        return io.StringIO(bulk.input_data)
+    return open(bulk.source, newline='', encoding='utf-8-sig')
+
+
+class BulkGenerator:
+    """
+    Run one BulkGeneration import.
+
+    Args:
+        bulk (BulkGeneration): The import; its checkpoint decides where to start
+        concurrency (int): Records generated at once
+        batch_size (int): Records persisted per insert_many
+        progress (callable): Called with the import after every batch
+    """
+
+    def __init__(self, bulk, concurrency=None, batch_size=None, progress=None):
+        self.bulk = bulk
+        self.concurrency = concurrency or setting('BULK_GENERATION_CONCURRENCY', 4)
+        self.batch_size = batch_size or setting('BULK_GENERATION_BATCH_SIZE', 25)
+        self.progress = progress
+        self._errors = json.loads(bulk.errors)
+
+    def run(self, stream=None):
+        """
+        Process every record after the checkpoint.
+
+        Raises whatever stopped the import after marking it failed; running
+        it again continues from the last saved batch.
+        """
+        bulk = self.bulk
+        BulkGeneration.objects.filter(id=bulk.id).update(status=BulkGeneration.STATUS_RUNNING, error=None)
+        bulk.status = BulkGeneration.STATUS_RUNNING
+        if bulk.checkpoint:
+            logger.info(f"Resuming bulk generation {bulk.bulk_id} after {bulk.checkpoint} records")
+
+        stream = stream or open_input(bulk)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='bulk') as executor:
+                batch = []
+                for index, record, error in iter_records(stream, bulk.format):
+                    if index < bulk.checkpoint:
+                        continue
+                    batch.append((index, record, error))
+                    if len(batch) >= self.batch_size:
+                        self._process_batch(batch, executor)
+                        batch = []
+                if batch:
+                    self._process_batch(batch, executor)
+        except Exception as e:
+            logger.error(f"Bulk generation {bulk.bulk_id} stopped at record {bulk.checkpoint}: {e}")
+            bulk.status = BulkGeneration.STATUS_FAILED
+            bulk.error = str(e)
+            bulk.save(update_fields=['status', 'error', 'updated_at'])
+            raise
+        finally:
+            stream.close()
+
+        bulk.status = BulkGeneration.STATUS_DONE
+        bulk.finished_at = datetime.now()
+        bulk.save(update_fields=['status', 'finished_at', 'updated_at'])
+        logger.info(f"Bulk generation {bulk.bulk_id} done: {bulk.created} created, {bulk.failed} failed")
+        return bulk
+
+    def _record_error(self, index, error):
+        self.bulk.failed += 1
+        if len(self._errors) < MAX_STORED_ERRORS:
+            self._errors.append({'record': index, 'error': error})
+
+    def _process_batch(self, batch, executor):
+        from .mongodb_utils import find_websites_by_bulk_key, save_websites_bulk
+
+        bulk = self.bulk
+        valid = []
+        for index, record, error in batch:
+            if error is None:
+                try:
+                    valid.append((index, _clean_record(record)))
+                    continue
+                except ValueError as e:
+                    error = str(e)
+            self._record_error(index, error)
+
+        # Skip records a previous attempt at this batch already inserted, before generating them
+        keys = [f"{bulk.bulk_id}:{index}" for index, _ in valid]
+        existing = find_websites_by_bulk_key(keys) if keys else {}
+        if existing is None:
+            raise RuntimeError("MongoDB is not available")
+        missing = [(key, fields) for key, (_, fields) in zip(keys, valid) if key not in existing]
+
+        contents = list(executor.map(lambda item: _generate(item[1]), missing))
+        now = datetime.now()
+        documents = [
+            dict(fields, user_email=bulk.user_email, content=content, bulk_key=key, created_at=now, updated_at=now)
+            for (key, fields), content in zip(missing, contents)
+        ]
+        if save_websites_bulk(documents) is None:
+            raise RuntimeError("Failed to save websites to MongoDB")
+
+        bulk.checkpoint = batch[-1][0] + 1
+        bulk.created += len(valid)
+        bulk.errors = json.dumps(self._errors)
+        bulk.save(update_fields=['checkpoint', 'created', 'failed', 'errors', 'updated_at'])
+
+        if self.progress:
+            self.progress(bulk)
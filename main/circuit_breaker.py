@@ -0,0 +1,321 @@
+"""
+Circuit breakers and hedged requests for generation providers.
+
+Each provider has a breaker that watches a rolling window of recent calls.
+When the error rate or the 95th percentile latency in that window crosses
+its threshold the breaker opens and calls fail immediately with
+CircuitOpenError, so generate_content serves the fallback template at once
+instead of waiting for the provider to time out. After ``open_seconds`` the
+breaker lets a few probe calls through (half-open): if they succeed it
+closes, otherwise it opens again.
+
+Hedging sends a second identical call when the first has been running longer
+than the provider's recent p95 latency and returns whichever finishes first.
+It is off by default because every hedge spends extra quota, and at most
+``max_hedge_ratio`` of calls are hedged so a slow provider never sees double
+the load.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker driven by error rate and latency.
+
+    Args:
+        name (str): Provider name, for logs and monitoring
+        window (float): Seconds of history considered
+        min_calls (int): Calls needed in the window before it can trip
+        error_threshold (float): Failure ratio that trips the breaker
+        latency_threshold (float): p95 latency in seconds that trips it
+        open_seconds (float): How long to fail fast before probing again
+        half_open_calls (int): Probe calls allowed while half-open
+        ignored (tuple): Exception types that say nothing about provider
+            health (e.g. our own queue timeouts) and are not recorded
+        clock (callable): Monotonic clock, injectable for tests
+    """
+
+    def __init__(self, name, window=60, min_calls=10, error_threshold=0.5, latency_threshold=30.0,
+                 open_seconds=30, half_open_calls=1, ignored=(), clock=time.monotonic):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.latency_threshold = latency_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.ignored = ignored
+        self.clock = clock
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.trip_count = 0
+        self.rejected = 0
+        self._probes = 0
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _trip(self, now, reason):
+        self.state = OPEN
+        self.opened_at = now
+        self.trip_count += 1
+        self._probes = 0
+        logger.warning(f"Circuit breaker for {self.name} opened: {reason}")
+
+    def allow(self):
+        """Whether a call may go ahead now; counts a rejection if not."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, ok, latency):
+        """Record the outcome of a call that allow() let through."""
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                if ok:
+                    logger.info(f"Circuit breaker for {self.name} closed")
+                    self.state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._trip(now, "probe call failed")
+                    return
+            elif self.state == OPEN:
+                # A call started before the breaker opened
+                return
+
+            self._calls.append((now, ok, latency))
+            self._prune(now)
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            error_rate = failures / len(self._calls)
+            if error_rate >= self.error_threshold:
+                self._trip(now, f"error rate {error_rate:.0%} over {len(self._calls)} calls")
+                return
+            p95 = _percentile([call_latency for _, _, call_latency in self._calls], 0.95)
+            if p95 >= self.latency_threshold:
+                self._trip(now, f"p95 latency {p95:.1f}s over {len(self._calls)} calls")
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run ``func`` under the breaker.
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except self.ignored:
+            self.record_ignored()
+            raise
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            self.record_ignored()
+            raise
+        self.record(True, time.monotonic() - started)
+        return result
+
+    def record_ignored(self):
+        """Give back the probe slot of a call that ended with an ignored error."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def latency_percentile(self, fraction, min_samples=None):
+        """Latency of successful calls in the window, or None without enough samples."""
+        with self._lock:
+            self._prune(self.clock())
+            latencies = [latency for _, ok, latency in self._calls if ok]
+        if not latencies or len(latencies) < (min_samples or self.min_calls):
+            return None
+        return _percentile(latencies, fraction)
+
+    def stats(self):
+        """State, trip count and recent error rate and latency, for monitoring."""
+        with self._lock:
+            self._prune(self.clock())
+            calls = list(self._calls)
+        latencies = [latency for _, ok, latency in calls if ok]
+        return {
+            'state': self.state,
+            'trip_count': self.trip_count,
+            'rejected': self.rejected,
+            'calls': len(calls),
+            'error_rate': round(sum(1 for _, ok, _ in calls if not ok) / len(calls), 3) if calls else 0.0,
+            'p50_latency': round(_percentile(latencies, 0.5), 3) if latencies else None,
+            'p95_latency': round(_percentile(latencies, 0.95), 3) if latencies else None,
+        }
+
+
+class Hedger:
+    """
+    Send a backup call when the first one is slower than the provider's p95.
+
+    Args:
+        breaker (CircuitBreaker): Supplies the latency percentile and guards
+            both calls
+        min_delay (float): Never hedge earlier than this many seconds
+        max_hedge_ratio (float): Largest share of calls that may be hedged
+        max_workers (int): Threads available for calls being hedged
+    """
+
+    def __init__(self, breaker, min_delay=1.0, max_hedge_ratio=0.1, max_workers=16):
+        self.breaker = breaker
+        self.min_delay = min_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_workers = max_workers
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _hedge_delay(self):
+        p95 = self.breaker.latency_percentile(0.95)
+        if p95 is None or self.breaker.state != CLOSED:
+            return None
+        return max(self.min_delay, p95)
+
+    def _take_hedge(self):
+        with self._lock:
+            if self.hedged >= self.max_hedge_ratio * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, func, *args, **kwargs):
+        """Run ``func`` through the breaker, hedging it when it runs long."""
+        with self._lock:
+            self.calls += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hedge')
+        delay = self._hedge_delay()
+        if delay is None:
+            return self.breaker.call(func, *args, **kwargs)
+
+        first = self._executor.submit(self.breaker.call, func, *args, **kwargs)
+        done, _ = wait([first], timeout=delay)
+        if done or not self._take_hedge():
+            return first.result()
+
+        logger.info(f"Hedging {self.breaker.name} call after {delay:.1f}s")
+        second = self._executor.submit(self.breaker.call, func, *args, **kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is second:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+        raise error
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+        }
+
+
+_breakers = {}
+_hedgers = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(name, ignored=()):
+    """Return the process-wide breaker for a provider, configured from settings."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    window=setting('GENERATION_BREAKER_WINDOW', 60.0),
+                    min_calls=setting('GENERATION_BREAKER_MIN_CALLS', 10),
+                    error_threshold=setting('GENERATION_BREAKER_ERROR_RATE', 0.5),
+                    latency_threshold=setting('GENERATION_BREAKER_P95_LATENCY', 30.0),
+                    open_seconds=setting('GENERATION_BREAKER_OPEN_SECONDS', 30.0),
+                    ignored=ignored,
+                )
+                _breakers[name] = breaker
+    return breaker
+
+def get_hedger(name, ignored=()):
+    """
+    Return the process-wide hedger for a provider, or None when hedging is
+    disabled (the GENERATION_HEDGE setting).
+    """
+    if not setting('GENERATION_HEDGE', False):
+        return None
+    hedger = _hedgers.get(name)
+    if hedger is None:
+        breaker = get_breaker(name, ignored)
+        with _registry_lock:
+            hedger = _hedgers.get(name)
+            if hedger is None:
+                hedger = Hedger(
+                    breaker,
+                    min_delay=setting('GENERATION_HEDGE_MIN_DELAY', 1.0),
+                    max_hedge_ratio=setting('GENERATION_HEDGE_MAX_RATIO', 0.1),
+                )
+                _hedgers[name] = hedger
+    return hedger
+
+def breaker_stats():
+    """Breaker and hedging state of every provider used so far."""
+    stats = {}
+    for name, breaker in list(_breakers.items()):
+        stats[name] = breaker.stats()
+        hedger = _hedgers.get(name)
+        if hedger is not None:
+            stats[name]['hedging'] = hedger.stats()
+    return stats
@@ -0,0 +1,78 @@
+"""
+Conditional requests for the website endpoints.
+
+A website response carries a strong ETag made of the website id and its
+version: the ``website_patch.version_token`` of a repository document, the
+``theme_version`` of an ORM row. The views answer a GET whose If-None-Match
+has the current ETag with 304 after reading the version alone
+(``website_cache.load_version``, ``repository.version``), before the content
+is loaded or rendered. On PUT, PATCH and DELETE an If-Match that does not
+have it gets 412, and the write is made conditional on the version checked,
+like ``expected_version``.
+
+List responses carry an ETag hashed from the user, the URL, the
+representation and ``repository.list_version``, which changes with any
+create, update or delete of the user's websites.
+"""
+import hashlib
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+def website_etag(website_id, version):
+    """ETag of a website at a version token."""
+    return quote_etag(f"{website_id}-{version}")
+
+
+def list_etag(request, email, list_version, representation='json'):
+    """ETag of a website list response, or None if the list version is unknown."""
+    if list_version is None:
+        return None
+    key = '\n'.join([email or '', request.get_full_path(), representation, list_version])
+    return quote_etag(hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def wants_not_modified(request):
+    """Whether a read could be answered 304, so its version is worth looking up first."""
+    return request.method in ('GET', 'HEAD') and 'HTTP_IF_NONE_MATCH' in request.META
+
+
+def has_if_match(request):
+    return 'HTTP_IF_MATCH' in request.META
+
+
+def check_preconditions(request, etag):
+    """
+    Evaluate If-Match and If-None-Match against the current ETag of the
+    resource (None if it does not exist).
+
+    Returns:
+        HttpResponse: 304 Not Modified or 412 Precondition Failed, with the
+            current ETag, to send instead of handling the request; or None
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        return None
+    if response.status_code == 412:
+        response = precondition_failed()
+    if etag:
+        response.headers['ETag'] = etag
+    return response
+
+
+def precondition_failed(etag=None):
+    """412 for a write whose If-Match no longer holds."""
+    response = JsonResponse({"error": "The website was changed by someone else."}, status=412)
+    if etag:
+        response.headers['ETag'] = etag
+    return response
+
+
+def set_list_etag(response, etag):
+    """Add a list ETag to a successful response; lists depend on the bearer token, so caches must key on it too."""
+    if etag and 200 <= response.status_code < 300:
+        response.headers['ETag'] = etag
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,54 @@
+"""
+Typed application settings.
+
+Every tunable of the application is read with ``setting(name, default)``:
+the Django setting of that name if it is set, else the environment variable,
+else ``default``. The value is converted to the type of ``default``, so an
+environment variable (always a string) and a settings.py value behave the
+same. Booleans accept true/false, yes/no, on/off and 1/0 in any case; a value
+that cannot be converted raises ImproperlyConfigured naming the setting.
+"""
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off', '')
+
+
+def parse_bool(value):
+    """A boolean from a setting value; strings must be one of TRUE_VALUES or FALSE_VALUES."""
+    if not isinstance(value, str):
+        return bool(value)
+    text = value.strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"expected one of {', '.join(TRUE_VALUES + FALSE_VALUES[:-1])}")
+
+
+def setting(name, default):
+    """
+    Read a setting from Django settings, then the environment.
+
+    Args:
+        name (str): Setting and environment variable name
+        default: Value when neither is set; its type (bool, int, float or
+            str) is the type returned
+
+    Raises:
+        ImproperlyConfigured: If the value cannot be converted
+    """
+    value = getattr(settings, name, None)
+    if value is None:
+        value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        if isinstance(default, bool):
+            return parse_bool(value)
+        return type(default)(value)
+    except (TypeError, ValueError) as e:
+        raise ImproperlyConfigured(f"{name}={value!r} is not a valid {type(default).__name__}: {e}") from e
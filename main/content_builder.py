@@ -0,0 +1,321 @@
+"""
+Structured site content (theme, pages/sections, footer) for new websites.
+
+Everything that depends only on the business type and industry (theme
+colors, images and services from the industry catalog, navigation, footer
+links) is built once per
+``(layout, business_type, industry)`` and memoized; each call only overlays
+the per-business fields (name, location, description, year). Memoized and
+constant parts are copied into every result, so callers may change any
+nested value without affecting other websites.
+
+Two layouts exist: ``basic``, used by the form and layout views and the
+create API, and ``rich``, used by the website form API, which adds a header,
+images, a map and a richer footer.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+from .industry_catalog import get_catalog
+
+CONTACT_PHONE = "+1 (555) 123-4567"
+CONTACT_EMAIL = "contact@example.com"
+
+BASIC_THEME = {
+    "primary_color": "#6366f1",
+    "secondary_color": "#4f46e5",
+    "text_color": "#333333",
+    "background_color": "#ffffff"
+}
+
+NAVIGATION = [
+    {"text": "Home", "link": "#"},
+    {"text": "About", "link": "#about"},
+    {"text": "Services", "link": "#services"},
+    {"text": "Testimonials", "link": "#testimonials"},
+    {"text": "Contact", "link": "#contact"}
+]
+
+QUICK_LINKS = {
+    "title": "Quick Links",
+    "links": [
+        {"text": "Home", "link": "#"},
+        {"text": "About", "link": "#about"},
+        {"text": "Services", "link": "#services"},
+        {"text": "Contact", "link": "#contact"}
+    ]
+}
+
+SOCIAL_LINKS = [
+    {"platform": "Facebook", "icon": "fab fa-facebook", "link": "#"},
+    {"platform": "Twitter", "icon": "fab fa-twitter", "link": "#"},
+    {"platform": "Instagram", "icon": "fab fa-instagram", "link": "#"},
+    {"platform": "LinkedIn", "icon": "fab fa-linkedin", "link": "#"}
+]
+
+BASIC_TESTIMONIAL = {
+    "quote": "The service here is simply amazing! The staff are always friendly and helpful. Highly recommend!",
+    "author": "John D.",
+    "position": "Customer"
+}
+
+RICH_TESTIMONIAL = {
+    "quote": "Professional, reliable, and truly outstanding results every time.",
+    "author": "Robert Johnson",
+    "position": "Business Owner"
+}
+
+CONTACT_CTA = {"text": "Contact Us", "link": "#contact"}
+GET_STARTED_CTA = {"text": "Get Started", "link": "#contact"}
+
+
+# Shared parts are flat dicts, lists of flat dicts, or one dict holding such
+# a list; copying them by shape is several times faster than copy.deepcopy
+
+
+def _copy_list(items):
+    return [item.copy() for item in items]
+
+
+def _copy_with_list(value, key):
+    return {**value, key: _copy_list(value[key])}
+
+
+def get_services(business_type, industry):
+    """(title, description) pairs for the services section."""
+    business_type = business_type or ''
+    catalog = get_catalog()
+    services = catalog.lookup(business_type, industry)['services']
+    if services is not None:
+        return services
+    if business_type:
+        lowered = business_type.lower()
+        return (
+            (f"Premium {business_type} Service", f"Our flagship {lowered} service designed to exceed expectations."),
+            ("Consultation", f"Expert {lowered} consultation tailored to your specific needs."),
+            ("Ongoing Support", f"Continuous assistance and support for all your {lowered} requirements."),
+        )
+    return catalog.current().defaults['services']
+
+
+def get_service_links(business_type, industry):
+    """Footer links to the services section."""
+    business_type = business_type or ''
+    if get_catalog().lookup(business_type, industry)['services'] is None and business_type:
+        titles = [f"{business_type} Service", "Consultation", "Support"]
+    else:
+        titles = [title for title, _ in get_services(business_type, industry)]
+    return [{"text": title, "link": "#services"} for title in titles]
+
+
+@lru_cache(maxsize=1024)
+def _basic_skeleton(business_type):
+    """Parts of the basic layout that depend only on the business type."""
+    return {
+        'business_type_lower': business_type.lower(),
+        'services': {
+            "type": "services",
+            "title": "Our Services",
+            "items": [
+                {
+                    "title": f"{business_type} Service 1",
+                    "description": "Detailed description of our primary service offering, tailored to meet your specific needs."
+                },
+                {
+                    "title": f"{business_type} Service 2",
+                    "description": "Comprehensive explanation of our secondary service, designed to enhance your experience."
+                },
+                {
+                    "title": f"{business_type} Service 3",
+                    "description": "Information about our tertiary service offering, providing additional value to our customers."
+                }
+            ]
+        },
+    }
+
+
+@lru_cache(maxsize=1024)
+def _rich_skeleton(business_type, industry, matcher):
+    """
+    Parts of the rich layout that depend only on the business type and
+    industry; keyed on the compiled catalog so a reload starts afresh.
+    """
+    assets = matcher.lookup(business_type, industry)
+    primary_color, secondary_color = assets['colors']
+    return {
+        'business_type_lower': business_type.lower(),
+        'theme': {
+            "primary_color": primary_color,
+            "secondary_color": secondary_color,
+            "text_color": "#f8fafc",
+            "background_color": "#0f172a",
+            "accent_color": "#a5b4fc"
+        },
+        'background_image': assets['background_image'],
+        'about_image': assets['about_image'],
+        'services': {
+            "type": "services",
+            "id": "services",
+            "title": "Our Services",
+            "items": [
+                {"title": title, "description": description}
+                for title, description in get_services(business_type, industry)
+            ]
+        },
+        'services_column': {
+            "title": "Services",
+            "links": get_service_links(business_type, industry)
+        },
+    }
+
+
+def build_basic_content(business_type, industry, business_name='', location='', description=''):
+    """Content for the basic layout."""
+    business_type = business_type or ''
+    skeleton = _basic_skeleton(business_type)
+    business_type_lower = skeleton['business_type_lower']
+    return {
+        "name": business_name,
+        "theme": BASIC_THEME.copy(),
+        "pages": [
+            {
+                "name": "Home",
+                "sections": [
+                    {
+                        "type": "hero",
+                        "title": business_name,
+                        "subtitle": f"Your premier {business_type_lower} in {location}",
+                        "cta": CONTACT_CTA.copy()
+                    },
+                    {
+                        "type": "about",
+                        "id": "about",
+                        "title": "About Us",
+                        "content": f"{description} We pride ourselves on delivering exceptional service and creating memorable experiences for all our customers. Our commitment to quality and innovation has made us a trusted name in {location}."
+                    },
+                    _copy_with_list(skeleton['services'], 'items'),
+                    {
+                        "type": "testimonials",
+                        "title": "Testimonials",
+                        "items": [
+                            BASIC_TESTIMONIAL.copy(),
+                            {
+                                "quote": f"Best {business_type_lower} I've experienced in {location}! Will definitely be coming back.",
+                                "author": "Sarah M.",
+                                "position": "Customer"
+                            }
+                        ]
+                    },
+                    {
+                        "type": "contact",
+                        "title": "Contact Us",
+                        "address": f"{business_name}, {location}",
+                        "phone": CONTACT_PHONE,
+                        "email": CONTACT_EMAIL
+                    }
+                ]
+            }
+        ],
+        "footer": {
+            "copyright": f" {datetime.now().year} {business_name}. All rights reserved."
+        }
+    }
+
+
+def build_rich_content(business_type, industry, business_name='', location='', description=''):
+    """Content for the rich layout, with header, images, map and footer columns."""
+    business_type = business_type or ''
+    skeleton = _rich_skeleton(business_type, industry or '', get_catalog().current())
+    business_type_lower = skeleton['business_type_lower']
+    return {
+        "name": business_name,
+        "theme": skeleton['theme'].copy(),
+        "header": {
+            "logo_text": business_name,
+            "navigation": _copy_list(NAVIGATION)
+        },
+        "pages": [
+            {
+                "name": "Home",
+                "sections": [
+                    {
+                        "type": "hero",
+                        "id": "home",
+                        "title": business_name,
+                        "subtitle": f"Your premier {business_type_lower} in {location}",
+                        "background_image": skeleton['background_image'],
+                        "cta": GET_STARTED_CTA.copy()
+                    },
+                    {
+                        "type": "about",
+                        "id": "about",
+                        "title": "About Us",
+                        "content": description,
+                        "image": skeleton['about_image']
+                    },
+                    _copy_with_list(skeleton['services'], 'items'),
+                    {
+                        "type": "testimonials",
+                        "id": "testimonials",
+                        "title": "What Our Clients Say",
+                        "items": [
+                            {
+                                "quote": f"The best {business_type_lower} service I've experienced in {location}. Highly recommended!",
+                                "author": "John Smith",
+                                "position": "Satisfied Customer"
+                            },
+                            {
+                                "quote": f"Exceptional quality and service. Their {business_type_lower} expertise is unmatched.",
+                                "author": "Jane Doe",
+                                "position": "Loyal Client"
+                            },
+                            RICH_TESTIMONIAL.copy()
+                        ]
+                    },
+                    {
+                        "type": "contact",
+                        "id": "contact",
+                        "title": "Contact Us",
+                        "address": f"{business_name}, {location}",
+                        "email": CONTACT_EMAIL,
+                        "phone": CONTACT_PHONE,
+                        "map_embed": f"https://maps.google.com/maps?q={location.replace(' ', '+')}&output=embed"
+                    }
+                ]
+            }
+        ],
+        "footer": {
+            "copyright": f" {datetime.now().year} {business_name}. All rights reserved.",
+            "social_links": _copy_list(SOCIAL_LINKS),
+            "columns": [
+                _copy_with_list(QUICK_LINKS, 'links'),
+                _copy_with_list(skeleton['services_column'], 'links'),
+                {
+                    "title": "Contact Info",
+                    "content": f"<p>{business_name}</p><p>{location}</p><p>Phone: {CONTACT_PHONE}</p><p>Email: {CONTACT_EMAIL}</p>"
+                }
+            ]
+        }
+    }
+
+
+LAYOUTS = {
+    'basic': build_basic_content,
+    'rich': build_rich_content,
+}
+
+
+def build_site_content(business_type, industry, business_name='', location='', description='', layout='basic'):
+    """
+    Build the structured content of a new website.
+
+    Args:
+        business_type, industry, business_name, location, description (str):
+            The business details from the form or API request
+        layout (str): ``basic`` or ``rich``
+
+    Returns:
+        dict: Content with name, theme, pages and footer, sharing no
+            mutable value with other results
+    """
+    return LAYOUTS[layout](business_type, industry, business_name or '', location or '', description or '')
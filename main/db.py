@@ -1,11 +1,21 @@
 # db.py
-import os
-from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from .mongo_client import get_mongo_client
+
 load_dotenv()
 
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["ai_website_builder"]
-users_collection = db["users"]
-websites_collection = db["websites_collection"]
\ No newline at end of file
+DB_NAME = "ai_website_builder"
+
+
+def __getattr__(name):
+    # Resolved on access so the client is created in the process that uses it
+    if name == 'client':
+        return get_mongo_client()
+    if name == 'db':
+        return get_mongo_client()[DB_NAME]
+    if name == 'users_collection':
+        return get_mongo_client()[DB_NAME]["users"]
+    if name == 'websites_collection':
+        return get_mongo_client()[DB_NAME]["websites_collection"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,402 @@
+"""
+Generation backends behind generate_content.
+
+A backend turns the generation inputs (and the prompt built from them) into
+raw HTML. The active backend is chosen with the ``GENERATION_BACKEND``
+setting or environment variable:
+
+- ``gemini`` (default): the Gemini model through the shared, rate-limited
+  client in main.llm_client
+- ``stub``: deterministic, realistic HTML after a configurable latency and
+  jitter, for load tests and benchmarks without an API key or quota
+- ``fallback``: the static template generate_content falls back to
+"""
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from .circuit_breaker import CircuitOpenError, get_breaker, get_hedger
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'gemini'
+
+# Registered backend classes, keyed by name
+BACKENDS = {}
+
+def register_backend(name):
+    """Register a GenerationBackend subclass under the given name."""
+    def register(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return register
+
+class GenerationBackend:
+    """
+    Base class for generation backends.
+
+    Subclasses implement ``generate``; ``stream`` defaults to yielding the
+    whole result as one chunk. Both return raw model output, which the
+    caller cleans. Failures are raised and turned into the fallback template
+    by generate_content. Providers wrap their calls in ``guard`` and
+    ``guard_stream`` so a failing or slow provider trips its circuit breaker
+    (see main.circuit_breaker).
+    """
+
+    name = None
+    # Whether results may be stored in the generation cache
+    cacheable = True
+
+    def ignored_errors(self):
+        """Exception types that say nothing about the provider's health."""
+        return ()
+
+    def guard(self, func, *args):
+        """Run a provider call through the circuit breaker, hedged if enabled."""
+        hedger = get_hedger(self.name, self.ignored_errors())
+        if hedger is not None:
+            return hedger.call(func, *args)
+        return get_breaker(self.name, self.ignored_errors()).call(func, *args)
+
+    def guard_stream(self, func, *args):
+        """
+        Yield from a streaming provider call under the circuit breaker.
+
+        Streams are never hedged, and the latency recorded is the time to
+        the first chunk so long pages do not look like a slow provider.
+        """
+        breaker = get_breaker(self.name, self.ignored_errors())
+        if not breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        started = time.monotonic()
+        first_chunk = None
+        try:
+            for chunk in func(*args):
+                if first_chunk is None:
+                    first_chunk = time.monotonic() - started
+                yield chunk
+        except breaker.ignored:
+            breaker.record_ignored()
+            raise
+        except Exception:
+            breaker.record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            # Closed before the end (GeneratorExit when an SSE client
+            # disconnects): says nothing about the provider, but the probe
+            # slot must be given back or a half-open breaker never closes
+            breaker.record_ignored()
+            raise
+        breaker.record(True, first_chunk if first_chunk is not None else time.monotonic() - started)
+
+    def generate(self, prompt, fields):
+        """
+        Args:
+            prompt (str): The prompt built by main.utils.build_prompt
+            fields (dict): business_type, industry, business_name, location
+                and description
+
+        Returns:
+            str: Raw generated HTML
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt, fields):
+        """Yield raw generated HTML in chunks."""
+        yield self.generate(prompt, fields)
+
+    def generate_section(self, prompt, fields, section):
+        """Generate one section of the page (see main.section_generation)."""
+        return self.generate(prompt, fields)
+
+
+@register_backend('gemini')
+class GeminiBackend(GenerationBackend):
+    """Generate with Gemini through the process-wide LLM client manager."""
+
+    def ignored_errors(self):
+        from .llm_client import LLMQueueTimeout
+
+        # Our own queue being full is not the provider's fault
+        return (LLMQueueTimeout,)
+
+    def generate(self, prompt, fields):
+        return self.guard(self._generate, prompt)
+
+    def _generate(self, prompt):
+        from .llm_client import get_client_manager
+
+        response = get_client_manager().generate(prompt)
+        if response and hasattr(response, 'text'):
+            return response.text
+        logger.error(f"Invalid response from Gemini API: {response}")
+        raise ValueError("Received empty or invalid response from AI model")
+
+    def stream(self, prompt, fields):
+        return self.guard_stream(self._stream, prompt)
+
+    def _stream(self, prompt):
+        from .llm_client import get_client_manager
+
+        for chunk in get_client_manager().generate_stream(prompt):
+            text = getattr(chunk, 'text', '')
+            if text:
+                yield text
+
+
+@register_backend('fallback')
+class FallbackBackend(GenerationBackend):
+    """Always return the static fallback template."""
+
+    # The template is cheap to build and must not hide real generations
+    cacheable = False
+
+    def generate(self, prompt, fields):
+        from .utils import get_fallback_content
+
+        return get_fallback_content(**fields)
+
+    def generate_section(self, prompt, fields, section):
+        from .utils import get_fallback_sections
+
+        return get_fallback_sections(**fields)[section]
+
+
+STUB_PALETTES = [
+    ('#1E3A8A', '#F59E0B', "'Playfair Display', serif"),
+    ('#065F46', '#F97316', "'Montserrat', sans-serif"),
+    ('#7C3AED', '#EC4899', "'Poppins', sans-serif"),
+    ('#0F172A', '#22D3EE', "'Inter', sans-serif"),
+    ('#9A3412', '#FDE68A', "'Lora', serif"),
+]
+
+STUB_SERVICES = [
+    ('fa-star', 'Signature {industry} Packages', 'Carefully designed packages that bring the best of {business_name} to every client.'),
+    ('fa-handshake', 'Personal Consultations', 'One-on-one sessions in {location} to understand exactly what you need.'),
+    ('fa-bolt', 'Express Service', 'Fast turnaround without cutting corners, backed by our {business_type} experience.'),
+    ('fa-leaf', 'Sustainable Practices', 'Responsible choices across everything we do in the {industry} space.'),
+    ('fa-gem', 'Premium Care', 'Extra attention to detail for clients who expect more.'),
+    ('fa-users', 'Community Programs', 'Workshops and events for the {location} community.'),
+]
+
+STUB_TESTIMONIALS = [
+    ('Sarah Mitchell', 'Regular Client', '{business_name} exceeded every expectation. The team truly understands {industry}.'),
+    ('David Chen', 'Local Business Owner', 'The best {business_type} in {location}. Professional, friendly and reliable.'),
+    ('Amelia Rossi', 'First-time Customer', 'I came in unsure and left impressed. I have already recommended them to friends.'),
+    ('James Okafor', 'Long-time Partner', 'Consistent quality year after year. {business_name} is a pleasure to work with.'),
+]
+
+
+@register_backend('stub')
+class StubBackend(GenerationBackend):
+    """
+    Deterministic stand-in for the AI model.
+
+    The same inputs always produce the same page, so cache behaviour and
+    output sizes are reproducible; only the delay varies.
+
+    Args:
+        latency (float): Mean seconds per generation
+        jitter (float): Maximum seconds added to or removed from ``latency``
+        chunks (int): Number of chunks ``stream`` splits the page into; the
+            delay is spread evenly across them
+        instructions (bool): Leave an instruction comment in the output, like
+            the real model sometimes does, so the cleanup runs on real work
+        error_rate (float): Share of calls that fail after their delay, to
+            exercise the circuit breaker and fallbacks
+        seed (int): Seed for the jitter and failures
+    """
+
+    def __init__(self, latency=None, jitter=None, chunks=None, instructions=True, error_rate=None, seed=None):
+        self.latency = setting('GENERATION_STUB_LATENCY', 1.5) if latency is None else latency
+        self.jitter = setting('GENERATION_STUB_JITTER', 0.5) if jitter is None else jitter
+        self.chunks = setting('GENERATION_STUB_CHUNKS', 20) if chunks is None else chunks
+        self.error_rate = setting('GENERATION_STUB_ERROR_RATE', 0.0) if error_rate is None else error_rate
+        self.instructions = instructions
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            offset = self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency + offset)
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise RuntimeError("Stub provider error")
+
+    def render_parts(self, fields):
+        """
+        Build the page for ``fields`` without any delay.
+
+        Returns:
+            tuple: (document head, dict of section HTML in page order, document tail)
+        """
+        values = {key: fields.get(key) or '' for key in ('business_type', 'industry', 'business_name', 'location', 'description')}
+        digest = hashlib.sha256('\x1f'.join(values.values()).encode('utf-8')).digest()
+        primary, accent, font = STUB_PALETTES[digest[0] % len(STUB_PALETTES)]
+        services = [STUB_SERVICES[(digest[1] + i) % len(STUB_SERVICES)] for i in range(3)]
+        testimonials = [STUB_TESTIMONIALS[(digest[2] + i) % len(STUB_TESTIMONIALS)] for i in range(2)]
+
+        service_cards = ''.join(f"""
+                    <div class="col-md-4">
+                        <div class="card border-0 shadow-sm h-100 service-card">
+                            <div class="card-body p-4">
+                                <i class="fas {icon} fa-2x mb-3" style="color: {accent};"></i>
+                                <h3 class="h5 fw-bold">{title.format(**values)}</h3>
+                                <p class="text-muted">{text.format(**values)}</p>
+                            </div>
+                        </div>
+                    </div>""" for icon, title, text in services)
+        testimonial_cards = ''.join(f"""
+                    <div class="col-md-6">
+                        <blockquote class="card border-0 shadow-sm p-4">
+                            <p class="fst-italic">"{quote.format(**values)}"</p>
+                            <footer class="fw-bold">{name} <small class="text-muted d-block">{role}</small></footer>
+                        </blockquote>
+                    </div>""" for name, role, quote in testimonials)
+        instruction = "\n    <!-- Remember to replace the images with photos of your business -->" if self.instructions else ''
+
+        head = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{values['business_name']} | {values['business_type']} in {values['location']}</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
+    <style>
+        body {{ font-family: {font}; }}
+        .hero {{ background: linear-gradient(135deg, {primary} 0%, {accent} 100%); color: #fff; }}
+        .service-card {{ transition: transform 0.3s ease; }}
+        .service-card:hover {{ transform: translateY(-6px); }}
+        .btn-accent {{ background: {accent}; color: {primary}; }}
+    </style>
+</head>
+<body>"""
+        sections = {
+            'hero': f"""{instruction}
+    <header class="hero py-5 text-center">
+        <div class="container py-5">
+            <h1 class="display-4 fw-bold">{values['business_name']}</h1>
+            <p class="lead">The {values['industry']} {values['business_type']} {values['location']} relies on.</p>
+            <a href="#contact" class="btn btn-accent btn-lg rounded-pill px-4">Get in Touch</a>
+        </div>
+    </header>""",
+            'about': f"""
+    <section class="py-5" id="about">
+        <div class="container">
+            <h2 class="fw-bold mb-4">About Us</h2>
+            <p class="lead">{values['description']}</p>
+        </div>
+    </section>""",
+            'services': f"""
+    <section class="py-5 bg-light" id="services">
+        <div class="container">
+            <h2 class="fw-bold text-center mb-5">Our Services</h2>
+            <div class="row g-4">{service_cards}
+            </div>
+        </div>
+    </section>""",
+            'testimonials': f"""
+    <section class="py-5" id="testimonials">
+        <div class="container">
+            <h2 class="fw-bold text-center mb-5">What Our Clients Say</h2>
+            <div class="row g-4">{testimonial_cards}
+            </div>
+        </div>
+    </section>""",
+            'contact': f"""
+    <section class="py-5 bg-light" id="contact">
+        <div class="container">
+            <h2 class="fw-bold mb-4">Contact Us</h2>
+            <p><i class="fas fa-map-marker-alt me-2"></i>{values['location']}</p>
+            <form>
+                <input type="text" class="form-control mb-3" placeholder="Your Name">
+                <input type="email" class="form-control mb-3" placeholder="Your Email">
+                <textarea class="form-control mb-3" rows="4" placeholder="Your Message"></textarea>
+                <button type="submit" class="btn btn-accent">Send Message</button>
+            </form>
+        </div>
+    </section>""",
+            'footer': f"""
+    <footer class="py-4 text-center text-white" style="background: {primary};">
+        <p class="mb-0">&copy; 2024 {values['business_name']}. All rights reserved.</p>
+    </footer>""",
+        }
+        tail = """
+</body>
+</html>
+"""
+        return head, sections, tail
+
+    def render(self, fields):
+        """Build the whole page for ``fields`` without any delay."""
+        head, sections, tail = self.render_parts(fields)
+        return head + ''.join(sections.values()) + tail
+
+    def generate(self, prompt, fields):
+        return self.guard(self._generate, fields)
+
+    def _generate(self, fields):
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return self.render(fields)
+
+    def stream(self, prompt, fields):
+        return self.guard_stream(self._stream, fields)
+
+    def _stream(self, fields):
+        page = self.render(fields)
+        chunks = max(1, self.chunks)
+        size = -(-len(page) // chunks)
+        pause = self._delay() / chunks
+        for start in range(0, len(page), size):
+            time.sleep(pause)
+            if start == 0:
+                self._maybe_fail()
+            yield page[start:start + size]
+
+    def generate_section(self, prompt, fields, section):
+        return self.guard(self._generate_section, fields, section)
+
+    def _generate_section(self, fields, section):
+        # Latency scales with output length, like a real completion
+        head, sections, tail = self.render_parts(fields)
+        page_length = len(head) + sum(len(html) for html in sections.values()) + len(tail)
+        time.sleep(self._delay() * len(sections[section]) / page_length)
+        self._maybe_fail()
+        return sections[section]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Return the configured generation backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = setting('GENERATION_BACKEND', DEFAULT_BACKEND)
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown generation backend: {name}")
+                _backend = BACKENDS[name]()
+                logger.info(f"Using generation backend: {name}")
+    return _backend
+
+def set_backend(backend):
+    """Replace the active backend with an instance or a registered name."""
+    global _backend
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown generation backend: {backend}")
+        backend = BACKENDS[backend]()
+    with _backend_lock:
+        _backend = backend
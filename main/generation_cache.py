@@ -0,0 +1,362 @@
+"""
+Response cache for AI-generated website content.
+
+Generated pages are cached in two tiers: an in-process LRU with a TTL that
+answers repeat requests inside a worker, backed by a MongoDB collection that
+is shared by every worker. Concurrent requests for the same key are coalesced
+so only one model call is in flight per key: inside a process followers wait
+on the leader, and across processes a short lease stored on the cache
+document tells other workers that a generation is already running.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION_NAME = "generation_cache"
+
+
+def normalize_field(value):
+    """Normalize a prompt input so trivially different submissions share a key."""
+    if value is None:
+        return ''
+    value = unicodedata.normalize('NFC', str(value))
+    return ' '.join(value.split())
+
+
+def make_cache_key(prompt_version, business_type, industry, business_name='', location='', description=''):
+    """
+    Build the cache key for a generation request.
+
+    Args:
+        prompt_version (int): Version of the prompt template; bump it to
+            invalidate everything generated with an older prompt
+        business_type, industry, business_name, location, description (str):
+            The raw generation inputs
+
+    Returns:
+        str: Hex digest identifying the normalized request
+    """
+    payload = json.dumps([
+        prompt_version,
+        normalize_field(business_type),
+        normalize_field(industry),
+        normalize_field(business_name),
+        normalize_field(location),
+        normalize_field(description),
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _InFlightCall:
+    """A generation that other threads in this process are waiting on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GenerationCache:
+    """
+    Two-tier cache for generated content with request coalescing.
+
+    The memory tier is a per-process LRU; the persistent tier is a MongoDB
+    collection. Either tier can be switched off, and any MongoDB error is
+    logged and treated as a miss so the cache never breaks generation.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, persistent_ttl=86400,
+                 lease_seconds=60, poll_interval=0.5, collection_name=CACHE_COLLECTION_NAME,
+                 persistent=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent_ttl = persistent_ttl
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.collection_name = collection_name
+        self.persistent = persistent
+
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # -- persistent tier ---------------------------------------------------
+
+    def _get_collection(self):
+        if not self.persistent:
+            return None
+        # Imported lazily so the cache works without pymongo installed
+        from .mongodb_utils import get_collection
+        return get_collection(self.collection_name)
+
+    def _persistent_get(self, key):
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return None
+            doc = collection.find_one({'_id': key, 'content': {'$exists': True}})
+            if not doc:
+                return None
+            expires_at = doc.get('expires_at')
+            if expires_at and expires_at < datetime.now():
+                return None
+            return doc['content']
+        except Exception as e:
+            logger.error(f"Error reading generation cache: {e}")
+            return None
+
+    def _persistent_set(self, key, content):
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return
+            now = datetime.now()
+            collection.update_one(
+                {'_id': key},
+                {
+                    '$set': {
+                        'content': content,
+                        'created_at': now,
+                        'expires_at': now + timedelta(seconds=self.persistent_ttl),
+                    },
+                    '$unset': {'pending_until': ''},
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error writing generation cache: {e}")
+
+    def _acquire_lease(self, key):
+        """
+        Mark ``key`` as being generated by this process.
+
+        Returns True when the lease was taken (or MongoDB is unavailable, in
+        which case there is nobody to coordinate with), False when another
+        worker already holds an unexpired lease.
+        """
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return True
+            now = datetime.now()
+            collection.update_one(
+                {'_id': key, '$or': [{'pending_until': None}, {'pending_until': {'$lt': now}}]},
+                {'$set': {'pending_until': now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            from pymongo.errors import DuplicateKeyError
+            if isinstance(e, DuplicateKeyError):
+                return False
+            logger.error(f"Error acquiring generation lease: {e}")
+            return True
+
+    def _release_lease(self, key):
+        try:
+            collection = self._get_collection()
+            if collection is not None:
+                collection.update_one({'_id': key}, {'$unset': {'pending_until': ''}})
+        except Exception as e:
+            logger.error(f"Error releasing generation lease: {e}")
+
+    # -- memory tier -------------------------------------------------------
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            content, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return content
+
+    def _lookup(self, key):
+        """
+        Look up both tiers, promoting persistent hits into memory.
+
+        Returns:
+            tuple: Cached content and the counter a hit goes to, or
+            ``(None, 'misses')``
+        """
+        content = self._memory_get(key)
+        if content is not None:
+            return content, 'memory_hits'
+        content = self._persistent_get(key)
+        if content is not None:
+            self._memory_set(key, content)
+            return content, 'persistent_hits'
+        return None, 'misses'
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _memory_set(self, key, content):
+        with self._lock:
+            self._entries[key] = (content, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # -- public API --------------------------------------------------------
+
+    def get(self, key):
+        """
+        Look up cached content, promoting persistent hits into memory.
+
+        Returns:
+            str: Cached content or None on a miss
+        """
+        content, counter = self._lookup(key)
+        self._count(counter)
+        return content
+
+    def set(self, key, content):
+        """Store content in both tiers."""
+        self._memory_set(key, content)
+        self._persistent_set(key, content)
+
+    def invalidate(self, key):
+        """Drop a single key from both tiers."""
+        with self._lock:
+            self._entries.pop(key, None)
+        try:
+            collection = self._get_collection()
+            if collection is not None:
+                collection.delete_one({'_id': key})
+        except Exception as e:
+            logger.error(f"Error invalidating generation cache: {e}")
+
+    def clear(self, persistent=True):
+        """Drop every cached entry, optionally including the shared tier."""
+        with self._lock:
+            self._entries.clear()
+        if not persistent:
+            return
+        try:
+            collection = self._get_collection()
+            if collection is not None:
+                collection.delete_many({})
+        except Exception as e:
+            logger.error(f"Error clearing generation cache: {e}")
+
+    def get_or_generate(self, key, generate):
+        """
+        Return cached content for ``key`` or call ``generate()`` to produce it.
+
+        Only one call to ``generate`` runs per key: other threads in this
+        process wait for its result, and other processes wait for the lease
+        holder to publish its result to the persistent tier. Exceptions from
+        ``generate`` propagate to every waiter and nothing is cached.
+        """
+        content = self.get(key)
+        if content is not None:
+            return content
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            # A leader that finished after the lookup above has already stored the content
+            content = self._recheck(key)
+            if content is None:
+                content = self._wait_for_other_worker(key)
+            if content is None:
+                # The lease is ours, but its last holder may have published just before releasing it
+                content = self._recheck(key)
+                if content is not None:
+                    self._release_lease(key)
+            if content is None:
+                try:
+                    content = generate()
+                except Exception:
+                    self._release_lease(key)
+                    raise
+                self.set(key, content)
+            call.result = content
+            return content
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.event.set()
+
+    def _recheck(self, key):
+        """Content another leader stored since this thread's lookup, counted as coalesced."""
+        content, _ = self._lookup(key)
+        if content is not None:
+            self._count('coalesced')
+        return content
+
+    def _wait_for_other_worker(self, key):
+        """
+        Take the cross-process lease for ``key``, or wait for its holder.
+
+        Returns the content published by another worker, or None once this
+        process holds the lease and should generate the content itself.
+        """
+        deadline = time.monotonic() + self.lease_seconds
+        while not self._acquire_lease(key):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+            content = self._persistent_get(key)
+            if content is not None:
+                self._count('coalesced')
+                self._memory_set(key, content)
+                return content
+        return None
+
+    def stats(self):
+        """Return hit/miss counters for monitoring."""
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        hits = self.memory_hits + self.persistent_hits
+        return {
+            'memory_hits': self.memory_hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._entries),
+            'in_flight': len(self._in_flight),
+        }
+
+
+generation_cache = GenerationCache(
+    max_entries=setting('GENERATION_CACHE_MAX_ENTRIES', 256),
+    ttl=setting('GENERATION_CACHE_TTL', 3600),
+    persistent_ttl=setting('GENERATION_CACHE_PERSISTENT_TTL', 86400),
+    persistent=setting('GENERATION_CACHE_PERSISTENT', True),
+)
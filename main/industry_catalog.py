@@ -0,0 +1,229 @@
+"""
+Industry catalog: theme colors, images and services per industry keyword.
+
+The catalog lives in a JSON file (``main/data/industry_catalog.json`` unless
+the INDUSTRY_CATALOG_PATH setting points elsewhere) and is compiled into an
+Aho-Corasick automaton over the lowercased keys. One pass over the business
+type and industry finds every key they contain; for each asset the earliest
+matching entry in the file wins, which is the order the old per-asset
+lookup tables were scanned in. Results are memoized per compiled catalog.
+
+The file is checked for changes at most every
+INDUSTRY_CATALOG_RELOAD_INTERVAL seconds (0 turns hot reload off). A file
+that fails to load is logged and the previous catalog stays in use.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'industry_catalog.json')
+
+ASSETS = ('colors', 'background_image', 'about_image', 'services')
+
+# Joins business type and industry; keys never contain it, so no match can
+# span the two
+SEPARATOR = '\n'
+
+
+def _freeze(name, value):
+    if value is None:
+        return None
+    if name == 'colors':
+        return tuple(value)
+    if name == 'services':
+        return tuple((service['title'], service['description']) for service in value)
+    return value
+
+
+class IndustryMatcher:
+    """
+    Compiled catalog.
+
+    Args:
+        industries (list): Entries in priority order, each with a ``key`` and
+            any of the ASSETS
+        defaults (dict): Assets used when no entry matches; lookups report
+            ``services`` as None instead, since callers derive generic
+            services from the business type
+    """
+
+    def __init__(self, industries, defaults):
+        self.keys = []
+        self.assets = []
+        for entry in industries:
+            key = str(entry['key'])
+            if not key.strip() or SEPARATOR in key:
+                raise ValueError(f"Invalid industry key: {key!r}")
+            self.keys.append(key)
+            self.assets.append({name: _freeze(name, entry.get(name)) for name in ASSETS})
+        self.defaults = {name: _freeze(name, defaults.get(name)) for name in ASSETS}
+        self._compile()
+        self.lookup = lru_cache(maxsize=4096)(self._lookup)
+
+    def _compile(self):
+        goto = [{}]
+        outputs = [set()]
+        for index, key in enumerate(self.keys):
+            state = 0
+            for char in key.lower():
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append(set())
+                state = next_state
+            outputs[state].add(index)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] |= outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [frozenset(output) for output in outputs]
+
+    def matches(self, text):
+        """Indexes of every entry whose key occurs in ``text`` (case-insensitive)."""
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+    def _lookup(self, business_type, industry):
+        found = sorted(self.matches(f"{business_type}{SEPARATOR}{industry}"))
+        bundle = dict(self.defaults, services=None, matched=None)
+        for name in ASSETS:
+            for index in found:
+                value = self.assets[index][name]
+                if value is not None:
+                    bundle[name] = value
+                    break
+        if found:
+            bundle['matched'] = self.keys[found[0]]
+        return bundle
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def load_matcher(path):
+    """Read and compile a catalog file."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return IndustryMatcher(data.get('industries', []), data.get('defaults', {}))
+
+
+class IndustryCatalog:
+    """
+    A catalog file and its compiled matcher, reloaded when the file changes.
+
+    Args:
+        path (str): Catalog JSON file
+        reload_interval (float): Seconds between checks of the file's
+            modification time; 0 disables hot reload
+    """
+
+    def __init__(self, path, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._checked = time.monotonic()
+        self.matcher = load_matcher(path)
+
+    def reload(self):
+        """Recompile the file now; keeps the current matcher if it fails to load."""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+                matcher = load_matcher(self.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"Could not reload industry catalog {self.path}: {e}")
+                return False
+            self.matcher = matcher
+            self._mtime = mtime
+            self.reloads += 1
+        logger.info(f"Reloaded industry catalog {self.path} ({len(matcher)} industries)")
+        return True
+
+    def current(self):
+        """The compiled matcher, after reloading it if the file has changed."""
+        if self.reload_interval and time.monotonic() - self._checked >= self.reload_interval:
+            self._checked = time.monotonic()
+            try:
+                changed = os.path.getmtime(self.path) != self._mtime
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+        return self.matcher
+
+    def lookup(self, business_type, industry):
+        """
+        Assets for a business type and industry.
+
+        Returns:
+            dict: ``colors`` (primary, secondary), ``background_image``,
+                ``about_image``, ``services`` ((title, description) pairs, or
+                None when no entry with services matched) and ``matched``
+                (the winning key, or None)
+        """
+        return self.current().lookup(business_type or '', industry or '')
+
+    def stats(self):
+        matcher = self.matcher
+        info = matcher.lookup.cache_info()
+        return {
+            'path': self.path,
+            'industries': len(matcher),
+            'reloads': self.reloads,
+            'cache_hits': info.hits,
+            'cache_misses': info.misses,
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Return the process-wide catalog, configured from settings."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = IndustryCatalog(
+                    setting('INDUSTRY_CATALOG_PATH', DEFAULT_CATALOG_PATH),
+                    reload_interval=setting('INDUSTRY_CATALOG_RELOAD_INTERVAL', 5.0),
+                )
+    return _catalog
+
+def set_catalog(catalog):
+    """Replace the process-wide catalog (an IndustryCatalog, or None to reset)."""
+    global _catalog
+    _catalog = catalog
@@ -0,0 +1,321 @@
+"""
+Background generation jobs.
+
+Requests enqueue a GenerationJob row and get its id back immediately; the
+``generation_worker`` management command claims queued jobs and runs them on
+a bounded thread pool. Jobs live in the Django database so they survive
+restarts: a running job whose worker stops sending heartbeats is put back in
+the queue until it runs out of attempts.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.db import close_old_connections
+from django.db.models import F
+
+from .models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry of a failed job; doubled on every attempt
+RETRY_BACKOFF = 30
+
+# Registered job handlers, keyed by GenerationJob.kind
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Register a function as the handler for jobs of the given kind."""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+def job_website_id(job):
+    """
+    The id of the website a ``website`` job stores, derived from the job's
+    UUID so a retried job finds the website of an earlier attempt.
+    """
+    return str(ObjectId(job.job_id.bytes[:12]))
+
+@job_handler('website')
+def generate_website_job(job, payload):
+    """
+    Generate a website with the AI model and store it.
+
+    A retry of a job whose website was already stored returns that website
+    without generating or saving it again.
+
+    Returns:
+        tuple: (MongoDB id, None), or (None, Django ORM id) if MongoDB failed
+    """
+    from .replication import save_website
+    from .repositories import get_repository
+    from .utils import generate_content
+
+    website_id = job_website_id(job)
+    if get_repository().get(website_id) is not None:
+        logger.info(f"Job {job.job_id} already stored website {website_id}")
+        return website_id, None
+
+    business_name = payload.get('business_name', '')
+    business_type = payload.get('business_type', '')
+    industry = payload.get('industry', '')
+    location = payload.get('location', '')
+    description = payload.get('description', '')
+
+    content = generate_content(business_type, industry, business_name, location, description)
+
+    website_data = {
+        '_id': ObjectId(website_id),
+        'user_email': job.user_email,
+        'business_name': business_name,
+        'location': location,
+        'description': description,
+        'business_type': business_type,
+        'industry': industry,
+        'content': content,
+        'created_at': datetime.now(),
+        'updated_at': datetime.now()
+    }
+    # The replicator copies it to the Django ORM
+    return save_website(website_data)
+
+@job_handler('bulk')
+def bulk_generation_job(job, payload):
+    """
+    Run a bulk import from its last checkpoint.
+
+    A retry of this job resumes where the previous attempt stopped.
+
+    Returns:
+        tuple: (None, None); results are tracked on the BulkGeneration
+    """
+    from .bulk import BulkGenerator
+    from .models import BulkGeneration
+
+    bulk = BulkGeneration.objects.get(bulk_id=payload['bulk_id'])
+    BulkGenerator(bulk).run()
+    return None, None
+
+def submit_job(payload, user_email='guest@example.com', kind='website', max_attempts=3):
+    """
+    Queue a generation job.
+
+    Args:
+        payload (dict): Inputs passed to the job handler
+        user_email (str): Owner of the resulting website
+        kind (str): Name of a registered job handler
+        max_attempts (int): How many times the job may run before it fails
+
+    Returns:
+        GenerationJob: The queued job
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return GenerationJob.objects.create(
+        kind=kind,
+        user_email=user_email,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts
+    )
+
+def get_job(job_id):
+    """Return the job with the given UUID, or None."""
+    try:
+        return GenerationJob.objects.get(job_id=job_id)
+    except (GenerationJob.DoesNotExist, ValueError):
+        return None
+
+def job_status(job):
+    """Serialize a job for the status API."""
+    return {
+        'job_id': str(job.job_id),
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'error': job.error,
+        'website_id': job.website_id,
+        'django_website_id': job.django_website_id,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest runnable job to ``running``.
+
+    Claiming is a conditional UPDATE on the queued status, so several
+    workers can poll the same table without taking a job twice.
+
+    Returns:
+        GenerationJob: The claimed job, or None if the queue is empty
+    """
+    now = datetime.now()
+    candidates = (GenerationJob.objects
+                  .filter(status=GenerationJob.STATUS_QUEUED, available_at__lte=now)
+                  .order_by('available_at', 'id')
+                  .values_list('id', flat=True)[:10])
+    for pk in candidates:
+        claimed = GenerationJob.objects.filter(id=pk, status=GenerationJob.STATUS_QUEUED).update(
+            status=GenerationJob.STATUS_RUNNING,
+            worker_id=worker_id,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return GenerationJob.objects.get(id=pk)
+    return None
+
+def _retry_or_fail(job, error):
+    """Requeue a job with exponential backoff, or mark it failed."""
+    now = datetime.now()
+    if job.attempts < job.max_attempts:
+        delay = RETRY_BACKOFF * 2 ** max(job.attempts - 1, 0)
+        updates = {
+            'status': GenerationJob.STATUS_QUEUED,
+            'available_at': now + timedelta(seconds=delay),
+            'worker_id': None,
+            'error': error,
+        }
+    else:
+        updates = {
+            'status': GenerationJob.STATUS_FAILED,
+            'finished_at': now,
+            'error': error,
+        }
+    # Only touch the job while it is still ours to change
+    return _owned(job).update(**updates)
+
+def _owned(job):
+    """The job's row, unless it was requeued or claimed by another worker since ``job`` was read."""
+    return GenerationJob.objects.filter(id=job.id, status=GenerationJob.STATUS_RUNNING, worker_id=job.worker_id)
+
+def run_job(job):
+    """Run a claimed job through its handler and record the outcome."""
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        website_id, django_website_id = handler(job, json.loads(job.payload))
+    except Exception as e:
+        logger.error(f"Generation job {job.job_id} failed (attempt {job.attempts}/{job.max_attempts}): {e}")
+        _retry_or_fail(job, str(e))
+        return
+
+    done = _owned(job).update(
+        status=GenerationJob.STATUS_DONE,
+        website_id=website_id,
+        django_website_id=django_website_id,
+        finished_at=datetime.now(),
+        error=None
+    )
+    if not done:
+        # Requeued as stale while it ran: the attempt that holds it now
+        # records its own outcome
+        logger.warning(
+            f"Generation job {job.job_id} finished (website {website_id or django_website_id}) "
+            f"after it was taken from worker {job.worker_id}; not marking it done"
+        )
+        return
+    logger.info(f"Generation job {job.job_id} done: website {website_id or django_website_id}")
+
+def requeue_stale_jobs(stale_after):
+    """
+    Recover jobs whose worker crashed or was killed.
+
+    Args:
+        stale_after (int): Seconds without a heartbeat before a running job
+            is considered abandoned
+
+    Returns:
+        int: Number of jobs requeued or failed
+    """
+    cutoff = datetime.now() - timedelta(seconds=stale_after)
+    recovered = 0
+    for job in GenerationJob.objects.filter(status=GenerationJob.STATUS_RUNNING, heartbeat_at__lt=cutoff):
+        recovered += _retry_or_fail(job, "Worker stopped responding")
+    if recovered:
+        logger.warning(f"Recovered {recovered} stale generation jobs")
+    return recovered
+
+class GenerationWorker:
+    """
+    Poll the job table and run jobs on a bounded thread pool.
+
+    At most ``concurrency`` jobs run at once; jobs are only claimed when a
+    pool slot is free, so queued jobs stay available to other workers.
+    """
+
+    def __init__(self, concurrency=4, poll_interval=1.0, stale_after=300, worker_id=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Stop claiming new jobs; running jobs are allowed to finish."""
+        self._stop.set()
+
+    def _execute(self, job):
+        close_old_connections()
+        try:
+            run_job(job)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+            close_old_connections()
+
+    def _heartbeat(self):
+        with self._lock:
+            running = list(self._running)
+        if running:
+            GenerationJob.objects.filter(
+                id__in=running, status=GenerationJob.STATUS_RUNNING, worker_id=self.worker_id
+            ).update(
+                heartbeat_at=datetime.now()
+            )
+
+    def run(self, once=False):
+        """
+        Process jobs until stopped.
+
+        Args:
+            once (bool): Exit as soon as the queue is drained instead of polling
+        """
+        logger.info(f"Generation worker {self.worker_id} started with {self.concurrency} threads")
+        last_recovery = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stop.is_set():
+                now = datetime.now().timestamp()
+                if now - last_recovery >= self.stale_after / 2:
+                    requeue_stale_jobs(self.stale_after)
+                    last_recovery = now
+                self._heartbeat()
+
+                claimed = False
+                while len(self._running) < self.concurrency:
+                    job = claim_next_job(self.worker_id)
+                    if job is None:
+                        break
+                    claimed = True
+                    with self._lock:
+                        self._running[job.id] = job
+                    executor.submit(self._execute, job)
+
+                if once and not claimed and not self._running:
+                    break
+                self._stop.wait(self.poll_interval)
+        logger.info(f"Generation worker {self.worker_id} stopped")
@@ -0,0 +1,295 @@
+"""
+Process-wide manager for outbound LLM calls.
+
+Model handles are configured once per process instead of on every request,
+and every call goes through two limits: a token bucket enforcing requests per
+minute and a cap on calls in flight at once. Callers over either limit queue
+until a deadline and then fail fast, which generate_content turns into the
+fallback template. When the provider reports that the quota is exhausted the
+bucket is paused, so queued callers wait instead of hitting the same error.
+
+The limits apply per process; with several gunicorn workers set them to the
+provider quota divided by the number of workers.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+
+class LLMQueueTimeout(Exception):
+    """Raised when a call could not start before its queue deadline."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate_per_minute (float): Tokens added per minute
+        capacity (int): Largest burst allowed after an idle period
+        clock (callable): Monotonic clock, injectable for tests
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, min(int(rate_per_minute), 10))
+        self.clock = clock
+        self.tokens = float(self.capacity)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """
+        Take a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one should be
+        """
+        with self._lock:
+            now = self.clock()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, deadline):
+        """Wait for a token until ``deadline`` (a clock value). Returns False on timeout."""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            now = self.clock()
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hand out no tokens for ``seconds``, e.g. after a quota error."""
+        with self._lock:
+            now = self.clock()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.0
+            self.updated = now
+
+    def available(self):
+        with self._lock:
+            now = self.clock()
+            if now < self.paused_until:
+                return 0.0
+            self._refill(now)
+            return self.tokens
+
+
+def _gemini_model_factory(model_name):
+    """Configure the Google AI API once and build a model handle."""
+    import google.generativeai as genai
+
+    # Get API key from environment variables
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        logger.error("API key not found in environment variables")
+        raise ValueError("Google API key not found. Please check your .env file.")
+    # Debug log the first few characters of the API key (never log full keys)
+    logger.info(f"API key found: {api_key[:4]}...")
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+class LLMClientManager:
+    """
+    Shared model handles plus rate and concurrency limits for LLM calls.
+
+    Args:
+        requests_per_minute (float): Token bucket refill rate
+        max_in_flight (int): Maximum concurrent calls
+        queue_timeout (float): Seconds a caller may wait for a slot
+        quota_backoff (float): Seconds to stop calling after a quota error
+        burst (int): Token bucket capacity
+        model_factory (callable): ``model_factory(model_name)`` returning an
+            object with ``generate_content(prompt, stream=False)``; defaults to
+            Gemini, pass a fake to test without the network
+        clock (callable): Monotonic clock shared with the token bucket,
+            injectable for tests
+    """
+
+    def __init__(self, requests_per_minute=60, max_in_flight=4, queue_timeout=30,
+                 quota_backoff=30, burst=None, model_factory=None, clock=time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.quota_backoff = quota_backoff
+        self.model_factory = model_factory or _gemini_model_factory
+        self.clock = clock
+
+        self.bucket = TokenBucket(requests_per_minute, capacity=burst, clock=clock)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._models = {}
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_calls = 0
+        self.queue_timeouts = 0
+        self.quota_errors = 0
+
+    def get_model(self, model_name=DEFAULT_MODEL):
+        """Return the shared handle for ``model_name``, creating it on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is None:
+                    model = self.model_factory(model_name)
+                    self._models[model_name] = model
+        return model
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """
+        Hold one rate-limited call slot for the duration of the block.
+
+        Raises:
+            LLMQueueTimeout: If no slot became free within ``timeout`` seconds
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = self.clock() + timeout
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+            if acquired and not self.bucket.acquire(deadline):
+                self._slots.release()
+                acquired = False
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            with self._lock:
+                self.queue_timeouts += 1
+            raise LLMQueueTimeout(f"No LLM call slot became available within {timeout}s")
+
+        with self._lock:
+            self.in_flight += 1
+            self.total_calls += 1
+        try:
+            yield
+        except (ResourceExhausted, TooManyRequests):
+            self._on_quota_error()
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _on_quota_error(self):
+        with self._lock:
+            self.quota_errors += 1
+        logger.warning(f"LLM quota exhausted, pausing calls for {self.quota_backoff}s")
+        self.bucket.pause(self.quota_backoff)
+
+    def generate(self, prompt, model_name=DEFAULT_MODEL, timeout=None):
+        """Run a non-streaming generation inside a slot and return the response."""
+        model = self.get_model(model_name)
+        with self.slot(timeout):
+            return model.generate_content(prompt)
+
+    def generate_stream(self, prompt, model_name=DEFAULT_MODEL, timeout=None):
+        """Yield response chunks, holding the slot until the stream ends."""
+        model = self.get_model(model_name)
+        with self.slot(timeout):
+            for chunk in model.generate_content(prompt, stream=True):
+                yield chunk
+
+    def utilization(self):
+        """Current load and counters, for monitoring."""
+        return {
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'waiting': self.waiting,
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_available': round(self.bucket.available(), 2),
+            'paused_for': round(max(0.0, self.bucket.paused_until - self.clock()), 2),
+            'total_calls': self.total_calls,
+            'queue_timeouts': self.queue_timeouts,
+            'quota_errors': self.quota_errors,
+            'models': sorted(self._models),
+        }
+
+
+class FakeModel:
+    """
+    Local stand-in for a Gemini model handle.
+
+    Returns ``text`` after ``latency`` seconds, and raises ResourceExhausted
+    for every ``quota_error_every``-th call when set, so the limits above can
+    be exercised without network access or quota.
+    """
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, text='<html><body><h1>Fake response</h1></body></html>', latency=0.0,
+                 quota_error_every=0, chunk_size=256):
+        self.text = text
+        self.latency = latency
+        self.quota_error_every = quota_error_every
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.quota_error_every and calls % self.quota_error_every == 0:
+            raise ResourceExhausted("Fake quota exhausted")
+        time.sleep(self.latency)
+        if not stream:
+            return self._Response(self.text)
+        return (self._Response(self.text[i:i + self.chunk_size]) for i in range(0, len(self.text), self.chunk_size))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_client_manager():
+    """Return the process-wide LLMClientManager, configured from settings."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = LLMClientManager(
+                    requests_per_minute=setting('LLM_REQUESTS_PER_MINUTE', 60.0),
+                    max_in_flight=setting('LLM_MAX_IN_FLIGHT', 4),
+                    queue_timeout=setting('LLM_QUEUE_TIMEOUT', 30.0),
+                    quota_backoff=setting('LLM_QUOTA_BACKOFF', 30.0),
+                )
+    return _manager
+
+
+def set_client_manager(manager):
+    """Replace the process-wide manager, e.g. with one built on a fake provider."""
+    global _manager
+    with _manager_lock:
+        _manager = manager
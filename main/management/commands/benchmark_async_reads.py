@@ -0,0 +1,410 @@
+import asyncio
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import jwt
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+
+BENCH_EMAIL = 'async-bench@example.com'
+STAND_IN_URI = 'mongodb://benchmark-stand-in'
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Both servers are gunicorn masters so their workers fork from a process that
+# already holds the seeded stand-in; they differ only in the worker class
+SERVERS = (
+    ('sync gunicorn', 'sync', 'ai_builder.wsgi:application'),
+    ('async uvicorn', 'uvicorn.workers.UvicornWorker', 'ai_builder.asgi:application'),
+)
+
+
+def website_id(i):
+    """Deterministic ObjectId of the i-th benchmark website."""
+    return ObjectId(f"{i + 1:024x}")
+
+
+def benchmark_websites(count, content_bytes):
+    filler = 'x' * content_bytes
+    created = datetime(2024, 1, 1)
+    for i in range(count):
+        yield {
+            '_id': website_id(i),
+            'user_email': BENCH_EMAIL,
+            'business_name': f"Business {i}",
+            'business_type': 'restaurant',
+            'location': 'Springfield',
+            'created_at': created + timedelta(seconds=i),
+            'content': {'hero': {'title': f"Business {i}", 'body': filler}},
+        }
+
+
+# -- in-memory stand-in ---------------------------------------------------
+#
+# One mongomock client per server process, seeded before the workers fork.
+# Every query sleeps for --latency-ms first: time.sleep in the sync wrappers
+# (blocking the worker, like pymongo), asyncio.sleep in the async ones (like
+# Motor awaiting the server). Results are memoized per query (the data is
+# read-only here): evaluating a query costs mongomock milliseconds of CPU,
+# which a real mongod spends in its own process, not in the worker measured.
+
+class _StandInClient:
+    def __init__(self, client, collection_class, latency):
+        self._client = client
+        self._collection_class = collection_class
+        self._latency = latency
+        self._results = {}
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def __getitem__(self, name):
+        return _StandInDatabase(self._client[name], self)
+
+    def close(self):
+        pass
+
+
+class _StandInDatabase:
+    def __init__(self, database, client):
+        self._database = database
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+    def __getitem__(self, name):
+        client = self._client
+        return client._collection_class(self._database[name], client._latency, client._results)
+
+
+class _StandInCollection:
+    def __init__(self, collection, latency, results):
+        self._collection = collection
+        self._latency = latency
+        self._results = results
+
+    def _run(self, operation, *args):
+        key = (self._collection.full_name, operation.__name__, repr(args))
+        if key not in self._results:
+            self._results[key] = operation(*args)
+        return self._results[key]
+
+    def _documents(self, filter, projection, sort, limit):
+        documents = self._run(self._find_documents, filter, projection, sort, limit)
+        # Callers rewrite _id in place
+        return [dict(document) for document in documents]
+
+    def _find_documents(self, filter, projection, sort, limit):
+        cursor = self._collection.find(filter, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        return list(cursor.limit(limit))
+
+    def _find_one(self, filter):
+        document = self._run(self._collection.find_one, filter)
+        return dict(document) if document else document
+
+
+class _StandInCursor:
+    def __init__(self, collection, filter, projection):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction)] if direction is not None else key
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def _documents(self):
+        return self._collection._documents(self._filter, self._projection, self._sort, self._limit)
+
+
+class _SlowCursor(_StandInCursor):
+    def __iter__(self):
+        time.sleep(self._collection._latency)
+        return iter(self._documents())
+
+    def close(self):
+        pass
+
+
+class _SlowCollection(_StandInCollection):
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def find_one(self, filter=None):
+        time.sleep(self._latency)
+        return self._find_one(filter)
+
+    def find(self, filter=None, projection=None):
+        return _SlowCursor(self, filter, projection)
+
+    def count_documents(self, filter):
+        time.sleep(self._latency)
+        return self._run(self._collection.count_documents, filter)
+
+
+class _AsyncSlowCursor(_StandInCursor):
+    async def to_list(self, length=None):
+        await asyncio.sleep(self._collection._latency)
+        return self._documents()[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self._collection._latency)
+        for document in self._documents():
+            yield document
+
+    async def close(self):
+        pass
+
+
+class _AsyncSlowCollection(_StandInCollection):
+    async def find_one(self, filter=None):
+        await asyncio.sleep(self._latency)
+        return self._find_one(filter)
+
+    def find(self, filter=None, projection=None):
+        return _AsyncSlowCursor(self, filter, projection)
+
+    async def count_documents(self, filter):
+        await asyncio.sleep(self._latency)
+        return self._run(self._collection.count_documents, filter)
+
+
+def install_stand_in(websites, content_bytes, latency):
+    """Point both client registries of this process at a seeded in-memory MongoDB."""
+    import mongomock
+
+    from main.mongo_client import database_name, registry
+    from main.mongodb_async import async_registry
+    from main.mongodb_utils import COLLECTION_NAME
+
+    client = mongomock.MongoClient()
+    client[database_name()][COLLECTION_NAME].insert_many(benchmark_websites(websites, content_bytes))
+    registry.client_factory = lambda uri, **options: _StandInClient(client, _SlowCollection, latency)
+    async_registry.client_factory = lambda uri, **options: _StandInClient(client, _AsyncSlowCollection, latency)
+
+
+def serve():
+    """Entry point of a server subprocess; the config is a JSON argument."""
+    config = json.loads(sys.argv[1])
+
+    import django
+    django.setup()
+    if config['stand_in']:
+        install_stand_in(config['websites'], config['content_bytes'], config['latency'])
+
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"127.0.0.1:{config['port']}")
+            self.cfg.set('workers', config['workers'])
+            self.cfg.set('worker_class', config['worker_class'])
+            self.cfg.set('backlog', 2048)
+            self.cfg.set('timeout', 120)
+            self.cfg.set('loglevel', 'warning')
+
+        def load(self):
+            module, name = config['app'].split(':')
+            return getattr(__import__(module, fromlist=[name]), name)
+
+    Server().run()
+
+
+# -- load generator -------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def run_load(port, paths, headers, requests, concurrency):
+    """
+    Send ``requests`` GETs from ``concurrency`` keep-alive clients.
+
+    Returns:
+        tuple: (latencies in seconds of 200 responses, error count, elapsed seconds)
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while True:
+            i = next(counter)
+            if i >= requests:
+                break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', paths[i % len(paths)], headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return latencies, errors[0], time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Compare read throughput of the sync views under gunicorn with the async views under uvicorn."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=('list', 'view'), default='list',
+                            help="GET /api/websites/ or /view-generated-website/<id>/")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per server")
+        parser.add_argument('--concurrency', type=int, default=100, help="Concurrent keep-alive clients")
+        parser.add_argument('--workers', type=int, default=2, help="Worker processes per server")
+        parser.add_argument('--mongo-uri', help="Benchmark against this MongoDB (e.g. a local mongod) instead of the in-memory stand-in")
+        parser.add_argument('--latency-ms', type=float, default=20.0, help="Simulated round trip per query (stand-in only)")
+        parser.add_argument('--websites', type=int, default=200, help="Benchmark websites to seed")
+        parser.add_argument('--content-bytes', type=int, default=2000, help="Generated content per website")
+
+    def handle(self, *args, **options):
+        stand_in = not options['mongo_uri']
+        if stand_in:
+            try:
+                import mongomock  # noqa: F401
+            except ImportError:
+                raise CommandError("The in-memory stand-in needs mongomock (pip install mongomock), or pass --mongo-uri")
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("uvicorn is not installed")
+
+        secret = os.getenv('SECRET_KEY') or 'benchmark-secret-key'
+        token = jwt.encode({'email': BENCH_EMAIL}, secret, algorithm='HS256')
+        headers = {'Authorization': f"Bearer {token}"}
+        if options['endpoint'] == 'list':
+            paths = ['/api/websites/?limit=20']
+        else:
+            paths = [f"/view-generated-website/{website_id(i)}/" for i in range(options['websites'])]
+
+        collection = None if stand_in else self.seed(options)
+        try:
+            results = [self.bench(name, worker_class, app, secret, paths, headers, options)
+                       for name, worker_class, app in SERVERS]
+        finally:
+            if collection is not None:
+                collection.delete_many({'user_email': BENCH_EMAIL})
+
+        source = f"in-memory stand-in, {options['latency_ms']:g} ms per query" if stand_in else options['mongo_uri']
+        self.stdout.write(
+            f"{options['endpoint']} endpoint, {options['requests']} requests, {options['concurrency']} clients, "
+            f"{options['workers']} workers per server ({source})"
+        )
+        self.stdout.write(f"{'server':<15} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name, latencies, errors, elapsed in results:
+            if not latencies:
+                self.stdout.write(f"{name:<15} {'-':>9} {'-':>8} {'-':>8} {'-':>8} {errors:>7}")
+                continue
+            latencies.sort()
+            self.stdout.write(
+                f"{name:<15} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies) * 1000:>8.1f} "
+                f"{percentile(latencies, 0.95) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} {errors:>7}"
+            )
+
+    def seed(self, options):
+        from pymongo import MongoClient
+
+        from main.mongo_client import database_name
+        from main.mongodb_utils import COLLECTION_NAME
+
+        collection = MongoClient(options['mongo_uri'], serverSelectionTimeoutMS=5000)[database_name()][COLLECTION_NAME]
+        collection.delete_many({'user_email': BENCH_EMAIL})
+        collection.insert_many(benchmark_websites(options['websites'], options['content_bytes']))
+        return collection
+
+    def bench(self, name, worker_class, app, secret, paths, headers, options):
+        port = free_port()
+        config = {
+            'port': port,
+            'workers': options['workers'],
+            'worker_class': worker_class,
+            'app': app,
+            'stand_in': not options['mongo_uri'],
+            'websites': options['websites'],
+            'content_bytes': options['content_bytes'],
+            'latency': options['latency_ms'] / 1000,
+        }
+        env = dict(
+            os.environ,
+            MONGO_URI=options['mongo_uri'] or STAND_IN_URI,
+            SECRET_KEY=secret,
+            ASYNC_READ_VIEWS='1' if app.endswith('asgi:application') else '0',
+        )
+        bootstrap = 'from main.management.commands.benchmark_async_reads import serve; serve()'
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen([sys.executable, '-c', bootstrap, json.dumps(config)],
+                                       env=env, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=log)
+            try:
+                if not wait_for_port(port, process):
+                    log.seek(0)
+                    raise CommandError(f"{name} server did not start:\n{log.read().decode(errors='replace')[-2000:]}")
+                # Warm every worker up before measuring
+                run_load(port, paths, headers, options['concurrency'] * 2, options['concurrency'])
+                latencies, errors, elapsed = run_load(port, paths, headers, options['requests'], options['concurrency'])
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+        return name, latencies, errors, elapsed
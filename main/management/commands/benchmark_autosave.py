@@ -0,0 +1,127 @@
+import json
+import random
+import time
+
+from bson import json_util
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.autosave import AutosaveBuffer
+from main.content_builder import build_site_content
+from main.repositories import SQLiteWebsiteRepository, set_repository
+from main.website_patch import Operation, check_operations, load_editable, mongo_update, write_operations
+
+EDITOR = 'editor@example.com'
+
+
+class CountingRepository(SQLiteWebsiteRepository):
+    """The SQLite repository, counting reads, writes and update bytes."""
+
+    def __init__(self):
+        super().__init__(':memory:')
+        self.reads = 0
+        self.writes = 0
+        self.update_bytes = 0
+
+    def get(self, website_id, raise_errors=False):
+        self.reads += 1
+        return super().get(website_id, raise_errors)
+
+    def patch(self, website_id, operations, *args, **kwargs):
+        self.writes += 1
+        self.update_bytes += len(json_util.dumps(mongo_update(operations)))
+        return super().patch(website_id, operations, *args, **kwargs)
+
+
+def editor_session(rng, website_ids, edits):
+    """
+    Editor-style changes: typing into one field a keystroke at a time,
+    switching fields, adding a service and then editing it.
+    """
+    fields = [
+        'content.pages.0.sections.0.title', 'content.pages.0.sections.0.subtitle',
+        'content.pages.0.sections.1.content', 'content.footer.copyright', 'business_name',
+    ]
+    website_id, path, text = rng.choice(website_ids), rng.choice(fields), ''
+    for _ in range(edits):
+        choice = rng.random()
+        if choice < 0.04:
+            website_id = rng.choice(website_ids)
+        if choice < 0.1:
+            path, text = rng.choice(fields), ''
+        if choice > 0.97:
+            yield website_id, [Operation('push', 'content.pages.0.sections.2.items', {'title': 'New service', 'description': ''})]
+        elif choice > 0.94:
+            yield website_id, [Operation('set', 'content.pages.0.sections.2.items.0.description', f"Edited {rng.random():.3f}")]
+        else:
+            text += rng.choice('abcdefghijklmnopqrstuvwxyz ')
+            yield website_id, [Operation('set', path, text)]
+
+
+class Command(BaseCommand):
+    help = "Count the website writes of editor changes saved one by one and through the autosave buffer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edits', type=int, default=1000, help="Editor changes (default: 1000)")
+        parser.add_argument('--websites', type=int, default=3, help="Websites edited (default: 3)")
+        parser.add_argument('--rate', type=float, default=5.0, help="Changes per second (default: 5, a fast typist)")
+        parser.add_argument('--intervals', default='0.5,2,5', help="Comma-separated autosave intervals in seconds")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<14} {'writes':>7} {'per 1k':>7} {'reads':>7} {'update KB':>10} {'cpu ms':>8}")
+        baseline = self.run(options, None)
+        for interval in [float(value) for value in options['intervals'].split(',')]:
+            if self.run(options, interval) != baseline:
+                raise CommandError(f"Autosave every {interval:g}s saved different websites than saving each change")
+
+    def run(self, options, interval):
+        """Replay the session, saving each change or through a buffer; returns the final contents."""
+        repository = CountingRepository()
+        set_repository(repository)
+        try:
+            # Nothing is kept: revisions are recorded in a rolled-back transaction
+            with transaction.atomic():
+                contents = self.replay(repository, options, interval)
+                transaction.set_rollback(True)
+        finally:
+            set_repository(None)
+        return contents
+
+    def replay(self, repository, options, interval):
+        website_ids = [
+            repository.save({
+                'user_email': EDITOR,
+                'business_name': f"Benchmark Bistro {i}",
+                'content': build_site_content(
+                    'Restaurant', 'Food & Beverage', f"Benchmark Bistro {i}", 'Portland, OR', 'Seasonal dishes.', layout='rich'
+                ),
+            })
+            for i in range(options['websites'])
+        ]
+        buffer = None
+        if interval is not None:
+            now = [0.0]
+            buffer = AutosaveBuffer(interval=interval, clock=lambda: now[0])
+            # Flushed on the simulated clock below, not by its thread
+            buffer.ensure_started = lambda: None
+
+        started = time.process_time()
+        session = editor_session(random.Random(options['seed']), website_ids, options['edits'])
+        for step, (website_id, operations) in enumerate(session):
+            if buffer is None:
+                write_operations(load_editable(website_id, EDITOR), check_operations(operations))
+            else:
+                now[0] = step / options['rate']
+                buffer.flush_due()
+                buffer.submit(website_id, EDITOR, operations)
+        if buffer is not None:
+            buffer.flush_all()
+        cpu = time.process_time() - started
+
+        label = 'each change' if buffer is None else f"every {interval:g}s"
+        self.stdout.write(
+            f"{label:<14} {repository.writes:>7} {repository.writes * 1000 / options['edits']:>7.0f} {repository.reads:>7} "
+            f"{repository.update_bytes / 1024:>10.1f} {cpu * 1000:>8.0f}"
+        )
+        return [json.dumps(repository.get(website_id)['content'], sort_keys=True) for website_id in website_ids]
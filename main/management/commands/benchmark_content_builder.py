@@ -0,0 +1,294 @@
+import timeit
+import tracemalloc
+from datetime import datetime
+from functools import lru_cache
+
+from django.core.management.base import BaseCommand
+
+from main.content_builder import build_site_content
+from main.industry_catalog import get_catalog
+
+SAMPLES = [
+    ('Coffee Shop', 'Food & Beverage', 'Benchmark Cafe', 'Portland, OR', 'Small-batch roastery and neighbourhood cafe.'),
+    ('Gym', 'Fitness', 'Iron Works', 'Austin, TX', 'Strength training for everyone.'),
+    ('Law Firm', 'Legal', 'Smith & Co', 'Boston, MA', 'Business and family law.'),
+    ('Pottery Studio', 'Arts', 'Clay Corner', 'Santa Fe, NM', 'Classes and commissions.'),
+]
+
+
+@lru_cache(maxsize=None)
+def _tables():
+    """The catalog as the per-asset lookup tables the old helpers used."""
+    matcher = get_catalog().current()
+    tables = {name: {} for name in ('colors', 'background_image', 'about_image', 'services')}
+    for key, assets in zip(matcher.keys, matcher.assets):
+        for name, value in assets.items():
+            if value is not None:
+                tables[name].setdefault(key, value)
+    return tables, matcher.defaults
+
+
+def _lookup(table, business_type, industry, default):
+    # The old helpers rebuilt their tables and scanned them on every call
+    table = dict(table)
+    for key in table:
+        if key.lower() in business_type.lower() or key.lower() in industry.lower():
+            return table[key]
+    return default
+
+
+def legacy_basic(business_type, industry, business_name, location, description):
+    """The inline structure the views built before content_builder existed."""
+    return {
+        "name": business_name,
+        "theme": {
+            "primary_color": "#6366f1",
+            "secondary_color": "#4f46e5",
+            "text_color": "#333333",
+            "background_color": "#ffffff"
+        },
+        "pages": [
+            {
+                "name": "Home",
+                "sections": [
+                    {
+                        "type": "hero",
+                        "title": business_name,
+                        "subtitle": f"Your premier {business_type.lower()} in {location}",
+                        "cta": {"text": "Contact Us", "link": "#contact"}
+                    },
+                    {
+                        "type": "about",
+                        "id": "about",
+                        "title": "About Us",
+                        "content": f"{description} We pride ourselves on delivering exceptional service and creating memorable experiences for all our customers. Our commitment to quality and innovation has made us a trusted name in {location}."
+                    },
+                    {
+                        "type": "services",
+                        "title": "Our Services",
+                        "items": [
+                            {
+                                "title": f"{business_type} Service 1",
+                                "description": "Detailed description of our primary service offering, tailored to meet your specific needs."
+                            },
+                            {
+                                "title": f"{business_type} Service 2",
+                                "description": "Comprehensive explanation of our secondary service, designed to enhance your experience."
+                            },
+                            {
+                                "title": f"{business_type} Service 3",
+                                "description": "Information about our tertiary service offering, providing additional value to our customers."
+                            }
+                        ]
+                    },
+                    {
+                        "type": "testimonials",
+                        "title": "Testimonials",
+                        "items": [
+                            {
+                                "quote": "The service here is simply amazing! The staff are always friendly and helpful. Highly recommend!",
+                                "author": "John D.",
+                                "position": "Customer"
+                            },
+                            {
+                                "quote": f"Best {business_type.lower()} I've experienced in {location}! Will definitely be coming back.",
+                                "author": "Sarah M.",
+                                "position": "Customer"
+                            }
+                        ]
+                    },
+                    {
+                        "type": "contact",
+                        "title": "Contact Us",
+                        "address": f"{business_name}, {location}",
+                        "phone": "+1 (555) 123-4567",
+                        "email": "contact@example.com"
+                    }
+                ]
+            }
+        ],
+        "footer": {
+            "copyright": f" {datetime.now().year} {business_name}. All rights reserved."
+        }
+    }
+
+
+def legacy_rich(business_type, industry, business_name, location, description):
+    """The structure WebsiteFormAPIView built before content_builder existed."""
+    tables, defaults = _tables()
+    primary_color, secondary_color = _lookup(tables['colors'], business_type, industry, defaults['colors'])
+    services = _lookup(tables['services'], business_type, industry, None)
+    if services is not None:
+        service_items = [{"title": title, "description": text} for title, text in services]
+        service_links = [{"text": title, "link": "#services"} for title, _ in services]
+    else:
+        service_items = [
+            {"title": f"Premium {business_type} Service", "description": f"Our flagship {business_type.lower()} service designed to exceed expectations."},
+            {"title": "Consultation", "description": f"Expert {business_type.lower()} consultation tailored to your specific needs."},
+            {"title": "Ongoing Support", "description": f"Continuous assistance and support for all your {business_type.lower()} requirements."}
+        ]
+        service_links = [
+            {"text": f"{business_type} Service", "link": "#services"},
+            {"text": "Consultation", "link": "#services"},
+            {"text": "Support", "link": "#services"}
+        ]
+    return {
+        "name": business_name,
+        "theme": {
+            "primary_color": primary_color,
+            "secondary_color": secondary_color,
+            "text_color": "#f8fafc",
+            "background_color": "#0f172a",
+            "accent_color": "#a5b4fc"
+        },
+        "header": {
+            "logo_text": business_name,
+            "navigation": [
+                {"text": "Home", "link": "#"},
+                {"text": "About", "link": "#about"},
+                {"text": "Services", "link": "#services"},
+                {"text": "Testimonials", "link": "#testimonials"},
+                {"text": "Contact", "link": "#contact"}
+            ]
+        },
+        "pages": [
+            {
+                "name": "Home",
+                "sections": [
+                    {
+                        "type": "hero",
+                        "id": "home",
+                        "title": business_name,
+                        "subtitle": f"Your premier {business_type.lower()} in {location}",
+                        "background_image": _lookup(
+                            tables['background_image'], business_type, industry, defaults['background_image']
+                        ),
+                        "cta": {"text": "Get Started", "link": "#contact"}
+                    },
+                    {
+                        "type": "about",
+                        "id": "about",
+                        "title": "About Us",
+                        "content": description,
+                        "image": _lookup(
+                            tables['about_image'], business_type, industry, defaults['about_image']
+                        )
+                    },
+                    {
+                        "type": "services",
+                        "id": "services",
+                        "title": "Our Services",
+                        "items": service_items
+                    },
+                    {
+                        "type": "testimonials",
+                        "id": "testimonials",
+                        "title": "What Our Clients Say",
+                        "items": [
+                            {
+                                "quote": f"The best {business_type.lower()} service I've experienced in {location}. Highly recommended!",
+                                "author": "John Smith",
+                                "position": "Satisfied Customer"
+                            },
+                            {
+                                "quote": f"Exceptional quality and service. Their {business_type.lower()} expertise is unmatched.",
+                                "author": "Jane Doe",
+                                "position": "Loyal Client"
+                            },
+                            {
+                                "quote": "Professional, reliable, and truly outstanding results every time.",
+                                "author": "Robert Johnson",
+                                "position": "Business Owner"
+                            }
+                        ]
+                    },
+                    {
+                        "type": "contact",
+                        "id": "contact",
+                        "title": "Contact Us",
+                        "address": f"{business_name}, {location}",
+                        "email": "contact@example.com",
+                        "phone": "+1 (555) 123-4567",
+                        "map_embed": f"https://maps.google.com/maps?q={location.replace(' ', '+')}&output=embed"
+                    }
+                ]
+            }
+        ],
+        "footer": {
+            "copyright": f" {datetime.now().year} {business_name}. All rights reserved.",
+            "social_links": [
+                {"platform": "Facebook", "icon": "fab fa-facebook", "link": "#"},
+                {"platform": "Twitter", "icon": "fab fa-twitter", "link": "#"},
+                {"platform": "Instagram", "icon": "fab fa-instagram", "link": "#"},
+                {"platform": "LinkedIn", "icon": "fab fa-linkedin", "link": "#"}
+            ],
+            "columns": [
+                {
+                    "title": "Quick Links",
+                    "links": [
+                        {"text": "Home", "link": "#"},
+                        {"text": "About", "link": "#about"},
+                        {"text": "Services", "link": "#services"},
+                        {"text": "Contact", "link": "#contact"}
+                    ]
+                },
+                {"title": "Services", "links": service_links},
+                {
+                    "title": "Contact Info",
+                    "content": f"<p>{business_name}</p><p>{location}</p><p>Phone: +1 (555) 123-4567</p><p>Email: contact@example.com</p>"
+                }
+            ]
+        }
+    }
+
+
+LEGACY = {
+    'basic': legacy_basic,
+    'rich': legacy_rich,
+}
+
+
+def allocations(build, rounds):
+    """Blocks and bytes still allocated per build when ``rounds`` results are kept."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [build(i) for i in range(rounds)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del results
+    return blocks / rounds, size / rounds
+
+
+class Command(BaseCommand):
+    help = "Compare the shared content builder with the inline structures it replaced."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help="Builds timed per layout (default: 20000)")
+        parser.add_argument('--retained', type=int, default=1000, help="Builds kept alive for the allocation count (default: 1000)")
+
+    def handle(self, *args, **options):
+        number = options['number']
+        for layout, legacy in LEGACY.items():
+            for sample in SAMPLES:
+                if build_site_content(*sample, layout=layout) != legacy(*sample):
+                    self.stderr.write(f"{layout} output differs from the old structure for {sample[0]!r}")
+                    return
+
+            def old(i):
+                return legacy(*SAMPLES[i % len(SAMPLES)])
+
+            def new(i):
+                return build_site_content(*SAMPLES[i % len(SAMPLES)], layout=layout)
+
+            self.stdout.write(f"{layout} layout (output identical for {len(SAMPLES)} samples)")
+            for label, build in (('inline', old), ('builder', new)):
+                build(0)
+                seconds = timeit.timeit(lambda: build(0), number=number)
+                blocks, size = allocations(build, options['retained'])
+                self.stdout.write(
+                    f"  {label + ':':<9} {seconds / number * 1e6:7.2f} us/build, "
+                    f"{blocks:6.1f} blocks, {size / 1024:6.2f} KiB retained per build"
+                )
@@ -0,0 +1,119 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from main.repositories import REPOSITORIES, get_repository, set_repository
+
+SECRET_KEY_DEFAULT = "django-insecure-dummy-key-for-development"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def seed_websites(repository, user_email, count, content_bytes):
+    """Save ``count`` websites for ``user_email``, newest first; returns their ids."""
+    filler = 'x' * content_bytes
+    base = datetime(2024, 1, 1)
+    ids = []
+    for i in range(count):
+        ids.append(repository.save({
+            'user_email': user_email,
+            'business_name': f"Business {i}",
+            'business_type': 'restaurant',
+            'industry': 'food',
+            'location': 'Springfield',
+            'description': 'Benchmark website',
+            'content': {'hero': {'title': f"Business {i}", 'body': filler}, 'sections': ['about', 'menu']},
+            'created_at': base + timedelta(minutes=i),
+        }))
+    if None in ids:
+        raise CommandError("Seeding the repository failed")
+    return ids
+
+
+class Command(BaseCommand):
+    help = "Time every website endpoint through the full Django stack against a website repository."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repository', choices=sorted(REPOSITORIES), default='sqlite',
+            help="Website repository (default: sqlite, which needs no network)"
+        )
+        parser.add_argument('--websites', type=int, default=500, help="Websites seeded for the benchmark user (default: 500)")
+        parser.add_argument('--content-bytes', type=int, default=2000, help="Generated content per website (default: 2000)")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint (default: 200)")
+        parser.add_argument('--page-size', type=int, default=20, help="Page size of the list endpoints (default: 20)")
+
+    def handle(self, *args, **options):
+        set_repository(options['repository'])
+        repository = get_repository()
+        if not repository.configured():
+            raise CommandError(f"The {options['repository']} repository is not configured")
+        secret_key = os.environ.setdefault('SECRET_KEY', SECRET_KEY_DEFAULT)
+        user_email = f"bench-{int(time.time())}@example.com"
+        token = jwt.encode({'email': user_email}, secret_key, algorithm='HS256')
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {token}"}
+
+        started = time.perf_counter()
+        ids = seed_websites(repository, user_email, options['websites'], options['content_bytes'])
+        self.stdout.write(f"seeded {len(ids)} websites in {time.perf_counter() - started:.2f}s ({options['repository']})")
+
+        client = Client()
+        created = []
+        page = f"?limit={options['page_size']}"
+        form = {
+            'business_name': 'Benchmark Cafe', 'business_type': 'Coffee Shop', 'industry': 'Food & Beverage',
+            'location': 'Portland, OR', 'description': 'Small-batch roastery and neighbourhood cafe.',
+        }
+        endpoints = [
+            ('GET /websites/', lambda i: client.get(f"/websites/{page}", **auth)),
+            ('GET /api/websites/', lambda i: client.get(f"/api/websites/{page}", **auth)),
+            ('GET /api/websites/ ndjson', lambda i: client.get("/api/websites/?format=ndjson", **auth)),
+            ('GET /view-generated-website/<id>/', lambda i: client.get(f"/view-generated-website/{ids[i % len(ids)]}/")),
+            ('GET /view-generated-website/', lambda i: client.get("/view-generated-website/")),
+            ('POST /api/website-form/', lambda i: self.create(client, created, dict(form, business_name=f"Benchmark Cafe {i}"))),
+        ]
+
+        self.stdout.write(f"{'endpoint':<36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        failing = []
+        try:
+            for label, call in endpoints:
+                latencies, errors = [], 0
+                for i in range(options['requests']):
+                    started = time.perf_counter()
+                    response = call(i)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    latencies.append(time.perf_counter() - started)
+                    # Pages that cannot be shown redirect instead of failing
+                    if response.status_code >= 400 or (response.status_code == 302 and 'view-generated' in label):
+                        errors += 1
+                self.stdout.write(
+                    f"{label:<36} {len(latencies) / sum(latencies):>8.1f} {percentile(latencies, 0.5) * 1000:>8.1f} "
+                    f"{percentile(latencies, 0.95) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} {errors:>7}"
+                )
+                if errors:
+                    failing.append(label)
+        finally:
+            for website in list(repository.iter(user_id=user_email, fields=('business_name',)) or []):
+                repository.delete(website['_id'])
+            for website_id in created:
+                repository.delete(website_id)
+        # Timings of failing requests say nothing about the endpoint
+        if failing:
+            raise CommandError(f"Requests failed on {len(failing)} endpoints: {', '.join(failing)}")
+
+    @staticmethod
+    def create(client, created, form):
+        # Anonymous form posts belong to the guest user; remember them for cleanup
+        response = client.post("/api/website-form/", data=json.dumps(form), content_type='application/json')
+        if response.status_code < 400:
+            created.append(response.json()['website_id'])
+        return response
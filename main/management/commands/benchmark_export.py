@@ -0,0 +1,102 @@
+import os
+import resource
+import sys
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from main.mongodb_utils import get_collection, iter_websites
+from main.renderers import ndjson_lines
+
+
+def synthetic_websites(count, content_bytes):
+    """Website-shaped documents, produced lazily like a cursor would."""
+    filler = 'x' * content_bytes
+    for i in range(count):
+        yield {
+            '_id': str(ObjectId()),
+            'user_email': 'bench@example.com',
+            'business_name': f"Business {i}",
+            'business_type': 'restaurant',
+            'location': 'Springfield',
+            'content': {'hero': {'title': f"Business {i}", 'body': filler}},
+        }
+
+
+def buffered(websites):
+    """What the paged JSON response does: the whole list, then the whole body."""
+    return len(JSONRenderer().render(list(websites)))
+
+
+def streamed(websites):
+    """What the NDJSON export does: one document per line, written as read."""
+    return sum(len(line) for line in ndjson_lines(websites))
+
+
+def peak_rss_kb(run):
+    """Run ``run`` in a fresh child process and return its peak RSS in KB."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            run()
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except Exception:
+            peak = -1
+        os.write(write_fd, str(peak).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as reader:
+        output = reader.read()
+    os.waitpid(pid, 0)
+    peak = int(output or -1)
+    if peak < 0:
+        raise CommandError("Benchmark child process failed")
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+class Command(BaseCommand):
+    help = "Compare peak memory of buffered JSON and streamed NDJSON website exports by result-set size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,5000,20000', help="Comma-separated result-set sizes")
+        parser.add_argument('--content-bytes', type=int, default=5000, help="Generated content per website (synthetic source)")
+        parser.add_argument(
+            '--source', choices=('synthetic', 'mongo'), default='synthetic',
+            help="Export generated documents, or a user's websites from MongoDB"
+        )
+        parser.add_argument('--user-email', help="User whose websites to export (--source mongo)")
+        parser.add_argument('--batch-size', type=int, default=100, help="Cursor batch size (--source mongo)")
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError("This benchmark needs os.fork")
+        if options['source'] == 'mongo':
+            if not options['user_email']:
+                raise CommandError("--source mongo needs --user-email")
+            if get_collection() is None:
+                raise CommandError("MongoDB is not available")
+            sizes = [None]
+        else:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+
+        def source(size):
+            if options['source'] == 'mongo':
+                return iter_websites(user_id=options['user_email'], batch_size=options['batch_size'])
+            return synthetic_websites(size, options['content_bytes'])
+
+        baseline = peak_rss_kb(lambda: None)
+        self.stdout.write(f"baseline process: {baseline / 1024:.1f} MB (subtracted below)")
+        self.stdout.write(f"{'websites':>10} {'buffered MB':>12} {'streamed MB':>12} {'output MB':>10}")
+        for size in sizes:
+            buffered_kb = peak_rss_kb(lambda: buffered(source(size)))
+            streamed_kb = peak_rss_kb(lambda: streamed(source(size)))
+            label = size if size is not None else options['user_email']
+            self.stdout.write(
+                f"{label:>10} {(buffered_kb - baseline) / 1024:>12.1f} {(streamed_kb - baseline) / 1024:>12.1f} "
+                f"{streamed(source(size)) / 1024 / 1024:>10.1f}"
+            )
@@ -0,0 +1,95 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from main.circuit_breaker import breaker_stats
+from main.generation_backends import BACKENDS, StubBackend, set_backend
+from main.generation_cache import generation_cache
+from main.section_generation import sections_enabled
+from main.utils import generate_content
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = "Measure generation throughput and latency against an offline backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', default='stub', choices=sorted(BACKENDS), help="Generation backend (default: stub)")
+        parser.add_argument('--requests', type=int, default=200, help="Total requests (default: 200)")
+        parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight at once (default: 16)")
+        parser.add_argument('--latency', type=float, default=0.5, help="Stub latency in seconds (default: 0.5)")
+        parser.add_argument('--jitter', type=float, default=0.2, help="Stub jitter in seconds (default: 0.2)")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of stub calls that fail (default: 0)")
+        parser.add_argument(
+            '--mode', choices=['page', 'sections'], default=None,
+            help="Generate whole pages or section by section (default: the GENERATION_MODE setting)"
+        )
+        parser.add_argument(
+            '--distinct', type=int, default=0,
+            help="Number of distinct inputs; 0 makes every request unique so nothing is served from cache"
+        )
+        parser.add_argument(
+            '--url', default=None,
+            help="POST each request as JSON to this path through the full Django stack "
+                 "(e.g. /api/generation-jobs/) instead of calling generate_content"
+        )
+        parser.add_argument(
+            '--persistent-cache', action='store_true',
+            help="Keep the MongoDB cache tier enabled (off by default so no database is needed)"
+        )
+
+    def handle(self, *args, **options):
+        if options['backend'] == 'stub':
+            set_backend(StubBackend(
+                latency=options['latency'], jitter=options['jitter'], error_rate=options['error_rate'], seed=0
+            ))
+        else:
+            set_backend(options['backend'])
+        if options['mode']:
+            settings.GENERATION_MODE = options['mode']
+        generation_cache.persistent = options['persistent_cache']
+        generation_cache.clear(persistent=False)
+
+        distinct = options['distinct']
+        client = Client() if options['url'] else None
+
+        def run(index):
+            key = index % distinct if distinct else index
+            fields = {
+                'business_type': 'Coffee Shop',
+                'industry': 'Food & Beverage',
+                'business_name': f'Benchmark Cafe {key}',
+                'location': 'Portland, OR',
+                'description': 'Small-batch roastery and neighbourhood cafe.',
+            }
+            started = time.perf_counter()
+            if client is not None:
+                response = client.post(options['url'], data=json.dumps(fields), content_type='application/json')
+                ok = response.status_code < 400
+            else:
+                ok = bool(generate_content(**fields))
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(run, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, _ in results]
+        failures = sum(1 for _, ok in results if not ok)
+        self.stdout.write(f"backend:     {options['backend']} ({'sections' if sections_enabled() else 'page'} mode)")
+        self.stdout.write(f"requests:    {len(results)} ({failures} failed), concurrency {options['concurrency']}")
+        self.stdout.write(f"throughput:  {len(results) / elapsed:.1f} req/s")
+        for label, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            self.stdout.write(f"{label + ':':<12} {percentile(latencies, fraction) * 1000:.1f} ms")
+        self.stdout.write(f"max:         {max(latencies) * 1000:.1f} ms")
+        self.stdout.write(f"cache:       {generation_cache.stats()}")
+        self.stdout.write(f"breakers:    {breaker_stats()}")
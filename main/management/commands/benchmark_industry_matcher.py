@@ -0,0 +1,102 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.industry_catalog import ASSETS, IndustryMatcher
+
+
+def synthetic_catalog(size, rng):
+    """A catalog of ``size`` made-up industries, every third one with services."""
+    keys = set()
+    while len(keys) < size:
+        keys.add(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12))).title())
+    industries = []
+    for index, key in enumerate(sorted(keys)):
+        entry = {
+            'key': key,
+            'colors': ['#%06x' % rng.randrange(1 << 24), '#%06x' % rng.randrange(1 << 24)],
+            'background_image': f'https://example.com/{key}/background.jpg',
+            'about_image': f'https://example.com/{key}/about.jpg',
+        }
+        if index % 3 == 0:
+            entry['services'] = [{'title': f'{key} {n}', 'description': 'Service'} for n in range(3)]
+        industries.append(entry)
+    defaults = {'colors': ['#6366f1', '#4f46e5'], 'background_image': 'default.jpg', 'about_image': 'default.jpg'}
+    return industries, defaults
+
+
+def scan_lookup(tables, defaults, business_type, industry):
+    """One linear scan per asset, lowering key and input every time, as the old helpers did."""
+    bundle = {}
+    for name in ASSETS:
+        bundle[name] = defaults.get(name)
+        for key in tables[name]:
+            if key.lower() in business_type.lower() or key.lower() in industry.lower():
+                bundle[name] = tables[name][key]
+                break
+    return bundle
+
+
+class Command(BaseCommand):
+    help = "Compare the compiled industry matcher with per-asset linear scans on large catalogs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,1000,5000', help="Comma-separated catalog sizes (default: 20,1000,5000)")
+        parser.add_argument('--queries', type=int, default=2000, help="Distinct lookups per size (default: 2000)")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        for size in [int(size) for size in options['sizes'].split(',')]:
+            industries, defaults = synthetic_catalog(size, rng)
+
+            started = time.perf_counter()
+            matcher = IndustryMatcher(industries, defaults)
+            compile_seconds = time.perf_counter() - started
+
+            tables = {name: {} for name in ASSETS}
+            for key, assets in zip(matcher.keys, matcher.assets):
+                for name, value in assets.items():
+                    if value is not None:
+                        tables[name][key] = value
+
+            # Half the queries name a catalog industry, half match nothing
+            queries = []
+            for n in range(options['queries']):
+                if n % 2:
+                    key = rng.choice(matcher.keys)
+                    queries.append((f"Family {key} Co", "Local business"))
+                else:
+                    queries.append((f"Shop {n}", "General"))
+
+            for business_type, industry in queries[:50]:
+                expected = scan_lookup(tables, matcher.defaults, business_type, industry)
+                actual = matcher._lookup(business_type, industry)
+                if expected['colors'] != actual['colors'] or expected['background_image'] != actual['background_image']:
+                    self.stderr.write(f"Matcher and scan disagree for {business_type!r}")
+                    return
+
+            started = time.perf_counter()
+            for business_type, industry in queries:
+                scan_lookup(tables, matcher.defaults, business_type, industry)
+            scan_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for business_type, industry in queries:
+                matcher._lookup(business_type, industry)
+            match_seconds = time.perf_counter() - started
+
+            for business_type, industry in queries:
+                matcher.lookup(business_type, industry)
+            started = time.perf_counter()
+            for business_type, industry in queries:
+                matcher.lookup(business_type, industry)
+            cached_seconds = time.perf_counter() - started
+
+            count = len(queries)
+            self.stdout.write(f"{size} industries (compiled in {compile_seconds * 1000:.1f} ms)")
+            self.stdout.write(f"  linear scans:  {scan_seconds / count * 1e6:9.1f} us/lookup")
+            self.stdout.write(f"  matcher:       {match_seconds / count * 1e6:9.1f} us/lookup")
+            self.stdout.write(f"  memoized:      {cached_seconds / count * 1e6:9.1f} us/lookup")
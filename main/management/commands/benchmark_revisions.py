@@ -0,0 +1,101 @@
+import copy
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.content_builder import build_site_content
+from main.revisions import RevisionStore
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def initial_content(html_bytes):
+    """Rich generated content with a multi-KB HTML block in the about section."""
+    content = build_site_content(
+        'Restaurant', 'Food & Beverage', 'Benchmark Bistro', 'Portland, OR', 'Seasonal dishes and natural wine.', layout='rich'
+    )
+    paragraph = "<p>We cook seasonal dishes from local farms and pour natural wine from small growers.</p>\n"
+    about = content['pages'][0]['sections'][1]
+    about['html'] = paragraph * max(1, html_bytes // len(paragraph))
+    return content
+
+
+def edit(content, rng, step):
+    """One editor-style change: a word, a color, a service, or a whole item."""
+    sections = content['pages'][0]['sections']
+    about, services = sections[1], sections[2]
+    choice = rng.random()
+    if choice < 0.5:
+        html = about['html']
+        at = rng.randrange(len(html))
+        about['html'] = html[:at] + f"<em>update {step}</em>" + html[at + 12:]
+    elif choice < 0.65:
+        content['theme']['primary_color'] = f"#{rng.randrange(0x1000000):06x}"
+    elif choice < 0.8:
+        item = rng.choice(services['items'])
+        item['description'] = f"{item['description'].split(' (')[0]} (revised {step})"
+    elif choice < 0.9 or len(services['items']) < 2:
+        services['items'].append({'title': f"Service {step}", 'description': "A new service."})
+    else:
+        services['items'].pop()
+    sections[0]['title'] = sections[0]['title'] if rng.random() < 0.9 else f"Benchmark Bistro {step}"
+
+
+class Command(BaseCommand):
+    help = "Measure website revision storage and reconstruction latency by snapshot interval."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervals', default='1,5,10,20,50', help="Comma-separated snapshot intervals")
+        parser.add_argument('--edits', type=int, default=200, help="Edits recorded per interval (default: 200)")
+        parser.add_argument('--html-bytes', type=int, default=8000, help="Size of the edited HTML block (default: 8000)")
+        parser.add_argument('--reads', type=int, default=200, help="Random versions rebuilt per interval (default: 200)")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'interval':>8} {'bytes/rev':>10} {'vs full':>8} {'record ms':>10} "
+            f"{'read p50':>9} {'read p95':>9} {'read max':>9} {'mismatch':>9}"
+        )
+        for interval in [int(value) for value in options['intervals'].split(',')]:
+            # Nothing is kept: each interval runs in a rolled-back transaction
+            with transaction.atomic():
+                self.run(RevisionStore(snapshot_interval=interval), interval, options)
+                transaction.set_rollback(True)
+
+    def run(self, store, interval, options):
+        rng = random.Random(options['seed'])
+        website_id = f"benchmark-{interval}"
+        content = initial_content(options['html_bytes'])
+        versions = {}
+        record_times = []
+        for step in range(options['edits']):
+            if step:
+                edit(content, rng, step)
+            started = time.perf_counter()
+            version = store.record(website_id, content)
+            record_times.append(time.perf_counter() - started)
+            versions[version] = copy.deepcopy(content)
+
+        history = store.history(website_id)
+        stored = sum(revision['size'] for revision in history)
+        full = sum(len(json.dumps(value, separators=(',', ':'))) for value in versions.values())
+
+        read_times, mismatches = [], 0
+        for _ in range(options['reads']):
+            version = rng.choice(list(versions))
+            started = time.perf_counter()
+            rebuilt = store.get(website_id, version)
+            read_times.append(time.perf_counter() - started)
+            mismatches += rebuilt != versions[version]
+
+        self.stdout.write(
+            f"{interval:>8} {stored / len(history):>10.0f} {stored / full:>7.1%} "
+            f"{sum(record_times) / len(record_times) * 1000:>10.2f} {percentile(read_times, 0.5) * 1000:>9.2f} "
+            f"{percentile(read_times, 0.95) * 1000:>9.2f} {max(read_times) * 1000:>9.2f} {mismatches:>9}"
+        )
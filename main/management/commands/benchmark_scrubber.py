@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.scrubber import Scrubber
+from main.utils import CLEANUP_PATTERNS, LOREM_IPSUM_PATTERN
+
+FILLER = [
+    '<section class="py-5"><div class="container"><h2 class="fw-bold">Our Services</h2>\n',
+    '<p class="lead">Freshly roasted coffee and homemade pastries every morning.</p>\n',
+    '<div class="card border-0 shadow-sm h-100"><div class="card-body p-4">\n',
+    '<i class="fas fa-mug-hot fs-1 text-primary"></i></div></div>\n',
+    '.hero-section { background: linear-gradient(135deg, #6366F1 0%, #8B5CF6 100%); }\n',
+    '<a href="#contact" class="btn btn-primary rounded-pill px-4">Contact Us</a>\n',
+]
+
+INSTRUCTIONS = [
+    '<!-- Remember to replace the placeholder images with your own photos -->',
+    'Remember to replace the map coordinates so the embed renders correctly.',
+    'Note: Replace YOUR_KIT_ID with your own Font Awesome kit.js',
+    "Don't forget to add your analytics snippet so visits are tracked properly.",
+    'Lorem ipsum dolor sit amet, consectetur adipiscing elit.',
+]
+
+# Prefixes with no terminator anywhere after them: each one made the original
+# lazy patterns scan to the end of the document
+DANGLING = [
+    'Remember to include a favicon',
+    'Make sure to add alt text to every image',
+]
+
+
+def synthetic_output(size, instruction_every=4096, dangling=50, seed=0):
+    """Build roughly ``size`` characters of model-like HTML."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    next_instruction = instruction_every
+    while length < size:
+        chunk = rng.choice(FILLER)
+        if length >= next_instruction:
+            chunk = rng.choice(INSTRUCTIONS) + '\n' + chunk
+            next_instruction += instruction_every
+        parts.append(chunk)
+        length += len(chunk)
+    for _ in range(dangling):
+        parts.insert(rng.randrange(len(parts)), rng.choice(DANGLING) + '\n')
+    return ''.join(parts)
+
+
+class Command(BaseCommand):
+    help = "Compare the single-pass scrubber with the original rule-by-rule cleanup."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,500,1000,2000,5000',
+            help="Comma-separated document sizes in KB (default: 100,500,1000,2000,5000)"
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per size; the best is reported")
+        parser.add_argument(
+            '--dangling', type=int, default=50,
+            help="Prefixes without a terminator per document (default: 50)"
+        )
+        parser.add_argument(
+            '--skip-legacy', action='store_true',
+            help="Only time the single-pass scrubber (the legacy loop is slow on large inputs)"
+        )
+
+    def handle(self, *args, **options):
+        scrubber = Scrubber(CLEANUP_PATTERNS + [LOREM_IPSUM_PATTERN])
+        sizes = [int(size) * 1024 for size in options['sizes'].split(',')]
+
+        self.stdout.write(f"{'size':>10} {'legacy ms':>12} {'scrubber ms':>12} {'scrubber us/KB':>15} {'identical':>10}")
+        for size in sizes:
+            text = synthetic_output(size, dangling=options['dangling'])
+
+            best = None
+            result = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                result = scrubber.scrub(text)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            if options['skip_legacy']:
+                legacy_ms = '-'
+                identical = '-'
+            else:
+                started = time.perf_counter()
+                expected = scrubber.scrub_sequential(text)
+                legacy_ms = f"{(time.perf_counter() - started) * 1000:.1f}"
+                identical = 'yes' if expected == result else 'NO'
+
+            self.stdout.write(
+                f"{len(text) // 1024:>8}KB {legacy_ms:>12} {best * 1000:>12.1f} "
+                f"{best * 1e6 / (len(text) / 1024):>15.2f} {identical:>10}"
+            )
@@ -0,0 +1,57 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+import main
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(main.__file__)))
+
+# What a gunicorn worker does before serving its first request
+BOOT_SCRIPT = """
+import time
+started = time.perf_counter()
+from ai_builder.wsgi import application
+import ai_builder.urls
+print(time.perf_counter() - started)
+"""
+
+# A non-routable address: connection attempts hang until they time out,
+# like a slow or unreachable Atlas cluster
+UNREACHABLE_URI = "mongodb://10.255.255.1:27017/?serverSelectionTimeoutMS=5000"
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold-start time (WSGI app and URLconf import) in fresh processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh processes to start (default: 5)")
+        parser.add_argument(
+            '--uri', default=UNREACHABLE_URI,
+            help="MONGO_URI for the workers (default: an unreachable address, to show the cost of blocking on MongoDB)"
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, MONGO_URI=options['uri'])
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'ai_builder.settings')
+        boot_times = []
+        wall_times = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-c', BOOT_SCRIPT],
+                cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+            )
+            wall_times.append(time.perf_counter() - started)
+            if result.returncode != 0:
+                self.stderr.write(result.stderr)
+                return
+            boot_times.append(float(result.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(f"MONGO_URI:      {options['uri']}")
+        self.stdout.write(f"runs:           {len(boot_times)}")
+        self.stdout.write(f"app import:     median {statistics.median(boot_times) * 1000:.0f} ms, max {max(boot_times) * 1000:.0f} ms")
+        self.stdout.write(f"process total:  median {statistics.median(wall_times) * 1000:.0f} ms, max {max(wall_times) * 1000:.0f} ms")
@@ -0,0 +1,64 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.bulk import BulkGenerator, detect_format
+from main.models import BulkGeneration
+
+
+class Command(BaseCommand):
+    help = "Generate websites for every business in a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Input file (CSV with a header row, or .jsonl)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+        parser.add_argument('--user-email', default='guest@example.com', help="Owner of the generated websites")
+        parser.add_argument('--concurrency', type=int, default=None, help="Websites generated at once (default: 4)")
+        parser.add_argument('--batch-size', type=int, default=None, help="Websites saved per batch (default: 25)")
+        parser.add_argument(
+            '--resume', metavar='BULK_ID',
+            help="Continue an import that stopped, from its last saved batch"
+        )
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                bulk = BulkGeneration.objects.get(bulk_id=options['resume'])
+            except (BulkGeneration.DoesNotExist, ValueError):
+                raise CommandError(f"No bulk generation {options['resume']}")
+            if bulk.status == BulkGeneration.STATUS_DONE:
+                raise CommandError(f"Bulk generation {bulk.bulk_id} has already finished")
+        else:
+            path = options['path']
+            if not path:
+                raise CommandError("Give an input file, or --resume an earlier import")
+            if not os.path.exists(path):
+                raise CommandError(f"No such file: {path}")
+            bulk = BulkGeneration.objects.create(
+                user_email=options['user_email'],
+                source=os.path.abspath(path),
+                format=options['format'] or detect_format(path)
+            )
+            self.stdout.write(f"Started bulk generation {bulk.bulk_id}")
+
+        def progress(bulk):
+            self.stdout.write(f"  {bulk.checkpoint} records processed: {bulk.created} created, {bulk.failed} failed")
+            self.stdout.flush()
+
+        generator = BulkGenerator(
+            bulk,
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            progress=progress
+        )
+        try:
+            generator.run()
+        except Exception as e:
+            self.stderr.write(f"Stopped: {e}")
+            self.stderr.write(f"Resume with: manage.py bulk_generate --resume {bulk.bulk_id}")
+            sys.exit(1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {bulk.created} created, {bulk.failed} failed (bulk id {bulk.bulk_id})"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.repositories import REPOSITORIES
+from main.repository_conformance import CHECKS, run_checks
+
+
+class Command(BaseCommand):
+    help = "Run the website repository conformance checks against one or every repository."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repository', choices=sorted(REPOSITORIES) + ['all'], default='all',
+            help="Repository to check (default: all; mongo is skipped without a MONGO_URI)"
+        )
+        parser.add_argument('--check', action='append', dest='checks', choices=[name for name, _ in CHECKS],
+                            help="Only run this check (repeatable)")
+
+    def handle(self, *args, **options):
+        names = sorted(REPOSITORIES) if options['repository'] == 'all' else [options['repository']]
+        failed = 0
+        for name in names:
+            repository = REPOSITORIES[name]()
+            if not repository.configured():
+                if options['repository'] == 'all':
+                    self.stdout.write(f"{name}: skipped (not configured)")
+                    continue
+                raise CommandError(f"The {name} repository is not configured")
+            self.stdout.write(f"{name}:")
+            for check, error in run_checks(repository, options['checks']):
+                if error is None:
+                    self.stdout.write(f"  ok    {check}")
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"  FAIL  {check}: {error}"))
+        if failed:
+            raise CommandError(f"{failed} conformance checks failed")
@@ -0,0 +1,76 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.mongo_client import MongoNotConfigured, MongoUnavailable
+from main.mongodb_utils import ensure_indexes, explain_queries, index_report
+
+
+class Command(BaseCommand):
+    help = "Create the MongoDB indexes declared in mongodb_utils.INDEXES (safe to run repeatedly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report; exit with status 1 if indexes are missing")
+        parser.add_argument('--rebuild', action='store_true', help="Drop and recreate indexes whose definition changed")
+        parser.add_argument('--drop-undeclared', action='store_true', help="Drop indexes that are not declared")
+        parser.add_argument('--explain', action='store_true', help="Print the query plan of each query in mongodb_utils")
+
+    def handle(self, *args, **options):
+        try:
+            if options['check']:
+                self.check()
+            else:
+                self.ensure(options['rebuild'], options['drop_undeclared'])
+            if options['explain']:
+                self.explain()
+        except (MongoNotConfigured, MongoUnavailable) as e:
+            raise CommandError(str(e))
+
+    def check(self):
+        report = index_report()
+        if report is None:
+            raise CommandError("Could not read the existing indexes")
+        ok = True
+        for collection_name, entry in report.items():
+            self.stdout.write(f"{collection_name}:")
+            for label in ('present', 'missing', 'conflicting', 'undeclared'):
+                if entry[label]:
+                    self.stdout.write(f"  {label + ':':<12} {', '.join(entry[label])}")
+            ok = ok and not entry['missing'] and not entry['conflicting']
+        if not ok:
+            self.stderr.write("Indexes are missing or out of date; run manage.py ensure_mongo_indexes")
+            sys.exit(1)
+
+    def ensure(self, rebuild, drop_undeclared):
+        result = ensure_indexes(rebuild=rebuild, drop_undeclared=drop_undeclared)
+        for collection_name, entry in result.items():
+            created = ', '.join(entry['created']) or 'nothing'
+            self.stdout.write(f"{collection_name}: created {created}")
+            if entry['dropped']:
+                self.stdout.write(f"  dropped {', '.join(entry['dropped'])}")
+            if entry['conflicting']:
+                self.stdout.write(self.style.WARNING(
+                    f"  definition changed for {', '.join(entry['conflicting'])}; rerun with --rebuild"
+                ))
+        self.stdout.write(self.style.SUCCESS("Indexes are up to date"))
+
+    def explain(self):
+        self.stdout.write("")
+        self.stdout.write("Query plans:")
+        for name, plan in explain_queries().items():
+            if 'error' in plan:
+                self.stdout.write(f"  {name}: {plan['error']}")
+                continue
+            warnings = []
+            if plan['collection_scan']:
+                warnings.append('COLLECTION SCAN')
+            if plan['in_memory_sort']:
+                warnings.append('IN-MEMORY SORT')
+            line = (
+                f"  {name:<22} {' > '.join(plan['stages'])} "
+                f"(index {plan['index'] or '-'}, {plan['keys_examined']} keys, {plan['docs_examined']} docs examined)"
+            )
+            if warnings:
+                self.stdout.write(self.style.WARNING(f"{line} {', '.join(warnings)}"))
+            else:
+                self.stdout.write(line)
@@ -0,0 +1,47 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from main.config import setting
+from main.jobs import GenerationWorker
+
+
+class Command(BaseCommand):
+    help = "Run queued website generation jobs on a bounded thread pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=setting('GENERATION_WORKER_CONCURRENCY', 4),
+            help="Maximum number of jobs running at once (default: 4)"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds between polls of the job table (default: 1)"
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=300,
+            help="Seconds without a heartbeat before a running job is retried (default: 300)"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty instead of polling forever"
+        )
+
+    def handle(self, *args, **options):
+        worker = GenerationWorker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            stale_after=options['stale_after']
+        )
+
+        def shutdown(signum, frame):
+            self.stdout.write("Shutting down after running jobs finish...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(f"Starting generation worker {worker.worker_id} ({worker.concurrency} threads)")
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS("Generation worker stopped"))
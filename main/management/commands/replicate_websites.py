@@ -0,0 +1,43 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from main.replication import WebsiteReplicator, metrics
+
+
+class Command(BaseCommand):
+    help = "Copy website changes from MongoDB to the Django ORM in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help="Documents applied per batch (default: REPLICATION_BATCH_SIZE or 100)"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds between polls when nothing is pending (default: 1)"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once nothing is pending instead of polling forever"
+        )
+
+    def handle(self, *args, **options):
+        replicator = WebsiteReplicator(
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval']
+        )
+
+        def shutdown(signum, frame):
+            self.stdout.write("Shutting down after the current batch...")
+            replicator.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(f"Starting website replicator (batch size {replicator.batch_size})")
+        replicator.run(once=options['once'])
+        stats = metrics.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Website replicator stopped: {stats['applied']} applied, {stats['failures']} failed"
+        ))
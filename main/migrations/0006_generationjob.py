@@ -0,0 +1,38 @@
+import datetime
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_auto_20250411_1801'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('kind', models.CharField(default='website', max_length=50)),
+                ('user_email', models.CharField(default='guest@example.com', max_length=255)),
+                ('payload', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('website_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('django_website_id', models.IntegerField(blank=True, null=True)),
+                ('worker_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('available_at', models.DateTimeField(default=datetime.datetime.now)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=datetime.datetime.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='main_job_status_avail_idx')],
+            },
+        ),
+    ]
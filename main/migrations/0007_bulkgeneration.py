@@ -0,0 +1,33 @@
+import datetime
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_generationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bulk_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('user_email', models.CharField(default='guest@example.com', max_length=255)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], default='csv', max_length=10)),
+                ('input_data', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('checkpoint', models.IntegerField(default=0)),
+                ('created', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('errors', models.TextField(default='[]')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=datetime.datetime.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
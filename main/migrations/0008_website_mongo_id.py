@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_bulkgeneration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='website',
+            name='mongo_id',
+            field=models.CharField(blank=True, max_length=24, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_website_mongo_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebsiteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('website_id', models.CharField(max_length=64)),
+                ('version', models.IntegerField()),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], max_length=10)),
+                ('data', models.TextField()),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=datetime.datetime.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('website_id', 'version'), name='main_revision_version_uniq')],
+                'indexes': [models.Index(fields=['website_id', 'kind', 'version'], name='main_revision_kind_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from datetime import datetime
+import uuid
 
 # MongoDB connection is disabled
 # Instead, we'll use Django's ORM
@@ -30,6 +31,127 @@ class Website(models.Model):
     last_edited = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
     theme_version = models.IntegerField(default=1)
+    mongo_id = models.CharField(max_length=24, null=True, blank=True, unique=True)  # Replicated from this MongoDB document
 
     def __str__(self):
         return self.business_name
+
+class GenerationJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=50, default='website')  # Name of the registered job handler
+    user_email = models.CharField(max_length=255, default='guest@example.com')
+    payload = models.TextField()  # JSON-encoded generation inputs
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    error = models.TextField(null=True, blank=True)
+
+    # Result of a finished job
+    website_id = models.CharField(max_length=64, null=True, blank=True)  # MongoDB ObjectId
+    django_website_id = models.IntegerField(null=True, blank=True)
+
+    # Scheduling and crash recovery
+    worker_id = models.CharField(max_length=255, null=True, blank=True)
+    available_at = models.DateTimeField(default=datetime.now)  # Not picked up before this time (retry backoff)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=datetime.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='main_job_status_avail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.job_id} ({self.status})"
+
+
+class BulkGeneration(models.Model):
+    """
+    A CSV/JSONL import that generates many websites.
+
+    ``checkpoint`` counts the input records already persisted, so an import
+    that stops part way resumes with the next unsaved batch.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+
+    bulk_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user_email = models.CharField(max_length=255, default='guest@example.com')
+    source = models.CharField(max_length=255, blank=True)  # File path or upload name
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    input_data = models.TextField(blank=True)  # Uploaded input; empty when read from ``source``
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    # Progress
+    checkpoint = models.IntegerField(default=0)  # Input records persisted so far
+    created = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    errors = models.TextField(default='[]')  # JSON list of {"record": n, "error": "..."}
+    error = models.TextField(null=True, blank=True)  # Why the import stopped
+
+    created_at = models.DateTimeField(default=datetime.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Bulk generation {self.bulk_id} ({self.status}, {self.checkpoint} records)"
+
+
+class WebsiteRevision(models.Model):
+    """
+    One version of a website's content.
+
+    Versions are numbered from 1 per website. A snapshot holds the whole
+    content; a delta holds the patch from the previous version (see
+    ``main.revisions``).
+    """
+    KIND_SNAPSHOT = 'snapshot'
+    KIND_DELTA = 'delta'
+    KIND_CHOICES = [
+        (KIND_SNAPSHOT, 'Snapshot'),
+        (KIND_DELTA, 'Delta'),
+    ]
+
+    website_id = models.CharField(max_length=64)  # MongoDB ObjectId or Django ORM id
+    version = models.IntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    data = models.TextField()  # JSON: the content, or the list of patch operations
+    size = models.IntegerField(default=0)  # Bytes of ``data``
+    created_at = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['website_id', 'version'], name='main_revision_version_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['website_id', 'kind', 'version'], name='main_revision_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"Website {self.website_id} version {self.version} ({self.kind})"
@@ -0,0 +1,481 @@
+"""
+Process-wide MongoDB clients.
+
+Every MongoDB access goes through ``get_mongo_client()`` / ``get_database()``
+so each process holds one connection pool per URI instead of opening a new
+client (and TLS handshake) per request. Clients are created on first use
+with ``connect=False``, and a process that finds itself forked (gunicorn
+workers, the generation worker) drops the clients it inherited and builds
+its own, so pools are never shared across processes.
+
+Pool size and timeouts come from the MONGO_MAX_POOL_SIZE,
+MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS and
+MONGO_SOCKET_TIMEOUT_MS settings. ``pool_stats()`` reports connection
+checkouts and how long requests waited for a connection, and
+``command_stats()`` how long commands took, both as latency histograms.
+
+Nothing connects at import time. The first use starts a background health
+probe that pings the server every MONGO_HEALTH_INTERVAL seconds and, while
+the server is unreachable, retries with exponential backoff (from
+MONGO_RECONNECT_BACKOFF up to MONGO_RECONNECT_MAX_BACKOFF seconds). While the
+probe reports MongoDB unavailable callers fail fast instead of each waiting
+for server selection to time out.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from pymongo import MongoClient, monitoring
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = "ai_builder_db"
+
+NOT_CONFIGURED = 'not_configured'
+UNKNOWN = 'unknown'
+AVAILABLE = 'available'
+UNAVAILABLE = 'unavailable'
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class MongoNotConfigured(Exception):
+    """No MONGO_URI is configured."""
+
+
+class MongoUnavailable(Exception):
+    """MongoDB is configured but cannot be reached right now."""
+
+
+def mongo_uri():
+    """The configured connection string, or None."""
+    return getattr(settings, 'MONGO_URI', None) or os.getenv('MONGO_URI')
+
+
+class LatencyHistogram:
+    """Durations counted per LATENCY_BUCKETS_MS bucket; not thread-safe on its own."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile (ms)."""
+        count = sum(self.counts)
+        if not count:
+            return 0.0
+        seen = 0
+        for bound, bucket in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += bucket
+            if seen >= fraction * count:
+                return min(bound, round(self.max, 3))
+        return round(self.max, 3)
+
+    def summary(self):
+        count = sum(self.counts)
+        return {
+            'count': count,
+            'avg_ms': round(self.total / count, 3) if count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 3),
+        }
+
+    def snapshot(self):
+        """``summary()`` plus the bucket counts; the last bucket (``le`` None) is unbounded."""
+        snapshot = self.summary()
+        bounds = list(LATENCY_BUCKETS_MS) + [None]
+        snapshot['buckets'] = [{'le': bound, 'count': count} for bound, count in zip(bounds, self.counts)]
+        return snapshot
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener counting checkouts and checkout waits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.checkout_failures = 0
+            self.pool_clears = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.waits = LatencyHistogram()
+
+    def _waited(self):
+        started = getattr(self._started, 'value', None)
+        self._started.value = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        # Check-out starts and ends on the requesting thread
+        self._started.value = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkout_failures += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.waits.observe(waited)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.waits.observe(waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+
+    def stats(self):
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                'connections_open': self.connections_created - self.connections_closed,
+                'connections_created': self.connections_created,
+                'checkouts': self.checkouts,
+                'in_use': self.checkouts - self.checkins,
+                'checkout_failures': self.checkout_failures,
+                'pool_clears': self.pool_clears,
+                'avg_wait_ms': round(self.wait_total / attempts * 1000, 3) if attempts else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'wait_histogram': self.waits.snapshot(),
+            }
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Command listener timing every command sent to MongoDB."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self.latency = LatencyHistogram()
+            self.by_command = {}
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        self.latency.observe(seconds)
+        histogram = self.by_command.get(event.command_name)
+        if histogram is None:
+            histogram = self.by_command[event.command_name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self._lock:
+            self._record(event)
+
+    def failed(self, event):
+        with self._lock:
+            self.failures += 1
+            self._record(event)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'failures': self.failures,
+                'latency': self.latency.snapshot(),
+                'by_command': {name: histogram.summary() for name, histogram in sorted(self.by_command.items())},
+            }
+
+
+class MongoClientRegistry:
+    """
+    One MongoClient per URI for the current process.
+
+    Args:
+        client_factory (callable): Builds a client from a URI and keyword
+            options; MongoClient by default, injectable for tests
+    """
+
+    def __init__(self, client_factory=MongoClient):
+        self.client_factory = client_factory
+        self.metrics = PoolMetrics()
+        self.commands = CommandMetrics()
+        self._clients = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def options(self):
+        """Client keyword options from settings."""
+        return {
+            'maxPoolSize': setting('MONGO_MAX_POOL_SIZE', 50),
+            'minPoolSize': setting('MONGO_MIN_POOL_SIZE', 0),
+            'maxIdleTimeMS': setting('MONGO_MAX_IDLE_TIME_MS', 60000),
+            'waitQueueTimeoutMS': setting('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000),
+            'serverSelectionTimeoutMS': setting('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+            'connectTimeoutMS': setting('MONGO_CONNECT_TIMEOUT_MS', 5000),
+            'socketTimeoutMS': setting('MONGO_SOCKET_TIMEOUT_MS', 30000),
+            'connect': False,
+            'event_listeners': [self.metrics, self.commands],
+        }
+
+    def _check_fork(self):
+        if os.getpid() != self._pid:
+            # Inherited clients belong to the parent; never use or close them here
+            self._clients = {}
+            self._pid = os.getpid()
+            self.metrics.reset()
+            self.commands.reset()
+            self._lock = threading.Lock()
+
+    def get_client(self, uri=None):
+        """
+        Return this process's client for ``uri`` (the MONGO_URI setting by
+        default), creating it on first use.
+        """
+        self._check_fork()
+        uri = uri or mongo_uri()
+        client = self._clients.get(uri)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(uri)
+                if client is None:
+                    client = self.client_factory(uri, **self.options())
+                    self._clients[uri] = client
+                    logger.info(f"Created MongoDB client in process {self._pid}")
+        return client
+
+    def close(self):
+        """Close this process's clients."""
+        self._check_fork()
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+
+    def stats(self):
+        stats = self.metrics.stats()
+        stats['clients'] = len(self._clients) if os.getpid() == self._pid else 0
+        stats['max_pool_size'] = setting('MONGO_MAX_POOL_SIZE', 50)
+        return stats
+
+
+class MongoHealth:
+    """
+    Background probe tracking whether MongoDB is reachable.
+
+    Args:
+        registry (MongoClientRegistry): Supplies the client to ping
+        interval (float): Seconds between probes while MongoDB is available
+        backoff (float): First retry delay after a failed probe
+        max_backoff (float): Longest retry delay
+    """
+
+    def __init__(self, registry, interval=30.0, backoff=1.0, max_backoff=60.0):
+        self.registry = registry
+        self.interval = interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = UNKNOWN
+        self.last_error = None
+        self.last_checked = None
+        self.failures = 0
+        self.reconnects = 0
+        self._callbacks = []
+        self._notified = False
+        self._pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Ping MongoDB once and update the state; returns True if it answered."""
+        if not mongo_uri():
+            self.state = NOT_CONFIGURED
+            return False
+        try:
+            self.registry.get_client().admin.command('ping')
+        except Exception as e:
+            self.mark_unavailable(e)
+            return False
+        if self.state == UNAVAILABLE:
+            self.reconnects += 1
+            logger.info(f"MongoDB is reachable again after {self.failures} failed probes")
+        self.state = AVAILABLE
+        self.failures = 0
+        self.last_error = None
+        self.last_checked = time.time()
+        if not self._notified:
+            self._notified = True
+            for callback in self._callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"MongoDB availability callback failed: {e}")
+        return True
+
+    def on_available(self, callback):
+        """Run ``callback`` on the probe thread the first time this process reaches MongoDB."""
+        self._callbacks.append(callback)
+
+    def mark_unavailable(self, error):
+        """Record a failed probe or operation and wake the probe to retry."""
+        if self.state != UNAVAILABLE:
+            logger.error(f"MongoDB unavailable: {error}")
+        self.state = UNAVAILABLE
+        self.failures += 1
+        self.last_error = str(error)
+        self.last_checked = time.time()
+        self._wake.set()
+
+    def next_delay(self):
+        if self.state == UNAVAILABLE:
+            return min(self.max_backoff, self.backoff * 2 ** max(0, self.failures - 1))
+        return self.interval
+
+    def _run(self):
+        while True:
+            self.check()
+            if self.state == NOT_CONFIGURED:
+                return
+            self._wake.wait(self.next_delay())
+            self._wake.clear()
+
+    def ensure_started(self):
+        """Start the probe thread in this process if it is not running yet."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self.state != NOT_CONFIGURED:
+                self.state = UNKNOWN
+            threading.Thread(target=self._run, name='mongo-health', daemon=True).start()
+
+    def _after_fork(self):
+        # The probe thread does not survive a fork
+        self._pid = None
+        self._notified = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'reconnects': self.reconnects,
+            'last_error': self.last_error,
+            'last_checked': self.last_checked,
+        }
+
+
+registry = MongoClientRegistry()
+health = MongoHealth(
+    registry,
+    interval=setting('MONGO_HEALTH_INTERVAL', 30.0),
+    backoff=setting('MONGO_RECONNECT_BACKOFF', 1.0),
+    max_backoff=setting('MONGO_RECONNECT_MAX_BACKOFF', 60.0),
+)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._check_fork)
+    os.register_at_fork(after_in_child=health._after_fork)
+
+
+def get_mongo_client(uri=None):
+    """The process-wide client for the configured MongoDB."""
+    return registry.get_client(uri)
+
+
+def database_name():
+    """Name of the application database: the MONGO_DB_NAME setting, ``ai_builder_db`` by default."""
+    return setting('MONGO_DB_NAME', DEFAULT_DB_NAME)
+
+
+def get_database(name=None):
+    """The application database, or the database ``name``."""
+    return get_mongo_client()[name or database_name()]
+
+
+def require_database(name=None):
+    """
+    The application database, checked against the health probe.
+
+    Raises:
+        MongoNotConfigured: If no MONGO_URI is set
+        MongoUnavailable: If the probe last found MongoDB unreachable, or the
+            client cannot be created
+    """
+    if not mongo_uri():
+        raise MongoNotConfigured("MONGO_URI is not configured")
+    health.ensure_started()
+    if health.state == UNAVAILABLE:
+        raise MongoUnavailable(f"MongoDB is unavailable: {health.last_error}")
+    try:
+        return get_database(name)
+    except Exception as e:
+        # e.g. the SRV lookup of a mongodb+srv:// URI failed
+        health.mark_unavailable(e)
+        raise MongoUnavailable(f"MongoDB is unavailable: {e}") from e
+
+
+def mongo_status():
+    """Health probe state for this process."""
+    return health.status()
+
+
+def pool_stats():
+    """Connection pool metrics for this process."""
+    return registry.stats()
+
+
+def command_stats():
+    """Command latency metrics for this process."""
+    return registry.commands.stats()
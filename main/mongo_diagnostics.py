@@ -0,0 +1,189 @@
+"""
+MongoDB diagnostics that are safe to request in production.
+
+Nothing here scans a collection. Document counts come from collection
+metadata (``estimated_document_count``), sizes from ``dbStats`` and
+``$collStats``, and index use from ``$indexStats``; only the collections the
+application declares in ``mongodb_utils.INDEXES`` are inspected. Those server
+statistics are gathered at most once every MONGO_DIAGNOSTICS_TTL seconds per
+process, however often the page is loaded. The connection pool, health probe
+and command latency counters of ``mongo_client`` are in-process and always
+current.
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+
+from pymongo.errors import OperationFailure
+
+from .config import setting
+from .mongo_client import (
+    command_stats,
+    mongo_status,
+    mongo_uri,
+    pool_stats,
+    require_database,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def redacted_uri(uri):
+    """``uri`` without its credentials and options."""
+    if not uri:
+        return 'Not configured'
+    return re.sub(r'//[^@/]*@', '//***@', uri).split('?')[0]
+
+
+def collection_stats(mongo_db, collection_name, declared):
+    """
+    Metadata statistics of one collection.
+
+    Args:
+        declared (dict): ``index_report()`` entry of the collection, or None
+
+    Returns:
+        dict: Estimated document count, data/storage/index sizes in bytes and
+            per-index usage counters
+    """
+    collection = mongo_db[collection_name]
+    stats = {'name': collection_name, 'documents': collection.estimated_document_count()}
+
+    index_sizes = {}
+    try:
+        # storageStats without the storage engine's own (large) sections
+        storage = next(collection.aggregate([
+            {'$collStats': {'storageStats': {}}},
+            {'$project': {'storageStats.wiredTiger': 0, 'storageStats.indexDetails': 0}},
+        ]), {}).get('storageStats', {})
+        stats.update(
+            size_bytes=storage.get('size'),
+            avg_document_bytes=storage.get('avgObjSize'),
+            storage_bytes=storage.get('storageSize'),
+            index_bytes=storage.get('totalIndexSize'),
+        )
+        index_sizes = storage.get('indexSizes', {})
+    except Exception as e:
+        # e.g. the collection does not exist yet
+        stats['error'] = str(e)
+
+    statuses = {}
+    for status in ('missing', 'conflicting', 'undeclared'):
+        for name in (declared or {}).get(status, []):
+            statuses[name] = status
+
+    indexes = []
+    try:
+        for usage in collection.aggregate([{'$indexStats': {}}]):
+            name = usage['name']
+            indexes.append({
+                'name': name,
+                'ops': usage['accesses']['ops'],
+                'since': usage['accesses']['since'],
+                'size_bytes': index_sizes.get(name),
+                'status': statuses.pop(name, 'declared' if name != '_id_' else 'default'),
+            })
+    except Exception as e:
+        stats.setdefault('error', str(e))
+    # Declared indexes the server does not have
+    indexes.extend({'name': name, 'ops': None, 'since': None, 'size_bytes': None, 'status': status}
+                   for name, status in statuses.items())
+    stats['indexes'] = indexes
+    return stats
+
+
+def server_diagnostics():
+    """Gather the server statistics, uncached."""
+    from .mongodb_utils import COLLECTION_NAME, INDEXES, index_report, replication_backlog
+
+    result = {
+        'connected': False,
+        'database_name': None,
+        'error': None,
+        'database': None,
+        'collections': [],
+        'website_count': None,
+        'replication': None,
+        'gathered_at': datetime.now(),
+    }
+    try:
+        mongo_db = require_database()
+        result['database_name'] = mongo_db.name
+        try:
+            db_stats = mongo_db.command('dbStats')
+            result['database'] = {
+                'collections': db_stats.get('collections'),
+                'objects': db_stats.get('objects'),
+                'data_bytes': db_stats.get('dataSize'),
+                'storage_bytes': db_stats.get('storageSize'),
+                'index_bytes': db_stats.get('indexSize'),
+            }
+        except OperationFailure as e:
+            # e.g. the database user may not run dbStats
+            result['database_error'] = str(e)
+
+        report = index_report() or {}
+        result['collections'] = [
+            collection_stats(mongo_db, collection_name, report.get(collection_name))
+            for collection_name in INDEXES
+        ]
+        result['connected'] = True
+        result['website_count'] = next(
+            stats['documents'] for stats in result['collections'] if stats['name'] == COLLECTION_NAME
+        )
+        result['replication'] = replication_backlog(max_attempts=setting('REPLICATION_MAX_ATTEMPTS', 5))
+    except Exception as e:
+        logger.error(f"Error gathering MongoDB diagnostics: {e}")
+        result['error'] = str(e)
+    return result
+
+
+class DiagnosticsCache:
+    """
+    Keeps the last ``server_diagnostics()`` result for ``ttl`` seconds.
+
+    Concurrent requests for an expired result wait for one refresh instead of
+    each querying the server.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._result = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._result is None or self._expires < time.monotonic():
+                self._result = server_diagnostics()
+                self._expires = time.monotonic() + self.ttl
+            return self._result
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+
+
+diagnostics_cache = DiagnosticsCache(ttl=setting('MONGO_DIAGNOSTICS_TTL', 30.0))
+
+
+def mongo_diagnostics():
+    """
+    Diagnostic information about the MongoDB connection.
+
+    Returns:
+        dict: The cached server statistics (``connected``, ``database``,
+            ``collections``, ``replication``, ...) with the live ``pool``,
+            ``health`` and ``commands`` counters of this process
+    """
+    result = dict(diagnostics_cache.get())
+    result.update(
+        connection_string=redacted_uri(mongo_uri()),
+        cache_ttl=diagnostics_cache.ttl,
+        pool=pool_stats(),
+        health=mongo_status(),
+        commands=command_stats(),
+    )
+    return result
@@ -0,0 +1,239 @@
+"""
+asyncio MongoDB access for the async read views.
+
+The read-heavy views in ``async_views`` (served under ASGI, see
+``ai_builder/asgi.py``) await these functions instead of blocking a worker
+on pymongo. They mirror the read helpers of ``mongodb_utils`` and build the
+same queries, so both paths return the same documents and cursors.
+
+Clients are Motor clients created on first use with the pool options of
+``mongo_client``. A Motor client belongs to the event loop it was created
+on, so there is one per running loop (uvicorn runs one per worker). The
+``mongo_client`` health probe is shared: while it reports MongoDB
+unavailable these functions fail fast as well.
+"""
+import asyncio
+import logging
+import os
+import threading
+
+from bson import ObjectId
+
+from .mongo_client import (
+    UNAVAILABLE,
+    MongoNotConfigured,
+    MongoUnavailable,
+    database_name,
+    health,
+    mongo_uri,
+    registry,
+)
+from .mongodb_utils import (
+    COLLECTION_NAME,
+    WEBSITE_ORDER,
+    _latest_update_query,
+    _list_queries,
+    _page,
+    _projection,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _motor_client(uri, **options):
+    # Imported lazily so sync workers never load Motor
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(uri, **options)
+
+
+class AsyncMongoClientRegistry:
+    """
+    One Motor client per URI for each running event loop of this process.
+
+    Args:
+        client_factory (callable): Builds a client from a URI and keyword
+            options; AsyncIOMotorClient by default, injectable for tests
+    """
+
+    def __init__(self, client_factory=_motor_client):
+        self.client_factory = client_factory
+        self._clients = {}  # id(loop) -> (loop, {uri: client})
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def options(self):
+        options = registry.options()
+        # PoolMetrics times checkouts per thread, which coroutines share;
+        # command latencies are timed by the driver and can be shared
+        options['event_listeners'] = [registry.commands]
+        return options
+
+    def get_client(self, uri=None):
+        """Return the client for ``uri`` on the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        uri = uri or mongo_uri()
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Inherited clients belong to the parent's loops
+                self._clients = {}
+                self._pid = os.getpid()
+            entry = self._clients.get(id(loop))
+            if entry is None or entry[0] is not loop:
+                self._drop_closed_loops()
+                entry = (loop, {})
+                self._clients[id(loop)] = entry
+            client = entry[1].get(uri)
+            if client is None:
+                client = self.client_factory(uri, **self.options())
+                entry[1][uri] = client
+                logger.info(f"Created async MongoDB client in process {self._pid}")
+        return client
+
+    def _drop_closed_loops(self):
+        for key, (loop, clients) in list(self._clients.items()):
+            if loop.is_closed():
+                for client in clients.values():
+                    client.close()
+                del self._clients[key]
+
+    def close(self):
+        """Close every client of this process."""
+        with self._lock:
+            entries, self._clients = self._clients, {}
+        for _, clients in entries.values():
+            for client in clients.values():
+                client.close()
+
+
+async_registry = AsyncMongoClientRegistry()
+
+
+def get_async_collection(collection_name=None, raise_errors=False):
+    """
+    The Motor collection for ``collection_name`` (the websites by default).
+
+    Args:
+        raise_errors (bool): Raise MongoNotConfigured or MongoUnavailable
+            instead of returning None
+
+    Returns:
+        Collection object or None if MongoDB is not configured or unavailable
+    """
+    try:
+        if not mongo_uri():
+            raise MongoNotConfigured("MONGO_URI is not configured")
+        health.ensure_started()
+        if health.state == UNAVAILABLE:
+            raise MongoUnavailable(f"MongoDB is unavailable: {health.last_error}")
+        return async_registry.get_client()[database_name()][collection_name or COLLECTION_NAME]
+    except (MongoNotConfigured, MongoUnavailable) as e:
+        if raise_errors:
+            raise
+        logger.error(f"Cannot get collection: {e}")
+        return None
+
+
+async def aget_website_by_id(website_id, raise_errors=False):
+    """Async ``mongodb_utils.get_website_by_id``."""
+    collection = get_async_collection(raise_errors=raise_errors)
+    if collection is None:
+        return None
+
+    try:
+        website = await collection.find_one({'_id': ObjectId(website_id)})
+        if website and '_id' in website:
+            website['_id'] = str(website['_id'])
+        return website
+    except Exception as e:
+        logger.error(f"Error retrieving website: {e}")
+        if raise_errors:
+            raise
+        return None
+
+
+async def aget_website_version(website_id, raise_errors=False):
+    """Async ``mongodb_utils.get_website_version``."""
+    collection = get_async_collection(raise_errors=raise_errors)
+    if collection is None:
+        return None
+
+    try:
+        website = await collection.find_one({'_id': ObjectId(website_id)}, {'updated_at': 1})
+        if website:
+            website['_id'] = str(website['_id'])
+        return website
+    except Exception as e:
+        logger.error(f"Error retrieving website version: {e}")
+        if raise_errors:
+            raise
+        return None
+
+
+async def aget_list_version(user_id=None):
+    """Async ``mongodb_utils.get_list_version``."""
+    collection = get_async_collection()
+    if collection is None:
+        return None
+
+    try:
+        query, projection, sort = _latest_update_query(user_id)
+        latest = await collection.find_one(query, projection, sort=sort)
+        return await collection.count_documents(query), (latest or {}).get('updated_at')
+    except Exception as e:
+        logger.error(f"Error reading website list version: {e}")
+        return None
+
+
+async def alist_websites(user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+    """
+    Async ``mongodb_utils.list_websites``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    base_query, query = _list_queries(user_id, cursor)
+
+    collection = get_async_collection()
+    if collection is None:
+        logger.error("Cannot list websites: MongoDB collection not available")
+        return None
+
+    try:
+        # One extra document tells whether there is a next page
+        websites = await (collection.find(query, _projection(fields))
+                          .sort(WEBSITE_ORDER).limit(limit + 1).to_list(length=limit + 1))
+        total = await collection.count_documents(base_query) if with_total else None
+        return _page(websites, limit, total)
+    except Exception as e:
+        logger.error(f"Error listing websites: {e}")
+        return None
+
+
+def aiter_websites(user_id=None, cursor=None, fields=None, batch_size=100):
+    """
+    Async ``mongodb_utils.iter_websites``.
+
+    Returns:
+        async generator: Website dicts, or None if MongoDB is not available
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    _, query = _list_queries(user_id, cursor)
+
+    collection = get_async_collection()
+    if collection is None:
+        logger.error("Cannot export websites: MongoDB collection not available")
+        return None
+
+    mongo_cursor = collection.find(query, _projection(fields)).sort(WEBSITE_ORDER).batch_size(batch_size)
+    return _aiter_documents(mongo_cursor)
+
+
+async def _aiter_documents(mongo_cursor):
+    try:
+        async for document in mongo_cursor:
+            document['_id'] = str(document['_id'])
+            yield document
+    finally:
+        await mongo_cursor.close()
@@ -2,54 +2,151 @@
 MongoDB utility functions for the AI Web Builder application.
 This module provides helper functions to interact with MongoDB Atlas.
 """
-from django.conf import settings
 from bson import ObjectId
+import base64
 import json
 from datetime import datetime
-from pymongo import MongoClient
-import os
 import logging
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+
+from .generation_cache import CACHE_COLLECTION_NAME
+from .website_cache import website_cache
+from .website_patch import ANY_VERSION, PatchError, VersionConflict, mongo_update, version_token
+
+from .mongo_client import (
+    MongoNotConfigured,
+    MongoUnavailable,
+    health,
+    mongo_uri,
+    require_database,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Get MongoDB connection from settings or environment
-MONGO_URI = getattr(settings, 'MONGO_URI', os.getenv('MONGO_URI'))
-logger.info(f"MongoDB URI: {MONGO_URI[:20]}...") # Log partial URI for security
+MONGO_URI = mongo_uri()
 
-# Database name to use
-DB_NAME = "ai_builder_db"
+# The database is named by the MONGO_DB_NAME setting (see mongo_client)
 COLLECTION_NAME = "websites_collection"
+# Tombstones of deleted websites, until the delete reaches the Django ORM
+DELETIONS_COLLECTION_NAME = "website_deletions"
+
+# Listing order of websites: newest first, _id breaking ties
+WEBSITE_ORDER = [('created_at', DESCENDING), ('_id', DESCENDING)]
+
+# Fields returned by list views that do not need the generated content
+SUMMARY_FIELDS = (
+    'business_name', 'business_type', 'industry', 'location', 'description',
+    'user_email', 'created_at', 'updated_at',
+)
+
+# Every write to a website stores a ``replication`` marker on the document
+# itself, in the same atomic write; main.replication copies marked documents
+# to the Django ORM and removes the marker.
+REPLICATION_PENDING = {'replication.pending': True}
+
+# Write errors of a patch that does not fit the document: BadValue,
+# TypeMismatch, PathNotViable, ConflictingUpdateOperators
+PATCH_ERROR_CODES = (2, 14, 28, 40)
+
+def mark_for_replication(document, changed_at=None):
+    """Add a pending replication marker to a website document or $set update."""
+    document['replication'] = {'pending': True, 'changed_at': changed_at or datetime.now(), 'attempts': 0}
+    return document
+
+def _after_cursor(created_at, object_id):
+    """Filter for websites after (created_at, _id) in WEBSITE_ORDER."""
+    if created_at is None:
+        # Documents without created_at sort last
+        return {'created_at': None, '_id': {'$lt': object_id}}
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': object_id}},
+        {'created_at': None},
+    ]}
+
+# Indexes the application relies on, by collection. Created by
+# ``manage.py ensure_mongo_indexes``; each process warns once MongoDB is
+# reachable if any are missing.
+INDEXES = {
+    COLLECTION_NAME: [
+        # Websites of one user, newest first; _id breaks ties for keyset paging
+        IndexModel(
+            [('user_email', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='user_email_created_at_id'
+        ),
+        # Most recent websites of any user
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id'),
+        # Newest change to a user's websites, read from the index alone for list ETags
+        IndexModel([('user_email', ASCENDING), ('updated_at', DESCENDING)], name='user_email_updated_at'),
+        # Bulk imports never store the same record twice
+        IndexModel(
+            [('bulk_key', ASCENDING)], name='bulk_key', unique=True,
+            partialFilterExpression={'bulk_key': {'$exists': True}}
+        ),
+        # Changes waiting for replication to the ORM, oldest first
+        IndexModel(
+            [('replication.changed_at', ASCENDING)], name='replication_pending',
+            partialFilterExpression=REPLICATION_PENDING
+        ),
+    ],
+    DELETIONS_COLLECTION_NAME: [
+        # Deletes waiting for replication to the ORM, oldest first
+        IndexModel([('replication.changed_at', ASCENDING)], name='replication_changed_at'),
+    ],
+    CACHE_COLLECTION_NAME: [
+        # MongoDB removes cache entries once they expire
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+}
 
-# Initialize MongoDB client
-try:
-    logger.info(f"Attempting to connect to MongoDB Atlas with database: {DB_NAME} and collection: {COLLECTION_NAME}...")
-    mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    # Verify connection with a ping
-    mongo_client.admin.command('ping')
-    # Explicitly specify the database name
-    mongo_db = mongo_client[DB_NAME]
-    db_name = mongo_db.name
-    logger.info(f"MongoDB Atlas connection successful. Database: {db_name}")
-    print(f"MongoDB Atlas connection successful. Database: {db_name}")
-except Exception as e:
-    logger.error(f"MongoDB Atlas connection error: {e}")
-    print(f"MongoDB Atlas connection error: {e}")
-    mongo_db = None
-
-def get_collection(collection_name=None):
+# The queries this module and the views run, for explain reports:
+# name -> (collection, filter, sort)
+QUERY_SHAPES = {
+    'websites_by_user': (COLLECTION_NAME, {'user_email': 'user@example.com'}, WEBSITE_ORDER),
+    'websites_by_user_after_cursor': (
+        COLLECTION_NAME,
+        {'user_email': 'user@example.com', **_after_cursor(datetime(2024, 1, 1), ObjectId('000000000000000000000000'))},
+        WEBSITE_ORDER
+    ),
+    'recent_websites': (COLLECTION_NAME, {}, WEBSITE_ORDER),
+    'latest_update_by_user': (COLLECTION_NAME, {'user_email': 'user@example.com'}, [('updated_at', DESCENDING)]),
+    'website_by_id': (COLLECTION_NAME, {'_id': ObjectId('000000000000000000000000')}, None),
+    'websites_by_bulk_key': (COLLECTION_NAME, {'bulk_key': {'$in': ['bulk:0', 'bulk:1']}}, None),
+    'pending_replication': (
+        COLLECTION_NAME, {**REPLICATION_PENDING, 'replication.attempts': {'$lt': 5}},
+        [('replication.changed_at', ASCENDING)]
+    ),
+    'pending_deletions': (
+        DELETIONS_COLLECTION_NAME, {'replication.attempts': {'$lt': 5}}, [('replication.changed_at', ASCENDING)]
+    ),
+    'cache_entry': (CACHE_COLLECTION_NAME, {'_id': 'cache-key'}, None),
+}
+
+# The client is created on first use, not at import, so a slow or
+# unreachable server never stalls worker boot or manage.py commands.
+
+def get_collection(collection_name=None, raise_errors=False):
     """
     Get a MongoDB collection by name.
     
     Args:
         collection_name (str, optional): Name of the collection. If None, uses default COLLECTION_NAME
+        raise_errors (bool): Raise MongoNotConfigured or MongoUnavailable
+            instead of returning None, so callers can tell them apart
         
     Returns:
-        Collection object or None if MongoDB is not connected
+        Collection object or None if MongoDB is not configured or unavailable
     """
-    if mongo_db is None:
-        logger.error(f"Cannot get collection: MongoDB not connected")
+    try:
+        mongo_db = require_database()
+    except (MongoNotConfigured, MongoUnavailable) as e:
+        if raise_errors:
+            raise
+        logger.error(f"Cannot get collection: {e}")
         return None
     
     # Use the default collection name if none is provided
@@ -79,6 +176,7 @@ def save_website_data(website_data):
         website_data['created_at'] = datetime.now()
     if 'updated_at' not in website_data:
         website_data['updated_at'] = datetime.now()
+    mark_for_replication(website_data)
     
     # Log the data being saved (excluding large content)
     log_data = {k: v for k, v in website_data.items() if k != 'content'}
@@ -100,17 +198,71 @@ def save_website_data(website_data):
         print(f"MongoDB Error: {e}")
         return None
 
-def get_website_by_id(website_id):
+def save_websites_bulk(documents):
+    """
+    Save many websites to MongoDB Atlas with one insert_many call.
+    
+    Args:
+        documents (list): Website data dicts to save
+        
+    Returns:
+        list: IDs of the inserted documents in input order, or None if failed
+    """
+    if not documents:
+        return []
+    collection = get_collection()
+    if collection is None:
+        logger.error("Cannot save websites: MongoDB collection not available")
+        return None
+    
+    now = datetime.now()
+    for document in documents:
+        document.setdefault('created_at', now)
+        document.setdefault('updated_at', now)
+        mark_for_replication(document, now)
+    
+    try:
+        result = collection.insert_many(documents)
+        logger.info(f"Inserted {len(result.inserted_ids)} websites")
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+    except Exception as e:
+        logger.error(f"Error saving websites in bulk: {e}")
+        return None
+
+def find_websites_by_bulk_key(bulk_keys):
+    """
+    Find websites already saved by a bulk import.
+    
+    Args:
+        bulk_keys (list): ``bulk_key`` values to look for
+        
+    Returns:
+        dict: bulk_key -> document ID for those that exist, or None if failed
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        cursor = collection.find({'bulk_key': {'$in': list(bulk_keys)}}, {'bulk_key': 1})
+        return {doc['bulk_key']: str(doc['_id']) for doc in cursor}
+    except Exception as e:
+        logger.error(f"Error looking up bulk keys: {e}")
+        return None
+
+def get_website_by_id(website_id, raise_errors=False):
     """
     Get website data by ID from MongoDB Atlas.
     
     Args:
         website_id (str): Website ID
+        raise_errors (bool): Raise instead of returning None when MongoDB
+            could not be queried, so callers can tell that from not found
         
     Returns:
         dict: Website data or None if not found
     """
-    collection = get_collection()
+    collection = get_collection(raise_errors=raise_errors)
     if collection is None:
         return None
     
@@ -127,6 +279,30 @@ def get_website_by_id(website_id):
         return website
     except Exception as e:
         logger.error(f"Error retrieving website: {e}")
+        if raise_errors:
+            raise
+        return None
+
+def get_website_version(website_id, raise_errors=False):
+    """
+    Get only the ``updated_at`` of a website, for conditional requests.
+    
+    Returns:
+        dict: ``_id`` and ``updated_at``, or None if not found
+    """
+    collection = get_collection(raise_errors=raise_errors)
+    if collection is None:
+        return None
+    
+    try:
+        website = collection.find_one({'_id': ObjectId(website_id)}, {'updated_at': 1})
+        if website:
+            website['_id'] = str(website['_id'])
+        return website
+    except Exception as e:
+        logger.error(f"Error retrieving website version: {e}")
+        if raise_errors:
+            raise
         return None
 
 def update_website(website_id, update_data):
@@ -147,6 +323,7 @@ def update_website(website_id, update_data):
     try:
         # Add updated timestamp
         update_data['updated_at'] = datetime.now()
+        mark_for_replication(update_data, update_data['updated_at'])
         
         # Convert string ID to ObjectId
         object_id = ObjectId(website_id)
@@ -154,6 +331,7 @@ def update_website(website_id, update_data):
             {'_id': object_id},
             {'$set': update_data}
         )
+        website_cache.invalidate(website_id)
         
         logger.info(f"Website data updated: {website_id}")
         return result.modified_count > 0
@@ -161,14 +339,71 @@ def update_website(website_id, update_data):
         logger.error(f"Error updating website: {e}")
         return False
 
-def get_all_websites(user_id=None, limit=20, skip=0):
+def patch_website(website_id, operations, expected_updated_at=ANY_VERSION):
+    """
+    Apply field-level operations (see ``website_patch``) with one targeted
+    update, optionally only if the website is still at a version.
+
+    Args:
+        website_id (str): Website ID
+        operations (list): Checked ``website_patch.Operation``s
+        expected_updated_at (datetime): Only update if the document's
+            ``updated_at`` is still this (None: never set); by default any
+
+    Returns:
+        dict: The updated document, or None if not found or failed
+
+    Raises:
+        PatchError: If MongoDB refuses the operations for this document
+        VersionConflict: If the website is at another version
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+
+    update = mongo_update(operations)
+    now = datetime.now()
+    update.setdefault('$set', {})['updated_at'] = now
+    mark_for_replication(update['$set'], now)
+    query = {'_id': ObjectId(website_id)}
+    if expected_updated_at is not ANY_VERSION:
+        query['updated_at'] = expected_updated_at
+    try:
+        website = collection.find_one_and_update(
+            query, update, projection={'replication': 0}, return_document=ReturnDocument.AFTER
+        )
+        if website is None and expected_updated_at is not ANY_VERSION:
+            current = collection.find_one({'_id': query['_id']}, {'updated_at': 1})
+            if current is not None:
+                raise VersionConflict(version_token(current))
+        website_cache.invalidate(website_id)
+        if website is None:
+            return None
+        website['_id'] = str(website['_id'])
+        logger.info(f"Website data patched: {website_id}")
+        return website
+    except VersionConflict:
+        raise
+    except OperationFailure as e:
+        if e.code in PATCH_ERROR_CODES:
+            raise PatchError(f"The patch does not fit the website: {e.details.get('errmsg', e) if e.details else e}")
+        logger.error(f"Error patching website: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Error patching website: {e}")
+        return None
+
+def get_all_websites(user_id=None, limit=20, skip=0, fields=None):
     """
     Get all websites from MongoDB Atlas, optionally filtered by user_id.
     
     Args:
         user_id (str, optional): User ID to filter by
         limit (int, optional): Maximum number of results to return
-        skip (int, optional): Number of results to skip
+        skip (int, optional): Number of results to skip; prefer
+            list_websites, whose cursors do not get slower with depth
+        fields (iterable, optional): Fields to return instead of the whole
+            document (e.g. SUMMARY_FIELDS)
         
     Returns:
         list: List of website data
@@ -186,17 +421,9 @@ def get_all_websites(user_id=None, limit=20, skip=0):
     try:
         # Log the query being executed
         logger.info(f"Executing MongoDB query: {query}")
-        
-        # First check if any documents match the query
-        count = collection.count_documents(query)
-        logger.info(f"Found {count} documents matching the query")
-        
-        if count == 0:
-            logger.warning(f"No websites found for user: {user_id}")
-            return []
             
         # Execute the query with sorting and pagination
-        cursor = collection.find(query).sort('created_at', -1).skip(skip).limit(limit)
+        cursor = collection.find(query, _projection(fields)).sort(WEBSITE_ORDER).skip(skip).limit(limit)
         websites = list(cursor)
         
         # Convert ObjectId to string for JSON serialization
@@ -210,6 +437,342 @@ def get_all_websites(user_id=None, limit=20, skip=0):
         logger.error(f"Error retrieving websites: {e}")
         return []
 
+def _projection(fields):
+    if not fields:
+        # The replication marker is bookkeeping, not website data
+        return {'replication': 0}
+    projection = {field: 1 for field in fields}
+    # Needed to build the next cursor
+    projection['created_at'] = 1
+    return projection
+
+def encode_cursor(website):
+    """Opaque cursor pointing just after ``website`` in WEBSITE_ORDER."""
+    created_at = website.get('created_at')
+    payload = {
+        't': created_at.isoformat() if isinstance(created_at, datetime) else None,
+        'id': str(website['_id']),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor.
+    
+    Returns:
+        tuple: (created_at or None, ObjectId)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload['t']) if payload['t'] else None
+        return created_at, ObjectId(payload['id'])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _list_queries(user_id, cursor):
+    """(query for every website of the user, query for those after ``cursor``)"""
+    base_query = {'user_email': user_id} if user_id else {}
+    query = dict(base_query)
+    if cursor:
+        query.update(_after_cursor(*decode_cursor(cursor)))
+    return base_query, query
+
+def _page(websites, limit, total):
+    """A list_websites result from up to ``limit + 1`` documents."""
+    next_cursor = encode_cursor(websites[limit - 1]) if len(websites) > limit else None
+    websites = websites[:limit]
+    for website in websites:
+        website['_id'] = str(website['_id'])
+    return {'websites': websites, 'next_cursor': next_cursor, 'total': total}
+
+def list_websites(user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+    """
+    Page through websites, newest first, without skip.
+    
+    Args:
+        user_id (str, optional): User email to filter by
+        limit (int): Page size
+        cursor (str, optional): ``next_cursor`` of the previous page
+        fields (iterable, optional): Fields to return instead of the whole
+            document (e.g. SUMMARY_FIELDS)
+        with_total (bool): Also count every matching website (an extra query)
+        
+    Returns:
+        dict: ``websites``, ``next_cursor`` (None on the last page) and
+            ``total`` (None unless requested), or None if MongoDB failed
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    base_query, query = _list_queries(user_id, cursor)
+    
+    collection = get_collection()
+    if collection is None:
+        logger.error("Cannot list websites: MongoDB collection not available")
+        return None
+    
+    try:
+        # One extra document tells whether there is a next page
+        websites = list(collection.find(query, _projection(fields)).sort(WEBSITE_ORDER).limit(limit + 1))
+        total = collection.count_documents(base_query) if with_total else None
+        return _page(websites, limit, total)
+    except Exception as e:
+        logger.error(f"Error listing websites: {e}")
+        return None
+
+def count_websites(user_id=None):
+    """
+    Count websites, optionally only those of one user.
+    
+    Returns:
+        int: Number of websites, or None if MongoDB failed
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        return collection.count_documents({'user_email': user_id} if user_id else {})
+    except Exception as e:
+        logger.error(f"Error counting websites: {e}")
+        return None
+
+def _latest_update_query(user_id):
+    """(filter, projection, sort) of the newest ``updated_at``, covered by user_email_updated_at."""
+    return ({'user_email': user_id} if user_id else {}), {'_id': 0, 'updated_at': 1}, [('updated_at', DESCENDING)]
+
+def get_list_version(user_id=None):
+    """
+    Number of websites and the newest ``updated_at``, optionally of one user.
+    
+    Any create, update or delete changes one of them, so they identify a
+    version of the list without reading documents.
+    
+    Returns:
+        tuple: (count, updated_at or None), or None if MongoDB failed
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        query, projection, sort = _latest_update_query(user_id)
+        latest = collection.find_one(query, projection, sort=sort)
+        return collection.count_documents(query), (latest or {}).get('updated_at')
+    except Exception as e:
+        logger.error(f"Error reading website list version: {e}")
+        return None
+
+def iter_websites(user_id=None, cursor=None, fields=None, batch_size=100):
+    """
+    Iterate over websites in WEBSITE_ORDER, fetching ``batch_size`` at a time.
+    
+    Only one batch is held in memory, so exports of any size stay flat.
+    
+    Args:
+        user_id (str, optional): User email to filter by
+        cursor (str, optional): Start after this list_websites cursor
+        fields (iterable, optional): Fields to return instead of the whole document
+        batch_size (int): Documents per round trip
+        
+    Returns:
+        generator: Website dicts, or None if MongoDB is not available
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    _, query = _list_queries(user_id, cursor)
+    
+    collection = get_collection()
+    if collection is None:
+        logger.error("Cannot export websites: MongoDB collection not available")
+        return None
+    
+    mongo_cursor = collection.find(query, _projection(fields)).sort(WEBSITE_ORDER).batch_size(batch_size)
+    return _iter_documents(mongo_cursor)
+
+def _iter_documents(mongo_cursor):
+    try:
+        for document in mongo_cursor:
+            document['_id'] = str(document['_id'])
+            yield document
+    finally:
+        mongo_cursor.close()
+
+def find_pending_replication(limit=100, max_attempts=5):
+    """
+    Get websites whose latest change has not reached the Django ORM yet.
+    
+    Args:
+        limit (int): Maximum number of documents to return
+        max_attempts (int): Skip documents that already failed this many times
+        
+    Returns:
+        list: Website documents, oldest change first, or None if failed
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        query = {**REPLICATION_PENDING, 'replication.attempts': {'$lt': max_attempts}}
+        return list(collection.find(query).sort('replication.changed_at', ASCENDING).limit(limit))
+    except Exception as e:
+        logger.error(f"Error reading pending replication: {e}")
+        return None
+
+def ack_replication(documents):
+    """
+    Clear the replication marker of documents applied to the ORM.
+    
+    A marker is only cleared if the document has not changed again since it
+    was read, so a newer change stays pending.
+    
+    Args:
+        documents (list): Documents as returned by find_pending_replication
+        
+    Returns:
+        int: Number of markers cleared, or None if failed
+    """
+    if not documents:
+        return 0
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        result = collection.bulk_write([
+            UpdateOne(
+                {'_id': document['_id'], 'replication.changed_at': document['replication']['changed_at']},
+                {'$unset': {'replication': ''}}
+            )
+            for document in documents
+        ], ordered=False)
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error acknowledging replication: {e}")
+        return None
+
+def record_replication_failure(document, error, collection_name=None):
+    """
+    Count a failed attempt to apply a document's change to the ORM.
+    
+    Args:
+        document (dict): Website document, or deletion tombstone
+        error (Exception): What went wrong
+        collection_name (str, optional): DELETIONS_COLLECTION_NAME for a tombstone
+    
+    Returns:
+        bool: True if the failure was recorded, False otherwise
+    """
+    collection = get_collection(collection_name)
+    if collection is None:
+        return False
+    
+    try:
+        result = collection.update_one(
+            {'_id': document['_id'], 'replication.changed_at': document['replication']['changed_at']},
+            {'$inc': {'replication.attempts': 1}, '$set': {'replication.error': str(error)}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error recording replication failure: {e}")
+        return False
+
+def find_pending_deletions(limit=100, max_attempts=5):
+    """
+    Get tombstones of deleted websites whose delete has not reached the
+    Django ORM yet. Tombstones of documents that still exist (deleted right
+    now, or whose delete failed) are left for later.
+    
+    Returns:
+        list: Tombstones (``_id`` of the website and ``replication``),
+            oldest first, or None if failed
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        tombstones = list(
+            collection.database[DELETIONS_COLLECTION_NAME]
+            .find({'replication.attempts': {'$lt': max_attempts}})
+            .sort('replication.changed_at', ASCENDING).limit(limit)
+        )
+        if not tombstones:
+            return []
+        remaining = {
+            document['_id']
+            for document in collection.find({'_id': {'$in': [tombstone['_id'] for tombstone in tombstones]}}, {'_id': 1})
+        }
+        return [tombstone for tombstone in tombstones if tombstone['_id'] not in remaining]
+    except Exception as e:
+        logger.error(f"Error reading pending deletions: {e}")
+        return None
+
+def ack_deletions(tombstones):
+    """
+    Remove the tombstones of deletes applied to the ORM.
+    
+    Returns:
+        int: Number of tombstones removed, or None if failed
+    """
+    if not tombstones:
+        return 0
+    collection = get_collection(DELETIONS_COLLECTION_NAME)
+    if collection is None:
+        return None
+    
+    try:
+        result = collection.bulk_write([
+            DeleteOne({'_id': tombstone['_id'], 'replication.changed_at': tombstone['replication']['changed_at']})
+            for tombstone in tombstones
+        ], ordered=False)
+        return result.deleted_count
+    except Exception as e:
+        logger.error(f"Error acknowledging deletions: {e}")
+        return None
+
+def replication_backlog(max_attempts=5):
+    """
+    Changes not yet replicated to the ORM, deletes included.
+    
+    Returns:
+        dict: ``pending`` (still being retried), ``failed`` (out of attempts)
+            and ``oldest_change`` of the pending ones (datetime or None), or
+            None if failed
+    """
+    collection = get_collection()
+    if collection is None:
+        return None
+    
+    try:
+        pending = failed = 0
+        oldest_changes = []
+        for changes in (collection, collection.database[DELETIONS_COLLECTION_NAME]):
+            retrying = {**REPLICATION_PENDING, 'replication.attempts': {'$lt': max_attempts}}
+            retrying_count = changes.count_documents(retrying)
+            pending += retrying_count
+            failed += changes.count_documents(REPLICATION_PENDING) - retrying_count
+            oldest = changes.find_one(
+                retrying, {'replication.changed_at': 1},
+                sort=[('replication.changed_at', ASCENDING)]
+            )
+            if oldest:
+                oldest_changes.append(oldest['replication']['changed_at'])
+        return {
+            'pending': pending,
+            'failed': failed,
+            'oldest_change': min(oldest_changes, default=None),
+        }
+    except Exception as e:
+        logger.error(f"Error reading replication backlog: {e}")
+        return None
+
 def delete_website(website_id):
     """
     Delete a website by ID from MongoDB Atlas.
@@ -227,55 +790,197 @@ def delete_website(website_id):
     try:
         # Convert string ID to ObjectId
         object_id = ObjectId(website_id)
-        result = collection.delete_one({'_id': object_id})
+    except Exception as e:
+        logger.error(f"Error deleting website: {e}")
+        return False
+    
+    # The tombstone goes first: a crash after the delete must not leave the
+    # replicated ORM row behind. The replicator skips tombstones of
+    # documents that still exist.
+    deletions = collection.database[DELETIONS_COLLECTION_NAME]
+    # Milliseconds, as BSON stores it, so the cleanup below matches
+    now = datetime.now()
+    changed_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    deleted = False
+    try:
+        deletions.replace_one(
+            {'_id': object_id},
+            mark_for_replication({}, changed_at),
+            upsert=True
+        )
+        deleted = collection.delete_one({'_id': object_id}).deleted_count > 0
+        website_cache.invalidate(website_id)
         
         logger.info(f"Website deleted: {website_id}")
-        return result.deleted_count > 0
+        return deleted
     except Exception as e:
         logger.error(f"Error deleting website: {e}")
         return False
+    finally:
+        if not deleted:
+            # Nothing was deleted, so there is nothing to replicate
+            try:
+                deletions.delete_one({'_id': object_id, 'replication.changed_at': changed_at})
+            except Exception as e:
+                logger.error(f"Error removing the deletion tombstone of {website_id}: {e}")
 
 def verify_mongodb_connection():
     """
     Verify MongoDB connection and return diagnostic information.
     
+    Cheap enough for production: see ``mongo_diagnostics``.
+    
     Returns:
         dict: Diagnostic information about the MongoDB connection
     """
-    result = {
-        'connected': False,
-        'database_name': None,
-        'collections': [],
-        'connection_string': MONGO_URI[:20] + '...' if MONGO_URI else 'Not configured',
-        'error': None,
-        'website_count': 0
+    from .mongo_diagnostics import mongo_diagnostics
+    return mongo_diagnostics()
+
+def _index_spec(index):
+    """Key and options of an IndexModel or an index_information() entry, for comparison."""
+    document = dict(index.document) if isinstance(index, IndexModel) else dict(index)
+    key = document.pop('key')
+    key = [
+        (field, int(direction) if isinstance(direction, float) else direction)
+        for field, direction in (key.items() if hasattr(key, 'items') else key)
+    ]
+    options = {
+        option: document[option]
+        for option in ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+        if document.get(option) not in (None, False)
     }
+    return key, options
+
+def index_report():
+    """
+    Compare the declared INDEXES with those on the server.
     
+    Returns:
+        dict: collection -> {'present', 'missing', 'conflicting', 'undeclared'}
+            lists of index names, or None if MongoDB is not available
+    """
     try:
-        # Check if we're connected
-        if mongo_db is None:
-            result['error'] = "MongoDB client is not initialized"
-            return result
-            
-        # Get database info
-        result['connected'] = True
-        result['database_name'] = mongo_db.name
+        mongo_db = require_database()
+        report = {}
+        for collection_name, indexes in INDEXES.items():
+            existing = mongo_db[collection_name].index_information()
+            entry = {'present': [], 'missing': [], 'conflicting': [], 'undeclared': []}
+            for index in indexes:
+                name = index.document['name']
+                if name not in existing:
+                    entry['missing'].append(name)
+                elif _index_spec(index) != _index_spec(existing[name]):
+                    entry['conflicting'].append(name)
+                else:
+                    entry['present'].append(name)
+            declared = {index.document['name'] for index in indexes}
+            entry['undeclared'] = [name for name in existing if name not in declared and name != '_id_']
+            report[collection_name] = entry
+        return report
+    except Exception as e:
+        logger.error(f"Error reading MongoDB indexes: {e}")
+        return None
+
+def ensure_indexes(rebuild=False, drop_undeclared=False):
+    """
+    Create the declared INDEXES that are missing. Safe to run repeatedly.
+    
+    Args:
+        rebuild (bool): Drop and recreate indexes whose definition changed
+        drop_undeclared (bool): Drop indexes that are not declared
         
-        # Get collections
-        result['collections'] = mongo_db.list_collection_names()
+    Returns:
+        dict: collection -> {'created', 'dropped', 'conflicting'} lists of
+            index names
         
-        # Count websites
-        if COLLECTION_NAME in result['collections']:
-            result['website_count'] = mongo_db[COLLECTION_NAME].count_documents({})
-            
-            # Get a sample website if any exist
-            if result['website_count'] > 0:
-                sample = mongo_db[COLLECTION_NAME].find_one()
-                if sample and '_id' in sample:
-                    sample['_id'] = str(sample['_id'])
-                result['sample_website'] = sample
-                
-        return result
-    except Exception as e:
-        result['error'] = str(e)
-        return result
+    Raises:
+        MongoNotConfigured, MongoUnavailable: If MongoDB cannot be used
+    """
+    mongo_db = require_database()
+    report = index_report()
+    if report is None:
+        raise MongoUnavailable("Could not read the existing indexes")
+    result = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = mongo_db[collection_name]
+        entry = report[collection_name]
+        dropped = []
+        if rebuild:
+            for name in entry['conflicting']:
+                collection.drop_index(name)
+                dropped.append(name)
+        if drop_undeclared:
+            for name in entry['undeclared']:
+                collection.drop_index(name)
+                dropped.append(name)
+        to_create = [
+            index for index in indexes
+            if index.document['name'] in entry['missing'] or index.document['name'] in dropped
+        ]
+        if to_create:
+            collection.create_indexes(to_create)
+            logger.info(f"Created indexes on {collection_name}: {[index.document['name'] for index in to_create]}")
+        result[collection_name] = {
+            'created': [index.document['name'] for index in to_create],
+            'dropped': dropped,
+            'conflicting': [name for name in entry['conflicting'] if name not in dropped],
+        }
+    return result
+
+def _plan_stages(plan):
+    """Stage names and index names of a winning plan, outermost first."""
+    stages = []
+    while plan:
+        # Servers using the slot-based engine nest the plan one level deeper
+        plan = plan.get('queryPlan', plan)
+        stages.append((plan.get('stage'), plan.get('indexName')))
+        children = plan.get('inputStages') or ([plan['inputStage']] if 'inputStage' in plan else [])
+        plan = children[0] if children else None
+    return stages
+
+def explain_queries(limit=20):
+    """
+    Explain each query in QUERY_SHAPES.
+    
+    Returns:
+        dict: query name -> {'collection', 'stages', 'index', 'collection_scan',
+            'in_memory_sort', 'docs_examined', 'keys_examined'} (or {'error'})
+    """
+    mongo_db = require_database()
+    report = {}
+    for name, (collection_name, query, sort) in QUERY_SHAPES.items():
+        try:
+            cursor = mongo_db[collection_name].find(query).limit(limit)
+            if sort:
+                cursor = cursor.sort(sort)
+            explanation = cursor.explain()
+            stages = _plan_stages(explanation.get('queryPlanner', {}).get('winningPlan'))
+            execution = explanation.get('executionStats', {})
+            report[name] = {
+                'collection': collection_name,
+                'stages': [stage for stage, _ in stages],
+                'index': next((index for _, index in stages if index), None),
+                'collection_scan': any(stage == 'COLLSCAN' for stage, _ in stages),
+                'in_memory_sort': any(stage == 'SORT' for stage, _ in stages),
+                'docs_examined': execution.get('totalDocsExamined'),
+                'keys_examined': execution.get('totalKeysExamined'),
+            }
+        except Exception as e:
+            report[name] = {'collection': collection_name, 'error': str(e)}
+    return report
+
+def warn_missing_indexes():
+    """Log a warning for every declared index missing on the server."""
+    report = index_report()
+    if report is None:
+        return
+    for collection_name, entry in report.items():
+        problems = entry['missing'] + entry['conflicting']
+        if problems:
+            logger.warning(
+                f"MongoDB collection {collection_name} lacks indexes {problems}; queries on it will scan "
+                f"the collection. Run: python manage.py ensure_mongo_indexes"
+            )
+
+# Checked once per process, from the health probe thread
+health.on_available(warn_missing_indexes)
@@ -0,0 +1,64 @@
+"""
+Cursor pagination for the website list endpoints.
+
+Pages are requested with ``?cursor=&limit=&fields=&total=``. The body stays
+a plain list of websites; the cursor of the next page is returned in the
+``X-Next-Cursor`` and ``Link`` headers and the total, when requested, in
+``X-Total-Count``.
+"""
+from rest_framework.response import Response
+
+from .mongodb_utils import SUMMARY_FIELDS, decode_cursor
+
+
+def parse_page_params(params, default_limit=20, max_limit=100):
+    """
+    Read ``cursor``, ``limit``, ``fields`` and ``total`` from query parameters.
+
+    ``fields`` is a comma-separated list, or ``summary`` for SUMMARY_FIELDS;
+    without it whole documents are returned.
+
+    Returns:
+        dict: Keyword arguments for mongodb_utils.list_websites (except user_id)
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    try:
+        limit = int(params.get('limit') or default_limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a number")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    fields = params.get('fields') or None
+    if fields == 'summary':
+        fields = SUMMARY_FIELDS
+    elif fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    cursor = params.get('cursor') or None
+    if cursor:
+        decode_cursor(cursor)
+    return {
+        'limit': min(limit, max_limit),
+        'cursor': cursor,
+        'fields': fields,
+        'with_total': params.get('total') in ('1', 'true', 'yes'),
+    }
+
+
+def page_headers(request, page):
+    """The ``X-Next-Cursor``, ``Link`` and ``X-Total-Count`` headers of a page."""
+    headers = {}
+    if page['next_cursor']:
+        params = request.GET.copy()
+        params['cursor'] = page['next_cursor']
+        headers['X-Next-Cursor'] = page['next_cursor']
+        headers['Link'] = f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+    if page['total'] is not None:
+        headers['X-Total-Count'] = str(page['total'])
+    return headers
+
+
+def paged_response(request, page):
+    """Response with one page of websites; the next cursor and total go in headers."""
+    return Response(page['websites'], headers=page_headers(request, page))
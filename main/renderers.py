@@ -0,0 +1,59 @@
+"""
+Newline-delimited JSON output.
+
+Selected with ``Accept: application/x-ndjson`` or ``?format=ndjson``. Views
+that support it stream their results with ``ndjson_lines`` so each document
+is serialized and sent as it is read instead of building the whole list.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def ndjson_line(item):
+    return json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def ndjson_lines(items, on_error=None):
+    """
+    Yield one encoded line per item.
+
+    If iterating ``items`` fails part way, ``on_error`` is called with the
+    exception and a final ``{"error": ...}`` line is written, since the
+    status code has already been sent.
+    """
+    try:
+        for item in items:
+            yield ndjson_line(item)
+    except Exception as e:
+        if on_error:
+            on_error(e)
+        yield ndjson_line({'error': str(e)})
+
+
+async def andjson_lines(items, on_error=None):
+    """``ndjson_lines`` for an async iterable."""
+    try:
+        async for item in items:
+            yield ndjson_line(item)
+    except Exception as e:
+        if on_error:
+            on_error(e)
+        yield ndjson_line({'error': str(e)})
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render a list as one JSON document per line (anything else as one line)."""
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, list):
+            return b''.join(ndjson_line(item) for item in data)
+        return ndjson_line(data)
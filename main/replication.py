@@ -0,0 +1,291 @@
+"""
+Write-behind replication of websites from MongoDB to the Django ORM.
+
+MongoDB is the primary store. Every write to a website document also stores
+a ``replication`` marker on it (see ``mongodb_utils``), so recording the
+change costs nothing extra and can never disagree with the write itself.
+The ``replicate_websites`` management command runs a ``WebsiteReplicator``
+that reads marked documents oldest change first and applies them to
+``Website`` rows in batches, with one ``bulk_create`` for new websites and
+one ``bulk_update`` for changed ones.
+
+MongoDB keeps no document to mark once a website is deleted, so
+``mongodb_utils.delete_website`` records a tombstone in a separate outbox
+collection instead, and the replicator deletes the row with that
+``mongo_id`` after applying the batch of changed documents.
+
+Applying a change is idempotent: ORM rows are matched on ``Website.mongo_id``,
+and a marker is only cleared if the document has not changed again since it
+was read. A batch that fails is retried one document at a time; a document
+that keeps failing is given up after REPLICATION_MAX_ATTEMPTS and reported
+as failed. ``replication_status()`` reports the backlog and replication lag.
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+
+from django.db import close_old_connections, transaction
+
+from .config import setting
+from .models import Website
+from .website_cache import website_cache
+
+logger = logging.getLogger(__name__)
+
+# Website columns copied from the MongoDB document
+REPLICATED_FIELDS = (
+    'user_email', 'business_name', 'location', 'description',
+    'business_type', 'industry', 'content', 'created_at',
+)
+
+
+def orm_fields(document):
+    """Website model fields for a MongoDB website document."""
+    fields = {}
+    for name in REPLICATED_FIELDS:
+        value = document.get(name)
+        if value is None:
+            continue
+        if name == 'content' and not isinstance(value, str):
+            value = json.dumps(value, default=str)
+        fields[name] = value
+    return fields
+
+
+def save_website(website_data):
+    """
+    Save a new website to the website repository (MongoDB in production); it
+    reaches the ORM through replication.
+
+    If the repository is unavailable the website is written to the ORM
+    directly so the request still succeeds.
+
+    Returns:
+        tuple: (repository id, None), or (None, Django ORM id) if the
+            repository failed
+    """
+    from .repositories import get_repository
+
+    mongo_id = get_repository().save(website_data)
+    if mongo_id:
+        return mongo_id, None
+    logger.warning("Website repository write failed; saving the website to the Django ORM only")
+    website = Website.objects.create(**orm_fields(website_data))
+    # The id may have been looked up (and cached as missing) before
+    website_cache.invalidate(website.id)
+    return None, website.id
+
+
+class ReplicationMetrics:
+    """Counters of the replicator running in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.applied = 0
+        self.failures = 0
+        self.last_batch_at = None
+        self.last_lag = None
+        self.max_lag = 0.0
+
+    def record_batch(self, applied, failures, lag):
+        with self._lock:
+            self.batches += 1
+            self.applied += applied
+            self.failures += failures
+            self.last_batch_at = datetime.now()
+            if lag is not None:
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'applied': self.applied,
+                'failures': self.failures,
+                'last_batch_at': self.last_batch_at,
+                'last_lag_seconds': round(self.last_lag, 3) if self.last_lag is not None else None,
+                'max_lag_seconds': round(self.max_lag, 3),
+            }
+
+
+metrics = ReplicationMetrics()
+
+
+def apply_to_orm(documents):
+    """
+    Create or update the Website rows of ``documents`` in one transaction.
+
+    Rows are matched on ``mongo_id``, so applying the same documents twice
+    leaves the same rows.
+    """
+    changes = {str(document['_id']): orm_fields(document) for document in documents}
+    with transaction.atomic():
+        existing = {
+            website.mongo_id: website
+            for website in Website.objects.select_for_update().filter(mongo_id__in=list(changes))
+        }
+        created = []
+        updated = []
+        for mongo_id, fields in changes.items():
+            website = existing.get(mongo_id)
+            if website is None:
+                created.append(Website(mongo_id=mongo_id, **fields))
+                continue
+            for name, value in fields.items():
+                setattr(website, name, value)
+            # A new version for ETags and PATCH version checks of the row
+            website.theme_version += 1
+            updated.append(website)
+        if created:
+            Website.objects.bulk_create(created)
+        if updated:
+            Website.objects.bulk_update(updated, REPLICATED_FIELDS + ('theme_version',))
+    website_cache.invalidate(*[website.id for website in created + updated])
+
+
+def apply_deletions(mongo_ids):
+    """Delete the Website rows of deleted MongoDB documents; rows already gone are skipped."""
+    with transaction.atomic():
+        ids = list(Website.objects.filter(mongo_id__in=list(mongo_ids)).values_list('id', flat=True))
+        if ids:
+            Website.objects.filter(id__in=ids).delete()
+    website_cache.invalidate(*ids)
+
+
+class WebsiteReplicator:
+    """
+    Apply pending website changes from MongoDB to the ORM in batches.
+
+    Args:
+        batch_size (int): Documents read and applied per batch
+        poll_interval (float): Seconds to wait when nothing is pending
+        max_attempts (int): Failed attempts before a document is given up
+    """
+
+    def __init__(self, batch_size=None, poll_interval=1.0, max_attempts=None):
+        self.batch_size = batch_size or setting('REPLICATION_BATCH_SIZE', 100)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts or setting('REPLICATION_MAX_ATTEMPTS', 5)
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Stop after the current batch."""
+        self._stop.set()
+
+    def replicate_batch(self):
+        """
+        Apply one batch of pending changes.
+
+        Returns:
+            int: Number of changes and deletes applied, or None if MongoDB is
+                unavailable
+        """
+        from .mongodb_utils import find_pending_replication
+
+        documents = find_pending_replication(limit=self.batch_size, max_attempts=self.max_attempts)
+        if documents is None:
+            return None
+        applied = self._apply_changes(documents) if documents else 0
+        # Read after the changes: a website saved and then deleted is created
+        # by the batch above before its row is deleted here
+        return applied + (self.replicate_deletions() or 0)
+
+    def _apply_changes(self, documents):
+        """Apply changed documents to the ORM; returns how many were applied."""
+        from .mongodb_utils import ack_replication, record_replication_failure
+
+        try:
+            apply_to_orm(documents)
+            applied = documents
+        except Exception as e:
+            logger.warning(f"Replicating a batch of {len(documents)} websites failed ({e}); retrying one at a time")
+            applied = []
+            for document in documents:
+                try:
+                    apply_to_orm([document])
+                    applied.append(document)
+                except Exception as e:
+                    logger.error(f"Replicating website {document['_id']} failed: {e}")
+                    record_replication_failure(document, e)
+
+        # A crash before the ack only means the batch is applied again
+        ack_replication(applied)
+        now = datetime.now()
+        lag = max((now - document['replication']['changed_at']).total_seconds() for document in applied) if applied else None
+        metrics.record_batch(len(applied), len(documents) - len(applied), lag)
+        return len(applied)
+
+    def replicate_deletions(self):
+        """
+        Delete the ORM rows of one batch of deleted websites.
+
+        Returns:
+            int: Number of deletes applied, or None if MongoDB is unavailable
+        """
+        from .mongodb_utils import (
+            DELETIONS_COLLECTION_NAME, ack_deletions, find_pending_deletions, record_replication_failure,
+        )
+
+        tombstones = find_pending_deletions(limit=self.batch_size, max_attempts=self.max_attempts)
+        if not tombstones:
+            return tombstones
+        try:
+            apply_deletions([str(tombstone['_id']) for tombstone in tombstones])
+            applied = tombstones
+        except Exception as e:
+            logger.error(f"Replicating {len(tombstones)} website deletes failed: {e}")
+            applied = []
+            for tombstone in tombstones:
+                record_replication_failure(tombstone, e, DELETIONS_COLLECTION_NAME)
+
+        ack_deletions(applied)
+        now = datetime.now()
+        lag = max((now - tombstone['replication']['changed_at']).total_seconds() for tombstone in applied) if applied else None
+        metrics.record_batch(len(applied), len(tombstones) - len(applied), lag)
+        return len(applied)
+
+    def run(self, once=False):
+        """
+        Replicate until stopped.
+
+        Args:
+            once (bool): Exit as soon as nothing is pending instead of polling
+        """
+        logger.info(f"Website replicator started (batch size {self.batch_size})")
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                applied = self.replicate_batch()
+            except Exception as e:
+                logger.error(f"Website replication failed: {e}")
+                applied = None
+            if applied:
+                continue
+            if once:
+                break
+            self._stop.wait(self.poll_interval)
+        logger.info("Website replicator stopped")
+
+
+def replication_status():
+    """
+    Replication backlog and lag.
+
+    ``lag_seconds`` is the age of the oldest change not yet in the ORM (0
+    when nothing is pending); ``replicator`` holds the counters of a
+    replicator running in this process.
+    """
+    from .mongodb_utils import replication_backlog
+
+    backlog = replication_backlog(max_attempts=setting('REPLICATION_MAX_ATTEMPTS', 5))
+    status = {'replicator': metrics.stats()}
+    if backlog is None:
+        status['error'] = "MongoDB is not available"
+        return status
+    oldest = backlog.pop('oldest_change')
+    status.update(backlog)
+    status['lag_seconds'] = round((datetime.now() - oldest).total_seconds(), 3) if oldest else 0.0
+    return status
@@ -0,0 +1,616 @@
+"""
+Website repositories: where website documents are stored.
+
+Views, API views and background jobs read and write websites through the
+active repository instead of calling pymongo. The repository is chosen with
+the ``WEBSITE_REPOSITORY`` setting or environment variable:
+
+- ``mongo`` (default): MongoDB, through the helpers in main.mongodb_utils
+  (and main.mongodb_async for the async views)
+- ``sqlite``: a SQLite table of JSON documents at WEBSITE_REPOSITORY_PATH
+  (``:memory:`` by default), for running and benchmarking every endpoint
+  without a network or a MongoDB server
+
+Every repository must pass the checks in main.repository_conformance
+(``python manage.py check_repositories``): the same ids, documents, ordering,
+cursors and error behaviour, so callers never need to know which one is
+active.
+"""
+import datetime
+import itertools
+import logging
+import sqlite3
+import threading
+
+from asgiref.sync import sync_to_async
+from bson import ObjectId, json_util
+
+from .config import setting
+from .website_cache import website_cache
+from .website_patch import ANY_VERSION, PatchError, VersionConflict, apply_operations, same_version, version_token
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPOSITORY = 'mongo'
+
+# Registered repository classes, keyed by name
+REPOSITORIES = {}
+
+def register_repository(name):
+    """Register a WebsiteRepository subclass under the given name."""
+    def register(cls):
+        cls.name = name
+        REPOSITORIES[name] = cls
+        return cls
+    return register
+
+class WebsiteRepository:
+    """
+    Base class for website repositories.
+
+    Websites are dicts whose ``_id`` is returned as a 24-character ObjectId
+    string. Lists run newest first (``created_at``, then ``_id``, descending;
+    websites without ``created_at`` last) and page with the opaque cursors of
+    mongodb_utils.encode_cursor. Like mongodb_utils, storage failures are
+    logged and reported as None or False rather than raised.
+
+    The async methods run the sync ones in a thread; repositories with an
+    asyncio driver override them.
+    """
+
+    name = None
+
+    def configured(self):
+        """Whether the store is set up (e.g. a MONGO_URI is present)."""
+        return True
+
+    def save(self, website_data):
+        """
+        Store a new website. Sets ``created_at`` and ``updated_at`` unless
+        given, and ``_id`` on ``website_data``.
+
+        Returns:
+            str: The website id, or None if it could not be stored
+        """
+        raise NotImplementedError
+
+    def get(self, website_id, raise_errors=False):
+        """
+        Returns:
+            dict: The website, or None if there is none with this id (or the
+                id cannot be one of this repository's)
+
+        Raises:
+            Exception: Only with ``raise_errors``, if the store could not be asked
+        """
+        raise NotImplementedError
+
+    def version(self, website_id, raise_errors=False):
+        """
+        The website's ``website_patch.version_token``, read without loading
+        its content (for conditional requests).
+
+        Returns:
+            str: The version token, or None if there is no such website
+
+        Raises:
+            Exception: Only with ``raise_errors``, if the store could not be asked
+        """
+        raise NotImplementedError
+
+    def update(self, website_id, update_data):
+        """
+        Set fields of a website (``$set`` semantics: dotted keys set nested
+        fields) and bump ``updated_at``.
+
+        Returns:
+            bool: True if the website exists and was updated
+        """
+        raise NotImplementedError
+
+    def patch(self, website_id, operations, expected_updated_at=ANY_VERSION):
+        """
+        Apply ``website_patch`` operations and bump ``updated_at``.
+
+        Args:
+            operations (list): Operations checked by ``check_operations``
+            expected_updated_at (datetime): Only update if ``updated_at`` is
+                still this (None: never set); by default any version
+
+        Returns:
+            dict: The updated website, or None if not found or failed
+
+        Raises:
+            PatchError: If the operations do not fit the website (e.g. a
+                push to something that is not a list)
+            VersionConflict: If the website is at another version
+        """
+        raise NotImplementedError
+
+    def delete(self, website_id):
+        """
+        Returns:
+            bool: True if a website was deleted
+        """
+        raise NotImplementedError
+
+    def list(self, user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+        """
+        One page of websites (see mongodb_utils.list_websites).
+
+        Returns:
+            dict: ``websites``, ``next_cursor`` and ``total``, or None if failed
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        raise NotImplementedError
+
+    def iter(self, user_id=None, cursor=None, fields=None, batch_size=100):
+        """
+        Every website after ``cursor`` in list order, ``batch_size`` at a time.
+
+        Returns:
+            generator: Website dicts, or None if failed
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        raise NotImplementedError
+
+    def count(self, user_id=None):
+        """
+        Returns:
+            int: Number of websites (of ``user_id`` if given), or None if failed
+        """
+        raise NotImplementedError
+
+    def list_version(self, user_id=None):
+        """
+        A token that changes whenever a website (of ``user_id`` if given) is
+        created, updated or deleted, read without loading the websites.
+
+        Returns:
+            str: The token, or None if failed
+        """
+        raise NotImplementedError
+
+    async def aget(self, website_id, raise_errors=False):
+        return await sync_to_async(self.get)(website_id, raise_errors)
+
+    async def aversion(self, website_id, raise_errors=False):
+        return await sync_to_async(self.version)(website_id, raise_errors)
+
+    async def alist_version(self, user_id=None):
+        return await sync_to_async(self.list_version)(user_id)
+
+    async def alist(self, user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+        return await sync_to_async(self.list)(user_id, limit, cursor, fields, with_total)
+
+    def aiter(self, user_id=None, cursor=None, fields=None, batch_size=100):
+        """Async ``iter``: an async generator, or None if failed."""
+        websites = self.iter(user_id, cursor, fields, batch_size)
+        if websites is None:
+            return None
+        return self._aiter_batches(websites, batch_size)
+
+    async def _aiter_batches(self, websites, batch_size):
+        next_batch = sync_to_async(lambda: list(itertools.islice(websites, batch_size)))
+        try:
+            while True:
+                batch = await next_batch()
+                if not batch:
+                    break
+                for website in batch:
+                    yield website
+        finally:
+            await sync_to_async(websites.close)()
+
+
+def _list_token(list_version):
+    """``list_version`` token of a (count, newest updated_at) pair."""
+    if list_version is None:
+        return None
+    count, updated_at = list_version
+    return f"{count}-{version_token({'updated_at': updated_at})}"
+
+
+@register_repository('mongo')
+class MongoWebsiteRepository(WebsiteRepository):
+    """MongoDB, the production store."""
+
+    def configured(self):
+        from .mongo_client import mongo_uri
+
+        return bool(mongo_uri())
+
+    def save(self, website_data):
+        from .mongodb_utils import save_website_data
+
+        return save_website_data(website_data)
+
+    def get(self, website_id, raise_errors=False):
+        from .mongodb_utils import get_website_by_id
+
+        if not ObjectId.is_valid(website_id):
+            return None
+        return get_website_by_id(website_id, raise_errors=raise_errors)
+
+    def version(self, website_id, raise_errors=False):
+        from .mongodb_utils import get_website_version
+
+        if not ObjectId.is_valid(website_id):
+            return None
+        website = get_website_version(website_id, raise_errors=raise_errors)
+        return version_token(website) if website else None
+
+    def update(self, website_id, update_data):
+        from .mongodb_utils import update_website
+
+        return update_website(website_id, update_data)
+
+    def patch(self, website_id, operations, expected_updated_at=ANY_VERSION):
+        from .mongodb_utils import patch_website
+
+        if not ObjectId.is_valid(website_id):
+            return None
+        return patch_website(website_id, operations, expected_updated_at)
+
+    def delete(self, website_id):
+        from .mongodb_utils import delete_website
+
+        return delete_website(website_id)
+
+    def list(self, user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+        from .mongodb_utils import list_websites
+
+        return list_websites(user_id=user_id, limit=limit, cursor=cursor, fields=fields, with_total=with_total)
+
+    def iter(self, user_id=None, cursor=None, fields=None, batch_size=100):
+        from .mongodb_utils import iter_websites
+
+        return iter_websites(user_id=user_id, cursor=cursor, fields=fields, batch_size=batch_size)
+
+    def count(self, user_id=None):
+        from .mongodb_utils import count_websites
+
+        return count_websites(user_id)
+
+    def list_version(self, user_id=None):
+        from .mongodb_utils import get_list_version
+
+        return _list_token(get_list_version(user_id))
+
+    async def aget(self, website_id, raise_errors=False):
+        from .mongodb_async import aget_website_by_id
+
+        if not ObjectId.is_valid(website_id):
+            return None
+        return await aget_website_by_id(website_id, raise_errors=raise_errors)
+
+    async def aversion(self, website_id, raise_errors=False):
+        from .mongodb_async import aget_website_version
+
+        if not ObjectId.is_valid(website_id):
+            return None
+        website = await aget_website_version(website_id, raise_errors=raise_errors)
+        return version_token(website) if website else None
+
+    async def alist_version(self, user_id=None):
+        from .mongodb_async import aget_list_version
+
+        return _list_token(await aget_list_version(user_id))
+
+    async def alist(self, user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+        from .mongodb_async import alist_websites
+
+        return await alist_websites(user_id=user_id, limit=limit, cursor=cursor, fields=fields, with_total=with_total)
+
+    def aiter(self, user_id=None, cursor=None, fields=None, batch_size=100):
+        from .mongodb_async import aiter_websites
+
+        return aiter_websites(user_id=user_id, cursor=cursor, fields=fields, batch_size=batch_size)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS websites (
+    id TEXT PRIMARY KEY,
+    user_email TEXT,
+    created_at TEXT,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS websites_user_created ON websites (user_email, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS websites_created ON websites (created_at DESC, id DESC);
+"""
+
+
+def _sort_key(created_at):
+    # MongoDB keeps milliseconds; fixed-width text sorts like the datetimes
+    if not isinstance(created_at, datetime.datetime):
+        return None
+    return created_at.replace(microsecond=created_at.microsecond // 1000 * 1000).isoformat(timespec='microseconds')
+
+
+def _set_path(document, path, value):
+    *parents, leaf = path.split('.')
+    for key in parents:
+        if not isinstance(document.get(key), dict):
+            document[key] = {}
+        document = document[key]
+    document[leaf] = value
+
+
+def _project(document, fields):
+    """mongodb_utils._projection applied to a loaded document."""
+    if not fields:
+        document.pop('replication', None)
+        return document
+    projected = {'_id': document['_id']}
+    for path in list(fields) + ['created_at']:
+        source, target = document, projected
+        *parents, leaf = path.split('.')
+        for key in parents:
+            source = source.get(key) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(key, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+    return projected
+
+
+@register_repository('sqlite')
+class SQLiteWebsiteRepository(WebsiteRepository):
+    """
+    Websites as JSON documents (MongoDB extended JSON, so datetimes and
+    ObjectIds survive) in one SQLite table, with the list order and user
+    filter indexed in their own columns.
+
+    Args:
+        path (str): Database file, or ``:memory:`` for a private in-memory
+            database (WEBSITE_REPOSITORY_PATH by default)
+    """
+
+    def __init__(self, path=None):
+        self.path = path or setting('WEBSITE_REPOSITORY_PATH', ':memory:')
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.executescript(SQLITE_SCHEMA)
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    @staticmethod
+    def _load(row):
+        document = json_util.loads(row[0])
+        document['_id'] = str(document['_id'])
+        return document
+
+    def save(self, website_data):
+        now = datetime.datetime.now()
+        website_data.setdefault('created_at', now)
+        website_data.setdefault('updated_at', now)
+        website_data.setdefault('_id', ObjectId())
+        try:
+            self._execute(
+                "INSERT INTO websites (id, user_email, created_at, document) VALUES (?, ?, ?, ?)",
+                (str(website_data['_id']), website_data.get('user_email'),
+                 _sort_key(website_data.get('created_at')), json_util.dumps(website_data))
+            )
+            return str(website_data['_id'])
+        except Exception as e:
+            logger.error(f"Error saving website data: {e}")
+            return None
+
+    def get(self, website_id, raise_errors=False):
+        if not ObjectId.is_valid(website_id):
+            return None
+        try:
+            rows = self._execute("SELECT document FROM websites WHERE id = ?", (str(website_id),))
+            return self._load(rows[0]) if rows else None
+        except Exception as e:
+            logger.error(f"Error retrieving website: {e}")
+            if raise_errors:
+                raise
+            return None
+
+    def version(self, website_id, raise_errors=False):
+        if not ObjectId.is_valid(website_id):
+            return None
+        try:
+            rows = self._execute(
+                "SELECT json_extract(document, '$.updated_at') FROM websites WHERE id = ?", (str(website_id),)
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving website version: {e}")
+            if raise_errors:
+                raise
+            return None
+        if not rows:
+            return None
+        return version_token({'updated_at': json_util.loads(rows[0][0]) if rows[0][0] else None})
+
+    def update(self, website_id, update_data):
+        if not ObjectId.is_valid(website_id):
+            return False
+        update_data['updated_at'] = datetime.datetime.now()
+        try:
+            with self._lock:
+                connection = self._connection
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = connection.execute("SELECT document FROM websites WHERE id = ?", (str(website_id),)).fetchall()
+                    if not rows:
+                        connection.execute("ROLLBACK")
+                        return False
+                    document = json_util.loads(rows[0][0])
+                    for path, value in update_data.items():
+                        _set_path(document, path, value)
+                    connection.execute(
+                        "UPDATE websites SET user_email = ?, created_at = ?, document = ? WHERE id = ?",
+                        (document.get('user_email'), _sort_key(document.get('created_at')),
+                         json_util.dumps(document), str(website_id))
+                    )
+                    connection.execute("COMMIT")
+                except Exception:
+                    connection.execute("ROLLBACK")
+                    raise
+            website_cache.invalidate(website_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating website: {e}")
+            return False
+
+    def patch(self, website_id, operations, expected_updated_at=ANY_VERSION):
+        if not ObjectId.is_valid(website_id):
+            return None
+        try:
+            with self._lock:
+                connection = self._connection
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = connection.execute("SELECT document FROM websites WHERE id = ?", (str(website_id),)).fetchall()
+                    if not rows:
+                        connection.execute("ROLLBACK")
+                        return None
+                    document = json_util.loads(rows[0][0])
+                    if expected_updated_at is not ANY_VERSION and not same_version(document, expected_updated_at):
+                        connection.execute("ROLLBACK")
+                        raise VersionConflict(version_token(document))
+                    apply_operations(document, operations)
+                    now = datetime.datetime.now()
+                    document['updated_at'] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+                    connection.execute(
+                        "UPDATE websites SET user_email = ?, document = ? WHERE id = ?",
+                        (document.get('user_email'), json_util.dumps(document), str(website_id))
+                    )
+                    connection.execute("COMMIT")
+                except VersionConflict:
+                    raise
+                except Exception:
+                    connection.execute("ROLLBACK")
+                    raise
+            website_cache.invalidate(website_id)
+            document['_id'] = str(document['_id'])
+            document.pop('replication', None)
+            return document
+        except (PatchError, VersionConflict):
+            raise
+        except Exception as e:
+            logger.error(f"Error patching website: {e}")
+            return None
+
+    def delete(self, website_id):
+        if not ObjectId.is_valid(website_id):
+            return False
+        try:
+            with self._lock:
+                deleted = self._connection.execute("DELETE FROM websites WHERE id = ?", (str(website_id),)).rowcount
+            website_cache.invalidate(website_id)
+            return deleted > 0
+        except Exception as e:
+            logger.error(f"Error deleting website: {e}")
+            return False
+
+    def _query(self, user_id, cursor):
+        """WHERE clause and parameters of list and iter."""
+        from .mongodb_utils import decode_cursor
+
+        clauses, parameters = [], []
+        if user_id:
+            clauses.append("user_email = ?")
+            parameters.append(user_id)
+        if cursor:
+            created_at, object_id = decode_cursor(cursor)
+            if created_at is None:
+                clauses.append("created_at IS NULL AND id < ?")
+                parameters.append(str(object_id))
+            else:
+                created_at = _sort_key(created_at)
+                clauses.append("(created_at < ? OR (created_at = ? AND id < ?) OR created_at IS NULL)")
+                parameters.extend([created_at, created_at, str(object_id)])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), parameters
+
+    def list(self, user_id=None, limit=20, cursor=None, fields=None, with_total=False):
+        from .mongodb_utils import _page
+
+        where, parameters = self._query(user_id, cursor)
+        try:
+            # One extra document tells whether there is a next page
+            rows = self._execute(
+                f"SELECT document FROM websites{where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                parameters + [limit + 1]
+            )
+            websites = [_project(self._load(row), fields) for row in rows]
+            total = self.count(user_id) if with_total else None
+            return _page(websites, limit, total)
+        except Exception as e:
+            logger.error(f"Error listing websites: {e}")
+            return None
+
+    def iter(self, user_id=None, cursor=None, fields=None, batch_size=100):
+        self._query(user_id, cursor)
+        return self._iter_pages(user_id, cursor, fields, batch_size)
+
+    def _iter_pages(self, user_id, cursor, fields, batch_size):
+        # Keyset pages, so no read holds the lock for the whole export
+        while True:
+            page = self.list(user_id=user_id, limit=batch_size, cursor=cursor, fields=fields)
+            if page is None:
+                raise RuntimeError("Error reading websites from SQLite")
+            yield from page['websites']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    def list_version(self, user_id=None):
+        where, parameters = self._query(user_id, None)
+        try:
+            # Extended JSON dates are ISO strings from 1970 on, which sort like the datetimes
+            rows = self._execute(
+                f"SELECT json_extract(document, '$.updated_at') FROM websites{where} "
+                f"ORDER BY json_extract(document, '$.updated_at.\"$date\"') DESC LIMIT 1", parameters
+            )
+            count = self._execute(f"SELECT COUNT(*) FROM websites{where}", parameters)[0][0]
+        except Exception as e:
+            logger.error(f"Error reading website list version: {e}")
+            return None
+        return _list_token((count, json_util.loads(rows[0][0]) if rows and rows[0][0] else None))
+
+    def count(self, user_id=None):
+        where, parameters = self._query(user_id, None)
+        try:
+            return self._execute(f"SELECT COUNT(*) FROM websites{where}", parameters)[0][0]
+        except Exception as e:
+            logger.error(f"Error counting websites: {e}")
+            return None
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_repository():
+    """Return the configured website repository, creating it on first use."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                name = setting('WEBSITE_REPOSITORY', DEFAULT_REPOSITORY)
+                if name not in REPOSITORIES:
+                    raise ValueError(f"Unknown website repository: {name}")
+                _repository = REPOSITORIES[name]()
+                logger.info(f"Using website repository: {name}")
+    return _repository
+
+def set_repository(repository):
+    """Replace the active repository with an instance or a registered name."""
+    global _repository
+    if isinstance(repository, str):
+        if repository not in REPOSITORIES:
+            raise ValueError(f"Unknown website repository: {repository}")
+        repository = REPOSITORIES[repository]()
+    with _repository_lock:
+        _repository = repository
@@ -0,0 +1,351 @@
+"""
+Conformance checks for website repositories.
+
+Every repository in main.repositories must pass all of CHECKS, so the
+production store and the local one behave the same for every endpoint. Run
+them with ``python manage.py check_repositories``. Each check stores
+websites only for throwaway users (``conformance-...@example.com``) and
+deletes them afterwards, so the checks are safe against a live database.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from .website_patch import (
+    Operation,
+    PatchError,
+    VersionConflict,
+    check_operations,
+    parse_version_token,
+    version_token,
+)
+
+# (name, function) in run order
+CHECKS = []
+
+
+class ConformanceError(AssertionError):
+    pass
+
+
+def check(func):
+    """Register a conformance check: ``func(repository, fixture)``."""
+    CHECKS.append((func.__name__, func))
+    return func
+
+
+def expect(condition, message):
+    if not condition:
+        raise ConformanceError(message)
+
+
+class Fixture:
+    """Throwaway users and websites of one check."""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.users = []
+
+    def user(self):
+        email = f"conformance-{uuid.uuid4().hex[:12]}@example.com"
+        self.users.append(email)
+        return email
+
+    def website(self, user_email, **fields):
+        website = {
+            'user_email': user_email,
+            'business_name': 'Conformance Bakery',
+            'business_type': 'bakery',
+            'industry': 'food',
+            'location': 'Springfield',
+            'description': 'Fresh bread every morning',
+            'content': {'hero': {'title': 'Welcome', 'subtitle': 'Fresh bread'}, 'sections': ['about', 'menu']},
+        }
+        website.update(fields)
+        website_id = self.repository.save(website)
+        expect(website_id is not None, "save() returned None")
+        return website_id
+
+    def cleanup(self):
+        for user_email in self.users:
+            websites = self.repository.iter(user_id=user_email, fields=('business_name',))
+            for website in list(websites or []):
+                self.repository.delete(website['_id'])
+
+
+def _ms(value):
+    # Stores keep datetimes to the millisecond
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+@check
+def save_and_get(repository, fixture):
+    created_at = datetime(2024, 3, 1, 12, 30, 15, 123456)
+    website_id = fixture.website(fixture.user(), created_at=created_at)
+    expect(isinstance(website_id, str) and ObjectId.is_valid(website_id), f"save() returned {website_id!r}, not an ObjectId string")
+
+    website = repository.get(website_id)
+    expect(website is not None, "get() did not find a saved website")
+    expect(website['_id'] == website_id, f"get() returned _id {website['_id']!r}")
+    expect(website['business_name'] == 'Conformance Bakery', "get() changed a string field")
+    expect(website['content'] == {'hero': {'title': 'Welcome', 'subtitle': 'Fresh bread'}, 'sections': ['about', 'menu']},
+           "get() changed the nested content")
+    expect(website['created_at'] == _ms(created_at), f"created_at came back as {website['created_at']!r}")
+    expect(isinstance(website.get('updated_at'), datetime), "save() did not set updated_at")
+
+
+@check
+def save_sets_timestamps_and_id(repository, fixture):
+    website = {'user_email': fixture.user(), 'business_name': 'Timestamps'}
+    before = _ms(datetime.now())
+    website_id = repository.save(website)
+    expect(str(website.get('_id')) == website_id, "save() did not set _id on the saved dict")
+    stored = repository.get(website_id)
+    expect(stored['created_at'] >= before - timedelta(seconds=1), "save() did not default created_at to now")
+
+
+@check
+def get_unknown_ids(repository, fixture):
+    expect(repository.get(str(ObjectId())) is None, "get() of an unknown id did not return None")
+    expect(repository.get('not-an-id') is None, "get() of a malformed id did not return None")
+    expect(repository.get('42') is None, "get() of an ORM-style id did not return None")
+
+
+@check
+def update_sets_fields(repository, fixture):
+    website_id = fixture.website(fixture.user())
+    before = repository.get(website_id)['updated_at']
+    expect(repository.update(website_id, {'business_name': 'Renamed', 'content.hero.title': 'Hello'}),
+           "update() of an existing website returned False")
+    website = repository.get(website_id)
+    expect(website['business_name'] == 'Renamed', "update() did not set a field")
+    expect(website['content']['hero'] == {'title': 'Hello', 'subtitle': 'Fresh bread'},
+           f"update() of a dotted path gave {website['content']['hero']!r}")
+    expect(website['content']['sections'] == ['about', 'menu'], "update() of a dotted path changed its siblings")
+    expect(website['updated_at'] >= before, "update() did not bump updated_at")
+    expect(repository.update(str(ObjectId()), {'business_name': 'x'}) is False, "update() of an unknown id did not return False")
+    expect(repository.update('not-an-id', {'business_name': 'x'}) is False, "update() of a malformed id did not return False")
+
+
+@check
+def patch_targets_paths(repository, fixture):
+    website_id = fixture.website(fixture.user())
+    before = repository.get(website_id)
+    operations = check_operations([
+        Operation('set', 'content.hero.title', 'Patched'),
+        Operation('push', 'content.sections', 'contact'),
+        Operation('push', 'content.sections', 'gallery'),
+        Operation('unset', 'content.hero.subtitle'),
+        Operation('set', 'business_name', 'Patched Bakery'),
+    ])
+    website = repository.patch(website_id, operations)
+    expect(website is not None, "patch() of an existing website returned None")
+    expect(website['_id'] == website_id, f"patch() returned _id {website['_id']!r}")
+    expect(website['content'] == {'hero': {'title': 'Patched'}, 'sections': ['about', 'menu', 'contact', 'gallery']},
+           f"patch() gave content {website['content']!r}")
+    expect(website['business_name'] == 'Patched Bakery' and website['location'] == 'Springfield', "patch() changed the wrong fields")
+    expect(website['updated_at'] >= before['updated_at'], "patch() did not bump updated_at")
+    expect(repository.get(website_id)['content'] == website['content'], "patch() returned content that was not stored")
+    expect(repository.patch(str(ObjectId()), operations) is None, "patch() of an unknown id did not return None")
+
+    website = repository.patch(website_id, check_operations([Operation('push', 'content.sections', 'home', 1)]))
+    expect(website['content']['sections'] == ['about', 'home', 'menu', 'contact', 'gallery'],
+           f"patch() of a positioned push gave {website['content']['sections']!r}")
+
+    try:
+        repository.patch(website_id, check_operations([Operation('push', 'content.hero.title', 'x')]))
+    except PatchError:
+        pass
+    else:
+        raise ConformanceError("patch() pushing to a string did not raise PatchError")
+
+
+@check
+def patch_checks_version(repository, fixture):
+    website_id = fixture.website(fixture.user(), updated_at=datetime(2024, 1, 1))
+    version = version_token(repository.get(website_id))
+    expect(version == '2024-01-01T00:00:00.000', f"version_token() of a stored website is {version!r}")
+    operations = check_operations([Operation('set', 'content.hero.title', 'First')])
+    website = repository.patch(website_id, operations, parse_version_token(version))
+    expect(website is not None and website['content']['hero']['title'] == 'First', "patch() at the expected version did not apply")
+    try:
+        repository.patch(website_id, check_operations([Operation('set', 'content.hero.title', 'Second')]),
+                         parse_version_token(version))
+    except VersionConflict as e:
+        expect(e.current_version == version_token(website), f"VersionConflict reports version {e.current_version!r}")
+    else:
+        raise ConformanceError("patch() at a stale version did not raise VersionConflict")
+    expect(repository.get(website_id)['content']['hero']['title'] == 'First', "a conflicting patch() was applied")
+
+
+@check
+def delete_removes(repository, fixture):
+    user_email = fixture.user()
+    website_id = fixture.website(user_email)
+    expect(repository.delete(website_id) is True, "delete() of an existing website did not return True")
+    expect(repository.get(website_id) is None, "get() found a deleted website")
+    expect(repository.delete(website_id) is False, "delete() of a deleted website did not return False")
+    expect(repository.delete('not-an-id') is False, "delete() of a malformed id did not return False")
+    expect(repository.count(user_email) == 0, "count() includes a deleted website")
+
+
+@check
+def versions_track_changes(repository, fixture):
+    user_email = fixture.user()
+    old = datetime(2024, 1, 1)
+    website_id = fixture.website(user_email, updated_at=old)
+    expect(repository.version(website_id) == version_token(repository.get(website_id)),
+           "version() differs from the version_token of get()")
+    expect(repository.version(str(ObjectId())) is None, "version() of an unknown id did not return None")
+    expect(repository.version('not-an-id') is None, "version() of a malformed id did not return None")
+
+    listed = repository.list_version(user_email)
+    expect(listed is not None and repository.list_version(user_email) == listed, "list_version() changed without a write")
+    other = fixture.website(user_email, updated_at=old)
+    expect(repository.list_version(user_email) != listed, "list_version() did not change when a website was saved")
+    listed = repository.list_version(user_email)
+    fixture.website(fixture.user())
+    expect(repository.list_version(user_email) == listed, "list_version() changed with another user's website")
+    repository.update(website_id, {'business_name': 'Renamed'})
+    expect(repository.version(website_id) != version_token({'updated_at': old}), "version() did not change with update()")
+    expect(repository.list_version(user_email) != listed, "list_version() did not change when a website was updated")
+    listed = repository.list_version(user_email)
+    repository.delete(other)
+    expect(repository.list_version(user_email) != listed, "list_version() did not change when a website was deleted")
+
+    async def read():
+        return await repository.aversion(website_id), await repository.alist_version(user_email)
+
+    expect(asyncio.run(read()) == (repository.version(website_id), repository.list_version(user_email)),
+           "aversion() or alist_version() differ from version() and list_version()")
+
+
+def _ordered_websites(fixture, user_email):
+    """Websites of ``user_email`` covering every ordering rule, in list order."""
+    base = datetime(2024, 5, 1, 9, 0, 0)
+    ids = {}
+    for minutes in (3, 1, 4, 5, 9, 2, 6):
+        ids[minutes] = fixture.website(user_email, created_at=base + timedelta(minutes=minutes), business_name=f"At {minutes}")
+    # Same created_at: the larger _id comes first
+    tied = [fixture.website(user_email, created_at=base + timedelta(minutes=7), business_name="Tied") for _ in range(2)]
+    # Without created_at: last
+    undated = fixture.website(user_email, created_at=None, business_name="Undated")
+    order = [ids[9]] + sorted(tied, reverse=True) + [ids[m] for m in (6, 5, 4, 3, 2, 1)] + [undated]
+    return order
+
+
+@check
+def list_order_and_cursors(repository, fixture):
+    user_email = fixture.user()
+    expected = _ordered_websites(fixture, user_email)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = repository.list(user_id=user_email, limit=3, cursor=cursor, with_total=True)
+        expect(page is not None, "list() returned None")
+        expect(len(page['websites']) <= 3, "list() returned more than limit websites")
+        expect(page['total'] == len(expected), f"list() total is {page['total']}, expected {len(expected)}")
+        seen.extend(website['_id'] for website in page['websites'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        expect(pages < 10, "list() cursors do not terminate")
+    expect(seen == expected, f"list() order is {seen}, expected {expected}")
+
+    page = repository.list(user_id=user_email, limit=len(expected))
+    expect(page['next_cursor'] is None, "list() of exactly every website returned a next cursor")
+    expect(page['total'] is None, "list() returned a total that was not requested")
+
+
+@check
+def list_fields(repository, fixture):
+    user_email = fixture.user()
+    fixture.website(user_email)
+    page = repository.list(user_id=user_email, fields=('business_name', 'content.hero'))
+    website = page['websites'][0]
+    expect(set(website) == {'_id', 'business_name', 'content', 'created_at'}, f"list() with fields returned {sorted(website)}")
+    expect(website['content'] == {'hero': {'title': 'Welcome', 'subtitle': 'Fresh bread'}}, "list() did not project a dotted field")
+    whole = repository.list(user_id=user_email)['websites'][0]
+    expect('replication' not in whole, "list() returned the replication marker")
+    expect('description' in whole, "list() without fields did not return whole documents")
+
+
+@check
+def list_filters_by_user(repository, fixture):
+    alice, bob = fixture.user(), fixture.user()
+    for _ in range(3):
+        fixture.website(alice)
+    fixture.website(bob)
+    websites = repository.list(user_id=alice)['websites']
+    expect(len(websites) == 3 and all(website['user_email'] == alice for website in websites),
+           "list() mixed in another user's websites")
+    expect(repository.count(alice) == 3 and repository.count(bob) == 1, "count() by user is wrong")
+    expect(repository.count() >= 4, "count() of every website is too small")
+
+
+@check
+def malformed_cursor(repository, fixture):
+    for call in (lambda: repository.list(cursor='garbage'), lambda: repository.iter(cursor='garbage')):
+        try:
+            call()
+        except ValueError:
+            continue
+        raise ConformanceError("a malformed cursor did not raise ValueError")
+
+
+@check
+def iter_matches_list(repository, fixture):
+    user_email = fixture.user()
+    expected = _ordered_websites(fixture, user_email)
+    websites = repository.iter(user_id=user_email, batch_size=2)
+    expect(websites is not None, "iter() returned None")
+    expect([website['_id'] for website in websites] == expected, "iter() order differs from list()")
+
+    cursor = repository.list(user_id=user_email, limit=4)['next_cursor']
+    rest = [website['_id'] for website in repository.iter(user_id=user_email, cursor=cursor, fields=('business_name',))]
+    expect(rest == expected[4:], "iter() after a cursor does not continue the list")
+
+
+@check
+def async_reads(repository, fixture):
+    user_email = fixture.user()
+    expected = _ordered_websites(fixture, user_email)
+
+    async def read():
+        website = await repository.aget(expected[0])
+        page = await repository.alist(user_id=user_email, limit=5)
+        exported = [website['_id'] async for website in repository.aiter(user_id=user_email, batch_size=3)]
+        return website, page, exported
+
+    website, page, exported = asyncio.run(read())
+    expect(website is not None and website['_id'] == expected[0], "aget() differs from get()")
+    expect([w['_id'] for w in page['websites']] == expected[:5], "alist() differs from list()")
+    expect(exported == expected, "aiter() differs from iter()")
+
+
+def run_checks(repository, names=None):
+    """
+    Run the conformance checks against ``repository``.
+
+    Args:
+        names (iterable, optional): Only run these checks
+
+    Returns:
+        list: (check name, None if it passed or the error message)
+    """
+    results = []
+    for name, func in CHECKS:
+        if names and name not in names:
+            continue
+        fixture = Fixture(repository)
+        try:
+            func(repository, fixture)
+            results.append((name, None))
+        except Exception as e:
+            results.append((name, f"{type(e).__name__}: {e}" if not isinstance(e, ConformanceError) else str(e)))
+        finally:
+            fixture.cleanup()
+    return results
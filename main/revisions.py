@@ -0,0 +1,244 @@
+"""
+Website content history, stored as snapshots and deltas.
+
+Every saved edit of a website's content becomes a ``WebsiteRevision``. Most
+revisions are deltas: the patch from the previous version, a list of JSON
+Patch operations (``add``, ``remove``, ``replace``) plus ``splice``, a text
+diff that replaces ``remove`` characters at ``at`` of a string with
+``text``. Editing one sentence of a multi-KB HTML section therefore stores
+that sentence, not the section.
+
+A revision is a full snapshot for version 1, every REVISION_SNAPSHOT_INTERVAL
+versions after the previous snapshot, and whenever the deltas since that
+snapshot would outgrow the content itself. Rebuilding any version thus
+loads one snapshot and applies at most REVISION_SNAPSHOT_INTERVAL - 1
+deltas, in two queries. ``python manage.py benchmark_revisions`` reports
+storage per revision and reconstruction latency by interval.
+"""
+import copy
+import json
+import logging
+
+from django.db import IntegrityError, transaction
+
+from .config import setting
+from .models import WebsiteRevision
+
+logger = logging.getLogger(__name__)
+
+# Strings shorter than this (old + new) are replaced instead of spliced
+SPLICE_MIN_LENGTH = 64
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def parse_content(content):
+    """Website content as JSON: ORM rows keep it as a JSON string."""
+    if isinstance(content, str):
+        try:
+            return json.loads(content)
+        except ValueError:
+            return content
+    return content
+
+
+def _pointer(path, key):
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _tokens(path):
+    if not path:
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+
+def _splice(path, old, new):
+    """A ``splice`` of ``old`` into ``new``: only the changed middle is kept."""
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    return {'op': 'splice', 'path': path, 'at': start, 'remove': len(old) - start - end, 'text': new[start:len(new) - end]}
+
+
+def diff(old, new, path=''):
+    """
+    Patch operations that turn ``old`` into ``new``.
+
+    Dicts are compared key by key and lists index by index (growing or
+    shrinking at the end); long strings are spliced. Anything else that
+    changed is replaced whole.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{'op': 'remove', 'path': _pointer(path, key)} for key in old if key not in new]
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': _pointer(path, key), 'value': value})
+            else:
+                ops.extend(diff(old[key], value, _pointer(path, key)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        ops = []
+        for index in range(common):
+            ops.extend(diff(old[index], new[index], _pointer(path, index)))
+        ops.extend({'op': 'add', 'path': _pointer(path, index), 'value': new[index]} for index in range(common, len(new)))
+        # Remove from the end so earlier indexes stay valid
+        ops.extend({'op': 'remove', 'path': _pointer(path, index)} for index in range(len(old) - 1, common - 1, -1))
+        return ops
+    if isinstance(old, str) and isinstance(new, str) and len(old) + len(new) >= SPLICE_MIN_LENGTH:
+        splice = _splice(path, old, new)
+        if len(splice['text']) < len(new):
+            return [splice]
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def apply_patch(document, ops):
+    """
+    Apply ``diff`` operations to ``document``, in place where possible.
+
+    Returns:
+        The patched document (a new object when the root is replaced)
+    """
+    for op in ops:
+        tokens = _tokens(op['path'])
+        if not tokens:
+            if op['op'] == 'splice':
+                document = document[:op['at']] + op['text'] + document[op['at'] + op['remove']:]
+            else:
+                document = copy.deepcopy(op['value'])
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        key = int(tokens[-1]) if isinstance(parent, list) else tokens[-1]
+        if op['op'] == 'remove':
+            del parent[key]
+        elif op['op'] == 'add' and isinstance(parent, list):
+            parent.insert(key, copy.deepcopy(op['value']))
+        elif op['op'] in ('add', 'replace'):
+            parent[key] = copy.deepcopy(op['value'])
+        elif op['op'] == 'splice':
+            value = parent[key]
+            parent[key] = value[:op['at']] + op['text'] + value[op['at'] + op['remove']:]
+        else:
+            raise ValueError(f"Unknown patch operation: {op['op']}")
+    return document
+
+
+class RevisionStore:
+    """
+    Versioned website content in ``WebsiteRevision`` rows.
+
+    Args:
+        snapshot_interval (int): Versions between full snapshots; rebuilding
+            a version applies at most ``snapshot_interval - 1`` deltas
+    """
+
+    def __init__(self, snapshot_interval=10):
+        self.snapshot_interval = max(1, snapshot_interval)
+
+    @staticmethod
+    def _chain(website_id, version=None):
+        """The revisions from the last snapshot up to ``version`` (latest if None)."""
+        revisions = WebsiteRevision.objects.filter(website_id=str(website_id))
+        if version is not None:
+            revisions = revisions.filter(version__lte=version)
+        snapshot = (revisions.filter(kind=WebsiteRevision.KIND_SNAPSHOT)
+                    .order_by('-version').values_list('version', flat=True).first())
+        if snapshot is None:
+            return []
+        return list(revisions.filter(version__gte=snapshot).order_by('version'))
+
+    @staticmethod
+    def _rebuild(chain):
+        content = json.loads(chain[0].data)
+        for revision in chain[1:]:
+            content = apply_patch(content, json.loads(revision.data))
+        return content
+
+    def latest_version(self, website_id):
+        """The newest version number, or 0 without history."""
+        version = (WebsiteRevision.objects.filter(website_id=str(website_id))
+                   .order_by('-version').values_list('version', flat=True).first())
+        return version or 0
+
+    def get(self, website_id, version=None):
+        """
+        The content of ``version`` (the latest if None).
+
+        Returns:
+            The content, or None if the version does not exist
+        """
+        chain = self._chain(website_id, version)
+        if not chain or (version is not None and chain[-1].version != version):
+            return None
+        return self._rebuild(chain)
+
+    def record(self, website_id, content, baseline=None):
+        """
+        Store ``content`` as the next version of the website.
+
+        Args:
+            baseline: The content before this edit; recorded as version 1
+                first when the website has no history yet
+
+        Returns:
+            int: The version of ``content`` (unchanged content is not
+                stored again)
+        """
+        content = parse_content(content)
+        for attempt in range(3):
+            try:
+                with transaction.atomic():
+                    return self._record(str(website_id), content, parse_content(baseline))
+            except IntegrityError:
+                # Another edit took the version number; diff against it instead
+                if attempt == 2:
+                    raise
+
+    def _record(self, website_id, content, baseline):
+        chain = self._chain(website_id)
+        if not chain and baseline is not None and baseline != content:
+            self._save(website_id, 1, WebsiteRevision.KIND_SNAPSHOT, _encode(baseline))
+            chain = self._chain(website_id)
+        if not chain:
+            return self._save(website_id, 1, WebsiteRevision.KIND_SNAPSHOT, _encode(content))
+
+        previous = self._rebuild(chain)
+        ops = diff(previous, content)
+        latest = chain[-1].version
+        if not ops:
+            return latest
+        delta = _encode(ops)
+        snapshot = _encode(content)
+        delta_bytes = sum(revision.size for revision in chain[1:]) + len(delta)
+        if len(chain) >= self.snapshot_interval or delta_bytes >= len(snapshot):
+            return self._save(website_id, latest + 1, WebsiteRevision.KIND_SNAPSHOT, snapshot)
+        return self._save(website_id, latest + 1, WebsiteRevision.KIND_DELTA, delta)
+
+    @staticmethod
+    def _save(website_id, version, kind, data):
+        WebsiteRevision.objects.create(website_id=website_id, version=version, kind=kind, data=data, size=len(data))
+        return version
+
+    def history(self, website_id):
+        """Every version of the website, newest first, without content."""
+        return list(
+            WebsiteRevision.objects.filter(website_id=str(website_id))
+            .order_by('-version').values('version', 'kind', 'size', 'created_at')
+        )
+
+    def delete(self, website_id):
+        """Forget the website's history."""
+        WebsiteRevision.objects.filter(website_id=str(website_id)).delete()
+
+
+revisions = RevisionStore(snapshot_interval=setting('REVISION_SNAPSHOT_INTERVAL', 10))
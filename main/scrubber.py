@@ -0,0 +1,266 @@
+"""
+Single-pass scrubber for instruction text the AI model leaves in its output.
+
+Every scrub rule is a regular expression of the form ``<prefix>.*?<terminator>``
+applied with DOTALL and IGNORECASE. The original implementation ran one
+``re.sub`` per rule, rescanning the whole document each time, and a rule whose
+prefix appears without a terminator made the lazy ``.*?`` scan to the end of
+the document once per occurrence.
+
+The Scrubber compiles all prefixes into one alternation and walks the text
+once: for each prefix occurrence it searches forward for that rule's
+terminator, and a rule whose terminator is missing is never tried again
+(no later occurrence can find one either). Matching runs case-sensitively on a
+lowercased copy of the text, which the regex engine scans far faster than an
+IGNORECASE alternation. When matches of different rules interact, so that
+running the rules one after another could give a different result, the
+scrubber switches to one linear pass per rule. Either way the output is
+identical to applying the rules in order with ``re.sub``.
+"""
+import re
+
+FLAGS = re.DOTALL | re.IGNORECASE
+
+# How far around a removed span to look for a prefix or terminator that the
+# removal has joined together
+JOIN_WINDOW = 256
+
+# Characters that IGNORECASE matches against ASCII letters but str.lower()
+# does not map onto them (or maps onto two characters)
+_CASE_SPECIALS = re.compile('[İıſ]')
+
+
+def _lower_pattern(pattern):
+    """Lowercase a pattern's literal characters, leaving escapes such as \\S alone."""
+    result = []
+    escaped = False
+    for char in pattern:
+        result.append(char if escaped else char.lower())
+        escaped = not escaped and char == '\\'
+    return ''.join(result)
+
+
+def _combine(patterns, flags):
+    # Capturing groups would disable the regex engine's literal prefix scan,
+    # so the matching rule is identified separately
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+
+
+class ScrubRule:
+    """One ``<prefix>.*?<terminator>`` rule, split into its two halves."""
+
+    def __init__(self, pattern):
+        prefix, separator, terminator = pattern.partition('.*?')
+        if not separator or not prefix or not terminator or '.*?' in terminator:
+            raise ValueError(f"Scrub rules must look like '<prefix>.*?<terminator>': {pattern!r}")
+        self.pattern = pattern
+        self.regex = re.compile(pattern, FLAGS)
+        self.prefix = prefix
+        self.terminator = terminator
+
+    def __repr__(self):
+        return f"ScrubRule({self.pattern!r})"
+
+
+class _Matchers:
+    """Compiled regexes for one way of matching (IGNORECASE or lowercased text)."""
+
+    def __init__(self, rules, flags, transform):
+        prefixes = [transform(rule.prefix) for rule in rules]
+        terminators = [transform(rule.terminator) for rule in rules]
+        self.prefix_re = _combine(prefixes, flags)
+        self.prefixes = [re.compile(prefix, flags) for prefix in prefixes]
+        self.terminators = [re.compile(terminator, flags) for terminator in terminators]
+        # Prefixes of the rules that run before rule i in the sequential order
+        self.earlier_prefix_re = [_combine(prefixes[:index], flags) for index in range(len(rules))]
+
+
+class Scrubber:
+    """
+    Remove every match of an ordered list of scrub rules.
+
+    Args:
+        patterns (list): Rule patterns, highest priority first. The result is
+            the same as ``re.sub(pattern, '', text, flags=DOTALL | IGNORECASE)``
+            applied for each pattern in this order.
+    """
+
+    def __init__(self, patterns):
+        self.rules = [ScrubRule(pattern) for pattern in patterns]
+        self._ignorecase = _Matchers(self.rules, FLAGS, lambda pattern: pattern)
+        self._lowercase = None
+        if all(pattern.isascii() for pattern in patterns):
+            self._lowercase = _Matchers(self.rules, re.DOTALL, _lower_pattern)
+
+        # For callers that scan text themselves (the streaming cleaner)
+        self.prefix_re = self._ignorecase.prefix_re
+        self.max_prefix_length = max(len(rule.prefix) for rule in self.rules)
+
+        # Zero-width versions report every start position, including ones
+        # inside another match, for the join check
+        self._overlapping_res = [
+            re.compile(f'(?=({"|".join(parts)}))', FLAGS)
+            for parts in ([rule.prefix for rule in self.rules], [rule.terminator for rule in self.rules])
+        ]
+
+    def _prepare(self, text):
+        """Return the text to match against and the matchers to use on it."""
+        if self._lowercase is not None and not _CASE_SPECIALS.search(text):
+            return text.lower(), self._lowercase
+        return text, self._ignorecase
+
+    def scrub(self, text):
+        """Return ``text`` with every rule match removed."""
+        result = self._scrub_single_pass(text)
+        if result is None:
+            return self.scrub_rule_by_rule(text)
+        return result
+
+    def scrub_rule_by_rule(self, text):
+        """Apply the rules one after another, each in a single linear pass."""
+        for index in range(len(self.rules)):
+            scan, matchers = self._prepare(text)
+            prefix_re = matchers.prefixes[index]
+            terminator_re = matchers.terminators[index]
+            pieces = []
+            last = 0
+            while True:
+                prefix = prefix_re.search(scan, last)
+                if prefix is None:
+                    break
+                terminator = terminator_re.search(scan, prefix.end())
+                if terminator is None:
+                    # No later occurrence can find a terminator either
+                    break
+                pieces.append(text[last:prefix.start()])
+                last = terminator.end()
+            if pieces:
+                pieces.append(text[last:])
+                text = ''.join(pieces)
+        return text
+
+    def scrub_sequential(self, text):
+        """Apply the rules with ``re.sub``, exactly like the original loop."""
+        for rule in self.rules:
+            text = rule.regex.sub('', text)
+        return text
+
+    def match_at(self, text, pos):
+        """
+        Return the end of the highest-priority rule match starting at ``pos``.
+
+        Returns None when no rule matches there (including when a prefix
+        matches but its terminator does not occur later in ``text``).
+        """
+        for prefix_re, terminator_re in zip(self._ignorecase.prefixes, self._ignorecase.terminators):
+            prefix = prefix_re.match(text, pos)
+            if prefix is None:
+                continue
+            terminator = terminator_re.search(text, prefix.end())
+            if terminator is not None:
+                return terminator.end()
+        return None
+
+    def _scrub_single_pass(self, text):
+        """
+        Remove matches in one left-to-right walk.
+
+        Returns None when matches of different rules overlap or a removal
+        joins text into a new prefix or terminator; those are the only cases
+        where the sequential passes can disagree with a single walk.
+        """
+        scan, matchers = self._prepare(text)
+        spans = []
+        exhausted = set()
+        earlier_cache = {}
+        pos = 0
+        while True:
+            found = matchers.prefix_re.search(scan, pos)
+            if found is None:
+                break
+            start = found.start()
+            # The highest-priority rule whose prefix matches here
+            for index, prefix_re in enumerate(matchers.prefixes):
+                prefix = prefix_re.match(scan, start)
+                if prefix is not None:
+                    break
+            end = None
+            if index not in exhausted:
+                terminator = matchers.terminators[index].search(scan, prefix.end())
+                if terminator is None:
+                    exhausted.add(index)
+                else:
+                    end = terminator.end()
+            if end is None:
+                # Lower-priority rules may still match at this position
+                index, end = self._match_lower_rules(scan, matchers, start, index, exhausted)
+                if end is None:
+                    pos = start + 1
+                    continue
+
+            if self._earlier_prefix_between(scan, matchers, index, start + 1, end, earlier_cache):
+                return None
+            spans.append((start, end))
+            pos = end
+
+        if not spans:
+            return text
+
+        pieces = []
+        joins = []
+        last = 0
+        length = 0
+        for start, end in spans:
+            pieces.append(text[last:start])
+            length += start - last
+            joins.append(length)
+            last = end
+        pieces.append(text[last:])
+        result = ''.join(pieces)
+
+        if self._joined_match(result, joins):
+            return None
+        return result
+
+    def _match_lower_rules(self, scan, matchers, pos, index, exhausted):
+        for lower in range(index + 1, len(self.rules)):
+            if lower in exhausted:
+                continue
+            prefix = matchers.prefixes[lower].match(scan, pos)
+            if prefix is None:
+                continue
+            terminator = matchers.terminators[lower].search(scan, prefix.end())
+            if terminator is None:
+                exhausted.add(lower)
+                continue
+            return lower, terminator.end()
+        return index, None
+
+    def _earlier_prefix_between(self, scan, matchers, index, start, end, cache):
+        """Whether a higher-priority rule's prefix starts in ``[start, end)``."""
+        earlier = matchers.earlier_prefix_re[index]
+        if earlier is None:
+            return False
+        # Searches only ever move forward, so remember the next occurrence
+        searched_from, next_start = cache.get(index, (None, None))
+        if searched_from is None or searched_from > start or (next_start is not None and next_start < start):
+            found = earlier.search(scan, start)
+            next_start = found.start() if found else None
+            cache[index] = (start, next_start)
+        return next_start is not None and next_start < end
+
+    def _joined_match(self, result, joins):
+        """Whether a prefix or terminator straddles a point where a span was removed."""
+        for join in joins:
+            window_start = max(0, join - JOIN_WINDOW)
+            window = result[window_start:join + JOIN_WINDOW]
+            offset = join - window_start
+            for regex in self._overlapping_res:
+                for found in regex.finditer(window):
+                    if found.start() >= offset:
+                        break
+                    if found.end(1) > offset:
+                        return True
+        return False
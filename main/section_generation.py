@@ -0,0 +1,230 @@
+"""
+Per-section website generation.
+
+The page prompt asks for the whole website in one completion, so latency is
+the sum of every section's output. In ``sections`` mode (``GENERATION_MODE``
+setting or environment variable) each section gets its own short prompt
+sharing a style brief, the sections run concurrently on a bounded pool and
+the page is assembled in order inside a common shell. A section that fails,
+returns nothing or is still running at the page deadline is replaced with
+its block from the fallback template, so one slow section never costs the
+whole page.
+"""
+import hashlib
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from .config import setting
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the section prompts or the page shell change
+SECTION_PROMPT_VERSION = 1
+
+# What each section prompt asks for, in page order
+SECTION_INSTRUCTIONS = {
+    'hero': (
+        'A striking hero section with a compelling headline and sub-headline based on the '
+        'business description, and a call-to-action button linking to #contact'
+    ),
+    'about': 'An "About Us" section with realistic, relevant content (NOT placeholder text)',
+    'services': (
+        'A Services/Products section with 3-4 specific offerings that would be realistic for '
+        'this type of business, shown as cards with Font Awesome icons'
+    ),
+    'testimonials': (
+        'A Testimonials section with 2-3 realistic testimonials '
+        '(names and comments should reflect the business type)'
+    ),
+    'contact': 'A Contact section (id="contact") with a form layout and the business location',
+    'footer': 'A footer with copyright, relevant links, and social icons',
+}
+
+# (primary, accent, heading font) shared by every section of a page
+STYLE_PALETTES = [
+    ('#1E3A8A', '#F59E0B', 'Playfair Display'),
+    ('#065F46', '#F97316', 'Montserrat'),
+    ('#7C3AED', '#EC4899', 'Poppins'),
+    ('#0F172A', '#22D3EE', 'Inter'),
+    ('#9A3412', '#CA8A04', 'Lora'),
+    ('#6366F1', '#8B5CF6', 'Raleway'),
+]
+
+_CODE_FENCE = re.compile(r'^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$')
+
+
+class PartialPageError(Exception):
+    """
+    Raised when some sections fell back to the template.
+
+    Carries the assembled page so it can still be served, while keeping it
+    out of the generation cache.
+    """
+
+    def __init__(self, content, failed_sections):
+        super().__init__(f"Sections fell back to the template: {', '.join(failed_sections)}")
+        self.content = content
+        self.failed_sections = failed_sections
+
+
+def sections_enabled():
+    """Whether generate_content should generate the page section by section."""
+    return setting('GENERATION_MODE', 'page') == 'sections'
+
+
+def choose_palette(business_type, industry):
+    """Pick a stable palette for the business so every section agrees on it."""
+    digest = hashlib.sha256(f"{industry}\x1f{business_type}".lower().encode('utf-8')).digest()
+    return STYLE_PALETTES[digest[0] % len(STYLE_PALETTES)]
+
+
+def build_style_brief(fields, palette):
+    """The style guidance repeated in every section prompt."""
+    primary, accent, font = palette
+    return (
+        f"Bootstrap 5, Font Awesome 6 and the '{font}' heading font are already loaded. "
+        f"Brand colors: primary {primary}, accent {accent}; use the predefined classes "
+        "text-brand, bg-brand, bg-brand-soft and btn-brand instead of writing new CSS. "
+        f"Tone: professional and specific to a {fields['business_type']} in the "
+        f"{fields['industry']} industry in {fields['location']}."
+    )
+
+
+def build_section_prompt(section, brief, fields):
+    """Build the prompt for one section of the page."""
+    return f"""Generate one section of a modern website for a {fields['business_type']} called "{fields['business_name']}" in the {fields['industry']} industry, located in {fields['location']}.
+
+Business description: {fields['description']}
+
+Section: {SECTION_INSTRUCTIONS[section]}
+
+Style brief: {brief}
+
+Return only the HTML for this section as a single <section> (or <footer>) element. Do not include <html>, <head>, <body>, <style> or <script> tags, markdown fences, template instructions or placeholder comments.
+"""
+
+
+def page_shell(fields, palette):
+    """Return the HTML before and after the assembled sections."""
+    # Imported lazily: main.utils imports this module
+    from .utils import FALLBACK_ASSETS
+
+    primary, accent, font = palette
+    head = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{fields['business_name']}</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
+    <link href="https://fonts.googleapis.com/css2?family={font.replace(' ', '+')}:wght@600;700&display=swap" rel="stylesheet">{FALLBACK_ASSETS}
+    <style>
+        h1, h2, h3, h4 {{ font-family: '{font}', sans-serif; }}
+        .text-brand {{ color: {primary}; }}
+        .bg-brand {{ background: linear-gradient(135deg, {primary} 0%, {accent} 100%); color: #fff; }}
+        .bg-brand-soft {{ background-color: {primary}0f; }}
+        .btn-brand {{ background-color: {accent}; border-color: {accent}; color: #fff; }}
+        .btn-brand:hover {{ filter: brightness(0.92); color: #fff; }}
+    </style>
+</head>
+<body>
+"""
+    tail = """
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+</body>
+</html>
+"""
+    return head, tail
+
+
+def _strip_code_fence(text):
+    return _CODE_FENCE.sub('', text)
+
+
+def _generate_section(backend, section, prompt, fields):
+    from .utils import finalize_generated_content
+
+    raw = backend.generate_section(prompt, fields, section)
+    content = finalize_generated_content(_strip_code_fence(raw or '')).strip()
+    if not content:
+        raise ValueError("Received an empty section")
+    return content
+
+
+def generate_sections(backend, business_type, industry, business_name='', location='', description='',
+                      parallelism=None, timeout=None):
+    """
+    Generate every section concurrently and assemble the page.
+
+    Args:
+        backend (GenerationBackend): Backend that generates each section
+        parallelism (int): Sections generated at once
+            (default: GENERATION_SECTION_PARALLELISM, 3)
+        timeout (float): Seconds the whole page may take; sections still
+            running then fall back (default: GENERATION_SECTION_TIMEOUT, 45)
+
+    Returns:
+        tuple: (page HTML, list of section names that fell back)
+    """
+    from .utils import FALLBACK_SECTIONS, get_fallback_sections
+
+    parallelism = parallelism or setting('GENERATION_SECTION_PARALLELISM', 3)
+    timeout = timeout or setting('GENERATION_SECTION_TIMEOUT', 45.0)
+    fields = {
+        'business_type': business_type,
+        'industry': industry,
+        'business_name': business_name,
+        'location': location,
+        'description': description,
+    }
+    palette = choose_palette(business_type, industry)
+    brief = build_style_brief(fields, palette)
+
+    blocks = []
+    failed = []
+    deadline = time.monotonic() + timeout
+    executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='section')
+    try:
+        futures = {
+            section: executor.submit(
+                _generate_section, backend, section, build_section_prompt(section, brief, fields), fields
+            )
+            for section in FALLBACK_SECTIONS
+        }
+        fallback = None
+        for section in FALLBACK_SECTIONS:
+            future = futures[section]
+            try:
+                blocks.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                continue
+            except TimeoutError:
+                future.cancel()
+                logger.warning(f"Section '{section}' timed out, using the fallback block")
+            except Exception as e:
+                logger.error(f"Section '{section}' failed, using the fallback block: {e}")
+            if fallback is None:
+                fallback = get_fallback_sections(business_type, industry, business_name, location, description)
+            blocks.append(fallback[section])
+            failed.append(section)
+    finally:
+        # Sections past the deadline finish in the background; their results are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    head, tail = page_shell(fields, palette)
+    return head + '\n'.join(blocks) + tail, failed
+
+
+def generate_page_by_sections(backend, business_type, industry, business_name='', location='', description=''):
+    """
+    Generate the page section by section for generate_content.
+
+    Raises:
+        PartialPageError: If any section fell back; the page is attached
+    """
+    content, failed = generate_sections(backend, business_type, industry, business_name, location, description)
+    if failed:
+        raise PartialPageError(content, failed)
+    return content
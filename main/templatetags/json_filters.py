@@ -13,3 +13,8 @@ def pprint(value):
         except json.JSONDecodeError:
             pass
     return pformat(value, indent=2)
+
+@register.filter
+def mongo_id(document):
+    """The ``_id`` of a MongoDB document (templates cannot read underscore attributes)"""
+    return str(document.get('_id', ''))
@@ -1,3 +1,1400 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import random
+import tempfile
+import re
+import threading
+from datetime import datetime
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import clear_url_caches, resolve
+from google.api_core.exceptions import ResourceExhausted
+
+from ai_builder import urls as project_urls
+
+from . import async_views, urls
+from .autosave import AutosaveBuffer, autosave
+from .bulk import BulkGenerator, iter_records
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .config import setting
+from .content_builder import build_site_content
+from .generation_backends import GenerationBackend, StubBackend
+from .generation_cache import GenerationCache
+from .industry_catalog import ASSETS, IndustryCatalog, IndustryMatcher
+from .jobs import JOB_HANDLERS, claim_next_job, generate_website_job, requeue_stale_jobs, run_job, submit_job
+from .llm_client import FakeModel, LLMClientManager, LLMQueueTimeout, TokenBucket
+from .models import BulkGeneration, GenerationJob, Website
+from .mongo_client import AVAILABLE, NOT_CONFIGURED, UNAVAILABLE, MongoHealth, MongoUnavailable, require_database
+from .mongo_diagnostics import DiagnosticsCache, mongo_diagnostics
+from .mongodb_utils import COLLECTION_NAME, INDEXES, _index_spec, ensure_indexes, get_collection, index_report
+from .replication import WebsiteReplicator, apply_to_orm
+from .repositories import SQLiteWebsiteRepository, set_repository
+from .repository_conformance import run_checks
+from .revisions import apply_patch, diff, revisions
+from .scrubber import Scrubber
+from .section_generation import PartialPageError, generate_page_by_sections, generate_sections
+from .utils import CLEANUP_PATTERNS, FALLBACK_SECTIONS, LOREM_IPSUM_PATTERN, get_fallback_sections
+from .website_cache import WebsiteCache, website_cache
+from .website_patch import (
+    Operation,
+    PatchError,
+    VersionConflict,
+    check_operations,
+    load_editable,
+    parse_dotted,
+    parse_json_patch,
+)
+
+SECRET_KEY = 'test-secret-key-of-at-least-32-bytes'
+
+
+@override_settings(ROOT_URLCONF='ai_builder.urls')
+class WebsiteAPITestCase(TestCase):
+    """Requests through the project URLs, with websites in a private SQLite repository."""
+
+    email = 'owner@example.com'
+
+    def setUp(self):
+        environ = mock.patch.dict(os.environ, {'SECRET_KEY': SECRET_KEY})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.repository = SQLiteWebsiteRepository(':memory:')
+        set_repository(self.repository)
+        self.addCleanup(set_repository, None)
+
+    def auth(self, email=None):
+        token = jwt.encode({'email': email or self.email}, SECRET_KEY, algorithm='HS256')
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def save_website(self, **fields):
+        website = {'user_email': self.email, 'business_name': 'Test Bakery', 'content': {'hero': {'title': 'Welcome'}}}
+        website.update(fields)
+        return self.repository.save(website)
+
+
+class WebsiteListTests(WebsiteAPITestCase):
+
+    def test_api_websites_lists_a_page(self):
+        self.save_website()
+        response = self.client.get('/api/websites/', **self.auth())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([website['business_name'] for website in response.json()], ['Test Bakery'])
+
+    def test_api_routes_resolve_to_the_api_views(self):
+        self.assertEqual(resolve('/api/websites/').url_name, 'list_websites_api')
+        self.assertEqual(resolve('/api/websites/1/').url_name, 'patch_website')
+        self.assertEqual(resolve('/websites/').url_name, 'websites')
+
+    def test_api_websites_needs_a_token(self):
+        self.assertEqual(self.client.get('/api/websites/').status_code, 401)
+        self.assertEqual(self.client.get('/api/websites/', HTTP_AUTHORIZATION='Bearer invalid').status_code, 401)
+
+    def test_api_websites_streams_ndjson(self):
+        self.save_website(business_name='First')
+        self.save_website(business_name='Second')
+        for extra in ({'QUERY_STRING': 'format=ndjson'}, {'HTTP_ACCEPT': 'application/x-ndjson'}):
+            response = self.client.get('/api/websites/', **self.auth(), **extra)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            self.assertEqual([json.loads(line)['business_name'] for line in lines], ['Second', 'First'])
+
+
+class AsyncReadViewTests(WebsiteAPITestCase):
+    """The project URLs as asgi.py serves them, with ASYNC_READ_VIEWS on."""
+
+    def setUp(self):
+        super().setUp()
+        # main.urls picks its read views at import time
+        with self.settings(ASYNC_READ_VIEWS=True):
+            self.reload_urls()
+        self.addCleanup(self.reload_urls)
+
+    @staticmethod
+    def reload_urls():
+        importlib.reload(urls)
+        importlib.reload(project_urls)
+        clear_url_caches()
+
+    @staticmethod
+    async def read_stream(response):
+        # The NDJSON body is an async iterator under the async views
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    def test_read_routes_resolve_to_the_async_views(self):
+        self.assertIs(resolve('/api/websites/').func, async_views.list_websites_api)
+        self.assertIs(resolve('/websites/').func, async_views.get_websites)
+        self.assertIs(resolve('/websites/view/1/').func, async_views.view_website)
+        self.assertIs(resolve('/view-generated-website/abc/').func, async_views.view_generated_website)
+
+    def test_api_websites_lists_a_page(self):
+        self.save_website(business_name='First')
+        self.save_website(business_name='Second')
+        response = self.client.get('/api/websites/', {'limit': 1}, **self.auth())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([website['business_name'] for website in response.json()], ['Second'])
+        self.assertIn('Link', response)
+        response = self.client.get('/api/websites/', HTTP_IF_NONE_MATCH=response['ETag'], **self.auth())
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get('/api/websites/', HTTP_IF_NONE_MATCH=etag, **self.auth())
+        self.assertEqual(response.status_code, 304)
+
+    def test_api_websites_rejects_bad_requests(self):
+        self.assertEqual(self.client.get('/api/websites/').status_code, 401)
+        self.assertEqual(self.client.get('/api/websites/', HTTP_AUTHORIZATION='Bearer invalid').status_code, 401)
+        response = self.client.get('/api/websites/', {'limit': 0}, **self.auth())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'limit must be at least 1'})
+        self.assertEqual(self.client.post('/api/websites/', **self.auth()).status_code, 405)
+
+    def test_api_websites_streams_ndjson(self):
+        self.save_website(business_name='First')
+        self.save_website(business_name='Second')
+        for extra in ({'QUERY_STRING': 'format=ndjson'}, {'HTTP_ACCEPT': 'application/x-ndjson'}):
+            response = self.client.get('/api/websites/', **self.auth(), **extra)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = async_to_sync(self.read_stream)(response).decode().splitlines()
+            self.assertEqual([json.loads(line)['business_name'] for line in lines], ['Second', 'First'])
+
+    def test_get_websites(self):
+        self.save_website()
+        self.assertEqual(self.client.get('/websites/').status_code, 401)
+        response = self.client.get('/websites/', **self.auth())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([website['business_name'] for website in response.json()], ['Test Bakery'])
+
+    def test_view_generated_website_not_modified(self):
+        website_id = self.save_website()
+        response = self.client.get(f'/view-generated-website/{website_id}/')
+        self.assertEqual(response.context['website_layout'], {'hero': {'title': 'Welcome'}})
+        response = self.client.get(f'/view-generated-website/{website_id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_page_views_show_pending_changes_without_writing_them(self):
+        website = Website.objects.create(user_email=self.email, content=json.dumps({'hero': {'title': 'Welcome'}}))
+        self.addCleanup(website_cache.invalidate, website.id)
+        website_id = self.save_website()
+        for pending_id in (website.id, website_id):
+            self.addCleanup(autosave.discard, pending_id)
+            self.client.post(f'/api/websites/{pending_id}/autosave/', data=json.dumps({'set': {'content.hero.title': 'Hi'}}),
+                             content_type='application/json', **self.auth())
+
+        response = self.client.get(f'/websites/view/{website.id}/')
+        self.assertEqual(json.loads(response.context['website'].content), {'hero': {'title': 'Hi'}})
+        self.assertEqual(response['ETag'], f'"{website.id}-1+1"')
+        website.refresh_from_db()
+        self.assertEqual(json.loads(website.content), {'hero': {'title': 'Welcome'}})
+
+        response = self.client.get(f'/view-generated-website/{website_id}/')
+        self.assertEqual(response.context['website_layout'], {'hero': {'title': 'Hi'}})
+        self.assertTrue(response['ETag'].endswith('+1"'))
+        self.assertEqual(self.repository.get(website_id)['content'], {'hero': {'title': 'Welcome'}})
+
+    def test_view_website_not_modified(self):
+        website = Website.objects.create(user_email=self.email, content='{}')
+        self.addCleanup(website_cache.invalidate, website.id)
+        response = self.client.get(f'/websites/view/{website.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['website'].id, website.id)
+        response = self.client.get(f'/websites/view/{website.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+class SettingTests(TestCase):
+
+    def environ(self, **values):
+        return mock.patch.dict(os.environ, values)
+
+    def test_booleans(self):
+        for value, expected in (('false', False), ('False', False), ('0', False), ('no', False), ('off', False),
+                                ('true', True), ('TRUE', True), ('1', True), ('yes', True), ('on', True)):
+            with self.subTest(value=value), self.environ(GENERATION_CACHE_PERSISTENT=value):
+                self.assertIs(setting('GENERATION_CACHE_PERSISTENT', True), expected)
+        with self.environ(GENERATION_CACHE_PERSISTENT='maybe'), self.assertRaises(ImproperlyConfigured):
+            setting('GENERATION_CACHE_PERSISTENT', True)
+
+    def test_numbers(self):
+        with self.environ(AUTOSAVE_INTERVAL='0.5', REPLICATION_BATCH_SIZE='250'):
+            self.assertEqual(setting('AUTOSAVE_INTERVAL', 2.0), 0.5)
+            self.assertEqual(setting('REPLICATION_BATCH_SIZE', 100), 250)
+        with self.environ(REPLICATION_BATCH_SIZE='lots'), self.assertRaisesRegex(ImproperlyConfigured, 'REPLICATION_BATCH_SIZE'):
+            setting('REPLICATION_BATCH_SIZE', 100)
+
+    def test_django_settings_come_first(self):
+        with self.environ(REPLICATION_BATCH_SIZE='250'), override_settings(REPLICATION_BATCH_SIZE=50):
+            self.assertEqual(setting('REPLICATION_BATCH_SIZE', 100), 50)
+        with override_settings(GENERATION_HEDGE=0):
+            self.assertIs(setting('GENERATION_HEDGE', True), False)
+
+    def test_default(self):
+        with self.environ():
+            os.environ.pop('REPLICATION_BATCH_SIZE', None)
+            self.assertEqual(setting('REPLICATION_BATCH_SIZE', 100), 100)
+
+
+@override_settings(MONGO_URI='mongodb://localhost')
+class MongomockTestCase(TestCase):
+    """Runs the synchronous MongoDB helpers against an in-memory mongomock client."""
+
+    def setUp(self):
+        import mongomock
+        self.client = mongomock.MongoClient()
+        for target, value in [
+            ('main.mongo_client.registry.get_client', lambda uri=None: self.client),
+            ('main.mongo_client.health.ensure_started', lambda: None),
+            ('main.mongo_client.health.state', AVAILABLE),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class MongoDatabaseNameTests(MongomockTestCase):
+
+    def test_default_database(self):
+        self.assertEqual(get_collection().database.name, 'ai_builder_db')
+
+    @override_settings(MONGO_DB_NAME='tenant_db')
+    def test_mongo_db_name_names_the_database(self):
+        self.assertEqual(get_collection().database.name, 'tenant_db')
+        self.assertEqual(get_collection('website_deletions').database.name, 'tenant_db')
+
+
+class EnsureMongoIndexesTests(MongomockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # mongomock leaves partialFilterExpression out of index_information(); a server reports it
+        def without_partial_filter(index):
+            key, options = _index_spec(index)
+            options.pop('partialFilterExpression', None)
+            return key, options
+
+        patcher = mock.patch('main.mongodb_utils._index_spec', without_partial_filter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_command(self, *args):
+        stdout = StringIO()
+        call_command('ensure_mongo_indexes', *args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_creates_missing_indexes_once(self):
+        with self.assertRaises(SystemExit):
+            self.run_command('--check')
+        self.assertIn('created user_email_created_at_id', self.run_command())
+        self.assertEqual(self.run_command().count('created nothing'), len(INDEXES))
+        report = index_report()
+        self.assertEqual({name: entry['missing'] + entry['conflicting'] for name, entry in report.items()},
+                         {name: [] for name in INDEXES})
+        self.assertIn('present:', self.run_command('--check'))
+
+    def test_rebuild_and_drop_undeclared(self):
+        websites = self.client['ai_builder_db'][COLLECTION_NAME]
+        websites.create_index([('created_at', 1)], name='created_at_id')
+        websites.create_index([('business_name', 1)], name='business_name')
+        output = self.run_command()
+        self.assertIn('definition changed for created_at_id', output)
+        self.assertEqual(index_report()[COLLECTION_NAME]['conflicting'], ['created_at_id'])
+
+        result = ensure_indexes(rebuild=True, drop_undeclared=True)
+        self.assertEqual(sorted(result[COLLECTION_NAME]['dropped']), ['business_name', 'created_at_id'])
+        self.assertIn('created_at_id', result[COLLECTION_NAME]['created'])
+        entry = index_report()[COLLECTION_NAME]
+        self.assertEqual((entry['conflicting'], entry['undeclared']), ([], []))
+
+    @override_settings(MONGO_URI='')
+    def test_not_configured(self):
+        with self.assertRaises(CommandError):
+            self.run_command()
+
+
+class DiagnosticsCacheTests(TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.gathered = []
+        for target, value in (
+            ('main.mongo_diagnostics.server_diagnostics', self.server_diagnostics),
+            ('main.mongo_diagnostics.time', mock.Mock(monotonic=lambda: self.now)),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache = DiagnosticsCache(ttl=30.0)
+
+    def server_diagnostics(self):
+        self.gathered.append(self.now)
+        return {'connected': True, 'gathered_at': self.now}
+
+    def test_result_is_kept_for_the_ttl(self):
+        self.assertEqual(self.cache.get()['gathered_at'], 100.0)
+        self.now = 130.0
+        self.assertEqual(self.cache.get()['gathered_at'], 100.0)
+        self.now = 130.5
+        self.assertEqual(self.cache.get()['gathered_at'], 130.5)
+        self.assertEqual(self.gathered, [100.0, 130.5])
+
+    def test_clear_forces_a_refresh(self):
+        self.cache.get()
+        self.cache.clear()
+        self.cache.get()
+        self.assertEqual(self.gathered, [100.0, 100.0])
+
+    def test_concurrent_requests_wait_for_one_refresh(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_diagnostics():
+            started.set()
+            release.wait(5)
+            return self.server_diagnostics()
+
+        results = []
+        with mock.patch('main.mongo_diagnostics.server_diagnostics', slow_diagnostics):
+            threads = [threading.Thread(target=lambda: results.append(self.cache.get())) for _ in range(4)]
+            threads[0].start()
+            self.assertTrue(started.wait(5))
+            for thread in threads[1:]:
+                thread.start()
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(self.gathered, [100.0])
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_mongo_diagnostics_adds_live_counters_to_a_copy(self):
+        with mock.patch('main.mongo_diagnostics.diagnostics_cache', self.cache):
+            first = mongo_diagnostics()
+            second = mongo_diagnostics()
+        self.assertEqual(self.gathered, [100.0])
+        self.assertEqual(first['cache_ttl'], 30.0)
+        self.assertIn('pool', second)
+        self.assertNotIn('pool', self.cache.get())
+
+
+@override_settings(MONGO_URI='mongodb://localhost')
+class MongoHealthTests(TestCase):
+
+    def setUp(self):
+        self.down = True
+        self.pings = 0
+        client = mock.Mock()
+        client.admin.command.side_effect = self.ping
+        self.health = MongoHealth(mock.Mock(get_client=lambda: client), interval=30, backoff=1, max_backoff=8)
+
+    def ping(self, command):
+        self.pings += 1
+        if self.down:
+            raise ConnectionError("connection refused")
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        delays = []
+        for _ in range(6):
+            self.assertFalse(self.health.check())
+            delays.append(self.health.next_delay())
+        self.assertEqual(delays, [1, 2, 4, 8, 8, 8])
+        self.assertEqual((self.health.state, self.health.failures), (UNAVAILABLE, 6))
+
+    def test_recovery_resets_the_backoff(self):
+        available = []
+        self.health.on_available(lambda: available.append(1))
+        self.health.check()
+        self.health.check()
+        self.down = False
+        self.assertTrue(self.health.check())
+        self.assertTrue(self.health.check())
+        self.assertEqual((self.health.state, self.health.failures, self.health.reconnects), (AVAILABLE, 0, 1))
+        self.assertEqual(self.health.next_delay(), 30)
+        self.assertEqual(available, [1])
+
+    def test_failed_operation_wakes_the_probe(self):
+        self.down = False
+        self.health.check()
+        self.health.mark_unavailable(ConnectionError("reset"))
+        self.assertTrue(self.health._wake.is_set())
+        self.assertEqual(self.health.next_delay(), 1)
+
+    @override_settings(MONGO_URI='')
+    def test_not_configured(self):
+        self.assertFalse(self.health.check())
+        self.assertEqual((self.health.state, self.pings), (NOT_CONFIGURED, 0))
+
+    def test_require_database_fails_fast_while_unavailable(self):
+        self.health.check()
+        with mock.patch('main.mongo_client.health', self.health):
+            self.health.ensure_started = lambda: None
+            with self.assertRaises(MongoUnavailable):
+                require_database()
+        self.assertEqual(self.pings, 1)
+
+
+class RepositoryConformanceTests(TestCase):
+
+    def test_sqlite_repository_conforms(self):
+        failures = [(name, error) for name, error in run_checks(SQLiteWebsiteRepository(':memory:')) if error]
+        self.assertEqual(failures, [])
+
+
+class ConditionalRequestTests(WebsiteAPITestCase):
+
+    def test_website_not_modified(self):
+        website_id = self.save_website()
+        response = self.client.get(f'/view-generated-website/{website_id}/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(f'/view-generated-website/{website_id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.repository.update(website_id, {'business_name': 'Renamed'})
+        response = self.client.get(f'/view-generated-website/{website_id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_not_modified_until_a_website_changes(self):
+        website_id = self.save_website()
+        etag = self.client.get('/api/websites/', **self.auth())['ETag']
+        response = self.client.get('/api/websites/', HTTP_IF_NONE_MATCH=etag, **self.auth())
+        self.assertEqual(response.status_code, 304)
+        self.repository.delete(website_id)
+        response = self.client.get('/api/websites/', HTTP_IF_NONE_MATCH=etag, **self.auth())
+        self.assertEqual(response.status_code, 200)
+
+    def test_put_with_stale_if_match(self):
+        website = Website.objects.create(user_email=self.email, content='{}')
+        response = self.client.put(f'/websites/{website.id}/', data=json.dumps({'business_name': 'Renamed'}),
+                                   content_type='application/json', HTTP_IF_MATCH='"stale"', **self.auth())
+        self.assertEqual(response.status_code, 412)
+        website.refresh_from_db()
+        self.assertEqual(website.business_name, 'New Business')
+
+
+class AutosaveRouteTests(WebsiteAPITestCase):
+
+    def autosave(self, website_id, body):
+        return self.client.post(f'/api/websites/{website_id}/autosave/', data=json.dumps(body),
+                                content_type='application/json', **self.auth())
+
+    def test_changes_are_pending_until_flushed(self):
+        website_id = self.save_website()
+        self.addCleanup(autosave.discard, website_id)
+        self.assertEqual(self.autosave(website_id, {'set': {'content.hero.title': 'H'}}).json()['pending'], 1)
+        self.assertEqual(self.autosave(website_id, {'set': {'content.hero.title': 'Hi'}}).status_code, 202)
+
+        response = self.client.get(f'/api/websites/{website_id}/autosave/', **self.auth())
+        self.assertEqual(response.json()['pending'], 2)
+        self.assertEqual(response.json()['website']['content'], {'hero': {'title': 'Hi'}})
+        self.assertEqual(self.repository.get(website_id)['content'], {'hero': {'title': 'Welcome'}})
+
+        self.assertTrue(autosave.flush(website_id))
+        self.assertEqual(self.repository.get(website_id)['content'], {'hero': {'title': 'Hi'}})
+
+    def test_page_views_show_pending_changes_without_writing_them(self):
+        website = Website.objects.create(user_email=self.email, content=json.dumps({'hero': {'title': 'Welcome'}}))
+        website_id = self.save_website()
+        for pending_id in (website.id, website_id):
+            self.addCleanup(autosave.discard, pending_id)
+            self.autosave(pending_id, {'set': {'content.hero.title': 'Hi'}})
+
+        response = self.client.get(f'/websites/view/{website.id}/')
+        self.assertEqual(json.loads(response.context['website'].content), {'hero': {'title': 'Hi'}})
+        self.assertEqual(response['ETag'], f'"{website.id}-1+1"')
+        website.refresh_from_db()
+        self.assertEqual(json.loads(website.content), {'hero': {'title': 'Welcome'}})
+
+        response = self.client.get(f'/view-generated-website/{website_id}/')
+        self.assertEqual(response.context['website_layout'], {'hero': {'title': 'Hi'}})
+        self.assertTrue(response['ETag'].endswith('+1"'))
+        self.assertEqual(self.repository.get(website_id)['content'], {'hero': {'title': 'Welcome'}})
+        self.assertTrue(autosave.has_pending(website_id))
+
+    def test_refused_changes(self):
+        website_id = self.save_website()
+        self.addCleanup(autosave.discard, website_id)
+        self.assertEqual(self.autosave(website_id, {'set': {'content.hero.title.text': 'x'}}).status_code, 400)
+        self.assertEqual(self.autosave(website_id, {'unset': ['user_email']}).status_code, 400)
+        other = self.save_website(user_email='someone@example.com')
+        self.assertEqual(self.autosave(other, {'set': {'business_name': 'x'}}).status_code, 404)
+
+
+class RevisionRouteTests(WebsiteAPITestCase):
+
+    def test_history_and_restore(self):
+        website_id = self.save_website()
+        self.addCleanup(revisions.delete, website_id)
+        for title in ('Hello', 'Hello again'):
+            self.client.patch(f'/api/websites/{website_id}/', data=json.dumps({'set': {'content.hero.title': title}}),
+                              content_type='application/json', **self.auth())
+
+        response = self.client.get(f'/api/websites/{website_id}/revisions/', **self.auth())
+        self.assertEqual([version['version'] for version in response.json()['versions']], [3, 2, 1])
+        response = self.client.get(f'/api/websites/{website_id}/revisions/1/', **self.auth())
+        self.assertEqual(response.json()['content'], {'hero': {'title': 'Welcome'}})
+        self.assertEqual(self.client.get(f'/api/websites/{website_id}/revisions/9/', **self.auth()).status_code, 404)
+
+        response = self.client.post(f'/api/websites/{website_id}/revisions/1/', **self.auth())
+        self.assertEqual(response.json()['version'], 4)
+        self.assertEqual(self.repository.get(website_id)['content'], {'hero': {'title': 'Welcome'}})
+
+    def test_other_users_history(self):
+        website_id = self.save_website(user_email='someone@example.com')
+        response = self.client.get(f'/api/websites/{website_id}/revisions/', **self.auth())
+        self.assertEqual(response.status_code, 404)
+
+
+class GenerationStatusTests(WebsiteAPITestCase):
+
+    def test_reports_every_component(self):
+        response = self.client.get('/api/generation-status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()),
+            {'llm', 'breakers', 'cache', 'website_cache', 'mongo_pool', 'mongo_commands', 'replication', 'autosave'}
+        )
+
+
+class GenerateWebsiteStreamTests(WebsiteAPITestCase):
+
+    FIELDS = {'business_name': 'Bakery', 'business_type': 'Shop', 'industry': 'Food',
+              'location': 'Paris', 'description': 'Bread'}
+
+    class FakeStream:
+        content = '<h1>Bakery</h1>'
+        is_fallback = False
+
+        def __iter__(self):
+            return iter(['<h1>', 'Bakery</h1>'])
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('main.views.generate_content_stream', return_value=self.FakeStream())
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body, **extra):
+        return self.client.post('/generate-website-stream/', data=body, content_type='application/json', **extra)
+
+    def events(self, response):
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        return [block.split('\n')[0].removeprefix('event: ') for block in body.strip().split('\n\n')]
+
+    def test_post_creates_a_draft_that_a_get_streams_once(self):
+        response = self.post(json.dumps(self.FIELDS))
+        self.assertEqual(response.status_code, 201)
+        stream_url = response.json()['stream_url']
+        self.generate.assert_not_called()
+        self.assertEqual(self.events(self.client.get(stream_url)), ['chunk', 'chunk', 'done'])
+        self.assertEqual(self.repository.count('guest@example.com'), 1)
+        self.assertEqual(self.client.get(stream_url).status_code, 404)
+        self.assertEqual(self.repository.count('guest@example.com'), 1)
+
+    def test_get_without_a_draft_stores_nothing(self):
+        response = self.client.get('/generate-website-stream/', self.FIELDS)
+        self.assertEqual(response.status_code, 404)
+        self.generate.assert_not_called()
+        self.assertEqual(self.repository.count('guest@example.com'), 0)
+
+    def test_post_accepting_event_stream_streams_at_once(self):
+        response = self.post(json.dumps(self.FIELDS), HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(self.events(response), ['chunk', 'chunk', 'done'])
+
+    def test_invalid_json_is_a_400(self):
+        self.assertEqual(self.post('{"business_name": ').status_code, 400)
+        self.assertEqual(self.post('[]').status_code, 400)
+
+
+class WebsitePatchTests(WebsiteAPITestCase):
+
+    def patch(self, website_id, body, content_type='application/json', **extra):
+        return self.client.patch(
+            f'/api/websites/{website_id}/', data=json.dumps(body), content_type=content_type, **self.auth(), **extra
+        )
+
+    def test_patch_repository_website(self):
+        website_id = self.save_website()
+        response = self.patch(website_id, {'set': {'content.hero.title': 'Hello'}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], ['content'])
+        self.assertEqual(self.repository.get(website_id)['content'], {'hero': {'title': 'Hello'}})
+
+    def test_patch_orm_website(self):
+        website = Website.objects.create(user_email=self.email, content=json.dumps({'hero': {'title': 'Welcome'}}))
+        response = self.patch(website.id, [{'op': 'replace', 'path': '/content/hero/title', 'value': 'Hello'}],
+                              content_type='application/json-patch+json')
+        self.assertEqual(response.status_code, 200)
+        website.refresh_from_db()
+        self.assertEqual(json.loads(website.content), {'hero': {'title': 'Hello'}})
+        self.assertEqual(website.theme_version, 2)
+        self.assertEqual(response.json()['version'], '2')
+
+    def test_patch_orm_website_checks_version(self):
+        website = Website.objects.create(user_email=self.email, content=json.dumps({'hero': {'title': 'Welcome'}}))
+        response = self.patch(website.id, {'set': {'business_name': 'Renamed'}, 'expected_version': '7'})
+        self.assertEqual(response.status_code, 409)
+        response = self.patch(website.id, {'set': {'business_name': 'Renamed'}}, HTTP_IF_MATCH='"other"')
+        self.assertEqual(response.status_code, 412)
+        website.refresh_from_db()
+        self.assertEqual(website.business_name, 'New Business')
+
+    def test_patch_other_users_website(self):
+        website = Website.objects.create(user_email='someone@example.com', content='{}')
+        response = self.client.patch(f'/api/websites/{website.id}/', data='{"set": {"business_name": "x"}}',
+                                     content_type='application/json', **self.auth())
+        self.assertEqual(response.status_code, 404)
+
+    def test_patch_routes_to_the_patch_view_only(self):
+        self.assertEqual(resolve('/api/websites/7/').url_name, 'patch_website')
+        website = Website.objects.create(user_email=self.email, content='{}')
+        response = self.client.patch(f'/websites/{website.id}/', data='{"set": {"business_name": "x"}}',
+                                     content_type='application/json', **self.auth())
+        self.assertEqual(response.status_code, 405)
+
+
+class GenerationJobTests(TestCase):
+
+    def setUp(self):
+        handlers = mock.patch.dict(JOB_HANDLERS, {'test': self.handler})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+        self.during_run = None
+
+    def handler(self, job, payload):
+        if self.during_run:
+            self.during_run()
+        return 'website-id', None
+
+    def test_run_marks_done(self):
+        submit_job({}, kind='test')
+        job = claim_next_job('worker-1')
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.website_id), (GenerationJob.STATUS_DONE, 'website-id'))
+
+    def test_job_taken_over_while_running_is_not_marked_done(self):
+        submit_job({}, kind='test')
+        job = claim_next_job('worker-1')
+
+        def taken_over():
+            # The heartbeat went stale: the job is requeued and claimed again
+            GenerationJob.objects.filter(id=job.id).update(heartbeat_at=datetime(2000, 1, 1))
+            requeue_stale_jobs(stale_after=60)
+            GenerationJob.objects.filter(id=job.id).update(available_at=datetime(2000, 1, 1))
+            claim_next_job('worker-2')
+
+        self.during_run = taken_over
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker_id, job.website_id), (GenerationJob.STATUS_RUNNING, 'worker-2', None))
+
+
+class WebsiteJobTests(WebsiteAPITestCase):
+
+    def test_retried_job_stores_one_website(self):
+        job = submit_job({'business_name': 'Bakery'}, user_email=self.email)
+        with mock.patch('main.utils.generate_content', return_value='<html>') as generate:
+            first = generate_website_job(job, json.loads(job.payload))
+            # The worker stopped before marking the job done, and the job ran again
+            second = generate_website_job(job, json.loads(job.payload))
+        self.assertEqual(first, second)
+        generate.assert_called_once()
+        self.assertEqual(self.repository.count(self.email), 1)
+        self.assertEqual(self.repository.get(first[0])['business_name'], 'Bakery')
+
+
+class BulkGenerationTests(TestCase):
+
+    CSV = (
+        'Business Name,Business-Type,Industry,Location,Description\n'
+        '\n'
+        'Bakery,Shop,Food,Paris,Bread\n'
+        'Missing,,Food,Paris,Bread\n'
+        'Florist,Shop,Flowers,Lyon,Roses\n'
+    )
+
+    def setUp(self):
+        self.stored = {}
+        self.generated = []
+        for target, fake in [
+            ('main.mongodb_utils.find_websites_by_bulk_key', self.find),
+            ('main.mongodb_utils.save_websites_bulk', self.save),
+            ('main.bulk._generate', self.generate),
+        ]:
+            patcher = mock.patch(target, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def find(self, keys):
+        return {key: key for key in keys if key in self.stored}
+
+    def save(self, documents):
+        for document in documents:
+            self.stored[document['bulk_key']] = document
+        return list(range(len(documents)))
+
+    def generate(self, fields):
+        self.generated.append(fields['business_name'])
+        return f"<h1>{fields['business_name']}</h1>"
+
+    def run_import(self, input_data, format='csv', **fields):
+        bulk = BulkGeneration.objects.create(input_data=input_data, format=format, **fields)
+        return BulkGenerator(bulk, concurrency=2, batch_size=2).run()
+
+    def test_iter_records_csv_and_jsonl(self):
+        records = list(iter_records(StringIO(self.CSV), 'csv'))
+        self.assertEqual([index for index, _, _ in records], [0, 1, 2])
+        self.assertEqual(records[0][1]['business_type'], 'Shop')
+        records = list(iter_records(StringIO('{"a": 1}\n\nnot json\n[1]\n'), 'jsonl'))
+        self.assertEqual([(index, record) for index, record, _ in records], [(0, {'a': 1}), (1, None), (2, None)])
+        self.assertTrue(records[1][2].startswith('Invalid JSON'))
+        with self.assertRaises(ValueError):
+            list(iter_records(StringIO(''), 'xml'))
+
+    def test_per_record_errors_do_not_stop_the_import(self):
+        bulk = self.run_import(self.CSV)
+        self.assertEqual((bulk.status, bulk.checkpoint, bulk.created, bulk.failed),
+                         (BulkGeneration.STATUS_DONE, 3, 2, 1))
+        self.assertEqual(json.loads(bulk.errors), [{'record': 1, 'error': 'Missing required fields: business_type'}])
+        self.assertEqual(self.generated, ['Bakery', 'Florist'])
+
+    def test_resume_skips_the_checkpoint_and_stored_records(self):
+        bulk = BulkGeneration.objects.create(input_data=self.CSV, checkpoint=1)
+        # A previous attempt at the second batch stored record 2 but stopped before its checkpoint
+        self.stored[f'{bulk.bulk_id}:2'] = {}
+        BulkGenerator(bulk, batch_size=2).run()
+        self.assertEqual((bulk.checkpoint, bulk.created, bulk.failed), (3, 1, 1))
+        self.assertEqual(self.generated, [])
+
+
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker('test', min_calls=1, open_seconds=10, clock=lambda: self.now)
+
+    def half_open(self):
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now += 10
+
+    def test_probe_success_closes(self):
+        self.half_open()
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_probe_failure_reopens(self):
+        self.half_open()
+        with self.assertRaises(ValueError):
+            self.breaker.call(self.fail)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_one_probe_at_a_time(self):
+        self.half_open()
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_stream_closed_early_gives_back_the_probe(self):
+        self.half_open()
+        backend = GenerationBackend()
+        backend.name = 'test'
+        with mock.patch('main.generation_backends.get_breaker', return_value=self.breaker):
+            stream = backend.guard_stream(lambda: iter(['<html>', '</html>']))
+            self.assertEqual(next(stream), '<html>')
+            # The SSE client disconnected
+            stream.close()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+    @staticmethod
+    def fail():
+        raise ValueError("provider error")
+
+
+class LLMClientManagerTests(TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def manager(self, model=None, **limits):
+        model = model or FakeModel()
+        return LLMClientManager(model_factory=lambda name: model, clock=self.clock, **limits)
+
+    def test_bucket_refills_at_the_rate(self):
+        bucket = TokenBucket(60, capacity=2, clock=self.clock)
+        self.assertEqual([bucket.try_acquire(), bucket.try_acquire()], [0.0, 0.0])
+        self.assertEqual(bucket.try_acquire(), 1.0)
+        self.now = 0.5
+        self.assertEqual(bucket.try_acquire(), 0.5)
+        self.now = 10
+        self.assertEqual(bucket.available(), 2)
+
+    def test_slot_times_out_when_full(self):
+        manager = self.manager(max_in_flight=1)
+        with manager.slot():
+            with self.assertRaises(LLMQueueTimeout):
+                with manager.slot(timeout=0):
+                    pass
+        self.assertEqual((manager.queue_timeouts, manager.in_flight), (1, 0))
+
+    def test_slot_times_out_without_tokens(self):
+        manager = self.manager(requests_per_minute=60, burst=1)
+        self.assertEqual(manager.generate('prompt').text, FakeModel().text)
+        with self.assertRaises(LLMQueueTimeout):
+            manager.generate('prompt', timeout=0.5)
+        self.now = 1
+        manager.generate('prompt', timeout=0)
+        self.assertEqual((manager.total_calls, manager.queue_timeouts), (2, 1))
+
+    def test_quota_error_pauses_the_bucket(self):
+        manager = self.manager(model=FakeModel(quota_error_every=1), quota_backoff=30)
+        with self.assertRaises(ResourceExhausted):
+            manager.generate('prompt')
+        self.assertEqual(manager.quota_errors, 1)
+        self.assertEqual(manager.utilization()['paused_for'], 30)
+        self.assertEqual(manager.bucket.try_acquire(), 30)
+        self.now = 31
+        self.assertEqual(manager.bucket.try_acquire(), 0.0)
+
+
+class ReplicationTests(TestCase):
+
+    def pending(self, **fields):
+        return {'replication': {'pending': True, 'changed_at': datetime.now(), 'attempts': 0}, **fields}
+
+    def replicate(self, documents=(), tombstones=()):
+        with mock.patch('main.mongodb_utils.find_pending_replication', return_value=list(documents)), \
+                mock.patch('main.mongodb_utils.find_pending_deletions', return_value=list(tombstones)), \
+                mock.patch('main.mongodb_utils.ack_replication') as ack_replication, \
+                mock.patch('main.mongodb_utils.ack_deletions') as ack_deletions:
+            applied = WebsiteReplicator(batch_size=10, max_attempts=5).replicate_batch()
+        return applied, ack_replication, ack_deletions
+
+    def test_changes_are_applied_by_mongo_id(self):
+        document = self.pending(_id='65f000000000000000000001', user_email='owner@example.com', content={'hero': {}})
+        self.assertEqual(self.replicate([document])[0], 1)
+        apply_to_orm([{**document, 'business_name': 'Renamed'}])
+        website = Website.objects.get(mongo_id='65f000000000000000000001')
+        self.assertEqual(website.business_name, 'Renamed')
+        self.assertEqual(website.theme_version, 2)
+
+    def test_deletes_remove_the_row(self):
+        apply_to_orm([{'_id': '65f000000000000000000001', 'user_email': 'owner@example.com'}])
+        tombstone = self.pending(_id='65f000000000000000000001')
+        applied, _, ack_deletions = self.replicate(tombstones=[tombstone])
+        self.assertEqual(applied, 1)
+        self.assertFalse(Website.objects.filter(mongo_id='65f000000000000000000001').exists())
+        ack_deletions.assert_called_once_with([tombstone])
+
+    def test_save_then_delete_in_one_batch(self):
+        document = self.pending(_id='65f000000000000000000002', user_email='owner@example.com')
+        tombstone = self.pending(_id='65f000000000000000000002')
+        self.assertEqual(self.replicate([document], [tombstone])[0], 2)
+        self.assertFalse(Website.objects.filter(mongo_id='65f000000000000000000002').exists())
+
+
+class WebsitePatchParsingTests(TestCase):
+
+    def test_dotted_paths(self):
+        operations = check_operations(parse_dotted({
+            'set': {'business_name': 'Renamed'},
+            'push': {'content.items': {'title': 'New'}},
+            'unset': ['content.footer'],
+        }))
+        self.assertEqual(operations, [
+            Operation('set', 'business_name', 'Renamed'),
+            Operation('push', 'content.items', [{'title': 'New'}]),
+            Operation('unset', 'content.footer'),
+        ])
+
+    def test_json_patch_against_the_document(self):
+        document = {'content': {'items': ['a', 'b', 'c'], 'title': 'Old'}}
+        operations = parse_json_patch([
+            {'op': 'replace', 'path': '/content/title', 'value': 'New'},
+            {'op': 'add', 'path': '/content/items/-', 'value': 'd'},
+            {'op': 'add', 'path': '/content/items/0', 'value': 'z'},
+        ], document)
+        self.assertEqual(operations, [
+            Operation('set', 'content.title', 'New'),
+            Operation('push', 'content.items', 'd'),
+            Operation('push', 'content.items', 'z', 0),
+        ])
+        self.assertEqual(parse_json_patch([{'op': 'remove', 'path': '/content/items/1'}], document),
+                         [Operation('set', 'content.items', ['a', 'c'])])
+        with self.assertRaises(VersionConflict):
+            parse_json_patch([{'op': 'test', 'path': '/content/title', 'value': 'Other'}], document)
+        with self.assertRaises(PatchError):
+            parse_json_patch([{'op': 'replace', 'path': '/content/missing/title', 'value': 'x'}], document)
+
+    def test_refused_operations(self):
+        for body in ({}, {'set': {}}, {'set': {'user_email': 'x'}}, {'set': {'business_name': 1}},
+                     {'set': {'content.a': 1, 'content.a.b': 2}}, {'unset': ['content']}):
+            with self.subTest(body=body), self.assertRaises(PatchError):
+                check_operations(parse_dotted(body))
+
+
+class RevisionDiffTests(TestCase):
+
+    def assertRoundTrip(self, old, new):
+        ops = diff(old, new)
+        self.assertEqual(apply_patch(json.loads(json.dumps(old)), ops), new)
+        return ops
+
+    def test_round_trips(self):
+        cases = [
+            ({'a': 1, 'b': [1, 2, 3]}, {'a': 2, 'b': [1, 2], 'c': {'d': None}}),
+            ([1, 2], [1, 2, 3, 4]),
+            ({'a/b': 1, 'c~d': 2}, {'a/b': 3}),
+            ({'html': '<p>' + 'x' * 100 + '</p>'}, {'html': '<p>' + 'x' * 50 + 'y' + 'x' * 50 + '</p>'}),
+            ('short', 'other'),
+            ({'a': 1}, [1]),
+        ]
+        for old, new in cases:
+            with self.subTest(old=old, new=new):
+                self.assertRoundTrip(old, new)
+
+    def test_long_strings_are_spliced(self):
+        ops = self.assertRoundTrip({'html': 'x' * 200}, {'html': 'x' * 100 + 'NEW' + 'x' * 100})
+        self.assertEqual(ops, [{'op': 'splice', 'path': '/html', 'at': 100, 'remove': 0, 'text': 'NEW'}])
+
+    def test_unchanged(self):
+        self.assertEqual(diff({'a': [1]}, {'a': [1]}), [])
+
+
+class ScrubberTests(TestCase):
+
+    CASES = [
+        '',
+        '<p>Nothing to remove</p>',
+        '<h1>Hi</h1><!-- Remember to replace the images -->\n<p>Body</p>',
+        '``` Remember to replace the keys ``` Remember to replace this correctly. done',
+        'Remember to include a favicon and nothing else',
+        'REMEMBER TO INCLUDE the jQuery LIBRARY. Lorem ipsum dolor sit amet.',
+        # Overlapping: an earlier rule's prefix starts inside a later rule's match
+        'Make sure to add <!-- Remember to replace x --> a CSS file. tail',
+        'Remember to include Remember to replace this correctly. the library. end',
+        # Nested: one instruction inside another
+        '<!-- Remember to replace /* Remember to replace a */ b --> c',
+        '/* Remember to replace <!-- Remember to replace --> */ after',
+        # A removal joins two halves into a new prefix or terminator
+        'Remember to <!-- Remember to replace x -->replace it correctly.',
+        'Lorem <!-- Remember to replace y -->ipsum text. kept',
+        "Don't forget to add Remember to replace properly. it properly. ok",
+        'Remember to replace \u0130stanbul correctly. Note: Replace the kit.js',
+    ]
+
+    FRAGMENTS = [
+        'Remember to replace', 'correctly.', '<!--', '-->', '/*', '*/', '```', 'Note: Replace', 'kit.js',
+        'Replace the Font Awesome', 'icons.', 'Remember to include', 'library.', 'Make sure to add',
+        'CSS file.', "Don't forget to add", 'properly.', 'Lorem ipsum', '.', ' text ', '\n', 'REMEMBER TO ',
+    ]
+
+    def sequential(self, patterns, text):
+        for pattern in patterns:
+            text = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
+        return text
+
+    def test_matches_sequential_re_sub(self):
+        rng = random.Random(0)
+        cases = self.CASES + [''.join(rng.choice(self.FRAGMENTS) for _ in range(rng.randrange(1, 12)))
+                              for _ in range(500)]
+        for patterns in (CLEANUP_PATTERNS, CLEANUP_PATTERNS + [LOREM_IPSUM_PATTERN]):
+            scrubber = Scrubber(patterns)
+            for text in cases:
+                with self.subTest(text=text):
+                    self.assertEqual(scrubber.scrub(text), self.sequential(patterns, text))
+
+
+class ContentBuilderTests(TestCase):
+
+    def containers(self, value):
+        if isinstance(value, dict):
+            yield value
+            for item in value.values():
+                yield from self.containers(item)
+        elif isinstance(value, list):
+            yield value
+            for item in value:
+                yield from self.containers(item)
+
+    def test_results_share_no_containers(self):
+        for layout in ('basic', 'rich'):
+            with self.subTest(layout=layout):
+                first = build_site_content('Bakery', 'Food', 'One', 'Paris', 'Bread', layout=layout)
+                second = build_site_content('Bakery', 'Food', 'Two', 'Lyon', 'Cake', layout=layout)
+                shared = {id(value) for value in self.containers(first)} & {id(value) for value in self.containers(second)}
+                self.assertEqual(shared, set())
+
+    def test_changing_a_result_leaves_the_next_alone(self):
+        content = build_site_content('Bakery', 'Food', layout='rich')
+        content['theme']['primary_color'] = '#000000'
+        content['pages'][0]['sections'][2]['items'].clear()
+        content['footer']['columns'][0]['links'].pop()
+        fresh = build_site_content('Bakery', 'Food', layout='rich')
+        self.assertNotEqual(fresh['theme']['primary_color'], '#000000')
+        self.assertEqual(len(fresh['pages'][0]['sections'][2]['items']), 3)
+        self.assertEqual(len(fresh['footer']['columns'][0]['links']), 4)
+
+
+class IndustryCatalogTests(TestCase):
+
+    # Overlapping keys, and entries without some assets, so later entries fill the gaps
+    INDUSTRIES = [
+        {'key': 'Cart', 'colors': ['#111', '#222']},
+        {'key': 'art', 'about_image': 'art.jpg', 'services': [{'title': 'Prints', 'description': 'Framed'}]},
+        {'key': 'car', 'colors': ['#333', '#444'], 'background_image': 'car.jpg'},
+        {'key': 'Art Studio', 'colors': ['#555', '#666'], 'about_image': 'studio.jpg'},
+        {'key': 'tar', 'background_image': 'tar.jpg'},
+    ]
+    DEFAULTS = {'colors': ['#000', '#fff'], 'background_image': 'default.jpg', 'about_image': 'about.jpg',
+                'services': [{'title': 'Generic', 'description': 'Anything'}]}
+
+    def naive_lookup(self, matcher, business_type, industry):
+        """The per-asset scan over the entries that the automaton replaced."""
+        found = [index for index, key in enumerate(matcher.keys)
+                 if key.lower() in business_type.lower() or key.lower() in industry.lower()]
+        bundle = dict(matcher.defaults, services=None, matched=matcher.keys[found[0]] if found else None)
+        for name in ASSETS:
+            for index in found:
+                if matcher.assets[index][name] is not None:
+                    bundle[name] = matcher.assets[index][name]
+                    break
+        return bundle
+
+    def test_matches_the_naive_scan(self):
+        matcher = IndustryMatcher(self.INDUSTRIES, self.DEFAULTS)
+        rng = random.Random(0)
+        words = ['car', 'cart', 'ART', 'studio', 'art studio', 'tar', 'star', 'c', 'a', ' ', 'Bakery']
+        cases = [('Cartography', ''), ('', 'guitar'), ('Art Studio', 'Cars'), ('ca', 'rt'), ('', '')]
+        cases += [(''.join(rng.choices(words, k=3)), ''.join(rng.choices(words, k=2))) for _ in range(300)]
+        for business_type, industry in cases:
+            with self.subTest(business_type=business_type, industry=industry):
+                self.assertEqual(matcher.lookup(business_type, industry),
+                                 self.naive_lookup(matcher, business_type, industry))
+
+    def test_priority_and_defaults(self):
+        matcher = IndustryMatcher(self.INDUSTRIES, self.DEFAULTS)
+        assets = matcher.lookup('Cart Art Studio', '')
+        self.assertEqual((assets['matched'], assets['colors'], assets['about_image']), ('Cart', ('#111', '#222'), 'art.jpg'))
+        self.assertEqual(assets['services'], (('Prints', 'Framed'),))
+        assets = matcher.lookup('Bakery', 'Food')
+        self.assertEqual((assets['matched'], assets['services'], assets['colors']), (None, None, ('#000', '#fff')))
+        # No key spans the business type and the industry
+        self.assertIsNone(matcher.lookup('ca', 'rt')['matched'])
+        with self.assertRaises(ValueError):
+            IndustryMatcher([{'key': ' '}], {})
+
+    def test_reload_keeps_the_last_good_catalog(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.json')
+            with open(path, 'w') as f:
+                json.dump({'industries': self.INDUSTRIES, 'defaults': self.DEFAULTS}, f)
+            catalog = IndustryCatalog(path, reload_interval=0)
+            self.assertEqual(catalog.lookup('Car', '')['matched'], 'car')
+
+            with open(path, 'w') as f:
+                json.dump({'industries': [{'key': 'Car', 'colors': ['#999', '#888']}], 'defaults': self.DEFAULTS}, f)
+            self.assertTrue(catalog.reload())
+            self.assertEqual(catalog.lookup('Car', '')['colors'], ('#999', '#888'))
+
+            with open(path, 'w') as f:
+                f.write('{not json')
+            self.assertFalse(catalog.reload())
+            self.assertEqual((catalog.lookup('Car', '')['colors'], catalog.reloads), (('#999', '#888'), 1))
+
+
+class WebsiteCacheTests(TestCase):
+
+    def test_loads_once_and_caches_missing_websites(self):
+        cache = WebsiteCache()
+        load = mock.Mock(side_effect=lambda website_id: {'id': website_id} if website_id == '1' else None)
+        self.assertEqual(cache.get_or_load(1, load), {'id': '1'})
+        self.assertEqual(cache.get_or_load('1', load), {'id': '1'})
+        self.assertIsNone(cache.get_or_load('2', load))
+        self.assertIsNone(cache.get_or_load('2', load))
+        self.assertEqual(load.call_count, 2)
+        stats = cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['negative_hits'], stats['misses']), (1, 1, 2))
+
+    def test_invalidate_reloads(self):
+        cache = WebsiteCache()
+        cache.get_or_load('1', lambda website_id: {'version': 1})
+        cache.invalidate('1')
+        self.assertEqual(cache.get_or_load('1', lambda website_id: {'version': 2}), {'version': 2})
+
+    def test_least_recently_used_is_evicted(self):
+        cache = WebsiteCache(max_entries=2)
+        for website_id in ('1', '2'):
+            cache.get_or_load(website_id, lambda website_id: {'id': website_id})
+        cache.get_or_load('1', None)
+        cache.get_or_load('3', lambda website_id: {'id': website_id})
+        load = mock.Mock(return_value={'id': '2'})
+        cache.get_or_load('1', None)
+        cache.get_or_load('2', load)
+        load.assert_called_once_with('2')
+
+    def test_expired_entries_are_reloaded(self):
+        cache = WebsiteCache(ttl=0)
+        load = mock.Mock(return_value={'id': '1'})
+        cache.get_or_load('1', load)
+        cache.get_or_load('1', load)
+        self.assertEqual(load.call_count, 2)
+
+
+class StubBackendTests(TestCase):
+
+    FIELDS = {'business_type': 'Bakery', 'industry': 'Food', 'business_name': 'Crumbs',
+              'location': 'Paris', 'description': 'Fresh bread daily.'}
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('stub', min_calls=1, open_seconds=10)
+        for target, value in [
+            ('main.generation_backends.get_breaker', self.breaker),
+            ('main.generation_backends.get_hedger', None),
+        ]:
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stub(self, **options):
+        return StubBackend(**dict({'latency': 0, 'jitter': 0}, **options))
+
+    def test_same_inputs_same_page(self):
+        page = self.stub().generate('prompt', self.FIELDS)
+        self.assertEqual(page, self.stub(seed=1).generate('other prompt', dict(self.FIELDS)))
+        self.assertIn('<h1 class="display-4 fw-bold">Crumbs</h1>', page)
+        self.assertIn('Fresh bread daily.', page)
+        self.assertNotEqual(page, self.stub().generate('prompt', dict(self.FIELDS, business_name='Loaf')))
+
+    def test_stream_and_sections_rebuild_the_page(self):
+        stub = self.stub(chunks=7)
+        page = stub.render(self.FIELDS)
+        chunks = list(stub.stream('prompt', self.FIELDS))
+        self.assertEqual((len(chunks), ''.join(chunks)), (7, page))
+        head, sections, tail = stub.render_parts(self.FIELDS)
+        self.assertEqual(head + ''.join(stub.generate_section('prompt', self.FIELDS, name) for name in sections) + tail, page)
+
+    def test_instructions_are_optional(self):
+        self.assertIn('<!-- Remember to replace', self.stub().render(self.FIELDS))
+        self.assertNotIn('<!-- Remember to replace', self.stub(instructions=False).render(self.FIELDS))
+
+    def test_errors_reach_the_circuit_breaker(self):
+        with self.assertRaises(RuntimeError):
+            self.stub(error_rate=1).generate('prompt', self.FIELDS)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    @override_settings(GENERATION_STUB_LATENCY=0.25, GENERATION_STUB_JITTER=0.0, GENERATION_STUB_CHUNKS=3)
+    def test_settings_and_delay(self):
+        stub = StubBackend()
+        self.assertEqual((stub.latency, stub.chunks), (0.25, 3))
+        with mock.patch('main.generation_backends.time.sleep') as sleep:
+            list(stub.stream('prompt', self.FIELDS))
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.25 / 3] * 3)
+
+
+class SectionGenerationTests(TestCase):
+
+    ARGS = ('Bakery', 'Food', 'Crumbs', 'Paris', 'Fresh bread daily.')
+
+    class Backend(GenerationBackend):
+        """Answers each section from ``answers``: HTML, an exception, or a callable run first."""
+
+        def __init__(self, answers):
+            self.answers = answers
+
+        def generate_section(self, prompt, fields, section):
+            answer = self.answers.get(section, f'<section id="{section}">{section}</section>')
+            if callable(answer):
+                answer = answer()
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+    def test_sections_run_concurrently_and_are_assembled_in_order(self):
+        # Sequential generation would break the barrier and fall back
+        barrier = threading.Barrier(3, timeout=5)
+
+        def after_barrier(section):
+            def answer():
+                barrier.wait()
+                return f'<section id="{section}">{section}</section>'
+            return answer
+
+        backend = self.Backend({'hero': after_barrier('hero'), 'about': after_barrier('about'),
+                                'services': after_barrier('services'),
+                                'contact': '```html\n<section id="contact">contact</section>\n```'})
+        page, failed = generate_sections(backend, *self.ARGS, parallelism=3, timeout=10)
+        self.assertEqual(failed, [])
+        self.assertIn('<section id="contact">contact</section>', page)
+        self.assertNotIn('```', page)
+        self.assertEqual([page.index(f'id="{section}">{section}<') for section in FALLBACK_SECTIONS],
+                         sorted(page.index(f'id="{section}">{section}<') for section in FALLBACK_SECTIONS))
+
+    def test_failed_empty_and_late_sections_fall_back(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        backend = self.Backend({'about': ValueError('provider error'), 'services': '```\n```',
+                                'footer': lambda: release.wait(5) and '<footer>late</footer>'})
+        page, failed = generate_sections(backend, *self.ARGS, parallelism=6, timeout=0.5)
+        self.assertEqual(failed, ['about', 'services', 'footer'])
+        fallback = get_fallback_sections(*self.ARGS)
+        for section in failed:
+            self.assertIn(fallback[section], page)
+        self.assertIn('<section id="hero">hero</section>', page)
+
+    def test_partial_page_carries_the_content(self):
+        backend = self.Backend({'testimonials': ValueError('provider error')})
+        with mock.patch('main.section_generation.setting', side_effect=lambda name, default: default):
+            with self.assertRaises(PartialPageError) as raised:
+                generate_page_by_sections(backend, *self.ARGS)
+        self.assertEqual(raised.exception.failed_sections, ['testimonials'])
+        self.assertIn('<section id="hero">hero</section>', raised.exception.content)
+
+
+class GenerationCacheTests(TestCase):
+
+    def test_concurrent_requests_generate_once(self):
+        cache = GenerationCache(persistent=False)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def generate():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return '<html>'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_generate('key', generate)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # The followers wait on the leader's call
+        while cache.coalesced < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['<html>'] * 5)
+        self.assertEqual(cache.get('key'), '<html>')
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        cache = GenerationCache(persistent=False)
+        with self.assertRaises(ValueError):
+            cache.get_or_generate('key', CircuitBreakerTests.fail)
+        self.assertEqual(cache.get_or_generate('key', lambda: '<html>'), '<html>')
+
+    def test_leader_rechecks_after_a_racing_leader_finished(self):
+        cache = GenerationCache(persistent=False)
+        cache.set('key', '<html>')
+        # The lookup missed just before another leader stored the content and left _in_flight
+        with mock.patch.object(cache, 'get', return_value=None):
+            self.assertEqual(cache.get_or_generate('key', CircuitBreakerTests.fail), '<html>')
+        self.assertEqual(cache.coalesced, 1)
+
+    def test_leader_rechecks_after_taking_the_lease(self):
+        import mongomock
+        collection = mongomock.MongoClient().db.generation_cache
+        cache = GenerationCache()
+        cache._get_collection = lambda: collection
+
+        def lease_released_after_publish(key):
+            # The lease holder published and released just before this worker took the lease
+            cache._persistent_set(key, '<html>')
+            self.assertTrue(cache._acquire_lease(key))
+            return None
+
+        cache._wait_for_other_worker = lease_released_after_publish
+        self.assertEqual(cache.get_or_generate('key', CircuitBreakerTests.fail), '<html>')
+        self.assertNotIn('pending_until', collection.find_one({'_id': 'key'}))
+
+
+class AutosaveBufferTests(WebsiteAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0.0
+        self.buffer = AutosaveBuffer(interval=2, clock=lambda: self.now)
+        self.buffer.ensure_started = lambda: None
+        self.website_id = self.save_website(content={'hero': {'title': 'Welcome'}, 'items': []})
+
+    def submit(self, **body):
+        return self.buffer.submit(self.website_id, self.email, parse_dotted(body))
+
+    def test_changes_are_merged_into_one_write(self):
+        self.submit(set={'content.hero.title': 'H'})
+        self.submit(set={'content.hero.title': 'Hi'})
+        self.submit(push={'content.items': 'a'})
+        self.submit(push={'content.items': 'b'})
+        self.assertEqual(self.buffer.flush_due(), 0)
+        self.now = 2
+        with mock.patch.object(self.repository, 'patch', wraps=self.repository.patch) as patch:
+            self.assertEqual(self.buffer.flush_due(), 1)
+        patch.assert_called_once()
+        self.assertEqual(sorted(operation.path for operation in patch.call_args.args[1]), ['content.hero.title', 'content.items'])
+        self.assertEqual(self.repository.get(self.website_id)['content'], {'hero': {'title': 'Hi'}, 'items': ['a', 'b']})
+
+    def test_overlapping_changes_fold_into_the_outer_path(self):
+        self.submit(set={'content.hero.title': 'Hi'})
+        self.submit(set={'content.hero.subtitle': 'There'})
+        self.submit(push={'content.items': 'a'})
+        self.submit(set={'content.hero': {'title': 'Replaced'}})
+        pending = self.buffer._pending[self.website_id]
+        self.assertEqual(sorted(pending.operations), ['content.hero', 'content.items'])
+        self.submit(set={'content.hero.subtitle': 'Again'})
+        self.assertEqual(pending.operations['content.hero'], Operation('set', 'content.hero', {'title': 'Replaced', 'subtitle': 'Again'}))
+        self.buffer.flush_all()
+        self.assertEqual(self.repository.get(self.website_id)['content'],
+                         {'hero': {'title': 'Replaced', 'subtitle': 'Again'}, 'items': ['a']})
+
+    def test_concurrent_write_is_merged_not_lost(self):
+        self.submit(set={'content.hero.title': 'Hi'})
+        # Another writer changes the website after it was loaded
+        self.repository.update(self.website_id, {'business_name': 'Renamed'})
+        self.buffer.flush_all()
+        website = self.repository.get(self.website_id)
+        self.assertEqual((website['business_name'], website['content']['hero']['title']), ('Renamed', 'Hi'))
+
+    def test_failed_writes_stay_pending(self):
+        self.submit(set={'content.hero.title': 'Hi'})
+        with mock.patch.object(self.repository, 'patch', return_value=None):
+            self.assertFalse(self.buffer.flush(self.website_id))
+        self.assertTrue(self.buffer.has_pending(self.website_id))
+        self.assertTrue(self.buffer.flush(self.website_id))
+        self.assertEqual(load_editable(self.website_id, self.email).document['content']['hero']['title'], 'Hi')
+
+    def test_other_users_cannot_add_changes(self):
+        self.submit(set={'content.hero.title': 'Hi'})
+        self.assertIsNone(self.buffer.submit(self.website_id, 'someone@example.com', parse_dotted({'set': {'business_name': 'x'}})))
+
+
+@override_settings(ROOT_URLCONF='ai_builder.urls')
+class BenchmarkEndpointsTests(TestCase):
+
+    def setUp(self):
+        self.addCleanup(set_repository, None)
+
+    def benchmark(self):
+        call_command('benchmark_endpoints', websites=3, requests=2, stdout=StringIO())
+
+    def test_passes_when_every_request_succeeds(self):
+        self.benchmark()
+
+    def test_fails_when_requests_fail(self):
+        with mock.patch('main.management.commands.benchmark_endpoints.jwt.encode', return_value='invalid'):
+            with self.assertRaisesRegex(CommandError, 'GET /websites/'):
+                self.benchmark()
@@ -1,6 +1,31 @@
 from django.urls import path
 from . import views
-from main.api_views import WebsiteCreateAPIView, WebsiteListAPIView, WebsiteFormAPIView
+from .config import setting
+from main.api_views import (
+    WebsiteCreateAPIView,
+    WebsiteListAPIView,
+    WebsiteFormAPIView,
+    WebsitePatchAPIView,
+    WebsiteAutosaveAPIView,
+    WebsiteRevisionListAPIView,
+    WebsiteRevisionAPIView,
+    GenerationJobCreateAPIView,
+    GenerationJobStatusAPIView,
+    GenerationStatusAPIView,
+    BulkGenerationCreateAPIView,
+    BulkGenerationStatusAPIView,
+)
+
+# Served by asgi.py: read-heavy views await MongoDB instead of blocking
+ASYNC_READ_VIEWS = setting('ASYNC_READ_VIEWS', False)
+
+if ASYNC_READ_VIEWS:
+    from . import async_views
+    read_views = async_views
+    list_websites_api_view = async_views.list_websites_api
+else:
+    read_views = views
+    list_websites_api_view = WebsiteListAPIView.as_view()
 
 urlpatterns = [
     path('', views.index, name='home'),
@@ -9,17 +34,27 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('details/', views.details, name='details'),
     path('generate/', views.generate_website, name='generate'),
-    path('websites/', views.get_websites, name='websites'),
+    path('websites/', read_views.get_websites, name='websites'),
     path('websites/<int:website_id>/', views.update_website, name='update_website'),
     path('websites/delete/<int:website_id>/', views.delete_website, name='delete_website'),
-    path('websites/view/<int:website_id>/', views.view_website, name='view_website'),
+    path('websites/view/<int:website_id>/', read_views.view_website, name='view_website'),
     path('mongodb-diagnostic/', views.mongodb_diagnostic, name='mongodb_diagnostic'),
     path('generate-website-layout/', views.generate_website_layout, name='generate_website_layout'),
-    path('view-generated-website/', views.view_generated_website, name='view_generated_website'),
-    path('view-generated-website/<str:website_id>/', views.view_generated_website, name='view_generated_website_by_id'),
+    path('generate-website-stream/', views.generate_website_stream, name='generate_website_stream'),
+    path('view-generated-website/', read_views.view_generated_website, name='view_generated_website'),
+    path('view-generated-website/<str:website_id>/', read_views.view_generated_website, name='view_generated_website_by_id'),
     path('api/create-website/', WebsiteCreateAPIView.as_view(), name='create_website_api'),
-    path('api/websites/', WebsiteListAPIView.as_view(), name='list_websites_api'),
+    path('api/websites/', list_websites_api_view, name='list_websites_api'),
+    path('api/websites/<str:website_id>/', WebsitePatchAPIView.as_view(), name='patch_website'),
+    path('api/websites/<str:website_id>/autosave/', WebsiteAutosaveAPIView.as_view(), name='website_autosave'),
+    path('api/websites/<str:website_id>/revisions/', WebsiteRevisionListAPIView.as_view(), name='website_revisions'),
+    path('api/websites/<str:website_id>/revisions/<int:version>/', WebsiteRevisionAPIView.as_view(), name='website_revision'),
     path('api/website-form/', WebsiteFormAPIView.as_view(), name='website_form_api'),
+    path('api/generation-jobs/', GenerationJobCreateAPIView.as_view(), name='generation_jobs'),
+    path('api/generation-jobs/<uuid:job_id>/', GenerationJobStatusAPIView.as_view(), name='generation_job_status'),
+    path('api/bulk-generations/', BulkGenerationCreateAPIView.as_view(), name='bulk_generations'),
+    path('api/bulk-generations/<uuid:bulk_id>/', BulkGenerationStatusAPIView.as_view(), name='bulk_generation_status'),
+    path('api/generation-status/', GenerationStatusAPIView.as_view(), name='generation_status'),
     path('api/signup/', views.signup, name='api_signup'),
     path('api/login/', views.login, name='api_login'),
 ]
@@ -1,53 +1,112 @@
-import os
-import google.generativeai as genai
-from google.api_core.exceptions import InvalidArgument
 import logging
-import re
+
+from .generation_cache import generation_cache, make_cache_key
+from .generation_backends import get_backend
+from .scrubber import Scrubber
+from .section_generation import (
+    SECTION_PROMPT_VERSION,
+    PartialPageError,
+    generate_page_by_sections,
+    sections_enabled,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# Instruction messages the model sometimes leaves in its output
+# (can be expanded as needed)
+CLEANUP_PATTERNS = [
+    r'```\s*Remember to replace.*?```',
+    r'Remember to replace.*?correctly\.',
+    r'<!-- Remember to replace.*?-->',
+    r'/\* Remember to replace.*?\*/',
+    r'Note: Replace.*?kit\.js',
+    r'Remember to add your Font Awesome kit.*?\.',
+    r'Replace the Font Awesome.*?icons\.',
+    r'Remember to include.*?library\.',
+    r'Make sure to add.*?CSS file\.',
+    r'Don\'t forget to add.*?properly\.'
+]
+
+# Placeholder text removed after the instruction messages
+LOREM_IPSUM_PATTERN = r'Lorem ipsum.*?\.'
+
+# Compiled once at import; each scrubber removes all of its patterns in a
+# single pass with the same result as applying them one after another
+instruction_scrubber = Scrubber(CLEANUP_PATTERNS)
+output_scrubber = Scrubber(CLEANUP_PATTERNS + [LOREM_IPSUM_PATTERN])
+
 def clean_generated_content(content):
     """Remove common instruction messages from the generated content."""
-    # List of patterns to remove (can be expanded as needed)
-    patterns_to_remove = [
-        r'```\s*Remember to replace.*?```',
-        r'Remember to replace.*?correctly\.',
-        r'<!-- Remember to replace.*?-->',
-        r'/\* Remember to replace.*?\*/',
-        r'Note: Replace.*?kit\.js',
-        r'Remember to add your Font Awesome kit.*?\.',
-        r'Replace the Font Awesome.*?icons\.',
-        r'Remember to include.*?library\.',
-        r'Make sure to add.*?CSS file\.',
-        r'Don\'t forget to add.*?properly\.'
-    ]
-    
-    # Apply each pattern
-    for pattern in patterns_to_remove:
-        content = re.sub(pattern, '', content, flags=re.DOTALL | re.IGNORECASE)
-    
-    return content
+    return instruction_scrubber.scrub(content)
 
-def generate_content(business_type, industry, business_name='', location='', description=''):
-    """Generate website content using Google's Gemini AI model."""
-    try:
-        # Get API key from environment variables
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        
-        # Debug log the first few characters of the API key (never log full keys)
-        if api_key:
-            logger.info(f"API key found: {api_key[:4]}...")
-        else:
-            logger.error("API key not found in environment variables")
-            raise ValueError("Google API key not found. Please check your .env file.")
-        
-        # Configure the Google AI API
-        genai.configure(api_key=api_key)
-        
-        # Create a detailed prompt with styling information for modern websites
-        prompt = f"""Generate a sophisticated, modern, fully-functioning HTML website for a {business_type} called "{business_name}" in the {industry} industry, located in {location}.
+def finalize_generated_content(content):
+    """Apply every cleanup pass that generate_content runs on model output."""
+    # Instruction messages plus any remaining placeholder or lorem ipsum text
+    return output_scrubber.scrub(content)
+
+class StreamingContentCleaner:
+    """
+    Incremental version of finalize_generated_content for streamed output.
+
+    Every cleanup pattern starts with a literal prefix, so text before the
+    first prefix occurrence can be emitted as soon as it arrives. From a
+    prefix onwards output is held back until the pattern either matches
+    (and is dropped) or can no longer match. A held span is released after
+    ``max_hold`` characters so a stray phrase without its terminator cannot
+    stall the stream; the persisted document is always cleaned in one batch
+    with finalize_generated_content.
+    """
+
+    def __init__(self, max_hold=16384, scrubber=None):
+        self.max_hold = max_hold
+        self._scrubber = scrubber or output_scrubber
+        # Enough trailing text to hold back a prefix that is still arriving
+        self._tail = self._scrubber.max_prefix_length + 16
+        self._buffer = ''
+
+    def feed(self, text):
+        """Add a chunk of model output and return the text that is safe to emit."""
+        self._buffer += text
+        return self._drain(final=False)
+
+    def flush(self):
+        """Return whatever is still buffered once the model output has ended."""
+        return self._drain(final=True)
+
+    def _drain(self, final):
+        buffer = self._buffer
+        output = []
+        pos = 0
+        while pos < len(buffer):
+            start = self._scrubber.prefix_re.search(buffer, pos)
+            if start is None:
+                safe = len(buffer) if final else max(pos, len(buffer) - self._tail)
+                output.append(buffer[pos:safe])
+                pos = safe
+                break
+            output.append(buffer[pos:start.start()])
+            pos = start.start()
+            end = self._scrubber.match_at(buffer, pos)
+            if end is not None:
+                pos = end
+            elif final or len(buffer) - pos > self.max_hold:
+                # The terminator never arrived: this was ordinary text
+                output.append(buffer[pos])
+                pos += 1
+            else:
+                break
+        self._buffer = buffer[pos:]
+        return ''.join(output)
+
+# Bump whenever the prompt below changes so cached generations made with an
+# older prompt are no longer served.
+PROMPT_VERSION = 1
+
+def build_prompt(business_type, industry, business_name='', location='', description=''):
+    """Build the Gemini prompt for a complete website."""
+    return f"""Generate a sophisticated, modern, fully-functioning HTML website for a {business_type} called "{business_name}" in the {industry} industry, located in {location}.
 
 Business description: {description}
 
@@ -73,31 +132,190 @@ Requirements:
 
 DO NOT include any template instructions or placeholder comments in the final code.
 """
-        try:
-            # Generate content using Google's generative model
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
-            
-            if response and hasattr(response, 'text'):
-                # Clean the content before returning
-                cleaned_content = clean_generated_content(response.text)
-                
-                # Apply a final cleanup to remove any remaining placeholder or lorem ipsum text
-                cleaned_content = re.sub(r'Lorem ipsum.*?\.', '', cleaned_content, flags=re.DOTALL | re.IGNORECASE)
-                
-                return cleaned_content
-            else:
-                logger.error(f"Invalid response from Gemini API: {response}")
-                raise ValueError("Received empty or invalid response from AI model")
-                
-        except Exception as model_error:
-            logger.error(f"Error with Gemini model: {str(model_error)}")
-            raise ValueError(f"Error generating content with Gemini: {str(model_error)}")
-        
+
+def _fields(business_type, industry, business_name, location, description):
+    return {
+        'business_type': business_type,
+        'industry': industry,
+        'business_name': business_name,
+        'location': location,
+        'description': description,
+    }
+
+def _cache_key(backend, business_type, industry, business_name='', location='', description='', sections=False):
+    # Keyed by backend and mode too, so stub output never answers a real
+    # request and section-built pages are kept apart from whole-page ones
+    parts = [] if backend.name == 'gemini' else [backend.name]
+    if sections:
+        parts.append(f"sections{SECTION_PROMPT_VERSION}")
+    version = ':'.join(parts + [str(PROMPT_VERSION)]) if parts else PROMPT_VERSION
+    return make_cache_key(version, business_type, industry, business_name, location, description)
+
+def generate_with_backend(backend, business_type, industry, business_name='', location='', description=''):
+    """Call the generation backend and return the cleaned content. Raises ValueError on failure."""
+    # Create a detailed prompt with styling information for modern websites
+    prompt = build_prompt(business_type, industry, business_name, location, description)
+    try:
+        content = backend.generate(prompt, _fields(business_type, industry, business_name, location, description))
+        return finalize_generated_content(content)
+    except Exception as model_error:
+        logger.error(f"Error with {backend.name} backend: {str(model_error)}")
+        raise ValueError(f"Error generating content with {backend.name}: {str(model_error)}")
+
+def stream_with_backend(backend, business_type, industry, business_name='', location='', description=''):
+    """Yield raw text chunks from the generation backend as they are produced."""
+    prompt = build_prompt(business_type, industry, business_name, location, description)
+    try:
+        for text in backend.stream(prompt, _fields(business_type, industry, business_name, location, description)):
+            if text:
+                yield text
+    except Exception as model_error:
+        logger.error(f"Error with {backend.name} backend stream: {str(model_error)}")
+        raise ValueError(f"Error generating content with {backend.name}: {str(model_error)}")
+
+def generate_content(business_type, industry, business_name='', location='', description=''):
+    """
+    Generate website content with the configured backend (Gemini by default).
+
+    With GENERATION_MODE set to ``sections`` the page is generated section
+    by section in parallel (see main.section_generation); sections that fail
+    use their block of the fallback template.
+
+    Successful generations are cached per normalized input, backend, mode
+    and prompt version (see main.generation_cache), and identical concurrent
+    requests share a single model call. The fallback template, and pages
+    with fallback sections, are never cached.
+    """
+    try:
+        backend = get_backend()
+        if not backend.cacheable:
+            return generate_with_backend(backend, business_type, industry, business_name, location, description)
+        sections = sections_enabled()
+        key = _cache_key(backend, business_type, industry, business_name, location, description, sections=sections)
+        if sections:
+            generate = lambda: generate_page_by_sections(backend, business_type, industry, business_name, location, description)
+        else:
+            generate = lambda: generate_with_backend(backend, business_type, industry, business_name, location, description)
+        return generation_cache.get_or_generate(key, generate)
+    except PartialPageError as e:
+        return e.content
     except Exception as e:
         logger.error(f"Error in generate_content: {str(e)}")
-        # If Google API fails, generate a basic modern template
-        return f"""
+        # If the backend fails, generate a basic modern template
+        return get_fallback_content(business_type, industry, business_name, location, description)
+
+def invalidate_generated_content(business_type, industry, business_name='', location='', description=''):
+    """Drop the cached generations for these inputs so the next call regenerates them."""
+    backend = get_backend()
+    for sections in (False, True):
+        key = _cache_key(backend, business_type, industry, business_name, location, description, sections=sections)
+        generation_cache.invalidate(key)
+
+class GenerationStream:
+    """
+    Iterator over cleaned HTML chunks of a streamed generation.
+
+    Once iteration finishes, ``content`` holds the complete document cleaned
+    in one batch (exactly what generate_content would have returned) and
+    ``is_fallback`` tells whether the static template was used because the
+    model failed before producing any output.
+    """
+
+    def __init__(self, chunks, fallback=None, cache_key=None, cleaned=False):
+        self._chunks = chunks
+        self._fallback = fallback
+        self._cache_key = cache_key
+        self._cleaned = cleaned
+        self.content = None
+        self.is_fallback = False
+
+    @classmethod
+    def from_content(cls, content):
+        """Wrap already finished content, e.g. a cache hit, as a one-chunk stream."""
+        return cls(iter([content]), cleaned=True)
+
+    def __iter__(self):
+        if self._cleaned:
+            self.content = next(self._chunks)
+            yield self.content
+            return
+
+        cleaner = StreamingContentCleaner()
+        raw = []
+        try:
+            for text in self._chunks:
+                raw.append(text)
+                cleaned = cleaner.feed(text)
+                if cleaned:
+                    yield cleaned
+        except Exception as e:
+            if raw:
+                raise
+            logger.error(f"Error in generate_content_stream: {str(e)}")
+            self.is_fallback = True
+            self.content = self._fallback()
+            yield self.content
+            return
+
+        tail = cleaner.flush()
+        if tail:
+            yield tail
+        self.content = finalize_generated_content(''.join(raw))
+        if self._cache_key:
+            generation_cache.set(self._cache_key, self.content)
+
+def generate_content_stream(business_type, industry, business_name='', location='', description=''):
+    """
+    Streaming counterpart of generate_content.
+
+    Returns a GenerationStream yielding cleaned HTML as the backend produces
+    it. Cached generations are returned as a single chunk, and a successful
+    stream populates the cache for later calls.
+    """
+    backend = get_backend()
+    key = None
+    if backend.cacheable:
+        key = _cache_key(backend, business_type, industry, business_name, location, description)
+        cached = generation_cache.get(key)
+        if cached is not None:
+            return GenerationStream.from_content(cached)
+    return GenerationStream(
+        stream_with_backend(backend, business_type, industry, business_name, location, description),
+        fallback=lambda: get_fallback_content(business_type, industry, business_name, location, description),
+        cache_key=key
+    )
+
+# Sections of the fallback template, in page order
+FALLBACK_SECTIONS = ['hero', 'about', 'services', 'testimonials', 'contact', 'footer']
+
+# Stylesheets the fallback sections rely on
+FALLBACK_ASSETS = """
+        <link href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css" rel="stylesheet">
+        <style>
+            .bg-gradient-primary-to-secondary {
+                background: linear-gradient(135deg, #6366F1 0%, #8B5CF6 100%);
+            }
+            .text-white-75 {
+                color: rgba(255, 255, 255, 0.75);
+            }
+            .transition-hover {
+                transition: transform 0.3s ease;
+            }
+            .transition-hover:hover {
+                transform: translateY(-5px);
+            }
+        </style>
+"""
+
+def get_fallback_sections(business_type, industry, business_name='', location='', description=''):
+    """
+    Blocks of the fallback template keyed by section name.
+
+    Returns:
+        dict: HTML for each name in FALLBACK_SECTIONS, in page order
+    """
+    return {
+        'hero': f"""
         <div class="hero-section text-center py-5 bg-gradient-primary-to-secondary">
             <div class="container">
                 <h1 class="display-4 fw-bold text-white">{business_name}</h1>
@@ -105,7 +323,8 @@ DO NOT include any template instructions or placeholder comments in the final co
                 <button class="btn btn-light btn-lg rounded-pill px-4 shadow-sm">Learn More</button>
             </div>
         </div>
-        
+""",
+        'about': f"""
         <div class="about-section py-5">
             <div class="container">
                 <div class="row align-items-center">
@@ -123,7 +342,8 @@ DO NOT include any template instructions or placeholder comments in the final co
                 </div>
             </div>
         </div>
-        
+""",
+        'services': f"""
         <div class="services-section py-5 bg-light">
             <div class="container">
                 <h2 class="text-center fw-bold mb-5">Our Services</h2>
@@ -164,7 +384,8 @@ DO NOT include any template instructions or placeholder comments in the final co
                 </div>
             </div>
         </div>
-        
+""",
+        'testimonials': f"""
         <div class="testimonial-section py-5">
             <div class="container">
                 <h2 class="text-center fw-bold mb-5">What Our Clients Say</h2>
@@ -202,7 +423,8 @@ DO NOT include any template instructions or placeholder comments in the final co
                 </div>
             </div>
         </div>
-        
+""",
+        'contact': f"""
         <div class="contact-section py-5 bg-light">
             <div class="container">
                 <div class="row g-4">
@@ -259,7 +481,8 @@ DO NOT include any template instructions or placeholder comments in the final co
                 </div>
             </div>
         </div>
-        
+""",
+        'footer': f"""
         <footer class="bg-dark text-white py-4 mt-5">
             <div class="container">
                 <div class="row g-4">
@@ -295,20 +518,11 @@ DO NOT include any template instructions or placeholder comments in the final co
                 <p class="text-center mb-0">&copy; 2024 {business_name}. All rights reserved.</p>
             </div>
         </footer>
-        
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css" rel="stylesheet">
-        <style>
-            .bg-gradient-primary-to-secondary {
-                background: linear-gradient(135deg, #6366F1 0%, #8B5CF6 100%);
-            }
-            .text-white-75 {
-                color: rgba(255, 255, 255, 0.75);
-            }
-            .transition-hover {
-                transition: transform 0.3s ease;
-            }
-            .transition-hover:hover {
-                transform: translateY(-5px);
-            }
-        </style>
-        """
+""",
+    }
+
+def get_fallback_content(business_type, industry, business_name='', location='', description=''):
+    """Basic modern template used when the AI model is unavailable."""
+    sections = get_fallback_sections(business_type, industry, business_name, location, description)
+    blocks = [sections[name] for name in FALLBACK_SECTIONS] + [FALLBACK_ASSETS]
+    return '        '.join(blocks) + '        '
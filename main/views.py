@@ -5,18 +5,38 @@ from .models import User, Website
 import bcrypt
 import jwt
 import os
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib import messages
+from django.db import transaction
 import random
 import uuid
 import json
 from datetime import datetime
 from django.urls import reverse
 import logging
-import pymongo
+from .mongodb_utils import SUMMARY_FIELDS, verify_mongodb_connection
+from .utils import generate_content_stream
+from .content_builder import build_site_content
+from .pagination import paged_response, parse_page_params
+from .replication import save_website
+from .repositories import get_repository
+from .revisions import revisions
+from .website_patch import version_token
+from .autosave import autosave
+from .website_cache import cached_website, load_version, website_cache, website_version
+from .conditional import (
+    check_preconditions,
+    list_etag,
+    set_list_etag,
+    wants_not_modified,
+    website_etag,
+)
 
 logger = logging.getLogger(__name__)
 
+# Recent websites listed on the diagnostic page
+DIAGNOSTIC_WEBSITES = 10
+
 def index(request):
     return render(request, 'index.html')
 
@@ -50,81 +70,7 @@ def details(request):
                 })
             
             # Generate content using a direct JSON structure
-            content = {
-                "name": business_name,
-                "theme": {
-                    "primary_color": "#6366f1",
-                    "secondary_color": "#4f46e5",
-                    "text_color": "#333333",
-                    "background_color": "#ffffff"
-                },
-                "pages": [
-                    {
-                        "name": "Home",
-                        "sections": [
-                            {
-                                "type": "hero",
-                                "title": business_name,
-                                "subtitle": f"Your premier {business_type.lower()} in {location}",
-                                "cta": {
-                                    "text": "Contact Us",
-                                    "link": "#contact"
-                                }
-                            },
-                            {
-                                "type": "about",
-                                "id": "about",
-                                "title": "About Us",
-                                "content": f"{description} We pride ourselves on delivering exceptional service and creating memorable experiences for all our customers. Our commitment to quality and innovation has made us a trusted name in {location}."
-                            },
-                            {
-                                "type": "services",
-                                "title": "Our Services",
-                                "items": [
-                                    {
-                                        "title": f"{business_type} Service 1",
-                                        "description": "Detailed description of our primary service offering, tailored to meet your specific needs."
-                                    },
-                                    {
-                                        "title": f"{business_type} Service 2",
-                                        "description": "Comprehensive explanation of our secondary service, designed to enhance your experience."
-                                    },
-                                    {
-                                        "title": f"{business_type} Service 3",
-                                        "description": "Information about our tertiary service offering, providing additional value to our customers."
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "testimonials",
-                                "title": "Testimonials",
-                                "items": [
-                                    {
-                                        "quote": "The service here is simply amazing! The staff are always friendly and helpful. Highly recommend!",
-                                        "author": "John D.",
-                                        "position": "Customer"
-                                    },
-                                    {
-                                        "quote": f"Best {business_type.lower()} I've experienced in {location}! Will definitely be coming back.",
-                                        "author": "Sarah M.",
-                                        "position": "Customer"
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "contact",
-                                "title": "Contact Us",
-                                "address": f"{business_name}, {location}",
-                                "phone": "+1 (555) 123-4567",
-                                "email": "contact@example.com"
-                            }
-                        ]
-                    }
-                ],
-                "footer": {
-                    "copyright": f" {datetime.now().year} {business_name}. All rights reserved."
-                }
-            }
+            content = build_site_content(business_type, industry, business_name, location, description)
             
             # Prepare website data
             website_data = {
@@ -139,19 +85,8 @@ def details(request):
                 'updated_at': datetime.now()
             }
             
-            # Save to MongoDB
-            mongo_id = save_website_data(website_data)
-            
-            # Also save using Django ORM for backward compatibility
-            website = Website.objects.create(
-                user_email=user_email,
-                business_name=business_name,
-                location=location,
-                description=description,
-                business_type=business_type,
-                industry=industry,
-                content=json.dumps(content)
-            )
+            # Save to MongoDB; the replicator copies it to the Django ORM
+            mongo_id, django_id = save_website(website_data)
 
             # Add success message
             messages.success(request, "✅ Website generated successfully! Your unique website has been created.")
@@ -166,7 +101,7 @@ def details(request):
                 # Fallback to Django ORM if MongoDB storage failed
                 messages.warning(request, "⚠️ MongoDB storage failed. Using Django database instead.")
                 # Redirect to view the created website using Django ID
-                return redirect('view_website', website_id=website.id)
+                return redirect('view_website', website_id=django_id)
             
         except Exception as e:
             # More specific error message for Google AI API issues
@@ -297,81 +232,10 @@ def generate_website(request):
 
         business = request.data['business_type']
         industry = request.data['industry']
-        content = {
-            "name": request.data.get('business_name', ''),
-            "theme": {
-                "primary_color": "#6366f1",
-                "secondary_color": "#4f46e5",
-                "text_color": "#333333",
-                "background_color": "#ffffff"
-            },
-            "pages": [
-                {
-                    "name": "Home",
-                    "sections": [
-                        {
-                            "type": "hero",
-                            "title": request.data.get('business_name', ''),
-                            "subtitle": f"Your premier {business.lower()} in {request.data.get('location', '')}",
-                            "cta": {
-                                "text": "Contact Us",
-                                "link": "#contact"
-                            }
-                        },
-                        {
-                            "type": "about",
-                            "id": "about",
-                            "title": "About Us",
-                            "content": f"{request.data.get('description', '')} We pride ourselves on delivering exceptional service and creating memorable experiences for all our customers. Our commitment to quality and innovation has made us a trusted name in {request.data.get('location', '')}."
-                        },
-                        {
-                            "type": "services",
-                            "title": "Our Services",
-                            "items": [
-                                {
-                                    "title": f"{business} Service 1",
-                                    "description": "Detailed description of our primary service offering, tailored to meet your specific needs."
-                                },
-                                {
-                                    "title": f"{business} Service 2",
-                                    "description": "Comprehensive explanation of our secondary service, designed to enhance your experience."
-                                },
-                                {
-                                    "title": f"{business} Service 3",
-                                    "description": "Information about our tertiary service offering, providing additional value to our customers."
-                                }
-                            ]
-                        },
-                        {
-                            "type": "testimonials",
-                            "title": "Testimonials",
-                            "items": [
-                                {
-                                    "quote": "The service here is simply amazing! The staff are always friendly and helpful. Highly recommend!",
-                                    "author": "John D.",
-                                    "position": "Customer"
-                                },
-                                {
-                                    "quote": f"Best {business.lower()} I've experienced in {request.data.get('location', '')}! Will definitely be coming back.",
-                                    "author": "Sarah M.",
-                                    "position": "Customer"
-                                }
-                            ]
-                        },
-                        {
-                            "type": "contact",
-                            "title": "Contact Us",
-                            "address": f"{request.data.get('business_name', '')}, {request.data.get('location', '')}",
-                            "phone": "+1 (555) 123-4567",
-                            "email": "contact@example.com"
-                        }
-                    ]
-                }
-            ],
-            "footer": {
-                "copyright": f" {datetime.now().year} {request.data.get('business_name', '')}. All rights reserved."
-            }
-        }
+        content = build_site_content(
+            business, industry, request.data.get('business_name', ''),
+            request.data.get('location', ''), request.data.get('description', '')
+        )
 
         website = Website.objects.create(
             user_email=email,
@@ -393,6 +257,18 @@ def generate_website(request):
     except Exception as e:
         return Response({"error": str(e)}, status=400)
 
+def website_to_dict(website):
+    """The get_websites representation of a Django ORM website."""
+    return {
+        'id': website.id,
+        'business_name': website.business_name,
+        'location': website.location,
+        'description': website.description,
+        'business_type': website.business_type,
+        'industry': website.industry,
+        'content': json.loads(website.content)
+    }
+
 @api_view(['GET'])
 def get_websites(request):
     try:
@@ -415,31 +291,36 @@ def get_websites(request):
         except jwt.PyJWTError as e:
             return Response({"error": f"Invalid token: {str(e)}"}, status=401)
         
-        # Get websites from MongoDB
-        mongo_websites = get_all_websites(user_id=email)
-        
-        # If MongoDB returned data, use it
-        if mongo_websites:
-            print(f"Retrieved {len(mongo_websites)} websites from MongoDB for user {email}")
-            return Response(mongo_websites)
-        
-        # If MongoDB is not available or returned no data, fall back to Django ORM
-        print(f"No MongoDB data found for user {email}, falling back to Django ORM")
+        try:
+            page_params = parse_page_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        
+        # The list version comes first, so a change while the page is read only costs a 200
+        repository = get_repository()
+        etag = list_etag(request, email, repository.list_version(email))
+        if etag and wants_not_modified(request):
+            response = check_preconditions(request, etag)
+            if response is not None:
+                return set_list_etag(response, etag)
+        
+        # Get websites from the repository, one page at a time
+        page = repository.list(user_id=email, **page_params)
+        
+        # If the repository returned data, use it
+        if page is not None and (page['websites'] or page_params['cursor']):
+            print(f"Retrieved {len(page['websites'])} websites from the repository for user {email}")
+            return set_list_etag(paged_response(request, page), etag)
+        
+        # If the repository is not available or returned no data, fall back to Django ORM
+        print(f"No repository data found for user {email}, falling back to Django ORM")
         websites = Website.objects.filter(user_email=email)
         
         if not websites.exists():
             print(f"No websites found in Django ORM for user {email}")
             return Response([])
             
-        websites_data = [{
-            'id': website.id,
-            'business_name': website.business_name,
-            'location': website.location,
-            'description': website.description,
-            'business_type': website.business_type,
-            'industry': website.industry,
-            'content': json.loads(website.content)
-        } for website in websites]
+        websites_data = [website_to_dict(website) for website in websites]
         
         print(f"Retrieved {len(websites_data)} websites from Django ORM for user {email}")
         return Response(websites_data)
@@ -451,16 +332,32 @@ def get_websites(request):
 def update_website(request, website_id):
     try:
         # Update in Django ORM
-        website = get_object_or_404(Website, id=website_id)
-        website.content = json.dumps(request.data.get('content', json.loads(website.content)))
-        website.save()
-        
-        # Also update in MongoDB if we have the ID
+        # Buffered autosave changes come first
+        autosave.flush(website_id)
+        with transaction.atomic():
+            # Locked, so an If-Match still holds when the row is saved
+            website = get_object_or_404(Website.objects.select_for_update(), id=website_id)
+            response = check_preconditions(request, website_etag(website_id, website.theme_version))
+            if response is not None:
+                return response
+            previous = website.content
+            content = request.data.get('content', json.loads(website.content))
+            website.content = json.dumps(content)
+            website.theme_version += 1
+            website.save()
+        website_cache.invalidate(website_id)
+        revisions.record(website_id, content, baseline=previous)
+        
+        # Also update in the repository if we have the ID
         mongo_id = request.session.get('mongo_website_id')
         if mongo_id:
-            update_mongo_website(mongo_id, {'content': request.data.get('content')})
+            autosave.flush(mongo_id)
+            repository = get_repository()
+            current = repository.get(mongo_id)
+            if repository.update(mongo_id, {'content': request.data.get('content')}) and current:
+                revisions.record(mongo_id, request.data.get('content'), baseline=current.get('content'))
             
-        return Response({"msg": "Website updated"})
+        return Response({"msg": "Website updated"}, headers={'ETag': website_etag(website_id, website.theme_version)})
     except Exception as e:
         return Response({"error": str(e)}, status=400)
 
@@ -468,13 +365,22 @@ def update_website(request, website_id):
 def delete_website(request, website_id):
     try:
         # Delete from Django ORM
-        website = get_object_or_404(Website, id=website_id)
-        website.delete()
-        
-        # Also delete from MongoDB if we have the ID
+        with transaction.atomic():
+            website = get_object_or_404(Website.objects.select_for_update(), id=website_id)
+            response = check_preconditions(request, website_etag(website_id, website.theme_version))
+            if response is not None:
+                return response
+            website.delete()
+        website_cache.invalidate(website_id)
+        revisions.delete(website_id)
+        autosave.discard(website_id)
+        
+        # Also delete from the repository if we have the ID
         mongo_id = request.session.get('mongo_website_id')
         if mongo_id:
-            delete_mongo_website(mongo_id)
+            get_repository().delete(mongo_id)
+            revisions.delete(mongo_id)
+            autosave.discard(mongo_id)
             if 'mongo_website_id' in request.session:
                 del request.session['mongo_website_id']
                 
@@ -491,58 +397,113 @@ def view_website(request, website_id):
         messages.error(request, "No website ID provided")
         return redirect('home')
     
-    # First try to get from MongoDB using the website_id
+    # A client that has the current version gets 304 without the content being loaded;
+    # autosaved changes are not in that version yet
+    version = None
+    if wants_not_modified(request) and not autosave.has_pending(website_id):
+        try:
+            version = load_version(website_id)
+        except Exception as e:
+            logger.error(f"Error reading website version: {str(e)}")
+        response = website_not_modified(request, website_id, version)
+        if response is not None:
+            return response
+    
+    # The MongoDB document, or else the Django ORM row, through the website cache
     try:
-        mongo_website = get_website_by_id(website_id)
-        logger.info(f"MongoDB lookup result: {'Found' if mongo_website else 'Not found'}")
-        
-        if mongo_website:
-            # If found in MongoDB, use that data
-            logger.info(f"Using MongoDB data for website: {website_id}")
-            website_content = mongo_website.get('content', {})
-            
-            # Print the content type for debugging
-            content_type = type(website_content).__name__
-            logger.info(f"Content type: {content_type}")
-            
-            # Create a Django model instance for template rendering
-            website = Website(
-                id=website_id,
-                user_email=mongo_website.get('user_email', ''),
-                business_name=mongo_website.get('business_name', ''),
-                location=mongo_website.get('location', ''),
-                description=mongo_website.get('description', ''),
-                business_type=mongo_website.get('business_type', ''),
-                industry=mongo_website.get('industry', ''),
-                content=json.dumps(website_content) if isinstance(website_content, dict) else website_content
-            )
-            messages.info(request, "📊 Website data retrieved from MongoDB.")
-            
-            # Store the MongoDB ID in session for future use
-            request.session['mongo_website_id'] = website_id
-            
-            # Log the template context for debugging
-            logger.info(f"Rendering template with MongoDB data: business_name={website.business_name}")
-            
-            return render(request, 'view_website.html', {
-                'website': website,
-                'mongo_data': mongo_website,
-                'is_mongo': True
-            })
+        cached = cached_website(website_id)
+        if cached is not None and version is not None and website_version(cached) != version:
+            # Cached before the last change (in another process's write)
+            website_cache.invalidate(website_id)
+            cached = cached_website(website_id)
     except Exception as e:
         logger.error(f"Error retrieving website from MongoDB: {str(e)}")
         messages.warning(request, f"⚠️ Error retrieving from MongoDB: {str(e)}")
+        # Nothing is cached while MongoDB cannot be asked
+        fields = Website.objects.filter(id=website_id).values().first()
+        cached = {'source': 'orm', 'document': fields} if fields else None
     
-    # If not found in MongoDB or error occurred, try Django ORM
-    try:
-        logger.info(f"Falling back to Django ORM for website: {website_id}")
-        website = get_object_or_404(Website, id=website_id)
-        logger.info(f"Found website in Django ORM: {website.business_name}")
-        return render(request, 'view_website.html', {'website': website})
-    except Exception as e:
-        logger.error(f"Error retrieving website from Django ORM: {str(e)}")
-        messages.error(request, f"❌ Website not found: {str(e)}")
+    return render_cached_website(request, website_id, with_autosaved_changes(website_id, cached))
+
+def with_autosaved_changes(website_id, cached):
+    """
+    A ``cached_website`` result with the editor's pending autosaved changes
+    applied in memory (shared with the async view); they are written by the
+    autosave interval, not by page views.
+    """
+    fields, edits = autosave.pending_fields(website_id)
+    if cached is None or fields is None:
+        return cached
+    if cached['source'] == 'orm' and 'content' in fields:
+        fields['content'] = json.dumps(fields['content'])
+    return {**cached, 'document': {**cached['document'], **fields}, 'pending_edits': edits}
+
+def pending_version(version, pending_edits):
+    """A version token for a page showing unwritten changes; no stored version has it."""
+    return f"{version}+{pending_edits}" if pending_edits else version
+
+def website_not_modified(request, website_id, version):
+    """
+    304 (or 412) for a ``load_version`` result, or None to render the website
+    (shared with the async view).
+    """
+    if version is None:
+        return None
+    response = check_preconditions(request, website_etag(website_id, version['version']))
+    if response is not None and version['source'] == 'mongo':
+        # As when the page is rendered
+        request.session['mongo_website_id'] = website_id
+    return response
+
+def render_cached_website(request, website_id, cached):
+    """Render a website resolved by ``cached_website`` (shared with the async view)."""
+    if cached is None:
+        logger.error(f"Website not found: {website_id}")
+        messages.error(request, "❌ Website not found")
         return redirect('home')
+    
+    if cached['source'] == 'mongo':
+        mongo_website = cached['document']
+        # If found in MongoDB, use that data
+        logger.info(f"Using MongoDB data for website: {website_id}")
+        website_content = mongo_website.get('content', {})
+        
+        # Print the content type for debugging
+        content_type = type(website_content).__name__
+        logger.info(f"Content type: {content_type}")
+        
+        # Create a Django model instance for template rendering
+        website = Website(
+            id=website_id,
+            user_email=mongo_website.get('user_email', ''),
+            business_name=mongo_website.get('business_name', ''),
+            location=mongo_website.get('location', ''),
+            description=mongo_website.get('description', ''),
+            business_type=mongo_website.get('business_type', ''),
+            industry=mongo_website.get('industry', ''),
+            content=json.dumps(website_content) if isinstance(website_content, dict) else website_content
+        )
+        messages.info(request, "📊 Website data retrieved from MongoDB.")
+        
+        # Store the MongoDB ID in session for future use
+        request.session['mongo_website_id'] = website_id
+        
+        # Log the template context for debugging
+        logger.info(f"Rendering template with MongoDB data: business_name={website.business_name}")
+        
+        response = render(request, 'view_website.html', {
+            'website': website,
+            'mongo_data': mongo_website,
+            'is_mongo': True
+        })
+    else:
+        website = Website(**cached['document'])
+        logger.info(f"Found website in Django ORM: {website.business_name}")
+        response = render(request, 'view_website.html', {'website': website})
+    
+    version = pending_version(website_version(cached)['version'], cached.get('pending_edits'))
+    response.headers['ETag'] = website_etag(website_id, version)
+    return response
 
 def view_generated_website(request, website_id=None):
     """
@@ -553,54 +514,37 @@ def view_generated_website(request, website_id=None):
     # Check if user is logged in
     user_email = request.session.get('user_email', None)
     
-    # Connect to MongoDB
-    MONGO_URI = os.getenv('MONGO_URI')
-    if not MONGO_URI:
-        messages.error(request, "MongoDB connection string not found")
+    repository = get_repository()
+    if not repository.configured():
+        messages.error(request, "Website repository is not configured")
         return redirect('details')
     
     try:
-        # Connect to MongoDB
-        mongo_client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        mongo_db = mongo_client["ai_builder_db"]
-        collection = mongo_db["websites_collection"]
-        
-        # Add debug logging
-        print(f"MongoDB connection successful. Looking for website_id: {website_id}")
+        print(f"Looking for website_id: {website_id}")
         
         if website_id:
-            # Get specific website from MongoDB
-            from bson.objectid import ObjectId
-            try:
-                # Try to convert to ObjectId if it's a valid MongoDB ID
-                object_id = ObjectId(website_id)
-                website_data = collection.find_one({"_id": object_id})
-                print(f"Searched for ObjectId: {object_id}, Found: {bool(website_data)}")
-            except Exception as e:
-                print(f"Error converting to ObjectId: {str(e)}")
-                # If not a valid ObjectId, try as a string ID
-                website_data = collection.find_one({"_id": website_id})
-                print(f"Searched for string ID: {website_id}, Found: {bool(website_data)}")
+            # Get specific website from the repository, with autosaved changes
+            if wants_not_modified(request) and not autosave.has_pending(website_id):
+                # 304 from the version alone when the client has it
+                version = repository.version(website_id)
+                if version is not None:
+                    response = check_preconditions(request, website_etag(website_id, version))
+                    if response is not None:
+                        return response
+            website_data = repository.get(website_id, raise_errors=True)
+            print(f"Searched for {website_id}, Found: {bool(website_data)}")
                 
             if not website_data:
-                # If still not found, try to list recent documents to see what's available
-                print("Website not found. Listing recent documents:")
-                recent_docs = list(collection.find().sort("created_at", -1).limit(3))
-                for doc in recent_docs:
-                    print(f"  - ID: {doc['_id']}, Name: {doc.get('business_name', 'N/A')}")
-                
                 messages.error(request, "Website not found.")
                 return redirect('home')
         else:
-            # Get the most recent website from MongoDB
+            # Get the most recent website from the repository
             if user_email:
-                cursor = collection.find({"user_email": user_email}).sort("created_at", -1).limit(1)
                 print(f"Searching for most recent website by user: {user_email}")
             else:
-                cursor = collection.find().sort("created_at", -1).limit(1)
                 print("Searching for most recent website (any user)")
-                
-            websites = list(cursor)
+            page = repository.list(user_id=user_email or None, limit=1)
+            websites = page['websites'] if page else []
             
             if not websites:
                 print("No websites found in the collection")
@@ -610,65 +554,79 @@ def view_generated_website(request, website_id=None):
             website_data = websites[0]
             print(f"Found most recent website with ID: {website_data['_id']}")
         
-        # Convert MongoDB ObjectId to string for JSON serialization
-        if '_id' in website_data and isinstance(website_data['_id'], ObjectId):
-            website_data['_id'] = str(website_data['_id'])
-        
-        # Extract the content (website layout)
-        website_layout = website_data.get('content', {})
-        
-        # Debug the content structure
-        print(f"Content type: {type(website_layout).__name__}")
-        if isinstance(website_layout, dict):
-            print(f"Content keys: {list(website_layout.keys())}")
-            
-        # Add more detailed debugging
-        print(f"All website_data keys: {list(website_data.keys())}")
-        print(f"Business name: {website_data.get('business_name')}")
-        print(f"Created at: {website_data.get('created_at')}")
-        
-        context = {
-            'website': website_data,  # Include the full website data
-            'mongo_data': website_data,
-            'website_layout': website_layout,  # Add the layout directly to context
-            'is_mongo': True,
-            'user_email': user_email,
-        }
-        
-        return render(request, 'view_website.html', context)
+        # Autosaved changes are shown here and written by the autosave interval
+        fields, pending_edits = autosave.pending_fields(website_data['_id'])
+        if fields is not None:
+            website_data.update(fields)
+        return render_generated_website(request, website_data, user_email, pending_edits)
     
     except Exception as e:
         print(f"Error in view_generated_website: {str(e)}")
-        messages.error(request, f"Error connecting to MongoDB: {str(e)}")
+        messages.error(request, f"Error loading the website: {str(e)}")
         return redirect('home')
 
+def render_generated_website(request, website_data, user_email, pending_edits=0):
+    """
+    Render a generated website document (shared with the async view);
+    ``pending_edits`` counts autosaved changes applied to it but not written.
+    """
+    # Convert MongoDB ObjectId to string for JSON serialization
+    if '_id' in website_data:
+        website_data['_id'] = str(website_data['_id'])
+    
+    # The most recent website is only known once loaded; still skip rendering it
+    etag = website_etag(website_data.get('_id'), pending_version(version_token(website_data), pending_edits))
+    response = check_preconditions(request, etag)
+    if response is not None:
+        return response
+    
+    # Extract the content (website layout)
+    website_layout = website_data.get('content', {})
+    
+    # Debug the content structure
+    print(f"Content type: {type(website_layout).__name__}")
+    if isinstance(website_layout, dict):
+        print(f"Content keys: {list(website_layout.keys())}")
+        
+    # Add more detailed debugging
+    print(f"All website_data keys: {list(website_data.keys())}")
+    print(f"Business name: {website_data.get('business_name')}")
+    print(f"Created at: {website_data.get('created_at')}")
+    
+    context = {
+        'website': website_data,  # Include the full website data
+        'mongo_data': website_data,
+        'website_layout': website_layout,  # Add the layout directly to context
+        'is_mongo': True,
+        'user_email': user_email,
+    }
+    
+    response = render(request, 'view_website.html', context)
+    response.headers['ETag'] = etag
+    return response
+
 def mongodb_diagnostic(request):
     """
     View to diagnose MongoDB connection and data storage.
+    
+    Safe to load in production: no collection scans, server statistics are
+    cached (see ``mongo_diagnostics``) and the user's websites are one
+    indexed page.
     """
     # Get MongoDB diagnostic information
     mongo_info = verify_mongodb_connection()
     
-    # Get Django ORM website count for comparison
-    django_website_count = Website.objects.count()
-    
     # Prepare context
     context = {
         'mongo_info': mongo_info,
-        'django_website_count': django_website_count,
         'user_email': request.session.get('user_email', None)
     }
     
-    # If user is logged in, get their websites from both sources
+    # If user is logged in, show their most recent websites
     if context['user_email']:
-        # Get MongoDB websites
-        mongo_websites = get_all_websites(user_id=context['user_email'])
-        context['mongo_user_websites'] = mongo_websites
-        context['mongo_user_website_count'] = len(mongo_websites)
-        
-        # Get Django ORM websites
-        django_websites = Website.objects.filter(user_email=context['user_email'])
-        context['django_user_website_count'] = django_websites.count()
+        page = get_repository().list(user_id=context['user_email'], limit=DIAGNOSTIC_WEBSITES, fields=SUMMARY_FIELDS)
+        context['mongo_user_websites'] = page['websites'] if page else []
+        context['mongo_user_websites_more'] = bool(page and page['next_cursor'])
     
     return render(request, 'mongodb_diagnostic.html', context)
 
@@ -706,81 +664,7 @@ def generate_website_layout(request):
         user_email = request.session.get('user_email', 'guest@example.com')
         
         # Create a basic JSON structure for the website content
-        content = {
-            "name": business_name,
-            "theme": {
-                "primary_color": "#6366f1",
-                "secondary_color": "#4f46e5",
-                "text_color": "#333333",
-                "background_color": "#ffffff"
-            },
-            "pages": [
-                {
-                    "name": "Home",
-                    "sections": [
-                        {
-                            "type": "hero",
-                            "title": business_name,
-                            "subtitle": f"Your premier {business_type.lower()} in {location}",
-                            "cta": {
-                                "text": "Contact Us",
-                                "link": "#contact"
-                            }
-                        },
-                        {
-                            "type": "about",
-                            "id": "about",
-                            "title": "About Us",
-                            "content": f"{description} We pride ourselves on delivering exceptional service and creating memorable experiences for all our customers. Our commitment to quality and innovation has made us a trusted name in {location}."
-                        },
-                        {
-                            "type": "services",
-                            "title": "Our Services",
-                            "items": [
-                                {
-                                    "title": f"{business_type} Service 1",
-                                    "description": "Detailed description of our primary service offering, tailored to meet your specific needs."
-                                },
-                                {
-                                    "title": f"{business_type} Service 2",
-                                    "description": "Comprehensive explanation of our secondary service, designed to enhance your experience."
-                                },
-                                {
-                                    "title": f"{business_type} Service 3",
-                                    "description": "Information about our tertiary service offering, providing additional value to our customers."
-                                }
-                            ]
-                        },
-                        {
-                            "type": "testimonials",
-                            "title": "Testimonials",
-                            "items": [
-                                {
-                                    "quote": "The service here is simply amazing! The staff are always friendly and helpful. Highly recommend!",
-                                    "author": "John D.",
-                                    "position": "Customer"
-                                },
-                                {
-                                    "quote": f"Best {business_type.lower()} I've experienced in {location}! Will definitely be coming back.",
-                                    "author": "Sarah M.",
-                                    "position": "Customer"
-                                }
-                            ]
-                        },
-                        {
-                            "type": "contact",
-                            "title": "Contact Us",
-                            "address": f"{business_name}, {location}",
-                            "phone": "+1 (555) 123-4567",
-                            "email": "contact@example.com"
-                        }
-                    ]
-                }
-            ],
-            "footer": {
-                "copyright": f" {datetime.now().year} {business_name}. All rights reserved."
-            }
-        }
+        content = build_site_content(business_type, industry, business_name, location, description)
         
         # Prepare website data for MongoDB
         website_data = {
@@ -795,50 +679,144 @@ def generate_website_layout(request):
             'updated_at': datetime.now()
         }
         
-        # Save to MongoDB
-        MONGO_URI = os.getenv('MONGO_URI')
-        if not MONGO_URI:
-            print("Error: MONGO_URI environment variable not set")
+        # Save to the website repository
+        if not get_repository().configured():
+            print("Error: the website repository is not configured")
             if request.headers.get('Content-Type') == 'application/json':
-                return JsonResponse({"success": False, "message": "MongoDB connection string not found"}, status=500)
+                return JsonResponse({"success": False, "message": "Website repository is not configured"}, status=500)
             else:
-                messages.error(request, "MongoDB connection string not found")
+                messages.error(request, "Website repository is not configured")
                 return redirect('details')
         
-        mongo_client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        mongo_db = mongo_client["ai_builder_db"]
-        collection = mongo_db["websites_collection"]
-        
-        result = collection.insert_one(website_data)
-        mongo_id = str(result.inserted_id)
-        print(f"Website data inserted with ID: {mongo_id}")
-        
-        # Also save in Django ORM for backward compatibility
-        try:
-            website = Website.objects.create(
-                user_email=user_email,
-                business_name=business_name,
-                location=location,
-                description=description,
-                business_type=business_type,
-                industry=industry,
-                content=json.dumps(content)  # Convert content to string for Django ORM
-            )
-            django_id = website.id
-        except Exception as e:
-            django_id = None
-            logger.error(f"Error saving to Django ORM: {str(e)}")
+        # The replicator copies the website to the Django ORM
+        mongo_id, django_id = save_website(website_data)
+        print(f"Website data inserted with ID: {mongo_id or django_id}")
         
         # Return success response
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({
                 "success": True,
                 "message": "Website data saved successfully.",
-                "mongo_id": str(mongo_id),
+                "mongo_id": mongo_id,
                 "django_id": django_id
             })
         else:
             messages.success(request, "Website generated successfully!")
+            if mongo_id is None:
+                return redirect('view_website', website_id=django_id)
             return redirect('view_generated_website_by_id', website_id=mongo_id)
     else:
         return render(request, 'details.html')
+
+
+def _sse_event(event, data):
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Stream drafts kept per session; the oldest is dropped beyond this
+MAX_STREAM_DRAFTS = 10
+
+def generate_website_stream(request):
+    """
+    Generate a website with Gemini and stream the HTML as Server-Sent Events.
+
+    Takes the same fields as generate_website_layout as a form or JSON POST.
+    A POST that accepts ``text/event-stream`` is streamed at once; any other
+    POST stores the fields as a draft in the session and returns its
+    ``stream_url``, which an EventSource then opens with GET. A GET only
+    streams a draft of its own session, once, so a plain link cannot make a
+    visitor generate and store a website. Emits ``chunk`` events with
+    cleaned HTML as soon as the model produces it, then a ``done`` event
+    with the ids of the stored website, or an ``error`` event.
+    """
+    if request.method == 'GET':
+        drafts = request.session.get('stream_drafts', {})
+        data = drafts.pop(request.GET.get('draft', ''), None)
+        if data is None:
+            return JsonResponse({
+                "success": False,
+                "message": "Unknown or already used draft; POST the website fields first."
+            }, status=404)
+        request.session['stream_drafts'] = drafts
+    elif request.method != 'POST':
+        return JsonResponse({"success": False, "message": "Method not allowed."}, status=405)
+    elif request.headers.get('Content-Type') == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError as e:
+            return JsonResponse({"success": False, "message": f"Invalid JSON: {e}"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"success": False, "message": "Expected a JSON object."}, status=400)
+    else:
+        data = request.POST
+    
+    business_name = data.get('business_name', '')
+    business_type = data.get('business_type', '')
+    industry = data.get('industry', '')
+    location = data.get('location', '')
+    description = data.get('description', '')
+    
+    # Check for required fields
+    if not all([business_name, business_type, industry, location, description]):
+        return JsonResponse({
+            "success": False,
+            "message": "All fields are required."
+        }, status=400)
+    
+    if request.method == 'POST' and 'text/event-stream' not in request.headers.get('Accept', ''):
+        drafts = request.session.get('stream_drafts', {})
+        draft = uuid.uuid4().hex
+        drafts[draft] = {
+            'business_name': business_name,
+            'business_type': business_type,
+            'industry': industry,
+            'location': location,
+            'description': description,
+        }
+        request.session['stream_drafts'] = dict(list(drafts.items())[-MAX_STREAM_DRAFTS:])
+        return JsonResponse({
+            "success": True,
+            "draft": draft,
+            "stream_url": f"{reverse('generate_website_stream')}?draft={draft}"
+        }, status=201)
+    
+    user_email = request.session.get('user_email', 'guest@example.com')
+    stream = generate_content_stream(business_type, industry, business_name, location, description)
+    
+    def events():
+        try:
+            for chunk in stream:
+                yield _sse_event('chunk', {'html': chunk})
+            
+            # Persist the assembled document once the model has finished
+            website_data = {
+                'user_email': user_email,
+                'business_name': business_name,
+                'location': location,
+                'description': description,
+                'business_type': business_type,
+                'industry': industry,
+                'content': stream.content,
+                'created_at': datetime.now(),
+                'updated_at': datetime.now()
+            }
+            # The replicator copies it to the Django ORM
+            mongo_id, django_id = save_website(website_data)
+            
+            yield _sse_event('done', {
+                'success': True,
+                'mongo_id': mongo_id,
+                'django_id': django_id,
+                'is_fallback': stream.is_fallback,
+                'url': (reverse('view_generated_website_by_id', args=[mongo_id]) if mongo_id
+                        else reverse('view_website', args=[django_id]))
+            })
+        except Exception as e:
+            logger.error(f"Error in generate_website_stream: {str(e)}")
+            yield _sse_event('error', {'success': False, 'message': str(e)})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,343 @@
+"""
+Read-through cache for single-website lookups.
+
+``view_website`` resolves a website id to its MongoDB document, or to the
+Django ORM row when MongoDB has no such document. ``cached_website()`` keeps
+that result in an in-process LRU and, when WEBSITE_CACHE_BACKEND names a
+Django cache alias (e.g. a Redis or Memcached backend), in that shared cache
+too. Ids that resolve to nothing are cached for WEBSITE_CACHE_NEGATIVE_TTL
+seconds so repeated requests for missing pages stay cheap.
+
+Writes through ``mongodb_utils.update_website`` / ``delete_website``, the
+ORM update and delete views and the replicator invalidate the entry in this
+process and in the shared cache. Other processes' memory tiers are not
+notified and may serve the previous version for up to WEBSITE_CACHE_TTL
+seconds, so keep that short when a shared backend is configured.
+
+Cached entries are shared between requests and must be treated as read-only.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+from django.core.cache import caches
+
+from .config import setting
+from .website_patch import version_token
+
+logger = logging.getLogger(__name__)
+
+# Stored for ids that resolved to nothing
+MISSING = '__missing__'
+
+
+def load_website(website_id):
+    """
+    Resolve a website id without the cache.
+
+    Returns:
+        dict: ``{'source': 'mongo', 'document': ...}`` for a MongoDB document,
+            ``{'source': 'orm', 'document': ...}`` with the Website row's
+            field values, or None if neither store has it
+
+    Raises:
+        MongoNotConfigured, MongoUnavailable: If MongoDB could not be asked,
+            so a miss is never cached because of an outage
+    """
+    from .models import Website
+    from .repositories import get_repository
+
+    website_id = str(website_id)
+    # Only ObjectIds can be in the repository; skip the round trip for ORM ids
+    if ObjectId.is_valid(website_id):
+        document = get_repository().get(website_id, raise_errors=True)
+        if document:
+            return {'source': 'mongo', 'document': document}
+    if website_id.isdigit():
+        fields = Website.objects.filter(id=int(website_id)).values().first()
+        if fields:
+            return {'source': 'orm', 'document': fields}
+    return None
+
+
+async def aload_website(website_id):
+    """Async ``load_website``, for the async views."""
+    from .models import Website
+    from .repositories import get_repository
+
+    website_id = str(website_id)
+    if ObjectId.is_valid(website_id):
+        document = await get_repository().aget(website_id, raise_errors=True)
+        if document:
+            return {'source': 'mongo', 'document': document}
+    if website_id.isdigit():
+        fields = await Website.objects.filter(id=int(website_id)).values().afirst()
+        if fields:
+            return {'source': 'orm', 'document': fields}
+    return None
+
+
+def load_version(website_id):
+    """
+    Resolve a website id like ``load_website``, reading only its version.
+
+    Returns:
+        dict: ``{'source': 'mongo' or 'orm', 'version': ...}``, or None if
+            neither store has it
+
+    Raises:
+        MongoNotConfigured, MongoUnavailable: If MongoDB could not be asked
+    """
+    from .models import Website
+    from .repositories import get_repository
+
+    website_id = str(website_id)
+    if ObjectId.is_valid(website_id):
+        version = get_repository().version(website_id, raise_errors=True)
+        if version is not None:
+            return {'source': 'mongo', 'version': version}
+    if website_id.isdigit():
+        theme_version = Website.objects.filter(id=int(website_id)).values_list('theme_version', flat=True).first()
+        if theme_version is not None:
+            return {'source': 'orm', 'version': str(theme_version)}
+    return None
+
+
+async def aload_version(website_id):
+    """Async ``load_version``."""
+    from .models import Website
+    from .repositories import get_repository
+
+    website_id = str(website_id)
+    if ObjectId.is_valid(website_id):
+        version = await get_repository().aversion(website_id, raise_errors=True)
+        if version is not None:
+            return {'source': 'mongo', 'version': version}
+    if website_id.isdigit():
+        theme_version = await Website.objects.filter(id=int(website_id)).values_list('theme_version', flat=True).afirst()
+        if theme_version is not None:
+            return {'source': 'orm', 'version': str(theme_version)}
+    return None
+
+
+def website_version(website):
+    """The ``load_version`` result matching a ``load_website`` result."""
+    if website['source'] == 'mongo':
+        return {'source': 'mongo', 'version': version_token(website['document'])}
+    return {'source': 'orm', 'version': str(website['document']['theme_version'])}
+
+
+class WebsiteCache:
+    """
+    In-process LRU with an optional shared Django cache behind it.
+
+    Args:
+        max_entries (int): Entries kept in memory
+        max_bytes (int): Approximate memory budget (pickled size) of the entries
+        ttl (int): Seconds a found website is cached
+        negative_ttl (int): Seconds a missing website is cached
+        backend (str): Django cache alias for the shared tier; empty to disable
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=60, negative_ttl=10, backend=''):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(website_id):
+        return f"website:{website_id}"
+
+    # -- shared tier -------------------------------------------------------
+
+    def _shared(self):
+        return caches[self.backend] if self.backend else None
+
+    def _shared_get(self, website_id):
+        try:
+            shared = self._shared()
+            return shared.get(self._key(website_id)) if shared is not None else None
+        except Exception as e:
+            logger.error(f"Error reading website cache: {e}")
+            return None
+
+    def _shared_set(self, website_id, value, ttl):
+        try:
+            shared = self._shared()
+            if shared is not None:
+                shared.set(self._key(website_id), value, ttl)
+        except Exception as e:
+            logger.error(f"Error writing website cache: {e}")
+
+    async def _ashared_get(self, website_id):
+        try:
+            shared = self._shared()
+            return await shared.aget(self._key(website_id)) if shared is not None else None
+        except Exception as e:
+            logger.error(f"Error reading website cache: {e}")
+            return None
+
+    async def _ashared_set(self, website_id, value, ttl):
+        try:
+            shared = self._shared()
+            if shared is not None:
+                await shared.aset(self._key(website_id), value, ttl)
+        except Exception as e:
+            logger.error(f"Error writing website cache: {e}")
+
+    # -- memory tier -------------------------------------------------------
+
+    def _memory_get(self, website_id):
+        with self._lock:
+            entry = self._entries.get(website_id)
+            if entry is None:
+                return None
+            value, expires, size = entry
+            if expires < time.monotonic():
+                del self._entries[website_id]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(website_id)
+            return value
+
+    def _memory_set(self, website_id, value, ttl):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            previous = self._entries.pop(website_id, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[website_id] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    # -- public API --------------------------------------------------------
+
+    def get_or_load(self, website_id, load=load_website):
+        """
+        Return the cached lookup for ``website_id``, calling ``load`` on a miss.
+
+        Returns:
+            The loaded value, or None if the website does not exist
+        """
+        website_id = str(website_id)
+        value = self._memory_get(website_id)
+        if value is not None:
+            return self._hit(value, shared=False)
+        value = self._shared_get(website_id)
+        if value is not None:
+            self._memory_set(website_id, value, self._ttl(value))
+            return self._hit(value, shared=True)
+
+        self.misses += 1
+        value = load(website_id)
+        stored = MISSING if value is None else value
+        self._memory_set(website_id, stored, self._ttl(stored))
+        self._shared_set(website_id, stored, self._ttl(stored))
+        return value
+
+    async def aget_or_load(self, website_id, load=aload_website):
+        """``get_or_load`` for async views; ``load`` is a coroutine function."""
+        website_id = str(website_id)
+        value = self._memory_get(website_id)
+        if value is not None:
+            return self._hit(value, shared=False)
+        value = await self._ashared_get(website_id)
+        if value is not None:
+            self._memory_set(website_id, value, self._ttl(value))
+            return self._hit(value, shared=True)
+
+        self.misses += 1
+        value = await load(website_id)
+        stored = MISSING if value is None else value
+        self._memory_set(website_id, stored, self._ttl(stored))
+        await self._ashared_set(website_id, stored, self._ttl(stored))
+        return value
+
+    def _ttl(self, value):
+        return self.negative_ttl if value == MISSING else self.ttl
+
+    def _hit(self, value, shared):
+        if value == MISSING:
+            self.negative_hits += 1
+            return None
+        if shared:
+            self.shared_hits += 1
+        else:
+            self.memory_hits += 1
+        return value
+
+    def invalidate(self, *website_ids):
+        """Drop websites from this process and the shared cache."""
+        website_ids = [str(website_id) for website_id in website_ids if website_id is not None]
+        if not website_ids:
+            return
+        with self._lock:
+            for website_id in website_ids:
+                entry = self._entries.pop(website_id, None)
+                if entry is not None:
+                    self._bytes -= entry[2]
+            self.invalidations += len(website_ids)
+        try:
+            shared = self._shared()
+            if shared is not None:
+                shared.delete_many([self._key(website_id) for website_id in website_ids])
+        except Exception as e:
+            logger.error(f"Error invalidating website cache: {e}")
+
+    def clear(self):
+        """Drop every entry held in this process."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and memory use for monitoring."""
+        hits = self.memory_hits + self.shared_hits + self.negative_hits
+        lookups = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'shared_hits': self.shared_hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._entries),
+            'memory_bytes': self._bytes,
+            'shared_backend': self.backend or None,
+        }
+
+
+website_cache = WebsiteCache(
+    max_entries=setting('WEBSITE_CACHE_MAX_ENTRIES', 1024),
+    max_bytes=setting('WEBSITE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+    ttl=setting('WEBSITE_CACHE_TTL', 60),
+    negative_ttl=setting('WEBSITE_CACHE_NEGATIVE_TTL', 10),
+    backend=setting('WEBSITE_CACHE_BACKEND', ''),
+)
+
+
+def cached_website(website_id):
+    """Resolve a website id through the cache (see ``load_website``)."""
+    return website_cache.get_or_load(website_id)
+
+
+async def acached_website(website_id):
+    """Async ``cached_website``."""
+    return await website_cache.aget_or_load(website_id)
@@ -0,0 +1,381 @@
+"""
+Field-level website updates.
+
+A PATCH names only what changed, either as JSON Patch (RFC 6902) or as
+dotted paths::
+
+    [{"op": "replace", "path": "/content/pages/0/sections/3/items/1/quote", "value": "..."}]
+
+    {"set": {"content.pages.0.sections.3.items.1.quote": "..."},
+     "push": {"content.pages.0.sections.2.items": {...}},
+     "unset": ["content.footer.social"]}
+
+Both become a list of ``Operation``s, which ``mongo_update`` turns into
+targeted ``$set``/``$unset``/``$push`` operators and ``apply_operations``
+applies to a loaded document (SQLite repository, ORM rows). Only
+EDITABLE_FIELDS can be changed.
+
+Writes are optimistic: a client sends back the ``version_token`` it read
+and the write is refused with ``VersionConflict`` if the website changed in
+between. The token is the document's ``updated_at`` to the millisecond for
+repository documents and ``theme_version`` for Django ORM rows.
+"""
+import copy
+import json
+from collections import namedtuple
+from datetime import datetime
+
+EDITABLE_FIELDS = ('content', 'business_name', 'location', 'description', 'business_type', 'industry')
+
+# Expected version that skips the version check
+ANY_VERSION = object()
+
+# kind is 'set', 'unset' or 'push'; position is the list index of a push (None appends)
+Operation = namedtuple('Operation', 'kind path value position', defaults=(None, None))
+
+
+class PatchError(ValueError):
+    """The patch is malformed or cannot be applied to the website."""
+
+
+class VersionConflict(Exception):
+    """The website changed since the version the client read."""
+
+    def __init__(self, current_version=None):
+        super().__init__("The website was changed by someone else")
+        self.current_version = current_version
+
+
+def _ms(value):
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def version_token(document):
+    """Version token of a repository document: its ``updated_at`` to the millisecond."""
+    updated_at = document.get('updated_at')
+    if not isinstance(updated_at, datetime):
+        return '0'
+    return _ms(updated_at).isoformat(timespec='milliseconds')
+
+
+def parse_version_token(token):
+    """
+    ``updated_at`` of a repository version token (None for '0').
+
+    Raises:
+        PatchError: If the token is not one
+    """
+    if token == '0':
+        return None
+    try:
+        return datetime.fromisoformat(token)
+    except (TypeError, ValueError):
+        raise PatchError(f"Invalid version: {token!r}")
+
+
+def same_version(document, updated_at):
+    stored = document.get('updated_at')
+    if not isinstance(stored, datetime):
+        return updated_at is None
+    return updated_at is not None and _ms(stored) == _ms(updated_at)
+
+
+def _check_path(path):
+    segments = path.split('.')
+    if segments[0] not in EDITABLE_FIELDS:
+        raise PatchError(f"{segments[0]!r} cannot be changed; editable fields are {', '.join(EDITABLE_FIELDS)}")
+    if any(not segment or segment.startswith('$') for segment in segments):
+        raise PatchError(f"Invalid path: {path!r}")
+    return path
+
+
+def _resolve(document, segments):
+    """The value at ``segments``, or raise PatchError if there is none."""
+    value = document
+    for segment in segments:
+        if isinstance(value, dict) and segment in value:
+            value = value[segment]
+        elif isinstance(value, list) and segment.isdigit() and int(segment) < len(value):
+            value = value[int(segment)]
+        else:
+            raise PatchError(f"Path not found: {'.'.join(segments)}")
+    return value
+
+
+def parse_dotted(body):
+    """Operations of a ``{"set": ..., "push": ..., "unset": ...}`` body."""
+    if not isinstance(body, dict) or not body or set(body) - {'set', 'push', 'unset', 'expected_version'}:
+        raise PatchError('Expected "set", "push" and/or "unset"')
+    operations = []
+    for path, value in (body.get('set') or {}).items():
+        operations.append(Operation('set', _check_path(path), value))
+    for path, value in (body.get('push') or {}).items():
+        operations.append(Operation('push', _check_path(path), value))
+    for path in body.get('unset') or []:
+        operations.append(Operation('unset', _check_path(path)))
+    if not operations:
+        raise PatchError("The patch changes nothing")
+    return operations
+
+
+def parse_json_patch(ops, document):
+    """
+    Operations of a JSON Patch against the current ``document``.
+
+    The document tells list elements from object members: ``add`` into a
+    list becomes a push, ``remove`` of a list element rewrites that list.
+    ``test`` operations are checked here.
+
+    Raises:
+        PatchError: For unsupported operations or paths that do not exist
+        VersionConflict: If a ``test`` operation fails
+    """
+    if not isinstance(ops, list) or not ops:
+        raise PatchError("Expected a list of JSON Patch operations")
+    operations = []
+    for op in ops:
+        if not isinstance(op, dict) or not isinstance(op.get('path'), str) or not op['path'].startswith('/'):
+            raise PatchError(f"Invalid JSON Patch operation: {op!r}")
+        segments = [token.replace('~1', '/').replace('~0', '~') for token in op['path'][1:].split('/')]
+        if any('.' in segment for segment in segments):
+            raise PatchError(f"Path segments cannot contain '.': {op['path']}")
+        path = _check_path('.'.join(segments))
+        parent = _resolve(document, segments[:-1]) if len(segments) > 1 else document
+        leaf = segments[-1]
+        kind = op.get('op')
+        if kind in ('add', 'replace', 'test') and 'value' not in op:
+            raise PatchError(f"{kind} needs a value: {op['path']}")
+
+        if kind == 'test':
+            if _resolve(document, segments) != op['value']:
+                raise VersionConflict()
+        elif kind == 'replace':
+            _resolve(document, segments)
+            operations.append(Operation('set', path, op['value']))
+        elif kind == 'add' and isinstance(parent, list):
+            if leaf == '-':
+                position = None
+            elif leaf.isdigit() and int(leaf) <= len(parent):
+                position = int(leaf)
+            else:
+                raise PatchError(f"Invalid list index: {op['path']}")
+            operations.append(Operation('push', '.'.join(segments[:-1]), op['value'], position))
+        elif kind == 'add':
+            operations.append(Operation('set', path, op['value']))
+        elif kind == 'remove' and isinstance(parent, list):
+            _resolve(document, segments)
+            remaining = [item for index, item in enumerate(parent) if index != int(leaf)]
+            operations.append(Operation('set', '.'.join(segments[:-1]), remaining))
+        elif kind == 'remove':
+            _resolve(document, segments)
+            operations.append(Operation('unset', path))
+        else:
+            raise PatchError(f"Unsupported JSON Patch operation: {kind!r}")
+    return operations
+
+
+def check_operations(operations):
+    """
+    Merge appends to the same list, and refuse overlapping paths (which
+    MongoDB cannot update in one write) and anything but setting the
+    top-level string fields or ``content`` itself.
+
+    Returns:
+        list: The operations to apply
+    """
+    merged = []
+    pushes = {}
+    for operation in operations:
+        if operation.kind == 'push' and operation.position is None and operation.path in pushes:
+            pushes[operation.path].value.append(operation.value)
+            continue
+        if operation.kind == 'push':
+            operation = operation._replace(value=[operation.value])
+            if operation.position is None:
+                pushes[operation.path] = operation
+        merged.append(operation)
+
+    for operation in merged:
+        field = operation.path.split('.')[0]
+        if operation.path == field and operation.kind != 'set':
+            raise PatchError(f"{field} can only be set")
+        if field != 'content' and (operation.path != field or not isinstance(operation.value, str)):
+            raise PatchError(f"{field} can only be set to a string")
+
+    paths = sorted(operation.path for operation in merged)
+    for first, second in zip(paths, paths[1:]):
+        if first == second or second.startswith(first + '.'):
+            raise PatchError(f"Conflicting changes to {first} and {second}")
+    return merged
+
+
+def mongo_update(operations):
+    """The MongoDB update document of checked operations."""
+    update = {}
+    for operation in operations:
+        if operation.kind == 'set':
+            update.setdefault('$set', {})[operation.path] = operation.value
+        elif operation.kind == 'unset':
+            update.setdefault('$unset', {})[operation.path] = ''
+        else:
+            push = {'$each': operation.value}
+            if operation.position is not None:
+                push['$position'] = operation.position
+            update.setdefault('$push', {})[operation.path] = push
+    return update
+
+
+def apply_operations(document, operations):
+    """
+    Apply checked operations to ``document`` in place, the way MongoDB
+    would: missing objects on a path are created, numeric segments index
+    lists, and paths through other values are refused with PatchError.
+    """
+    for operation in operations:
+        try:
+            _apply(document, operation)
+        except PatchError:
+            raise
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            raise PatchError(f"Cannot {operation.kind} {operation.path} in this website")
+    return document
+
+
+def _apply(document, operation):
+    *parents, leaf = operation.path.split('.')
+    target = document
+    for segment in parents:
+        if isinstance(target, list):
+            target = target[int(segment)]
+        elif segment in target:
+            target = target[segment]
+        elif operation.kind == 'unset':
+            return
+        else:
+            target = target.setdefault(segment, {})
+    if not isinstance(target, (dict, list)):
+        raise PatchError(f"Cannot {operation.kind} {operation.path}: its parent is not an object or list")
+    if isinstance(target, list):
+        leaf = int(leaf)
+    if operation.kind == 'set':
+        target[leaf] = copy.deepcopy(operation.value)
+    elif operation.kind == 'unset':
+        if isinstance(target, list):
+            target[leaf] = None
+        else:
+            target.pop(leaf, None)
+    else:
+        items = target[leaf] if isinstance(target, list) else target.setdefault(leaf, [])
+        if not isinstance(items, list):
+            raise PatchError(f"{operation.path} is not a list")
+        position = len(items) if operation.position is None else operation.position
+        items[position:position] = copy.deepcopy(operation.value)
+
+
+def get_path(document, path):
+    """
+    The value at a dotted path.
+
+    Returns:
+        tuple: (found, value)
+    """
+    try:
+        return True, _resolve(document, path.split('.'))
+    except PatchError:
+        return False, None
+
+
+# A website being edited: ``store`` is 'repository' for documents of the
+# website repository (ObjectIds) and 'orm' for Django ORM rows; ``version``
+# is its version token when loaded.
+EditableWebsite = namedtuple('EditableWebsite', 'website_id store document version')
+
+
+def load_editable(website_id, email):
+    """
+    The user's website, with its editable fields and version.
+
+    Returns:
+        EditableWebsite: Or None if ``email`` has no such website
+
+    Raises:
+        MongoNotConfigured, MongoUnavailable: If the repository cannot be asked
+    """
+    from bson import ObjectId
+
+    from .models import Website
+    from .repositories import get_repository
+    from .revisions import parse_content
+
+    website_id = str(website_id)
+    if ObjectId.is_valid(website_id):
+        website = get_repository().get(website_id, raise_errors=True)
+        if website is None or website.get('user_email') != email:
+            return None
+        return EditableWebsite(website_id, 'repository', website, version_token(website))
+    website = Website.objects.filter(id=website_id, user_email=email).first() if website_id.isdigit() else None
+    if website is None:
+        return None
+    document = {field: getattr(website, field) for field in EDITABLE_FIELDS}
+    document['content'] = parse_content(website.content)
+    return EditableWebsite(website_id, 'orm', document, str(website.theme_version))
+
+
+def write_operations(website, operations, expected_version=None):
+    """
+    Apply checked operations to a loaded website with one write and record
+    the content revision.
+
+    Repository documents get one targeted update; ORM rows get the changed
+    columns only, guarded by the ``theme_version`` that was loaded.
+
+    Args:
+        website (EditableWebsite): From ``load_editable``
+        expected_version (str, optional): Refuse the write unless the
+            website is still at this version token
+
+    Returns:
+        str: The new version token, or None if the store failed
+
+    Raises:
+        PatchError: If the operations do not fit the website
+        VersionConflict: If the website is at another version
+    """
+    from django.db.models import F
+
+    from .models import Website
+    from .repositories import get_repository
+    from .revisions import revisions
+    from .website_cache import website_cache
+
+    # Refuse what the store would refuse before writing
+    document = apply_operations(copy.deepcopy(website.document), operations)
+    fields = {operation.path.split('.')[0] for operation in operations}
+
+    if website.store == 'repository':
+        expected_updated_at = parse_version_token(str(expected_version)) if expected_version is not None else ANY_VERSION
+        updated = get_repository().patch(website.website_id, operations, expected_updated_at)
+        if updated is None:
+            return None
+        version = version_token(updated)
+        content = updated.get('content')
+    else:
+        if expected_version is not None and str(expected_version) != website.version:
+            raise VersionConflict(website.version)
+        values = {field: document[field] for field in fields}
+        if 'content' in values:
+            values['content'] = json.dumps(values['content'])
+        # The version loaded guards the write even without expected_version
+        updated = Website.objects.filter(id=website.website_id, theme_version=int(website.version)).update(
+            theme_version=F('theme_version') + 1, **values
+        )
+        if not updated:
+            current = Website.objects.filter(id=website.website_id).values_list('theme_version', flat=True).first()
+            raise VersionConflict(str(current))
+        website_cache.invalidate(website.website_id)
+        version = str(int(website.version) + 1)
+        content = document['content']
+
+    if 'content' in fields:
+        revisions.record(website.website_id, content, baseline=website.document.get('content'))
+    return version